@@ -4,9 +4,13 @@ from flask_bcrypt import Bcrypt
 from flask_wtf.csrf import CSRFProtect
 import firebase_admin
 from firebase_admin import credentials, firestore
+import click
 import os
 import json
 from config import config
+from services import doc_loader
+from services.doc_loader import load_doc
+from services.user_cache import probe_order, remember, user_cache
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -22,6 +26,9 @@ login_manager = LoginManager(app)
 login_manager.login_view = 'login'
 login_manager.login_message = 'Please log in to access this page.'
 
+# Per-request Firestore document cache + X-Firestore-Reads/Writes headers
+doc_loader.init_app(app)
+
 # Initialize Firebase - Render safe
 db = None
 try:
@@ -50,23 +57,24 @@ except Exception as e:
 # User loader for Flask-Login
 @login_manager.user_loader
 def load_user(user_id):
-    """Load user from database"""
+    """Load user from the in-process cache, else from database"""
     if db is None:
         print("⚠️  Cannot load user - database not connected")
         return None
     
+    cached = user_cache.get(user_id)
+    if cached:
+        return cached[1]
+    
     try:
-        user_doc = db.collection('users').document(user_id).get()
-        if user_doc.exists:
-            from models.user import User
-            return User(user_doc.id, user_doc.to_dict())
-        
-        # Check other collections for different roles
-        for collection in ['admins', 'contractors', 'suppliers']:
-            user_doc = db.collection(collection).document(user_id).get()
-            if user_doc.exists:
-                from models.user import User
-                return User(user_doc.id, user_doc.to_dict())
+        # Session hint (set at login) first, so a miss is usually one get
+        from models.user import User
+        for collection in probe_order():
+            user_data = load_doc(db, collection, user_id)
+            if user_data is not None:
+                user = User(user_id, user_data)
+                remember(user_id, collection, user)
+                return user
     except Exception as e:
         print(f"Error loading user: {e}")
     
@@ -146,11 +154,9 @@ def inject_user_data():
     if current_user.is_authenticated:
         try:
             if db is not None:
-                user_ref = db.collection('users').document(current_user.id)
-                user_doc = user_ref.get()
+                user_data = load_doc(db, 'users', current_user.id)
                 
-                if user_doc.exists:
-                    user_data = user_doc.to_dict()
+                if user_data is not None:
                     profile_picture = user_data.get('profile_picture')
                     
                     # Debug print
@@ -165,6 +171,75 @@ def inject_user_data():
     
     return {'user_profile_picture': None, 'user_data': {}}
 
+# One-off maintenance: `flask backfill-email-index`
+@app.cli.command('backfill-email-index')
+def backfill_email_index():
+    """Build email_index entries for every existing account"""
+    if db is None:
+        print("❌ Cannot backfill - database not connected")
+        return
+    from services.email_index import backfill
+    stats = backfill(db)
+    print(f"✅ email_index: {stats['indexed']} indexed, "
+          f"{stats['duplicates']} duplicate emails, {stats['skipped']} without an email")
+
+# One-off maintenance: `flask backfill-conversations`
+@app.cli.command('backfill-conversations')
+def backfill_conversations():
+    """Build conversation summaries from the existing messages"""
+    if db is None:
+        print("❌ Cannot backfill - database not connected")
+        return
+    from services.conversation_service import backfill
+    print(f"✅ conversations: {backfill(db)} summaries written")
+
+# Periodic maintenance (cron): `flask reconcile-unread-counts`
+@app.cli.command('reconcile-unread-counts')
+def reconcile_unread_counts():
+    """Recount unread messages / notifications and repair drifted counters"""
+    if db is None:
+        print("❌ Cannot reconcile - database not connected")
+        return
+    from services.unread_counters import reconcile
+    fixed = reconcile(db)
+    print(f"✅ unread counters: {fixed['counters']} accounts and "
+          f"{fixed['conversations']} conversations repaired")
+
+# Recovery after a restart: `flask resume-project-deletes`
+@app.cli.command('resume-project-deletes')
+def resume_project_deletes():
+    """Finish background project deletes that were interrupted"""
+    if db is None:
+        print("❌ Cannot resume - database not connected")
+        return
+    from services.cascade_delete import resume_pending
+    print(f"✅ delete_jobs: {resume_pending(db)} interrupted deletes finished")
+
+# Hot SKUs: `flask shard-stock <material_id> [--shards N]`
+@app.cli.command('shard-stock')
+@click.argument('material_id')
+@click.option('--shards', type=int, default=None, help='Number of stock shards (default STOCK_SHARDS)')
+def shard_stock(material_id, shards):
+    """Spread a material's stock over shard documents so concurrent orders don't contend"""
+    if db is None:
+        print("❌ Cannot shard - database not connected")
+        return
+    from services.inventory import shard_stock as split
+    count = split(db, material_id, shards or app.config['STOCK_SHARDS'])
+    print(f"✅ materials/{material_id}: stock spread over {count} shards")
+
+# Periodic maintenance (cron): `flask recompute-stats`
+@app.cli.command('recompute-stats')
+def recompute_stats():
+    """Rebuild the admin dashboard rollup (stats/platform) from the source collections"""
+    if db is None:
+        print("❌ Cannot recompute - database not connected")
+        return
+    from services.stats_rollup import recompute
+    stats = recompute(db)
+    print(f"✅ stats/platform: {stats['users']} users, {stats['contractors']} contractors, "
+          f"{stats['suppliers']} suppliers, {stats['projects']} projects, revenue {stats['revenue']}")
+
 if __name__ == '__main__':
     # Create upload folders if they don't exist
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
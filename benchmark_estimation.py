@@ -0,0 +1,439 @@
+#!/usr/bin/env python3
+"""
+Estimation Benchmark & Regression Gate
+Times calculate_materials_and_cost (AI refinement stubbed out) and each of
+its sub-stages over realistic residential / villa / apartment forms, and
+checks every estimate against stored golden outputs. The batch engine
+(services/batch_service.py) must price the golden forms, plus PARITY_CASES
+fresh ones per property type, exactly as the scalar path does - values and
+types. The Monte Carlo uncertainty bands are timed too and must stay under
+UNCERTAINTY_BUDGET_MS.
+
+    python benchmark_estimation.py                   # check - exits 1 on any regression
+    python benchmark_estimation.py --update          # regenerate forms, goldens and timings
+    python benchmark_estimation.py --update-timings  # re-baseline timings on this machine
+
+benchmarks/estimation_golden.json holds the generated forms and their exact
+estimates (machine independent - commit it with any intentional rate-table or
+formula change). benchmarks/estimation_baseline.json holds per-stage median
+timings and should be regenerated on the machine that runs the gate.
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import statistics
+import sys
+import time
+
+import services.calculation_service as calc
+from services.batch_service import calculate_materials_and_cost_batch
+from services.form_schema import PROPERTY_TYPES, resolve_inputs, schema_for
+from services.uncertainty_service import cost_bands
+
+ROOT          = os.path.dirname(os.path.abspath(__file__))
+TEMPLATE      = os.path.join(ROOT, 'templates', 'user', 'create_project.html')
+GOLDEN_PATH   = os.path.join(ROOT, 'benchmarks', 'estimation_golden.json')
+BASELINE_PATH = os.path.join(ROOT, 'benchmarks', 'estimation_baseline.json')
+
+CASES_PER_TYPE = 12
+SEED           = 2024
+
+# Extra generated forms per property type for the batch / scalar parity check
+PARITY_CASES = 100
+
+# Hard per-project ceiling for the Monte Carlo bands, on top of the relative gate
+UNCERTAINTY_BUDGET_MS = 50
+
+# Realistic ranges for the headline sizing fields, per property type
+SIZING = {
+    'residential': {'square_feet': (800, 3500),   'rooms': (2, 5),  'floors': (1, 3), 'bathrooms': (1, 4)},
+    'villa':       {'square_feet': (2500, 8000),  'rooms': (3, 7),  'floors': (1, 3), 'bathrooms': (3, 7)},
+    'apartment':   {'square_feet': (12000, 90000), 'apt_total_floors': (4, 18)},
+}
+
+# Numeric fields whose schema default is zero / computed - ranges a real project would use
+NUMERIC_RANGES = {
+    'garden_sqft':       (0, 1500),
+    'boundary_rft':      (0, 400),
+    'car_porch_sqft':    (150, 400),
+    'pool_length':       (0, 40),
+    'pool_width':        (10, 20),
+    'driveway_sqft':     (0, 1200),
+    'num_ac_points':     (0, 6),
+    'apt_1bhk_count':    (0, 24),
+    'apt_2bhk_count':    (8, 48),
+    'apt_3bhk_count':    (0, 24),
+    'apt_lifts':         (1, 4),
+    'apt_parking_slots': (20, 120),
+    'apt_solar_kw':      (0, 50),
+}
+
+# ─────────────────────────────────────────────────────────────────
+#  FORM GENERATION
+# ─────────────────────────────────────────────────────────────────
+
+def _template_options():
+    """{field name: [option values]} for every select / radio in create_project.html."""
+    with open(TEMPLATE, encoding='utf-8') as f:
+        html = f.read()
+    options = {}
+    for name, body in re.findall(r'<select[^>]*name="([^"]+)"[^>]*>(.*?)</select>', html, re.S):
+        options[name] = [v for v in re.findall(r'value="([^"]*)"', body) if v]
+    for tag in re.findall(r'<input[^>]*type="radio"[^>]*>', html):
+        name  = re.search(r'name="([^"]+)"', tag)
+        value = re.search(r'value="([^"]*)"', tag)
+        if name and value:
+            options.setdefault(name.group(1), []).append(value.group(1))
+    return options
+
+
+def _number(rng, ftype, lo, hi):
+    if ftype.startswith('int'):
+        return str(rng.randint(int(lo), int(hi)))
+    return str(round(rng.uniform(lo, hi), 1))
+
+
+def generate_form(rng, kind, options):
+    """One realistic create_project submission for a property type."""
+    form = {
+        'title':          f'Benchmark {kind}',
+        'property_type':  kind,
+        'location':       rng.choice(['Chennai', 'Bengaluru', 'Hyderabad', 'Kochi', 'Pune']),
+        'budget_range':   rng.choice(['low', 'medium', 'high']),
+        'estimate_scope': rng.choice(options.get('estimate_scope') or ['material_only']),
+    }
+    for key, (lo, hi) in SIZING[kind].items():
+        form[key] = str(rng.randint(lo, hi))
+    form['plot_area'] = str(int(float(form['square_feet']) * rng.uniform(1.1, 1.6)))
+
+    for name, ftype, default, keys in schema_for(kind):
+        key = keys[0]
+        if key in form:
+            continue
+        bare = key[len('villa_'):] if kind == 'villa' and key.startswith('villa_') else key
+        if ftype in ('str', 'raw'):
+            choices = options.get(key) or options.get(bare)
+            if choices:
+                form[key] = rng.choice(choices)
+        elif bare in NUMERIC_RANGES:
+            form[key] = _number(rng, ftype, *NUMERIC_RANGES[bare])
+        elif default:
+            form[key] = _number(rng, ftype, default * 0.75, default * 1.5)
+
+    if kind == 'apartment':
+        form['apt_total_units'] = str(sum(int(form.get(f'apt_{n}bhk_count') or 0) for n in (1, 2, 3)))
+        if form.get('apt_parking_type') == 'basement':
+            form['apt_basement_depth'] = str(rng.randint(10, 14))
+    return form
+
+
+def route_args(form):
+    """The scalar arguments create_project derives from the same form."""
+    if form.get('property_type') == 'apartment':
+        rooms     = int(form.get('apt_total_units') or 0)
+        floors    = int(form.get('apt_total_floors') or 1)
+        bathrooms = max(1, (int(form.get('apt_1bhk_count') or 0)
+                            + int(form.get('apt_2bhk_count') or 0) * 2
+                            + int(form.get('apt_3bhk_count') or 0) * 3) // max(rooms, 1))
+    else:
+        rooms     = int(form.get('rooms') or 1)
+        floors    = int(form.get('floors') or 1)
+        bathrooms = int(form.get('bathrooms') or 2)
+    return (float(form.get('square_feet') or 0), rooms, floors, bathrooms,
+            form.get('budget_range', 'medium'))
+
+
+def generate_cases(per_type=CASES_PER_TYPE, seed=SEED):
+    rng, options = random.Random(seed), _template_options()
+    return [{'kind': kind, 'form': generate_form(rng, kind, options)}
+            for kind in PROPERTY_TYPES for _ in range(per_type)]
+
+
+# ─────────────────────────────────────────────────────────────────
+#  ESTIMATES (AI STUBBED)
+# ─────────────────────────────────────────────────────────────────
+
+def _no_ai(base_costs, inp):
+    return {}
+
+
+def estimate(form):
+    """calculate_materials_and_cost on the refine=True path, with the AI call stubbed."""
+    real, calc._ai_refine_estimate = calc._ai_refine_estimate, _no_ai
+    try:
+        result = calc.calculate_materials_and_cost(*route_args(form), form=form)
+    finally:
+        calc._ai_refine_estimate = real
+    return json.loads(json.dumps(result, default=str))
+
+
+def _first_difference(expected, actual, path='estimation', strict=False):
+    """First (path, expected, actual) that differs; strict also compares types (0 vs 0.0)."""
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        for key in sorted(set(expected) | set(actual), key=str):
+            if key not in expected or key not in actual:
+                return f'{path}.{key}', expected.get(key), actual.get(key)
+            diff = _first_difference(expected[key], actual[key], f'{path}.{key}', strict)
+            if diff:
+                return diff
+        return None
+    if expected != actual or (strict and type(expected) is not type(actual)):
+        return path, expected, actual
+    return None
+
+
+def check_golden(golden):
+    """Re-run every golden form; returns a list of (case, path, expected, actual)."""
+    failures = []
+    for i, case in enumerate(golden['cases']):
+        diff = _first_difference(case['estimation'], estimate(case['form']))
+        if diff:
+            failures.append((f"#{i} {case['kind']}",) + diff)
+    return failures
+
+
+def check_batch_parity(cases):
+    """
+    Price every case with the batch engine and with calculate_materials_and_cost
+    (refine=False); returns a list of (case, path, scalar, batch) differences.
+    """
+    forms = [case['form'] for case in cases]
+    projects = [dict(zip(('square_feet', 'rooms', 'floors', 'bathrooms', 'budget_range'),
+                         route_args(form)), form=form) for form in forms]
+    results, errors = calculate_materials_and_cost_batch(projects)
+    failures = []
+    for i, (case, project, batch) in enumerate(zip(cases, projects, results)):
+        if i in errors:
+            failures.append((f"#{i} {case['kind']}", 'batch error', None, errors[i]))
+            continue
+        scalar = calc.calculate_materials_and_cost(**project, refine=False)
+        diff = _first_difference(scalar, batch, strict=True)
+        if diff:
+            failures.append((f"#{i} {case['kind']}",) + diff)
+    return failures
+
+
+# ─────────────────────────────────────────────────────────────────
+#  TIMING
+# ─────────────────────────────────────────────────────────────────
+
+def _stage_calls(kind, forms):
+    """{stage: zero-arg callable running that stage once over every form}."""
+    args   = [route_args(f) for f in forms]
+    inputs = [resolve_inputs(*a, form=f) for a, f in zip(args, forms)]
+    calc_fn = calc._calc_apartment if kind == 'apartment' else calc._calc_residential
+    bases  = [calc_fn(inp) for inp in inputs]
+    pairs  = list(zip(args, forms))
+
+    def end_to_end():
+        for a, f in pairs:
+            calc.calculate_materials_and_cost(*a, form=f)
+
+    return {
+        'resolve_inputs': lambda: [resolve_inputs(*a, form=f) for a, f in pairs],
+        'calculator':     lambda: [calc_fn(inp) for inp in inputs],
+        'cost_tiers':     lambda: [calc._build_cost_tiers(b, inp.scope) for b, inp in zip(bases, inputs)],
+        'quantities':     lambda: [calc._build_quantities(inp) for inp in inputs],
+        'timeline':       lambda: [calc._build_timeline(inp.sqft, inp.floors, inp.rooms) for inp in inputs],
+        'end_to_end':     end_to_end,
+        'uncertainty':    lambda: [cost_bands(inp) for inp in inputs],
+    }
+
+
+_REFERENCE_BREAKDOWN = {f'stage_{i}': 12345.678 * (i + 1) for i in range(10)}
+
+
+def _reference():
+    """Fixed pure-Python workload timed alongside each stage to cancel out host speed."""
+    for fac in (0.75, 1.0, 1.4, 0.9, 1.1, 1.25):
+        stage = {k: round(v * fac, 0) for k, v in _REFERENCE_BREAKDOWN.items()}
+        sum(stage.values())
+
+
+def _calibrate(fn, min_seconds=0.005):
+    """Loops per round so one round lasts at least min_seconds (timeit-style)."""
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        if time.perf_counter() - start >= min_seconds:
+            return loops
+        loops *= 2
+
+
+def _round(fn, loops):
+    start = time.perf_counter()
+    for _ in range(loops):
+        fn()
+    return (time.perf_counter() - start) / loops
+
+
+def run_timings(cases, rounds=30, warmup=3):
+    """
+    Per-call stats (microseconds) for every (property type, stage).
+    Each round also times _reference(); `relative` is the median of
+    stage / reference over the rounds, which is what the gate compares -
+    it stays put when the whole host is busier or quieter between runs.
+    """
+    results = {}
+    ref_loops = _calibrate(_reference)
+    real, calc._ai_refine_estimate = calc._ai_refine_estimate, _no_ai
+    try:
+        for kind in PROPERTY_TYPES:
+            forms = [c['form'] for c in cases if c['kind'] == kind]
+            if not forms:
+                continue
+            for stage, fn in _stage_calls(kind, forms).items():
+                for _ in range(warmup):
+                    fn()
+                loops, samples, ratios = _calibrate(fn), [], []
+                for _ in range(rounds):
+                    ref = _round(_reference, ref_loops)
+                    per_call = _round(fn, loops) / len(forms)
+                    samples.append(per_call * 1e6)
+                    ratios.append(per_call / ref)
+                results[f'{kind}.{stage}'] = {
+                    'min':      round(min(samples), 2),
+                    'median':   round(statistics.median(samples), 2),
+                    'mean':     round(statistics.fmean(samples), 2),
+                    'stddev':   round(statistics.pstdev(samples), 2),
+                    'relative': round(statistics.median(ratios), 4),
+                    'rounds':   rounds,
+                }
+    finally:
+        calc._ai_refine_estimate = real
+    return results
+
+
+def check_timings(timings, baseline, tolerance, min_delta=1.0):
+    """
+    Stages whose relative cost grew by more than `tolerance` over the
+    baseline, and by at least min_delta µs per call at today's host speed,
+    so timer noise on the tiny stages does not fail the gate.
+    """
+    slow = []
+    for name, stats in timings.items():
+        base = baseline.get('timings', {}).get(name)
+        if not base or not base.get('relative'):
+            continue
+        growth = stats['relative'] / base['relative'] - 1
+        delta  = stats['median'] - stats['median'] / (1 + growth)
+        if growth > tolerance and delta >= min_delta:
+            slow.append((name, f"{growth * 100:+.0f}% vs baseline (limit {tolerance * 100:.0f}%)"))
+    for name, stats in timings.items():
+        if name.endswith('.uncertainty') and stats['median'] > UNCERTAINTY_BUDGET_MS * 1000:
+            slow.append((name, f"{stats['median'] / 1000:.1f}ms per project "
+                               f"(budget {UNCERTAINTY_BUDGET_MS}ms)"))
+    return slow
+
+
+# ─────────────────────────────────────────────────────────────────
+#  MAIN
+# ─────────────────────────────────────────────────────────────────
+
+def _load(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _save(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=1, sort_keys=True)
+        f.write('\n')
+    print(f"   💾 Wrote {os.path.relpath(path, ROOT)}")
+
+
+def _print_timings(timings, baseline):
+    base = (baseline or {}).get('timings', {})
+    print(f"   {'stage':<28}{'median µs':>12}{'min µs':>10}{'stddev':>10}"
+          f"{'relative':>10}{'baseline':>10}")
+    for name, stats in timings.items():
+        ref = base.get(name, {}).get('relative')
+        print(f"   {name:<28}{stats['median']:>12.2f}{stats['min']:>10.2f}{stats['stddev']:>10.2f}"
+              f"{stats['relative']:>10.3f}{(f'{ref:.3f}' if ref else '-'):>10}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Estimation benchmark and regression gate')
+    parser.add_argument('--update', action='store_true',
+                        help='regenerate forms, golden outputs and the timing baseline')
+    parser.add_argument('--update-timings', action='store_true',
+                        help='keep the goldens, re-baseline timings on this machine')
+    parser.add_argument('--rounds', type=int, default=30)
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed median slowdown per stage (0.25 = 25%%)')
+    parser.add_argument('--min-delta', type=float, default=1.0,
+                        help='ignore slowdowns smaller than this many µs per call')
+    args = parser.parse_args(argv)
+
+    print("=" * 60)
+    print("📐 ESTIMATION BENCHMARK & REGRESSION GATE")
+    print(f"   Rate table version: {calc.RATE_TABLE_VERSION}")
+    print("=" * 60)
+
+    golden = _load(GOLDEN_PATH)
+    if args.update or golden is None:
+        print("\n1. Generating forms and golden outputs...")
+        cases = generate_cases()
+        for case in cases:
+            case['estimation'] = estimate(case['form'])
+        golden = {'rate_table_version': calc.RATE_TABLE_VERSION, 'cases': cases}
+        _save(GOLDEN_PATH, golden)
+        failures = []
+    else:
+        print(f"\n1. Checking {len(golden['cases'])} golden estimates...")
+        failures = check_golden(golden)
+        for case, path, expected, actual in failures:
+            print(f"   ❌ {case}: {path} expected {expected!r}, got {actual!r}")
+        if not failures:
+            print("   ✅ All estimates match")
+        elif golden.get('rate_table_version') != calc.RATE_TABLE_VERSION:
+            print(f"   ⚠️  Rate tables changed ({golden.get('rate_table_version')} → "
+                  f"{calc.RATE_TABLE_VERSION}); run with --update if this is intended")
+
+    parity_cases = golden['cases'] + generate_cases(per_type=PARITY_CASES, seed=SEED + 1)
+    print(f"\n2. Checking batch engine parity on {len(parity_cases)} forms...")
+    mismatches = check_batch_parity(parity_cases)
+    for case, path, expected, actual in mismatches[:20]:
+        print(f"   ❌ {case}: {path} scalar {expected!r}, batch {actual!r}")
+    if len(mismatches) > 20:
+        print(f"   ... and {len(mismatches) - 20} more")
+    if not mismatches:
+        print("   ✅ Batch engine matches the scalar path exactly")
+    failures += mismatches
+
+    print(f"\n3. Timing stages ({args.rounds} rounds, AI stubbed)...")
+    timings  = run_timings(golden['cases'], rounds=args.rounds)
+    baseline = _load(BASELINE_PATH)
+    _print_timings(timings, baseline)
+
+    slow = []
+    if args.update or args.update_timings or baseline is None:
+        _save(BASELINE_PATH, {'rate_table_version': calc.RATE_TABLE_VERSION, 'timings': timings})
+    else:
+        slow = check_timings(timings, baseline, args.tolerance, args.min_delta)
+        for name, reason in slow:
+            print(f"   ❌ {name}: {reason}")
+        if not slow:
+            print(f"   ✅ No stage more than {args.tolerance * 100:.0f}% slower than baseline")
+
+    print("\n" + "=" * 60)
+    if failures or slow:
+        print(f"❌ REGRESSION: {len(failures)} changed estimate(s) or batch mismatch(es), "
+              f"{len(slow)} slow stage(s)")
+        print("=" * 60)
+        return 1
+    print("✅ ESTIMATION BENCHMARK PASSED")
+    print("=" * 60)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,1175 @@
+#!/usr/bin/env python3
+"""
+Service Behaviour Checks
+Exercises the stateful service logic in process, without credentials or
+network, and exits non-zero if any behaviour regressed. Firestore-backed
+services run against the in-memory fake in fake_firestore.py.
+
+    python check_services.py                  # every check - exits 1 on any failure
+    python check_services.py inventory        # only the named groups
+    python check_services.py --list           # list the groups
+"""
+
+import argparse
+import contextlib
+import os
+import sys
+import tempfile
+import time
+import traceback
+import warnings
+
+CHECKS = []          # (group, description, fn) in registration order
+
+
+def check(group):
+    """Register a check; its docstring's first line is what gets printed."""
+    def register(fn):
+        CHECKS.append((group, (fn.__doc__ or fn.__name__).strip().splitlines()[0], fn))
+        return fn
+    return register
+
+
+def expect(actual, expected, what):
+    if actual != expected:
+        raise AssertionError(f"{what}: expected {expected!r}, got {actual!r}")
+
+
+@contextlib.contextmanager
+def patched(target, **attrs):
+    """Temporarily set attributes on a module or class."""
+    saved = {name: getattr(target, name) for name in attrs}
+    for name, value in attrs.items():
+        setattr(target, name, value)
+    try:
+        yield target
+    finally:
+        for name, value in saved.items():
+            setattr(target, name, value)
+
+
+def expect_raises(exc_type, fn, what):
+    try:
+        fn()
+    except exc_type as e:
+        return e
+    raise AssertionError(f"{what}: expected {exc_type.__name__}")
+
+
+# ─────────────────────────────────────────────────────────────────
+#  ESTIMATE CACHE
+# ─────────────────────────────────────────────────────────────────
+
+@check('estimate_cache')
+def check_cache_lru():
+    """LRU evicts the least recently used entry"""
+    from services.estimate_cache import EstimateCache
+    cache = EstimateCache(max_entries=2, ttl_seconds=60)
+    cache.put('a', {'v': 1})
+    cache.put('b', {'v': 2})
+    cache.get('a')
+    cache.put('c', {'v': 3})
+    expect(cache.get('b'), None, "evicted entry")
+    expect(cache.get('a'), {'v': 1}, "recently used entry")
+    expect(cache.get('c'), {'v': 3}, "newest entry")
+    expect(cache.stats()['evictions'], 1, "evictions")
+
+
+@check('estimate_cache')
+def check_cache_ttl():
+    """Entries expire after the TTL and are dropped on lookup"""
+    from services.estimate_cache import EstimateCache
+    cache = EstimateCache(max_entries=8, ttl_seconds=0.05)
+    cache.put('a', {'v': 1})
+    expect(cache.get('a'), {'v': 1}, "fresh entry")
+    time.sleep(0.08)
+    expect(cache.get('a'), None, "expired entry")
+    stats = cache.stats()
+    expect((stats['size'], stats['hits'], stats['misses']), (0, 1, 1), "size / hits / misses")
+
+
+@check('estimate_cache')
+def check_cache_copies():
+    """Every hit is a fresh dict the caller may mutate"""
+    from services.estimate_cache import EstimateCache
+    cache = EstimateCache(max_entries=8, ttl_seconds=60)
+    cache.put('a', {'costs': {'medium': 100}})
+    cache.get('a')['costs']['medium'] = 0
+    expect(cache.get('a'), {'costs': {'medium': 100}}, "entry after mutating a hit")
+
+
+@check('estimate_cache')
+def check_cache_disk_tier():
+    """The SQLite tier is shared between caches and honours the TTL"""
+    from services.estimate_cache import EstimateCache
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'estimates.sqlite')
+        EstimateCache(max_entries=8, ttl_seconds=60, disk_path=path).put('a', {'v': 1})
+        other = EstimateCache(max_entries=8, ttl_seconds=60, disk_path=path)
+        expect(other.get('a'), {'v': 1}, "entry written by another cache")
+        expect(other.stats()['disk_hits'], 1, "disk hits")
+        expired = EstimateCache(max_entries=8, ttl_seconds=0, disk_path=path)
+        time.sleep(0.01)
+        expect(expired.get('a'), None, "disk entry past the TTL")
+
+
+@check('estimate_cache')
+def check_cache_key():
+    """The key covers estimator inputs only, not unrelated form fields"""
+    from services.estimate_cache import estimate_key
+    from services.form_schema import resolve_inputs
+    form = {'property_type': 'residential', 'concrete_grade': 'M25'}
+    key = estimate_key(resolve_inputs(1500, 3, 2, 2, 'medium', form))
+    expect(estimate_key(resolve_inputs(1500, 3, 2, 2, 'medium', dict(form, title='New title'))),
+           key, "key after a title-only change")
+    if estimate_key(resolve_inputs(1500, 3, 2, 2, 'medium', dict(form, concrete_grade='M30'))) == key:
+        raise AssertionError("key unchanged after an estimator input changed")
+
+
+FACTORS = {'foundation': 1.1, 'walls': 0.9, 'rationale': 'Soil rates are high', 'confidence': 7}
+
+
+@check('estimate_cache')
+def check_cache_deterministic_entries():
+    """Estimates are cached unrefined; AI factors are a separate entry"""
+    from services.calculation_service import estimate_from_inputs
+    from services.estimate_cache import EstimateCache, cached_estimate, cached_factors, remember_factors
+    from services.form_schema import resolve_inputs
+    cache = EstimateCache(max_entries=8, ttl_seconds=60)
+    inp = resolve_inputs(1500, 3, 2, 2, 'medium', {'property_type': 'residential'})
+    expect(cached_estimate(inp, cache=cache), estimate_from_inputs(inp, refine=False), "first estimate")
+    remember_factors(inp, {}, cache=cache)
+    expect(cache.stats()['size'], 1, "entries after a failed AI call")
+    remember_factors(inp, FACTORS, cache=cache)
+    expect(cached_estimate(inp, cache=cache)['ai_rationale'], '', "rationale of a cached estimate")
+    expect(cached_factors(inp, cache=cache), FACTORS, "cached factors")
+    expect((cache.stats()['size'], cache.stats()['hits']), (2, 2), "entries / hits")
+
+
+@check('estimate_cache')
+def check_build_estimate_caches_without_ai():
+    """build_estimate hits the cache when the AI call fails, and reuses factors once it succeeds"""
+    from config import Config
+    from services import ai_refine_service
+    from services.estimate_cache import estimate_cache
+    calls, answer = [], {}
+
+    def refine(costs, inp):
+        calls.append(1)
+        return dict(answer)
+
+    real, ai_refine_service._ai_refine_estimate = ai_refine_service._ai_refine_estimate, refine
+    refine_async, Config.AI_REFINE_ASYNC = Config.AI_REFINE_ASYNC, False
+    draws, Config.MONTE_CARLO_DRAWS = Config.MONTE_CARLO_DRAWS, 0
+    try:
+        estimate_cache.clear()
+        hits = estimate_cache.stats()['hits']
+        form = {'property_type': 'villa', 'location': 'Check Town'}
+        build = lambda: ai_refine_service.build_estimate(3200, 4, 2, 4, 'medium', form)
+        first, second = build(), build()
+        expect((first['ai_status'], second['ai_status']), ('failed', 'failed'), "AI status")
+        expect(estimate_cache.stats()['hits'] - hits, 1, "cache hits with the AI down")
+        expect(len(calls), 2, "AI calls (failures are retried)")
+        answer.update(FACTORS)
+        refined = build()
+        expect((refined['ai_status'], refined['ai_rationale']), ('done', FACTORS['rationale']),
+               "refined estimate")
+        again = build()
+        expect((len(calls), again['costs']), (3, refined['costs']), "AI calls / costs with cached factors")
+    finally:
+        ai_refine_service._ai_refine_estimate = real
+        Config.AI_REFINE_ASYNC, Config.MONTE_CARLO_DRAWS = refine_async, draws
+        estimate_cache.clear()
+
+
+# ─────────────────────────────────────────────────────────────────
+#  AI REFINE
+# ─────────────────────────────────────────────────────────────────
+
+REFINE_ARGS = (3200, 4, 2, 4, 'medium', {'property_type': 'villa', 'location': 'Check Town'})
+
+
+@contextlib.contextmanager
+def _async_refine(answer):
+    """Async mode with the AI call answering `answer` and firestore.client() on a fake db."""
+    from config import Config
+    from fake_firestore import make_client
+    from services import ai_refine_service
+    from services.estimate_cache import estimate_cache
+    db, api = make_client()
+    estimate_cache.clear()
+    try:
+        with patched(Config, AI_REFINE_ASYNC=True, MONTE_CARLO_DRAWS=0), \
+             patched(ai_refine_service, _ai_refine_estimate=lambda costs, inp: dict(answer)), \
+             patched(ai_refine_service.firestore, client=lambda: db):
+            yield ai_refine_service, api
+    finally:
+        estimate_cache.clear()
+
+
+def _pending_project(ai_refine_service, api, project_id):
+    estimation = ai_refine_service.build_estimate(*REFINE_ARGS)
+    api.put(f'projects/{project_id}', {'estimation': estimation})
+    return estimation
+
+
+@check('ai_refine')
+def check_refine_job_patches_estimate():
+    """A queued job patches the pending estimate with the refined costs"""
+    with _async_refine(FACTORS) as (ai_refine_service, api):
+        estimation = _pending_project(ai_refine_service, api, 'p1')
+        expect((estimation['ai_status'], bool(estimation.get('ai_job'))), ('pending', True),
+               "status / token of the saved estimate")
+        future = ai_refine_service.queue_refinement('p1', estimation, *REFINE_ARGS)
+        expect(future.result(5), True, "job result")
+        stored = api.data('projects/p1')['estimation']
+        refined = ai_refine_service.apply_ai_refinement(estimation, FACTORS)
+        expect((stored['ai_status'], stored['ai_rationale']), ('done', FACTORS['rationale']),
+               "stored status / rationale")
+        expect(stored['costs'], refined['costs'], "stored costs")
+        expect(ai_refine_service.queue_refinement('p1', stored, *REFINE_ARGS), None,
+               "job queued for a settled estimate")
+
+
+@check('ai_refine')
+def check_refine_job_skips_stale_token():
+    """A job whose token was superseded by a newer edit writes nothing"""
+    with _async_refine(FACTORS) as (ai_refine_service, api):
+        estimation = _pending_project(ai_refine_service, api, 'p1')
+        newer = _pending_project(ai_refine_service, api, 'p1')
+        expect(newer['ai_job'] != estimation['ai_job'], True, "fresh token per edit")
+        before = api.data('projects/p1')
+        future = ai_refine_service.queue_refinement('p1', estimation, *REFINE_ARGS)
+        expect(future.result(5), False, "stale job result")
+        expect(api.data('projects/p1'), before, "project after the stale job")
+
+
+@check('ai_refine')
+def check_refine_job_marks_failure():
+    """A job whose AI call returns nothing marks the estimate failed"""
+    with _async_refine({}) as (ai_refine_service, api):
+        estimation = _pending_project(ai_refine_service, api, 'p1')
+        future = ai_refine_service.queue_refinement('p1', estimation, *REFINE_ARGS)
+        expect(future.result(5), True, "job result")
+        stored = api.data('projects/p1')['estimation']
+        expect((stored['ai_status'], stored['costs']), ('failed', estimation['costs']),
+               "stored status / costs")
+
+
+# ─────────────────────────────────────────────────────────────────
+#  RATE TABLES
+# ─────────────────────────────────────────────────────────────────
+
+@check('rate_tables')
+def check_rate_tables_frozen():
+    """Every level of a compiled rate file is read-only"""
+    from operator import setitem
+    from services import rate_tables
+    rates = rate_tables.current().rates
+    expect_raises(TypeError, lambda: setitem(rates.DOOR_RATE, 'teak', 1), "adding a table row")
+    expect_raises(TypeError, lambda: setitem(rates.WALL_MATERIAL_RATE['red_clay'], 'mat_rate', 0),
+                  "editing a nested rate")
+    expect_raises(AttributeError, lambda: setattr(rates, 'DOOR_RATE', {}), "replacing a table")
+
+
+@check('rate_tables')
+def check_rate_reload_swaps_snapshot():
+    """A reload replaces a bound module's RATES with the new snapshot in one assignment"""
+    import json
+    from services import rate_tables
+    original, namespace = rate_tables.current(), {}
+    rate_tables.bind(namespace)
+    with open(original.path, encoding='utf-8') as fh:
+        raw = json.load(fh)
+    raw['version'] = 'check'
+    raw['tables']['DOOR_RATE'] = dict(raw['tables']['DOOR_RATE'], teak=1)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'rate_tables.json')
+        with open(path, 'w', encoding='utf-8') as fh:
+            json.dump(raw, fh)
+        try:
+            rate_tables._swap(rate_tables.compile_file(path, previous=original))
+            expect((list(namespace), namespace['RATES'].DOOR_RATE['teak']), (['RATES'], 1), "bound namespace")
+        finally:
+            rate_tables._swap(original)
+            rate_tables._namespaces.remove(namespace)
+    expect(namespace['RATES'] is original.rates, True, "RATES after swapping back")
+
+
+# ─────────────────────────────────────────────────────────────────
+#  AI GUARD
+# ─────────────────────────────────────────────────────────────────
+
+def _failing():
+    raise ConnectionError("upstream down")
+
+
+@check('ai_guard')
+def check_breaker_opens():
+    """The breaker opens after the failure threshold and short-circuits"""
+    from services.ai_guard import AIGuard, CircuitOpenError
+    guard = AIGuard(failure_threshold=2, cooldown_seconds=60)
+    for key in ('a', 'b'):
+        expect_raises(ConnectionError, lambda: guard.call(key, _failing), "failing call")
+    calls = []
+    expect_raises(CircuitOpenError, lambda: guard.call('c', lambda: calls.append(1) or {}),
+                  "call while open")
+    expect(calls, [], "upstream calls while open")
+    m = guard.metrics()
+    expect((m['breaker_state'], m['breaker_opens'], m['short_circuits']), ('open', 1, 1),
+           "state / opens / short circuits")
+
+
+@check('ai_guard')
+def check_breaker_half_open():
+    """After the cooldown one trial call decides whether the breaker closes"""
+    from services.ai_guard import AIGuard
+    guard = AIGuard(failure_threshold=1, cooldown_seconds=0.05)
+    expect_raises(ConnectionError, lambda: guard.call('a', _failing), "failing call")
+    time.sleep(0.08)
+    expect_raises(ConnectionError, lambda: guard.call('b', _failing), "failed trial")
+    expect(guard.metrics()['breaker_state'], 'open', "state after a failed trial")
+    time.sleep(0.08)
+    expect(guard.call('c', lambda: {'factor': 1.1}), {'factor': 1.1}, "successful trial")
+    expect(guard.metrics()['breaker_state'], 'closed', "state after a successful trial")
+
+
+@check('ai_guard')
+def check_guard_coalescing():
+    """Identical in-flight calls share one upstream request"""
+    import threading
+    from services.ai_guard import AIGuard
+    guard = AIGuard()
+    release, calls, results = threading.Event(), [], []
+
+    def upstream():
+        calls.append(1)
+        release.wait(5)
+        return {'factor': 1.2}
+
+    threads = [threading.Thread(target=lambda: results.append(guard.call('k', upstream)))
+               for _ in range(5)]
+    for t in threads:
+        t.start()
+    deadline = time.monotonic() + 5
+    while guard.metrics()['coalesced'] < 4 and time.monotonic() < deadline:
+        time.sleep(0.005)
+    release.set()
+    for t in threads:
+        t.join(5)
+    expect(len(calls), 1, "upstream calls")
+    expect(results, [{'factor': 1.2}] * 5, "results")
+    expect(guard.metrics()['coalesced'], 4, "coalesced calls")
+
+
+@check('ai_guard')
+def check_guard_coalesced_error():
+    """Callers waiting on a failing in-flight call get its error"""
+    import threading
+    from services.ai_guard import AIGuard
+    guard = AIGuard(failure_threshold=5)
+    release, errors = threading.Event(), []
+
+    def upstream():
+        release.wait(5)
+        raise ConnectionError("upstream down")
+
+    def caller():
+        try:
+            guard.call('k', upstream)
+        except ConnectionError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=caller) for _ in range(3)]
+    for t in threads:
+        t.start()
+    deadline = time.monotonic() + 5
+    while guard.metrics()['coalesced'] < 2 and time.monotonic() < deadline:
+        time.sleep(0.005)
+    release.set()
+    for t in threads:
+        t.join(5)
+    expect(len(errors), 3, "callers that saw the error")
+    expect(guard.metrics()['failures'], 1, "upstream failures")
+
+
+@check('ai_guard')
+def check_guard_factor_cache():
+    """Factors are cached per key with an LRU bound and a TTL"""
+    from services.ai_guard import AIGuard
+    guard = AIGuard(cache_size=2, cache_ttl=0.05)
+    calls = []
+    upstream = lambda: calls.append(1) or {'factor': 1.0}
+    guard.call('a', upstream)
+    guard.call('a', upstream)['factor'] = 9
+    expect(guard.call('a', upstream), {'factor': 1.0}, "cached factors after mutating a hit")
+    expect(len(calls), 1, "upstream calls for a cached key")
+    guard.call('b', upstream)
+    guard.call('c', upstream)
+    expect(guard.metrics()['cache_size'], 2, "cache size")
+    time.sleep(0.08)
+    guard.call('c', upstream)
+    expect(len(calls), 4, "upstream calls after the TTL")
+
+
+@check('ai_guard')
+def check_summary_key():
+    """Summary keys bucket sqft and ignore location case"""
+    from services.ai_guard import summary_key
+    summary = {'property_type': 'villa', 'sqft': 2010, 'location': 'Pune',
+               'key_inputs': {'concrete_grade': 'M25'}}
+    key = summary_key(summary, sqft_bucket=250)
+    expect(summary_key(dict(summary, sqft=2240, location=' pune '), sqft_bucket=250), key,
+           "key in the same sqft bucket")
+    if summary_key(dict(summary, sqft=2260), sqft_bucket=250) == key:
+        raise AssertionError("key unchanged in the next sqft bucket")
+
+
+# ─────────────────────────────────────────────────────────────────
+#  STAGE TRACKER
+# ─────────────────────────────────────────────────────────────────
+
+STAGE_FORM = {'property_type': 'residential', 'concrete_grade': 'M25', 'internal_paint': 'emulsion',
+              'flooring_type': 'vitrified', 'num_doors': '8'}
+
+
+def _stage_inputs(**changes):
+    from services.form_schema import resolve_inputs
+    return resolve_inputs(1800, 4, 2, 3, 'medium', dict(STAGE_FORM, **changes))
+
+
+def _without_tracking(estimation):
+    return {k: v for k, v in estimation.items() if k != 'stage_inputs'}
+
+
+@check('stage_tracker')
+def check_tracker_matches_estimator():
+    """A traced estimate equals the plain estimator and traces every stage"""
+    from services.calculation_service import STAGE_KEYS, estimate_from_inputs
+    from services.stage_tracker import tracked_estimate
+    inp = _stage_inputs()
+    estimation, recomputed = tracked_estimate(inp)
+    expect(_without_tracking(estimation), estimate_from_inputs(inp, refine=False), "estimate")
+    expect(recomputed, list(STAGE_KEYS), "recomputed stages")
+    expect(sorted(estimation['stage_inputs']['stages']), sorted(STAGE_KEYS), "traced stages")
+
+
+@check('stage_tracker')
+def check_tracker_reuses_unchanged():
+    """Unchanged inputs reuse every stage and the BOQ"""
+    from services.stage_tracker import tracked_estimate
+    first, _ = tracked_estimate(_stage_inputs())
+    second, recomputed = tracked_estimate(_stage_inputs(), previous=first)
+    expect(recomputed, [], "recomputed stages")
+    expect(second['costs'], first['costs'], "costs")
+    expect(second['materials'] is first['materials'], True, "BOQ reused")
+
+
+@check('stage_tracker')
+def check_tracker_recomputes_dependents():
+    """An edit recomputes exactly the stages whose fingerprints read the field"""
+    from services.calculation_service import STAGE_KEYS, estimate_from_inputs
+    from services.stage_tracker import tracked_estimate
+    first, _ = tracked_estimate(_stage_inputs())
+    readers = [s for s in STAGE_KEYS
+               if 'internal_paint' in first['stage_inputs']['stages'][s]['deps']]
+    if not readers:
+        raise AssertionError("no stage reads internal_paint")
+    edited = _stage_inputs(internal_paint='texture')
+    second, recomputed = tracked_estimate(edited, previous=first)
+    expect(recomputed, readers, "recomputed stages")
+    expect(_without_tracking(second), estimate_from_inputs(edited, refine=False), "edited estimate")
+
+
+@check('stage_tracker')
+def check_tracker_invalidation():
+    """A rate table version or property type change recomputes everything"""
+    from services.calculation_service import STAGE_KEYS
+    from services.stage_tracker import tracked_estimate
+    first, _ = tracked_estimate(_stage_inputs())
+    stale = dict(first, stage_inputs=dict(first['stage_inputs'], v='old-rates'))
+    expect(tracked_estimate(_stage_inputs(), previous=stale)[1], list(STAGE_KEYS),
+           "recomputed after a rate change")
+    villa = _stage_inputs(property_type='villa')
+    expect(tracked_estimate(villa, previous=first)[1], list(STAGE_KEYS),
+           "recomputed after a property type change")
+
+
+@check('stage_tracker')
+def check_project_base_needs_inputs():
+    """Projects without stored inputs are refused for what-if and only priced on defaults on request"""
+    from services.whatif_service import MissingInputs, project_base, what_if
+    legacy = {'square_feet': 1800, 'rooms': 4, 'floors': 2, 'property_type': 'villa'}
+    expect_raises(MissingInputs, lambda: project_base(legacy), "project without inputs")
+    expect(project_base(legacy, allow_defaults=True)['form'], {'property_type': 'villa'}, "defaults base")
+    stored = dict(legacy, inputs=dict(STAGE_FORM))
+    expect(project_base(stored)['form'], dict(STAGE_FORM), "stored inputs win over the project fields")
+    expect(len(what_if(project_base(stored), {'concrete_grade': ['M20', 'M30']})['variants']), 2,
+           "variants priced")
+
+
+# ─────────────────────────────────────────────────────────────────
+#  PAGINATION
+# ─────────────────────────────────────────────────────────────────
+
+def _paging(orders=7, same_time=False):
+    """(app, db, api, query) with orders for user u1 (and one for u2) in the fake store."""
+    from datetime import datetime, timedelta
+    from flask import Flask
+    from fake_firestore import make_client
+    app = Flask(__name__)
+    app.secret_key = 'check-services'
+    db, api = make_client()
+    start = datetime(2024, 1, 1)
+    for i in range(orders):
+        api.put(f'orders/o{i}', {'user_id': 'u1', 'title': f'Order {i}', 'total': i,
+                                 'created_at': start if same_time else start + timedelta(hours=i)})
+    api.put('orders/other', {'user_id': 'u2', 'title': 'Other', 'created_at': start})
+    return app, db, api, db.collection('orders').where('user_id', '==', 'u1')
+
+
+def _ids(page):
+    return [doc.id for doc in page.items]
+
+
+@check('pagination')
+def check_pages_walk_both_ways():
+    """next / prev tokens walk the listing without gaps or repeats"""
+    from services.pagination import paginate
+    app, db, api, query = _paging()
+    with app.app_context():
+        first = paginate(query, 'user.orders', per_page=3)
+        expect((_ids(first), first.total, first.pages, first.prev_token),
+               (['o6', 'o5', 'o4'], 7, 3, None), "page 1")
+        second = paginate(query, 'user.orders', token=first.next_token, per_page=3)
+        expect((_ids(second), second.number), (['o3', 'o2', 'o1'], 2), "page 2")
+        last = paginate(query, 'user.orders', token=second.next_token, per_page=3)
+        expect((_ids(last), last.number, last.next_token), (['o0'], 3, None), "page 3")
+        back = paginate(query, 'user.orders', token=last.prev_token, per_page=3)
+        expect((_ids(back), back.number, bool(back.next_token)), (['o3', 'o2', 'o1'], 2, True),
+               "page 2 from page 3")
+        front = paginate(query, 'user.orders', token=back.prev_token, per_page=3)
+        expect((_ids(front), front.number, front.prev_token), (['o6', 'o5', 'o4'], 1, None),
+               "page 1 from page 2")
+
+
+@check('pagination')
+def check_pages_break_ties_by_id():
+    """Equal sort values are ordered by document id, so no row is skipped"""
+    from services.pagination import paginate
+    app, db, api, query = _paging(orders=5, same_time=True)
+    with app.app_context():
+        seen, token = [], None
+        for _ in range(3):
+            page = paginate(query, 'user.orders', token=token, per_page=2, total=False)
+            seen += _ids(page)
+            token = page.next_token
+        expect((seen, token), (['o4', 'o3', 'o2', 'o1', 'o0'], None), "rows across pages")
+
+
+@check('pagination')
+def check_bad_tokens_restart():
+    """Tampered tokens and tokens from another listing restart at page 1"""
+    from services.pagination import paginate
+    app, db, api, query = _paging()
+    with app.app_context():
+        token = paginate(query, 'user.orders', per_page=3).next_token
+        for bad, what in ((token[:-2] + ('AA' if token[-2:] != 'AA' else 'BB'), "tampered token"),
+                          ('not-a-token', "garbage token")):
+            page = paginate(query, 'user.orders', token=bad, per_page=3)
+            expect((_ids(page), page.number), (['o6', 'o5', 'o4'], 1), what)
+        page = paginate(query, 'supplier.orders:s1', token=token, per_page=3)
+        expect(page.number, 1, "token from another scope")
+
+
+@check('pagination')
+def check_pages_project_sort_fields():
+    """fields= projects the page but always keeps the sort fields"""
+    from services.pagination import paginate
+    app, db, api, query = _paging()
+    with app.app_context():
+        page = paginate(query, 'user.orders', fields=('title',), per_page=3)
+        expect(api.projections[-1], {'title', 'created_at'}, "projected fields")
+        expect(page.items[0].to_dict(), {'title': 'Order 6', 'created_at': page.items[0].get('created_at')},
+               "projected document")
+        nxt = paginate(query, 'user.orders', token=page.next_token, fields=('title',), per_page=3)
+        expect(_ids(nxt), ['o3', 'o2', 'o1'], "next page from a projected cursor")
+
+
+# ─────────────────────────────────────────────────────────────────
+#  BID ACCEPTANCE
+# ─────────────────────────────────────────────────────────────────
+
+def _bidding(bids=3):
+    """(db, api) with project p1 (owner u1, open) and pending bids b0..b<n-1> on it."""
+    from fake_firestore import make_client
+    db, api = make_client()
+    api.put('projects/p1', {'user_id': 'u1', 'status': 'pending', 'title': 'House'})
+    for i in range(bids):
+        api.put(f'bids/b{i}', {'project_id': 'p1', 'status': 'pending', 'contractor_id': f'c{i}',
+                               'contractor_name': f'Contractor {i}', 'total_cost': 1000 + i,
+                               'duration_days': 90})
+    api.put('bids/elsewhere', {'project_id': 'p2', 'status': 'pending', 'contractor_id': 'c9'})
+    return db, api
+
+
+def _bid_statuses(api, bids):
+    return [api.data(f'bids/b{i}')['status'] for i in range(bids)]
+
+
+@check('bid_service')
+def check_accept_assigns_contractor():
+    """Accepting assigns the project and rejects the other pending bids"""
+    from services.bid_service import accept_bid
+    db, api = _bidding()
+    expect(accept_bid(db, 'b1', 'u1')['contractor_id'], 'c1', "returned bid")
+    expect(_bid_statuses(api, 3), ['rejected', 'accepted', 'rejected'], "bid statuses")
+    expect(api.data('bids/elsewhere')['status'], 'pending', "another project's bid")
+    project = api.data('projects/p1')
+    expect((project['status'], project['contractor_id'], project['agreed_cost']),
+           ('active', 'c1', 1001), "project")
+    expect(api.data('stats/platform'), {'projects_active': 1}, "stats rollup")
+
+
+@check('bid_service')
+def check_accept_conflicts():
+    """A second accept fails and leaves the first contractor in place"""
+    from services.bid_service import accept_bid
+    db, api = _bidding()
+    accept_bid(db, 'b0', 'u1')
+    for bid_id in ('b0', 'b2'):
+        expect_raises(ValueError, lambda: accept_bid(db, bid_id, 'u1'), f"accepting {bid_id} again")
+    expect(api.data('projects/p1')['contractor_id'], 'c0', "contractor")
+    expect(_bid_statuses(api, 3), ['accepted', 'rejected', 'rejected'], "bid statuses")
+    expect(api.data('stats/platform'), {'projects_active': 1}, "stats rollup")
+
+
+@check('bid_service')
+def check_accept_guards():
+    """Missing bids and other users' projects are refused without writes"""
+    from services.bid_service import accept_bid
+    db, api = _bidding()
+    expect_raises(LookupError, lambda: accept_bid(db, 'missing', 'u1'), "missing bid")
+    expect_raises(PermissionError, lambda: accept_bid(db, 'b0', 'u2'), "another user's project")
+    expect(api.writes(), 0, "writes")
+    expect(_bid_statuses(api, 3), ['pending'] * 3, "bid statuses")
+
+
+@check('bid_service')
+def check_accept_overflow():
+    """Bids beyond the transaction's write limit are rejected in batches"""
+    from services import bid_service
+    db, api = _bidding(bids=11)
+    limit = bid_service.WRITE_LIMIT
+    bid_service.WRITE_LIMIT = 6
+    try:
+        bid_service.accept_bid(db, 'b0', 'u1')
+    finally:
+        bid_service.WRITE_LIMIT = limit
+    expect(_bid_statuses(api, 11), ['accepted'] + ['rejected'] * 10, "bid statuses")
+    expect([n for kind, *n in api.rpcs if kind == 'commit'], [[6], [6], [1]], "writes per commit")
+
+
+# ─────────────────────────────────────────────────────────────────
+#  INVENTORY
+# ─────────────────────────────────────────────────────────────────
+
+def _stocked(**quantities):
+    """(db, api) with materials/<id> {quantity: n} for each keyword."""
+    from fake_firestore import make_client
+    db, api = make_client()
+    for material_id, quantity in quantities.items():
+        api.put(f'materials/{material_id}', {'name': material_id, 'unit': 'bags', 'quantity': quantity})
+    return db, api
+
+
+def _order(db, order_id, total=100, **items):
+    return (db.collection('orders').document(order_id),
+            {'status': 'pending', 'total': total,
+             'items': [{'material_id': m, 'quantity': q} for m, q in items.items()]})
+
+
+def _place(db, orders):
+    """place_orders() for ready-made [(ref, order)] pairs."""
+    from services.inventory import place_orders
+    material_ids = [item['material_id'] for _, order in orders for item in order['items']]
+    return place_orders(db, material_ids, lambda materials, read: orders)
+
+
+def _stock(api, material_id):
+    """(available, reserved) of a material, summed over its shards."""
+    material = api.data(f'materials/{material_id}')
+    shards = [api.data(f'materials/{material_id}/stock_shards/{i}')
+              for i in range(material.get('stock_shards') or 0)]
+    return (material['quantity'] + sum(s['available'] for s in shards),
+            (material.get('reserved') or 0) + sum(s['reserved'] for s in shards))
+
+
+@check('inventory')
+def check_orders_reserve_stock():
+    """Placing orders moves their quantities from available to reserved"""
+    db, api = _stocked(cement=10, sand=5)
+    _place(db, [_order(db, 'o1', cement=2, sand=5), _order(db, 'o2', cement=1)])
+    expect((_stock(api, 'cement'), _stock(api, 'sand')), ((7, 3), (0, 5)), "cement / sand stock")
+    hold = api.data('orders/o1')['reservation']
+    expect((hold['status'], hold['lines']),
+           ('held', {'cement': {'quantity': 2, 'shards': 0}, 'sand': {'quantity': 5, 'shards': 0}}),
+           "first order's reservation")
+    expect(api.data('orders/o2')['reservation']['lines'], {'cement': {'quantity': 1, 'shards': 0}},
+           "second order's reservation")
+
+
+@check('inventory')
+def check_orders_priced_in_transaction():
+    """Orders are priced from the snapshots the reserving transaction reads, in one round trip"""
+    from services.inventory import place_orders
+    db, api = _stocked(cement=10, sand=5)
+    api.put('materials/cement', dict(api.data('materials/cement'), price=350))
+    api.put('projects/p1', {'title': 'Villa'})
+
+    def build(materials, read):
+        items = [{'material_id': m, 'quantity': 2, 'total': 2 * (materials[m].get('price') or 0)}
+                 for m in ('cement', 'gravel') if m in materials]
+        return [(db.collection('orders').document('o1'),
+                 {'project_title': read['project']['title'], 'items': items,
+                  'total': sum(item['total'] for item in items)})]
+
+    placed = place_orders(db, ['cement', 'gravel', 'cement'], build,
+                          also_read={'project': db.collection('projects').document('p1')})
+    expect([ref.id for ref, _ in placed], ['o1'], "orders returned")
+    order = api.data('orders/o1')
+    expect((order['project_title'], order['total'], order['reservation']['lines']),
+           ('Villa', 700, {'cement': {'quantity': 2, 'shards': 0}}), "order priced from the snapshot")
+    expect(api.rpcs, [('begin',), ('get', 3), ('commit', 2)], "round trips")
+
+
+@check('inventory')
+def check_out_of_stock_writes_nothing():
+    """An order line that can't be covered fails the whole placement"""
+    from services.inventory import OutOfStock
+    db, api = _stocked(cement=10, sand=5)
+    orders = [_order(db, 'o1', cement=2), _order(db, 'o2', sand=6)]
+    error = expect_raises(OutOfStock, lambda: _place(db, orders), "placing too much sand")
+    expect(str(error), "Only 5 bags of sand available", "message")
+    expect_raises(OutOfStock, lambda: _place(db, [_order(db, 'o3', gravel=1)]), "unknown material")
+    expect((api.writes(), api.data('orders/o1')), (0, None), "writes / first order")
+
+
+@check('inventory')
+def check_release_once():
+    """A rejected order returns its stock once; closing it again fails"""
+    from services.inventory import close_order
+    db, api = _stocked(cement=10)
+    ref, order = _order(db, 'o1', cement=4)
+    _place(db, [(ref, order)])
+    before = close_order(db, ref, 'released', {'status': 'rejected'})
+    expect(before['reservation']['status'], 'held', "returned order")
+    expect((_stock(api, 'cement'), api.data('orders/o1')['reservation']['status']),
+           ((10, 0), 'released'), "stock / reservation after rejecting")
+    for outcome in ('released', 'settled'):
+        expect_raises(ValueError, lambda: close_order(db, ref, outcome, {'status': 'completed'}),
+                      f"{outcome} after rejecting")
+    expect((_stock(api, 'cement'), api.data('stats/platform')), ((10, 0), None), "stock / stats")
+    expect_raises(LookupError, lambda: close_order(db, db.collection('orders').document('gone'),
+                                                   'released', {}), "missing order")
+
+
+@check('inventory')
+def check_settle_counts_revenue():
+    """Completing an order settles its reservation and bumps the revenue rollup"""
+    from services.inventory import close_order
+    db, api = _stocked(cement=10)
+    ref, order = _order(db, 'o1', total=2500, cement=4)
+    _place(db, [(ref, order)])
+    close_order(db, ref, 'settled', {'status': 'completed'})
+    expect(_stock(api, 'cement'), (6, 0), "stock")
+    expect(api.data('stats/platform'), {'orders_completed': 1, 'revenue': 2500}, "stats rollup")
+    expect_raises(ValueError, lambda: close_order(db, ref, 'settled', {'status': 'completed'}),
+                  "completing twice")
+    expect(api.data('stats/platform'), {'orders_completed': 1, 'revenue': 2500}, "stats after a retry")
+
+
+@check('inventory')
+def check_shards_split_exactly():
+    """Sharding spreads the quantity exactly; reservations draw across shards"""
+    from services.inventory import close_order, shard_stock, with_available_stock
+    db, api = _stocked(cement=10)
+    expect(shard_stock(db, 'cement', 3), 3, "shard count")
+    expect([api.data(f'materials/cement/stock_shards/{i}')['available'] for i in range(3)],
+           [4, 3, 3], "shard quantities")
+    expect(shard_stock(db, 'cement', 2), 3, "shard count never shrinks")
+    expect(_stock(api, 'cement'), (10, 0), "stock after resharding")
+    expect(with_available_stock(db, [dict(api.data('materials/cement'), id='cement')])[0]['quantity'],
+           10, "listed quantity")
+    ref, order = _order(db, 'o1', cement=9)
+    _place(db, [(ref, order)])
+    expect(_stock(api, 'cement'), (1, 9), "stock after reserving across shards")
+    close_order(db, ref, 'released', {'status': 'rejected'})
+    expect(_stock(api, 'cement'), (10, 0), "stock after releasing")
+
+
+@check('inventory')
+def check_release_held_skips_deleted():
+    """Releasing held stock skips settled orders and deleted materials"""
+    from services.inventory import release_held
+    db, api = _stocked(cement=10, sand=5)
+    _place(db, [_order(db, 'o1', cement=3, sand=2), _order(db, 'o2', cement=1)])
+    settled = dict(api.data('orders/o2'))
+    settled['reservation'] = dict(settled['reservation'], status='settled')
+    db.collection('materials').document('sand').delete()
+    batch = db.batch()
+    held = release_held(db, batch, [api.data('orders/o1'), settled])
+    batch.commit()
+    expect(held, 1, "orders holding stock")
+    expect((_stock(api, 'cement'), api.data('materials/sand')), ((9, 1), None), "cement / sand")
+
+
+# ─────────────────────────────────────────────────────────────────
+#  EMAIL INDEX
+# ─────────────────────────────────────────────────────────────────
+
+def _indexed(api, email):
+    return api.data(f'email_index/{email}')
+
+
+@check('email_index')
+def check_email_change_moves_index():
+    """Changing an email moves its index entry; the old address stops resolving"""
+    from fake_firestore import make_client
+    from services import email_index
+    db, api = make_client()
+    with patched(email_index, _backfilled=True):
+        uid = email_index.create_account(db, 'users', {'email': 'Asha@Example.com', 'name': 'Asha'})
+        other = email_index.create_account(db, 'contractors', {'email': 'ravi@example.com'})
+        email_index.update_account_email(db, 'users', uid, 'asha@example.com',
+                                         {'email': ' asha.k@example.com', 'name': 'Asha K'})
+        expect((_indexed(api, 'asha@example.com'), _indexed(api, 'asha.k@example.com')['doc_id']),
+               (None, uid), "old / new index entry")
+        expect(email_index.find_account(db, 'ASHA.K@example.com')[:2], ('users', uid), "new email")
+        expect(email_index.find_account(db, 'asha@example.com'), None, "old email")
+        expect(api.data(f'users/{uid}')['email'], 'asha.k@example.com', "stored email")
+        for email in ('ravi@example.com', 'a/b@example.com'):
+            expect_raises(ValueError, lambda: email_index.update_account_email(
+                db, 'users', uid, 'asha.k@example.com', {'email': email}), f"changing to {email}")
+        expect(_indexed(api, 'ravi@example.com')['doc_id'], other, "other account's entry")
+
+
+@check('email_index')
+def check_duplicate_register():
+    """Registering an indexed email (any case) or one with '/' writes nothing"""
+    from google.api_core.exceptions import AlreadyExists
+    from fake_firestore import make_client
+    from services import email_index
+    db, api = make_client()
+    email_index.create_account(db, 'users', {'email': 'asha@example.com'})
+    writes = api.writes()
+    expect_raises(AlreadyExists, lambda: email_index.create_account(
+        db, 'suppliers', {'email': ' ASHA@example.com'}), "second sign-up")
+    expect_raises(ValueError, lambda: email_index.create_account(
+        db, 'users', {'email': 'a/b@example.com'}), "email with '/'")
+    expect((api.writes(), [n for n in api.store if '/suppliers/' in n]), (writes, []), "writes / suppliers")
+
+
+@check('email_index')
+def check_unbackfilled_meta_cached():
+    """Before a backfill, the 'not backfilled' answer is re-read only after the TTL"""
+    from config import Config
+    from fake_firestore import make_client
+    from services import email_index
+    db, api = make_client()
+    api.put('users/u1', {'email': 'old@example.com'})
+    api.put('users/u2', {'email': 'odd/one@example.com'})
+    with patched(email_index, _backfilled=False, _checked_at=None):
+        expect(email_index.find_account(db, 'old@example.com')[:2], ('users', 'u1'), "unindexed account")
+        expect(email_index.find_account(db, 'Odd/One@example.com')[:2], ('users', 'u2'), "account with '/'")
+        expect(email_index.find_account(db, 'nobody@example.com'), None, "unknown email")
+        gets = [r for r in api.rpcs if r[0] == 'get']
+        expect(len(gets), 3, "gets: 2 index entries + 1 meta")
+        with patched(Config, EMAIL_INDEX_CHECK_SECONDS=0):
+            api.put('meta/email_index', {'complete': True})
+            api.rpcs.clear()
+            expect(email_index.find_account(db, 'old@example.com'), None, "miss after the backfill")
+            expect((api.rpcs, email_index._backfilled), ([('get', 1), ('get', 1)], True), "rpcs / state")
+
+
+# ─────────────────────────────────────────────────────────────────
+#  CONVERSATIONS / UNREAD COUNTERS
+# ─────────────────────────────────────────────────────────────────
+
+def _message(text, from_contractor=False, **fields):
+    from datetime import datetime
+    message = {'user_id': 'u1', 'contractor_id': 'c1', 'message': text, 'read': False,
+               'created_at': datetime.now()}
+    if from_contractor:
+        message['sender_type'] = 'contractor'
+    return dict(message, **fields)
+
+
+def _unread_state(api):
+    conv = api.data('conversations/u1_contractor_c1') or {}
+    return ({who: (api.data(f'unread_counts/{who}') or {}).get('messages') for who in ('u1', 'c1')},
+            (conv.get('user_unread'), conv.get('partner_unread')))
+
+
+@check('conversations')
+def check_conversation_summaries():
+    """Sent messages keep summaries equal to a rebuild; inboxes list them newest first"""
+    from datetime import datetime, timedelta
+    from fake_firestore import make_client
+    from services import conversation_service as conversations
+    db, api = make_client()
+    start = datetime(2026, 1, 5, 9, 0)
+    conversations.send_message(db, _message('quote?', sender_name='Asha', contractor_name='BuildCo',
+                                            created_at=start))
+    conversations.send_message(db, _message('sure', from_contractor=True, sender_name='BuildCo',
+                                            created_at=start + timedelta(minutes=5)))
+    conversations.send_message(db, {'user_id': 'u1', 'supplier_id': 's1', 'message': 'cement?',
+                                    'read': False, 'sender_name': 'Asha', 'supplier_name': 'StoneMart',
+                                    'created_at': start + timedelta(minutes=9)})
+
+    inbox = conversations.list_for_user(db, 'u1')
+    expect([(c['id'], c['sender_name'], c['last_message'], c['unread_count']) for c in inbox],
+           [('s1', 'StoneMart', 'cement?', 0), ('c1', 'BuildCo', 'sure', 1)], "user inbox")
+    expect([(c['user_id'], c['sender_name'], c['unread_count']) for c in conversations.list_for_partner(db, 'c1')],
+           [('u1', 'Asha', 1)], "contractor inbox")
+
+    def summaries():
+        # a counter that was never bumped is simply absent
+        return {conv_id: dict({'user_unread': 0, 'partner_unread': 0}, **api.data(f'conversations/{conv_id}'))
+                for conv_id in ('u1_contractor_c1', 'u1_supplier_s1')}
+    sent = summaries()
+    expect(conversations.backfill(db), 2, "summaries rebuilt")
+    expect(summaries(), sent, "rebuilt summaries")
+
+
+@check('unread_counters')
+def check_unread_send_and_mark_read():
+    """Sending bumps the recipient's counters; marking read takes each message off once"""
+    from fake_firestore import make_client
+    from services.conversation_service import mark_read, send_message
+    db, api = make_client()
+    to_contractor = [dict(_message(text), id=send_message(db, _message(text))) for text in ('a', 'b')]
+    send_message(db, _message('c', from_contractor=True))
+    expect(_unread_state(api), ({'u1': 1, 'c1': 2}, (1, 2)), "after sending")
+    mark_read(db, to_contractor, 'u1', 'contractor', 'c1')
+    mark_read(db, to_contractor, 'u1', 'contractor', 'c1')        # a second tab, same stale list
+    expect(_unread_state(api), ({'u1': 1, 'c1': 0}, (1, 0)), "after marking read twice")
+
+
+@check('unread_counters')
+def check_unread_notifications():
+    """A notification comes off the count once, and only for its owner"""
+    from fake_firestore import make_client
+    from services.unread_counters import bump, mark_notification_read, unread_count
+    db, api = make_client()
+    api.put('notifications/n1', {'user_id': 'u1', 'read': False})
+    batch = db.batch()
+    bump(db, batch, 'u1', 'notifications')
+    batch.commit()
+    expect_raises(PermissionError, lambda: mark_notification_read(db, 'n1', 'u2'), "someone else's")
+    expect_raises(LookupError, lambda: mark_notification_read(db, 'gone', 'u1'), "missing notification")
+    for _ in range(2):
+        mark_notification_read(db, 'n1', 'u1')
+    expect((unread_count(db, 'u1', 'notifications'), api.data('notifications/n1')['read']), (0, True),
+           "count / read flag")
+
+
+@check('unread_counters')
+def check_unread_reconcile():
+    """Reconcile counts messages without a read field as unread and repairs drifted counters"""
+    from fake_firestore import make_client
+    from services.conversation_service import send_message
+    from services.unread_counters import reconcile
+    db, api = make_client()
+    send_message(db, _message('a'))
+    legacy = _message('b')
+    del legacy['read']
+    api.put('messages/legacy', legacy)
+    api.put('messages/seen', _message('c', from_contractor=True, read=True))
+    api.put('notifications/n1', {'user_id': 'u1'})
+    api.put('notifications/n2', {'user_id': 'u1', 'read': True})
+    api.put('unread_counts/u1', {'messages': 5, 'notifications': 0})
+
+    expect(reconcile(db), {'counters': 2, 'conversations': 1}, "fixes")
+    expect(_unread_state(api), ({'u1': 0, 'c1': 2}, (None, 2)), "after reconciling")
+    expect(api.data('unread_counts/u1')['notifications'], 1, "notifications without a read field")
+    expect(reconcile(db), {'counters': 0, 'conversations': 0}, "fixes on a second run")
+
+
+# ─────────────────────────────────────────────────────────────────
+#  STATS ROLLUP
+# ─────────────────────────────────────────────────────────────────
+
+@check('stats_rollup')
+def check_project_completion_rollup():
+    """Completing projects, twice or by the wrong account, keeps the rollup equal to recompute()"""
+    from fake_firestore import make_client
+    from services.stats_rollup import FIELDS, recompute, set_project_status
+    db, api = make_client()
+    api.put('projects/p1', {'status': 'planning', 'user_id': 'u1'})
+    api.put('projects/p2', {'status': 'active', 'user_id': 'u1', 'contractor_id': 'c1'})
+    api.put('projects/p3', {'status': 'active', 'user_id': 'u2', 'contractor_id': 'c1'})
+    recompute(db)
+
+    before = set_project_status(db, 'p2', 'completed', {'completed_by': 'u1'}, owner=('user_id', 'u1'))
+    expect(before['status'], 'active', "returned project")
+    set_project_status(db, 'p2', 'completed', owner=('user_id', 'u1'))
+    set_project_status(db, 'p3', 'completed', owner=('contractor_id', 'c1'))
+    expect_raises(PermissionError, lambda: set_project_status(db, 'p1', 'completed', owner=('user_id', 'u2')),
+                  "completing someone else's project")
+    expect_raises(LookupError, lambda: set_project_status(db, 'gone', 'completed'), "missing project")
+    expect((api.data('projects/p2')['status'], api.data('projects/p2')['completed_by']),
+           ('completed', 'u1'), "completed project")
+    expect(api.data('projects/p1')['status'], 'planning', "project the wrong account tried")
+
+    rollup = {f: api.data('stats/platform').get(f) for f in FIELDS}
+    expect(rollup, {f: recompute(db)[f] for f in FIELDS}, "rollup against recompute()")
+    expect((rollup['projects_active'], rollup['projects_completed']), (0, 2), "active / completed")
+
+
+# ─────────────────────────────────────────────────────────────────
+#  CASCADE DELETE
+# ─────────────────────────────────────────────────────────────────
+
+class _Queue:
+    """Stands in for the cascade's thread pool: keeps the jobs instead of running them."""
+
+    def __init__(self):
+        self.jobs = []
+
+    def submit(self, fn, *args):
+        self.jobs.append(args)
+
+
+def _project_with_dependents():
+    """Project p1 with 2 bids, an update, a completed order and 2 orders holding stock."""
+    db, api = _stocked(cement=10, sand=5, gravel=8)
+    api.put('projects/p1', {'title': 'Villa', 'status': 'active'})
+    orders = [_order(db, 'o1', cement=3, sand=2), _order(db, 'o2', cement=1, gravel=4)]
+    for _, order in orders:
+        order['project_id'] = 'p1'
+    _place(db, orders)
+    api.put('orders/o3', {'project_id': 'p1', 'status': 'completed', 'total': 500})
+    for doc in ('bids/b1', 'bids/b2', 'project_updates/u1'):
+        api.put(doc, {'project_id': 'p1'})
+    api.rpcs.clear()
+    return db, api
+
+
+def _left_over(api):
+    paths = (name.split('/documents/')[1] for name in api.store)
+    return sorted(p for p in paths if p == 'projects/p1' or not p.startswith('delete_jobs/')
+                  and api.data(p).get('project_id') == 'p1')
+
+
+def _commit_sizes(api):
+    return [n for kind, *rest in api.rpcs if kind == 'commit' for n in rest]
+
+
+@check('cascade_delete')
+def check_cascade_inline():
+    """A small cascade deletes everything, releases held stock and fixes the rollup in one commit"""
+    from services.cascade_delete import delete_project
+    db, api = _project_with_dependents()
+    result = delete_project(db, 'p1', api.data('projects/p1'))
+    expect((result['status'], result['counts']),
+           ('done', {'bids': 2, 'orders': 3, 'project_documents': 0, 'project_updates': 1}), "result")
+    expect(_left_over(api), [], "documents left")
+    expect([_stock(api, m) for m in ('cement', 'sand', 'gravel')], [(10, 0), (5, 0), (8, 0)],
+           "stock after the cascade")
+    expect(api.data('stats/platform'),
+           {'projects': -1, 'projects_active': -1, 'orders_completed': -1, 'revenue': -500}, "rollup deltas")
+    # project + 6 dependents + 3 materials + rollup
+    expect(_commit_sizes(api), [11], "commits")
+
+
+@check('cascade_delete')
+def check_cascade_background():
+    """A large cascade runs as a job whose chunks each fit the commit limit"""
+    from config import Config
+    from services import cascade_delete
+    db, api = _project_with_dependents()
+    queue = _Queue()
+    with patched(Config, CASCADE_INLINE_LIMIT=2), patched(cascade_delete, _get_executor=lambda: queue):
+        job = cascade_delete.delete_project(db, 'p1', api.data('projects/p1'))
+    expect((job['status'], job['total'], queue.jobs), ('running', 6, [('p1',)]), "job queued")
+    expect(_left_over(api), ['bids/b1', 'bids/b2', 'orders/o1', 'orders/o2', 'orders/o3',
+                             'project_updates/u1'], "documents left before the job runs")
+
+    api.rpcs.clear()
+    with patched(cascade_delete, MAX_WRITES=6):
+        cascade_delete._cascade(db, 'p1')
+    expect(max(_commit_sizes(api)) <= 6, True, f"commit sizes {_commit_sizes(api)} within the limit")
+    expect(_left_over(api), [], "documents left")
+    expect([_stock(api, m) for m in ('cement', 'sand', 'gravel')], [(10, 0), (5, 0), (8, 0)],
+           "stock after the cascade")
+    status = cascade_delete.delete_status(db, 'p1')
+    expect((status['status'], status['deleted']),
+           ('done', {'bids': 2, 'orders': 3, 'project_documents': 0, 'project_updates': 1}), "job status")
+    expect(api.data('stats/platform'),
+           {'projects': -1, 'projects_active': -1, 'orders_completed': -1, 'revenue': -500}, "rollup deltas")
+
+
+@check('cascade_delete')
+def check_cascade_inline_over_limit():
+    """A cascade under the inline count whose writes don't fit one commit becomes a job"""
+    from services import cascade_delete
+    db, api = _project_with_dependents()
+    queue = _Queue()
+    with patched(cascade_delete, MAX_WRITES=10, _get_executor=lambda: queue):
+        job = cascade_delete.delete_project(db, 'p1', api.data('projects/p1'))
+    expect((job['status'], queue.jobs), ('running', [('p1',)]), "job queued")
+    expect(_stock(api, 'cement'), (6, 4), "stock still held until the job runs")
+
+
+# ─────────────────────────────────────────────────────────────────
+#  MAIN
+# ─────────────────────────────────────────────────────────────────
+
+def main(argv=None):
+    groups = list(dict.fromkeys(group for group, _, _ in CHECKS))
+    parser = argparse.ArgumentParser(description='Service behaviour checks')
+    parser.add_argument('groups', nargs='*', help=f"groups to run (default all: {', '.join(groups)})")
+    parser.add_argument('--list', action='store_true', help='list the check groups and exit')
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for group in groups:
+            print(group)
+        return 0
+    unknown = set(args.groups) - set(groups)
+    if unknown:
+        parser.error(f"unknown group(s): {', '.join(sorted(unknown))}")
+    selected = args.groups or groups
+    # the services filter with positional where(); the client's nudge towards filter= is noise here
+    warnings.filterwarnings('ignore', message='Detected filter using positional arguments')
+
+    print("=" * 60)
+    print("🧪 SERVICE BEHAVIOUR CHECKS")
+    print("=" * 60)
+
+    failures = 0
+    for n, group in enumerate(selected, 1):
+        print(f"\n{n}. {group}")
+        for _, description, fn in (c for c in CHECKS if c[0] == group):
+            try:
+                fn()
+                print(f"   ✅ {description}")
+            except Exception as e:
+                failures += 1
+                print(f"   ❌ {description}: {e}")
+                if not isinstance(e, AssertionError):
+                    traceback.print_exc()
+
+    print("\n" + "=" * 60)
+    if failures:
+        print(f"❌ {failures} CHECK(S) FAILED")
+        print("=" * 60)
+        return 1
+    print("✅ ALL SERVICE CHECKS PASSED")
+    print("=" * 60)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
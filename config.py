@@ -29,22 +29,57 @@ class Config:
     MAIL_USERNAME = os.environ.get('MAIL_USERNAME')
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
     
-    # Material Price Ranges (default prices in INR)
-    MATERIAL_PRICES = {
-        'cement': {'low': 350, 'medium': 450, 'high': 600},
-        'steel': {'low': 50, 'medium': 65, 'high': 80},
-        'bricks': {'low': 8, 'medium': 12, 'high': 18},
-        'sand': {'low': 40, 'medium': 55, 'high': 70},
-        'aggregate': {'low': 45, 'medium': 60, 'high': 75},
-        'wood': {'low': 500, 'medium': 800, 'high': 1200},
-        'tiles': {'low': 30, 'medium': 50, 'high': 80},
-        'paint': {'low': 200, 'medium': 350, 'high': 500},
-        'electrical': {'low': 150, 'medium': 250, 'high': 400},
-        'plumbing': {'low': 180, 'medium': 300, 'high': 450}
-    }
+    # Rate tables + material price ranges (INR), hot-reloaded from a data file
+    # (services/rate_tables.py); MATERIAL_PRICES is filled in from that file
+    RATE_TABLES_PATH = os.environ.get('RATE_TABLES_PATH') or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), 'data', 'rate_tables.json')
+    RATE_TABLE_CHECK_SECONDS = float(os.environ.get('RATE_TABLE_CHECK_SECONDS') or 10)
+    MATERIAL_PRICES = {}
     
     # Labor cost percentage of material cost
     LABOR_COST_PERCENTAGE = 0.30  # 30%
+
+    # Estimate cache (set ESTIMATE_CACHE_PATH to a .sqlite file to persist across restarts)
+    ESTIMATE_CACHE_SIZE = int(os.environ.get('ESTIMATE_CACHE_SIZE') or 512)
+    ESTIMATE_CACHE_TTL = int(os.environ.get('ESTIMATE_CACHE_TTL') or 6 * 3600)  # seconds
+    ESTIMATE_CACHE_PATH = os.environ.get('ESTIMATE_CACHE_PATH')
+
+    # AI estimate refinement (point AI_REFINE_URL at a local stub for tests)
+    AI_REFINE_URL = os.environ.get('AI_REFINE_URL') or 'https://api.anthropic.com/v1/messages'
+    AI_REFINE_API_KEY = os.environ.get('AI_REFINE_API_KEY')
+    AI_REFINE_TIMEOUT = float(os.environ.get('AI_REFINE_TIMEOUT') or 12)  # seconds
+    AI_REFINE_ASYNC = os.environ.get('AI_REFINE_ASYNC', 'true').lower() in ('1', 'true', 'yes')
+    AI_REFINE_WORKERS = int(os.environ.get('AI_REFINE_WORKERS') or 4)
+    AI_BREAKER_THRESHOLD = int(os.environ.get('AI_BREAKER_THRESHOLD') or 3)    # consecutive failures
+    AI_BREAKER_COOLDOWN = float(os.environ.get('AI_BREAKER_COOLDOWN') or 60)   # seconds
+    AI_FACTOR_CACHE_SIZE = int(os.environ.get('AI_FACTOR_CACHE_SIZE') or 1024)
+    AI_FACTOR_CACHE_TTL = int(os.environ.get('AI_FACTOR_CACHE_TTL') or 24 * 3600)
+    AI_SQFT_BUCKET = int(os.environ.get('AI_SQFT_BUCKET') or 250)
+
+    # Monte Carlo P10/P50/P90 bands per estimate (0 disables)
+    MONTE_CARLO_DRAWS = int(os.environ.get('MONTE_CARLO_DRAWS') or 4000)
+
+    # What-if sweep: max variants priced per request, max values per varied field
+    WHATIF_MAX_VARIANTS = int(os.environ.get('WHATIF_MAX_VARIANTS') or 256)
+    WHATIF_MAX_VALUES = int(os.environ.get('WHATIF_MAX_VALUES') or 32)
+
+    # Log pages that make more Firestore reads than this (see X-Firestore-Reads)
+    FIRESTORE_READ_WARN = int(os.environ.get('FIRESTORE_READ_WARN') or 50)
+
+    # Project delete: dependents (bids, orders, documents, updates) removed inside the
+    # request up to this many, beyond it by a background job (services/cascade_delete.py)
+    CASCADE_INLINE_LIMIT = int(os.environ.get('CASCADE_INLINE_LIMIT') or 20)
+    CASCADE_DELETE_WORKERS = int(os.environ.get('CASCADE_DELETE_WORKERS') or 2)
+
+    # Default shard count for `flask shard-stock` (hot SKUs, services/inventory.py)
+    STOCK_SHARDS = int(os.environ.get('STOCK_SHARDS') or 8)
+
+    # In-process cache of logged-in User objects (load_user)
+    USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE') or 1024)
+    USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL') or 60)  # seconds
+
+    # How long an "email_index not backfilled yet" answer is trusted before re-reading it
+    EMAIL_INDEX_CHECK_SECONDS = float(os.environ.get('EMAIL_INDEX_CHECK_SECONDS') or 300)
     
     # User Roles
     ROLES = {
@@ -0,0 +1,236 @@
+"""
+In-Memory Firestore
+===================
+A fake of the Firestore RPC surface for check_services.py. make_client()
+returns a real google.cloud.firestore_v1.Client whose API calls land on a
+FakeFirestoreAPI, so the services run their actual queries, batches and
+transactions without credentials or network:
+
+    db, api = make_client()
+    api.put('materials/m1', {'quantity': 10})
+    ...service code using db...
+    api.data('materials/m1')     # -> {'quantity': 7, 'reserved': 3}
+    api.rpcs                     # [('begin',), ('get', 1), ('commit', 2), ...]
+
+Supported: document reads (get / get_all, in or out of a transaction),
+queries with == filters, order_by, start_at / start_after cursors, limit
+and select() projections, count() / sum() aggregations, and commits with
+update masks, deletes, exists preconditions and Increment transforms.
+Anything else raises NotImplementedError rather than answering wrongly.
+"""
+
+import functools
+
+from google.api_core.exceptions import AlreadyExists, NotFound
+from google.auth.credentials import AnonymousCredentials
+from google.cloud import firestore_v1
+from google.cloud.firestore_v1 import _helpers
+from google.cloud.firestore_v1.types import aggregation_result
+from google.cloud.firestore_v1.types import document as document_pb
+from google.cloud.firestore_v1.types import firestore as firestore_pb
+from google.cloud.firestore_v1.types import write as write_pb
+from google.protobuf import timestamp_pb2
+
+PROJECT = 'house-forge-checks'
+ROOT = f"projects/{PROJECT}/databases/(default)/documents"
+
+_EQUAL = 5          # StructuredQuery.FieldFilter.Operator.EQUAL
+_DESCENDING = 2     # StructuredQuery.Direction.DESCENDING
+
+
+def _now():
+    stamp = timestamp_pb2.Timestamp()
+    stamp.GetCurrentTime()
+    return stamp
+
+
+class FakeFirestoreAPI:
+    """Documents kept as plain dicts keyed by their full resource name."""
+
+    def __init__(self):
+        self.store = {}
+        self.rpcs = []          # one tuple per RPC: ('get', n) / ('query',) / ('agg',) / ('commit', n) ...
+        self.projections = []   # field set (or None) of every query's select()
+
+    # ── helpers for the checks ───────────────────────────────────
+
+    def put(self, path, data):
+        # round-tripped so values read back as Firestore returns them (datetimes in UTC, ...)
+        self.store[f"{ROOT}/{path}"] = {k: _helpers.decode_value(_helpers.encode_value(v), None)
+                                        for k, v in data.items()}
+
+    def data(self, path):
+        return self.store.get(f"{ROOT}/{path}")
+
+    def writes(self):
+        return sum(n for kind, *rest in self.rpcs if kind == 'commit' for n in rest)
+
+    # ── reads ────────────────────────────────────────────────────
+
+    def _document(self, name, fields=None):
+        data = self.store[name]
+        return document_pb.Document(
+            name=name,
+            fields={k: _helpers.encode_value(v) for k, v in data.items() if fields is None or k in fields},
+            create_time=_now(), update_time=_now())
+
+    def batch_get_documents(self, request, metadata=None, **kwargs):
+        if isinstance(request, dict):
+            request = firestore_pb.BatchGetDocumentsRequest(**request)
+        self.rpcs.append(('get', len(request.documents)))
+        for name in request.documents:
+            if name in self.store:
+                yield firestore_pb.BatchGetDocumentsResponse(found=self._document(name), read_time=_now())
+            else:
+                yield firestore_pb.BatchGetDocumentsResponse(missing=name, read_time=_now())
+
+    def _matches(self, data, where):
+        if 'composite_filter' in where:
+            return all(self._matches(data, f) for f in where.composite_filter.filters)
+        if 'field_filter' in where:
+            f = where.field_filter
+            if f.op != _EQUAL:
+                raise NotImplementedError(f"filter operator {f.op}")
+            return data.get(f.field.field_path) == _helpers.decode_value(f.value, None)
+        raise NotImplementedError("unary filters")
+
+    def _select(self, parent, query):
+        """Names of the documents query returns, in order."""
+        prefix = f"{parent}/{query.from_[0].collection_id}/"
+        hits = [n for n in self.store if n.startswith(prefix) and '/' not in n[len(prefix):]]
+        if 'where' in query:
+            hits = [n for n in hits if self._matches(self.store[n], query.where)]
+
+        orders = [(o.field.field_path, o.direction) for o in query.order_by]
+
+        def value(name, path):
+            return name if path == '__name__' else self.store[name].get(path)
+
+        # like Firestore, ordering by a field drops documents without it
+        hits = [n for n in hits if all(p == '__name__' or p in self.store[n] for p, _ in orders)]
+
+        def compare(a, b):
+            for path, direction in orders:
+                x, y = value(a, path), value(b, path)
+                if x != y:
+                    result = -1 if x < y else 1
+                    return -result if direction == _DESCENDING else result
+            return 0
+        hits.sort(key=functools.cmp_to_key(compare))
+
+        if 'start_at' in query:
+            cursor = [v.reference_value if 'reference_value' in v else _helpers.decode_value(v, None)
+                      for v in query.start_at.values]
+
+            def after_cursor(name):
+                for (path, direction), at in zip(orders, cursor):
+                    x = value(name, path)
+                    if x != at:
+                        return x < at if direction == _DESCENDING else x > at
+                return query.start_at.before    # equal to the cursor: kept by start_at only
+            hits = [n for n in hits if after_cursor(n)]
+        if 'end_at' in query:
+            raise NotImplementedError("end_at / end_before cursors")
+        if 'limit' in query:
+            hits = hits[:query.limit if isinstance(query.limit, int) else query.limit.value]
+        return hits
+
+    def run_query(self, request, metadata=None, **kwargs):
+        if isinstance(request, dict):
+            request = firestore_pb.RunQueryRequest(**request)
+        self.rpcs.append(('query',))
+        query = request.structured_query
+        hits = self._select(request.parent, query)
+        fields = {f.field_path for f in query.select.fields} if 'select' in query else None
+        self.projections.append(fields)
+        if not hits:
+            yield firestore_pb.RunQueryResponse(read_time=_now())
+        for name in hits:
+            yield firestore_pb.RunQueryResponse(document=self._document(name, fields), read_time=_now())
+
+    def run_aggregation_query(self, request, metadata=None, **kwargs):
+        if isinstance(request, dict):
+            request = firestore_pb.RunAggregationQueryRequest(**request)
+        self.rpcs.append(('agg',))
+        aggregation = request.structured_aggregation_query
+        hits = self._select(request.parent, aggregation.structured_query)
+        fields = {}
+        for agg in aggregation.aggregations:
+            if 'count' in agg:
+                result = len(hits)
+            elif 'sum' in agg:
+                path = agg.sum.field.field_path
+                result = sum(v for v in (self.store[n].get(path) for n in hits)
+                             if isinstance(v, (int, float)) and not isinstance(v, bool))
+            else:
+                raise NotImplementedError("avg() aggregation")
+            fields[agg.alias] = _helpers.encode_value(result)
+        yield firestore_pb.RunAggregationQueryResponse(
+            result=aggregation_result.AggregationResult(aggregate_fields=fields), read_time=_now())
+
+    # ── writes ───────────────────────────────────────────────────
+
+    def begin_transaction(self, request=None, metadata=None, **kwargs):
+        self.rpcs.append(('begin',))
+        return firestore_pb.BeginTransactionResponse(transaction=b'fake-transaction')
+
+    def rollback(self, request=None, metadata=None, **kwargs):
+        self.rpcs.append(('rollback',))
+
+    def _apply_mask(self, name, fields, paths):
+        doc = self.store.setdefault(name, {})
+        for path in paths:
+            *parents, leaf = path.split('.')
+            source, target = fields, doc
+            for key in parents:
+                source = source.get(key, {}) if isinstance(source, dict) else {}
+                target = target.setdefault(key, {})
+            if isinstance(source, dict) and leaf in source:
+                target[leaf] = source[leaf]
+            else:
+                target.pop(leaf, None)
+
+    def _apply_transform(self, name, transform):
+        if 'increment' not in transform:
+            raise NotImplementedError("transforms other than Increment")
+        doc = self.store.setdefault(name, {})
+        *parents, leaf = transform.field_path.split('.')
+        for key in parents:
+            doc = doc.setdefault(key, {})
+        doc[leaf] = (doc.get(leaf) or 0) + _helpers.decode_value(transform.increment, None)
+
+    def commit(self, request, metadata=None, **kwargs):
+        if isinstance(request, dict):
+            request = firestore_pb.CommitRequest(**request)
+        # preconditions first, so a failed commit writes nothing
+        for w in request.writes:
+            if 'current_document' in w and 'exists' in w.current_document:
+                name = w.delete or w.update.name
+                if w.current_document.exists and name not in self.store:
+                    raise NotFound(f"No document to update: {name}")
+                if not w.current_document.exists and name in self.store:
+                    raise AlreadyExists(f"Document already exists: {name}")
+        self.rpcs.append(('commit', len(request.writes)))
+        for w in request.writes:
+            if w.delete:
+                self.store.pop(w.delete, None)
+                continue
+            name = w.update.name
+            fields = {k: _helpers.decode_value(v, None) for k, v in w.update.fields.items()}
+            if 'update_mask' in w:
+                self._apply_mask(name, fields, w.update_mask.field_paths)
+            else:
+                self.store[name] = fields
+            for transform in w.update_transforms:
+                self._apply_transform(name, transform)
+        return firestore_pb.CommitResponse(
+            write_results=[write_pb.WriteResult(update_time=_now()) for _ in request.writes],
+            commit_time=_now())
+
+
+def make_client():
+    """(db, api): a Firestore client backed by a fresh in-memory FakeFirestoreAPI."""
+    db = firestore_v1.Client(project=PROJECT, credentials=AnonymousCredentials())
+    api = FakeFirestoreAPI()
+    db._firestore_api_internal = api
+    return db, api
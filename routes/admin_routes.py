@@ -1,8 +1,16 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
 from flask_login import login_required, current_user
+from firebase_admin import firestore
 from datetime import datetime
 from functools import wraps
 
+from services import stats_rollup
+from services.aggregation import count_of
+from services.stats_rollup import ACCOUNT_FIELDS
+from services.pagination import paginate
+from services.projections import ADMIN_PROJECT_LIST
+from services.user_cache import invalidate
+
 admin_bp = Blueprint('admin', __name__)
 
 def get_db():
@@ -23,31 +31,25 @@ def admin_required(f):
 @admin_required
 def dashboard():
     db = get_db()
-    users = list(db.collection('users').stream())
-    contractors = list(db.collection('contractors').stream())
-    suppliers = list(db.collection('suppliers').stream())
-    pending_contractors = [c for c in contractors if not c.to_dict().get('verified', False)]
-    pending_suppliers = [s for s in suppliers if not s.to_dict().get('verified', False)]
-    projects = list(db.collection('projects').stream())
-    active_projects = [p for p in projects if p.to_dict().get('status') == 'active']
-    orders = list(db.collection('orders').stream())
-    total_revenue = sum(o.to_dict().get('total', 0) for o in orders if o.to_dict().get('status') == 'completed')
+    # One read: the incrementally maintained stats/platform rollup
+    rollup = stats_rollup.load(db)
     stats = {
-        'total_users': len(users),
-        'total_contractors': len(contractors),
-        'total_suppliers': len(suppliers),
-        'pending_verifications': len(pending_contractors) + len(pending_suppliers),
-        'total_projects': len(projects),
-        'active_projects': len(active_projects),
-        'total_revenue': total_revenue,
-        'total_platform_users': len(users) + len(contractors) + len(suppliers)
+        'total_users': rollup['users'],
+        'total_contractors': rollup['contractors'],
+        'total_suppliers': rollup['suppliers'],
+        'pending_verifications': rollup['pending_contractors'] + rollup['pending_suppliers'],
+        'total_projects': rollup['projects'],
+        'active_projects': rollup['projects_active'],
+        'total_revenue': rollup['revenue'],
+        'total_platform_users': rollup['users'] + rollup['contractors'] + rollup['suppliers']
     }
-    recent_projects = projects[-5:] if len(projects) > 5 else projects
+    # Only the five shown per type are fetched
+    pending_contractors = list(db.collection('contractors').where('verified', '==', False).limit(5).stream())
+    pending_suppliers = list(db.collection('suppliers').where('verified', '==', False).limit(5).stream())
     return render_template('admin/dashboard.html',
                            stats=stats,
-                           pending_contractors=pending_contractors[:5],
-                           pending_suppliers=pending_suppliers[:5],
-                           recent_projects=recent_projects)
+                           pending_contractors=pending_contractors,
+                           pending_suppliers=pending_suppliers)
 
 
 @admin_bp.route('/users')
@@ -55,8 +57,10 @@ def dashboard():
 @admin_required
 def manage_users():
     db = get_db()
+    users_query = db.collection('users')
+    page = paginate(users_query, scope='admin.users', token=request.args.get('page'))
     users = []
-    for doc in db.collection('users').stream():
+    for doc in page.items:
         user_data = doc.to_dict()
         user_data['id'] = doc.id
         user_data['type'] = 'user'
@@ -66,7 +70,15 @@ def manage_users():
         if 'active' not in user_data:
             user_data['active'] = True
         users.append(user_data)
-    return render_template('admin/manage_users.html', users=users)
+    # Header counts cover every user; missing 'verified' means pending, missing 'active' means active
+    verified = count_of(users_query.where('verified', '==', True))
+    stats = {
+        'total': page.total,
+        'verified': verified,
+        'pending': page.total - verified,
+        'inactive': count_of(users_query.where('active', '==', False))
+    }
+    return render_template('admin/manage_users.html', users=users, stats=stats, page=page)
 
 
 @admin_bp.route('/contractors')
@@ -103,17 +115,53 @@ def manage_suppliers():
     return render_template('admin/manage_suppliers.html', suppliers=suppliers)
 
 
+def _verify_account(db, collection, account_id):
+    """Mark an account verified; takes it off the pending count if it was pending."""
+    account_ref = db.collection(collection).document(account_id)
+
+    # State check and rollup bump in one transaction, so a double-submitted
+    # verify only takes the account off the pending count once
+    @firestore.transactional
+    def _verify(transaction):
+        snap = account_ref.get(transaction=transaction)
+        if not snap.exists:
+            raise ValueError('Account not found')
+        transaction.update(account_ref, {
+            'verified': True,
+            'verified_at': datetime.now(),
+            'verified_by': current_user.id
+        })
+        if not (snap.to_dict() or {}).get('verified', False):
+            stats_rollup.bump(db, transaction, **{ACCOUNT_FIELDS[collection][1]: -1})
+
+    _verify(db.transaction())
+    invalidate(account_id)
+
+
+def _set_active(db, collection, account_id, active, fields):
+    """Activate / deactivate an account, keeping the users_active rollup in step."""
+    account_ref = db.collection(collection).document(account_id)
+
+    @firestore.transactional
+    def _update(transaction):
+        snap = account_ref.get(transaction=transaction)
+        if not snap.exists:
+            raise ValueError('Account not found')
+        transaction.update(account_ref, dict(fields, active=active))
+        if collection == 'users' and (snap.to_dict() or {}).get('active', True) != active:
+            stats_rollup.bump(db, transaction, users_active=1 if active else -1)
+
+    _update(db.transaction())
+    invalidate(account_id)
+
+
 @admin_bp.route('/verify-contractor/<contractor_id>', methods=['POST'])
 @login_required
 @admin_required
 def verify_contractor(contractor_id):
     db = get_db()
     try:
-        db.collection('contractors').document(contractor_id).update({
-            'verified': True,
-            'verified_at': datetime.now(),
-            'verified_by': current_user.id
-        })
+        _verify_account(db, 'contractors', contractor_id)
         flash('Contractor verified successfully!', 'success')
     except Exception as e:
         flash(f'Error verifying contractor: {str(e)}', 'error')
@@ -126,11 +174,7 @@ def verify_contractor(contractor_id):
 def verify_supplier(supplier_id):
     db = get_db()
     try:
-        db.collection('suppliers').document(supplier_id).update({
-            'verified': True,
-            'verified_at': datetime.now(),
-            'verified_by': current_user.id
-        })
+        _verify_account(db, 'suppliers', supplier_id)
         flash('Supplier verified successfully!', 'success')
     except Exception as e:
         flash(f'Error verifying supplier: {str(e)}', 'error')
@@ -143,11 +187,7 @@ def verify_supplier(supplier_id):
 def verify_user(user_id):
     db = get_db()
     try:
-        db.collection('users').document(user_id).update({
-            'verified': True,
-            'verified_at': datetime.now(),
-            'verified_by': current_user.id
-        })
+        _verify_account(db, 'users', user_id)
         flash('User verified successfully!', 'success')
     except Exception as e:
         flash(f'Error verifying user: {str(e)}', 'error')
@@ -161,8 +201,7 @@ def deactivate_user(user_type, user_id):
     db = get_db()
     try:
         collection = user_type + 's' if user_type != 'user' else 'users'
-        db.collection(collection).document(user_id).update({
-            'active': False,
+        _set_active(db, collection, user_id, False, {
             'deactivated_at': datetime.now(),
             'deactivated_by': current_user.id
         })
@@ -179,8 +218,7 @@ def activate_user(user_type, user_id):
     db = get_db()
     try:
         collection = user_type + 's' if user_type != 'user' else 'users'
-        db.collection(collection).document(user_id).update({
-            'active': True,
+        _set_active(db, collection, user_id, True, {
             'activated_at': datetime.now()
         })
         flash('User activated successfully!', 'success')
@@ -194,12 +232,14 @@ def activate_user(user_type, user_id):
 @admin_required
 def all_projects():
     db = get_db()
+    page = paginate(db.collection('projects'), scope='admin.projects', token=request.args.get('page'),
+                    fields=ADMIN_PROJECT_LIST)
     projects = []
-    for doc in db.collection('projects').stream():
+    for doc in page.items:
         project_data = doc.to_dict()
         project_data['id'] = doc.id
         projects.append(project_data)
-    return render_template('admin/all_projects.html', projects=projects)
+    return render_template('admin/all_projects.html', projects=projects, page=page)
 
 
 @admin_bp.route('/analytics')
@@ -207,17 +247,27 @@ def all_projects():
 @admin_required
 def analytics():
     db = get_db()
-    users = list(db.collection('users').stream())
-    contractors = list(db.collection('contractors').stream())
-    suppliers = list(db.collection('suppliers').stream())
-    projects = list(db.collection('projects').stream())
-    orders = list(db.collection('orders').stream())
+    rollup = stats_rollup.load(db)
     analytics_data = {
-        'user_growth': len(users),
-        'contractor_growth': len(contractors),
-        'supplier_growth': len(suppliers),
+        'user_growth': rollup['users'],
+        'contractor_growth': rollup['contractors'],
+        'supplier_growth': rollup['suppliers'],
         'project_completion_rate': 0,
-        'total_revenue': sum(o.to_dict().get('total', 0) for o in orders if o.to_dict().get('status') == 'completed'),
-        'active_users': len([u for u in users if u.to_dict().get('active', True)])
+        'total_revenue': rollup['revenue'],
+        'active_users': rollup['users_active']
     }
-    return render_template('admin/analytics.html', analytics=analytics_data)
\ No newline at end of file
+    return render_template('admin/analytics.html', analytics=analytics_data)
+
+
+@admin_bp.route('/api/estimator-metrics')
+@login_required
+@admin_required
+def estimator_metrics():
+    """AI refine guard + estimate cache counters, incl. latency saved"""
+    from services.ai_guard import ai_guard
+    from services.estimate_cache import estimate_cache
+    return jsonify({
+        'success': True,
+        'ai_refine': ai_guard.metrics(),
+        'estimate_cache': estimate_cache.stats(),
+    })
@@ -2,6 +2,11 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash
 from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 from models.user import User
+from services.email_index import create_account, email_taken, find_account
+from services.user_cache import forget_session, invalidate, remember
+from services import stats_rollup
+from services.stats_rollup import ACCOUNT_FIELDS
+from google.api_core.exceptions import AlreadyExists
 from datetime import datetime
 import re
 
@@ -46,27 +51,12 @@ def login():
             return render_template('login.html')
         
         try:
-            collections = ['users', 'admins', 'contractors', 'suppliers']
-            user_doc = None
-            user_data = None
-            collection_name = None
-            
-            for collection in collections:
-                users_ref = db.collection(collection)
-                query = users_ref.where('email', '==', email).limit(1).stream()
-                
-                for doc in query:
-                    user_doc = doc
-                    user_data = doc.to_dict()
-                    collection_name = collection
-                    break
-                
-                if user_doc:
-                    break
-            
-            if not user_doc or not user_data:
+            # One email_index get + one account get instead of a query per collection
+            found = find_account(db, email)
+            if not found:
                 flash('Invalid email or password', 'error')
                 return render_template('login.html')
+            collection_name, user_id, user_data = found
             
             stored_password_hash = user_data.get('password', '')
             password_match = check_password_hash(stored_password_hash, password)
@@ -85,10 +75,11 @@ def login():
                 flash('Your account is pending admin verification. Please wait for approval.', 'error')
                 return render_template('login.html')
             
-            user = User(user_doc.id, user_data)
+            user = User(user_id, user_data)
             login_user(user, remember=True)
+            remember(user_id, collection_name, user)
             
-            db.collection(collection_name).document(user_doc.id).update({
+            db.collection(collection_name).document(user_id).update({
                 'last_login': datetime.now()
             })
             
@@ -157,12 +148,9 @@ def register():
             return render_template('register.html')
         
         try:
-            collections = ['users', 'admins', 'contractors', 'suppliers']
-            for collection in collections:
-                existing = db.collection(collection).where('email', '==', email).limit(1).stream()
-                if any(existing):
-                    flash('Email already registered', 'error')
-                    return render_template('register.html')
+            if email_taken(db, email):
+                flash('Email already registered', 'error')
+                return render_template('register.html')
             
             if role == 'user':
                 collection = 'users'
@@ -201,8 +189,19 @@ def register():
                     'rating': 0.0
                 })
             
-            doc_ref = db.collection(collection).add(user_data)
-            new_user_id = doc_ref[1].id
+            # Account, email_index entry and platform stats in one batch
+            batch = db.batch()
+            new_user_id = create_account(db, collection, user_data, batch=batch)
+            total_field, pending_field = ACCOUNT_FIELDS[collection]
+            deltas = {total_field: 1, pending_field: 1}
+            if collection == 'users':
+                deltas['users_active'] = 1
+            stats_rollup.bump(db, batch, **deltas)
+            try:
+                batch.commit()
+            except AlreadyExists:
+                flash('Email already registered', 'error')
+                return render_template('register.html')
             
             flash('Registration successful! Your account is pending admin verification. You will be able to login once approved.', 'success')
             return redirect(url_for('auth.login'))
@@ -217,6 +216,8 @@ def register():
 @auth_bp.route('/logout')
 @login_required
 def logout():
+    invalidate(current_user.id)
+    forget_session()
     logout_user()
     flash('You have been logged out successfully', 'success')
     return redirect(url_for('index'))
\ No newline at end of file
@@ -7,6 +7,14 @@ from datetime import datetime
 import os
 import json
 
+from services.doc_loader import load_docs
+from services.email_index import update_account_email
+from services.user_cache import invalidate
+from services.conversation_service import list_for_partner, mark_read, send_message
+from services import stats_rollup, unread_counters
+from services.pagination import paginate
+from services.projections import BROWSE_PROJECTS, CONTRACTOR_ACTIVE_PROJECTS, select_fields
+
 contractor_bp = Blueprint('contractor', __name__)
 db = firestore.client()
 
@@ -148,6 +156,7 @@ def update_business_info():
             'specializations': specializations,
             'updated_at': datetime.now()
         })
+        invalidate(current_user.id)
         
         return jsonify({'success': True, 'message': 'Business information updated successfully'})
     
@@ -165,15 +174,18 @@ def update_personal_info():
         name = request.form.get('name')
         email = request.form.get('email')
         
-        contractor_ref = db.collection('contractors').document(current_user.id)
-        contractor_ref.update({
+        # Moves the email_index entry along with the email
+        update_account_email(db, 'contractors', current_user.id, current_user.email, {
             'name': name,
             'email': email,
             'updated_at': datetime.now()
         })
+        invalidate(current_user.id)
         
         return jsonify({'success': True, 'message': 'Personal information updated successfully'})
     
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
         print(f"Error updating personal info: {str(e)}")
         return jsonify({'success': False, 'message': str(e)}), 500
@@ -259,25 +271,37 @@ def browse_projects():
     db = get_db()
     
     try:
-        projects_ref = db.collection('projects').where('status', '==', 'planning').stream()
+        page = paginate(db.collection('projects').where('status', '==', 'planning'),
+                        scope='contractor.browse_projects', token=request.args.get('page'),
+                        fields=BROWSE_PROJECTS)
         projects = []
         
-        for doc in projects_ref:
+        # Owners in one get_all, and this contractor's bids on just this page's projects
+        # ('in' takes at most 30 values, so one query per 30 projects)
+        owners = load_docs(db, 'users', [doc.to_dict().get('user_id') for doc in page.items])
+        page_ids = [doc.id for doc in page.items]
+        my_bids = db.collection('bids').where('contractor_id', '==', current_user.id)
+        bid_on = set()
+        for start in range(0, len(page_ids), 30):
+            bid_on.update(bid.to_dict().get('project_id') for bid in
+                          select_fields(my_bids.where('project_id', 'in', page_ids[start:start + 30]),
+                                        ('project_id',)).stream())
+        
+        for doc in page.items:
             project_data = doc.to_dict()
             project_data['id'] = doc.id
             
             # Get user info
-            user_doc = db.collection('users').document(project_data.get('user_id')).get()
-            if user_doc.exists:
-                project_data['user_name'] = user_doc.to_dict().get('name', 'Unknown')
+            owner = owners.get(project_data.get('user_id'))
+            if owner is not None:
+                project_data['user_name'] = owner.get('name', 'Unknown')
             
             # Check if contractor already bid
-            existing_bid = list(db.collection('bids').where('project_id', '==', doc.id).where('contractor_id', '==', current_user.id).limit(1).stream())
-            project_data['has_bid'] = len(existing_bid) > 0
+            project_data['has_bid'] = doc.id in bid_on
             
             projects.append(project_data)
         
-        return render_template('contractor/browse_projects.html', projects=projects)
+        return render_template('contractor/browse_projects.html', projects=projects, page=page)
         
     except Exception as e:
         flash(f'Error loading projects: {str(e)}', 'error')
@@ -289,7 +313,8 @@ def my_projects():
     """View contractor's active projects"""
     db = get_db()
     
-    projects_ref = db.collection('projects').where('contractor_id', '==', current_user.id).stream()
+    projects_ref = select_fields(db.collection('projects').where('contractor_id', '==', current_user.id),
+                                 CONTRACTOR_ACTIVE_PROJECTS).stream()
     projects = []
     for doc in projects_ref:
         project_data = doc.to_dict()
@@ -550,45 +575,8 @@ def messages():
 def api_conversations():
     """API endpoint to get all conversations as JSON"""
     try:
-        # Get all unique conversations
-        messages_ref = db.collection('messages').where('contractor_id', '==', current_user.id).stream()
-        
-        conversations = {}
-        for doc in messages_ref:
-            message_data = doc.to_dict()
-            
-            # Skip outgoing messages from this contractor
-            if message_data.get('sender_id') == current_user.id and message_data.get('sender_type') == 'contractor':
-                continue
-            
-            user_id = message_data.get('user_id')
-            if not user_id:
-                continue
-                
-            conv_key = f"user_{user_id}"
-            
-            if conv_key not in conversations:
-                conversations[conv_key] = {
-                    'user_id': user_id,
-                    'sender_name': message_data.get('sender_name', 'Customer'),
-                    'sender_email': message_data.get('sender_email', ''),
-                    'sender_phone': message_data.get('sender_phone', ''),
-                    'last_message': message_data.get('message', ''),
-                    'last_message_time': message_data.get('created_at'),
-                    'unread_count': 0
-                }
-            
-            # Update last message if newer
-            if message_data.get('created_at') > conversations[conv_key]['last_message_time']:
-                conversations[conv_key]['last_message'] = message_data.get('message', '')
-                conversations[conv_key]['last_message_time'] = message_data.get('created_at')
-            
-            # Count unread incoming messages only
-            if not message_data.get('read', False) and message_data.get('sender_type') != 'contractor':
-                conversations[conv_key]['unread_count'] += 1
-        
-        conversations_list = list(conversations.values())
-        conversations_list.sort(key=lambda x: x.get('last_message_time', datetime.min), reverse=True)
+        # One query over the conversation summaries, newest first
+        conversations_list = list_for_partner(db, current_user.id)
         
         return jsonify({'conversations': conversations_list})
         
@@ -640,13 +628,9 @@ def api_messages(user_id):
         else:
             user_info = {'name': 'Customer', 'email': '', 'phone': ''}
         
-        # Mark incoming messages as read
-        for msg in all_messages:
-            if msg['direction'] == 'incoming' and not msg.get('read', False):
-                db.collection('messages').document(msg['id']).update({
-                    'read': True,
-                    'read_at': datetime.now()
-                })
+        # Mark incoming messages as read (and off the unread counters)
+        incoming = [msg for msg in all_messages if msg['direction'] == 'incoming']
+        mark_read(db, incoming, user_id, 'contractor', current_user.id)
         
         return jsonify({
             'messages': all_messages,
@@ -685,8 +669,7 @@ def send_chat_message(user_id):
             'created_at': datetime.now()
         }
         
-        doc_ref = db.collection('messages').add(message_data)
-        message_id = doc_ref[1].id
+        message_id = send_message(db, message_data)
         
         return jsonify({
             'success': True,
@@ -709,18 +692,8 @@ def messages_unread_count():
         if not db:
             return jsonify({'count': 0}), 200
 
-        messages_ref = db.collection('messages').where('contractor_id', '==', current_user.id).stream()
-
-        unread_count = 0
-        for doc in messages_ref:
-            message_data = doc.to_dict()
-            # Skip messages sent BY this contractor
-            if message_data.get('sender_id') == current_user.id and message_data.get('sender_type') == 'contractor':
-                continue
-            if not message_data.get('read', False):
-                unread_count += 1
-
-        response = jsonify({'count': unread_count})
+        # Maintained counter - one document read per poll
+        response = jsonify({'count': unread_counters.unread_count(db, current_user.id, 'messages')})
         response.headers['Content-Type'] = 'application/json'
         return response, 200
 
@@ -737,25 +710,18 @@ def messages_unread_count():
 def complete_project(project_id):
     """Mark project as completed"""
     try:
-        project_ref = db.collection('projects').document(project_id)
-        project_doc = project_ref.get()
-        
-        if not project_doc.exists:
+        # Status check and rollup bump in one transaction, so a double-submitted
+        # complete only counts the project once
+        try:
+            stats_rollup.set_project_status(db, project_id, 'completed', {
+                'completed_at': datetime.now(),
+                'updated_at': datetime.now()
+            }, owner=('contractor_id', current_user.id))
+        except LookupError:
             return jsonify({'success': False, 'message': 'Project not found'}), 404
-        
-        project_data = project_doc.to_dict()
-        
-        # Verify this is the contractor's project
-        if project_data.get('contractor_id') != current_user.id:
+        except PermissionError:
             return jsonify({'success': False, 'message': 'Access denied'}), 403
         
-        # Update project status to completed
-        project_ref.update({
-            'status': 'completed',
-            'completed_at': datetime.now(),
-            'updated_at': datetime.now()
-        })
-        
         flash('Project marked as completed!', 'success')
         return jsonify({'success': True, 'message': 'Project completed successfully!'})
         
@@ -7,6 +7,14 @@ from datetime import datetime
 import os
 import json
 
+from services.email_index import update_account_email
+from services.user_cache import invalidate
+from services.conversation_service import list_for_partner, mark_read, send_message
+from services import inventory as stock
+from services import unread_counters
+from services.aggregation import count_of, sum_of
+from services.pagination import paginate
+
 supplier_bp = Blueprint('supplier', __name__)
 db = firestore.client()
 
@@ -15,63 +23,51 @@ db = firestore.client()
 def dashboard():
     """Supplier Dashboard - Main page after login"""
     
-    # Get supplier's materials
-    materials_ref = db.collection('materials').where('supplier_id', '==', current_user.id).stream()
-    materials = []
-    for doc in materials_ref:
-        material_data = doc.to_dict()
-        material_data['id'] = doc.id
-        materials.append(material_data)
-    
-    # Get orders
-    orders_ref = db.collection('orders').where('supplier_id', '==', current_user.id).stream()
+    # Counts and revenue are aggregated server-side; only the 5 recent orders are fetched
+    orders_query = db.collection('orders').where('supplier_id', '==', current_user.id)
+    recent_ref = orders_query.order_by('created_at', direction=firestore.Query.DESCENDING).limit(5).stream()
     orders = []
-    total_revenue = 0
-    pending_orders = 0
-    
-    for doc in orders_ref:
+    for doc in recent_ref:
         order_data = doc.to_dict()
         order_data['id'] = doc.id
         orders.append(order_data)
-        
-        if order_data.get('status') == 'completed':
-            total_revenue += order_data.get('total', 0)
-        if order_data.get('status') == 'pending':
-            pending_orders += 1
     
     stats = {
-        'total_materials': len(materials),
-        'total_orders': len(orders),
-        'pending_orders': pending_orders,
-        'total_revenue': total_revenue,
+        'total_materials': count_of(db.collection('materials').where('supplier_id', '==', current_user.id)),
+        'total_orders': count_of(orders_query),
+        'pending_orders': count_of(orders_query.where('status', '==', 'pending')),
+        'total_revenue': sum_of(orders_query.where('status', '==', 'completed'), 'total'),
         'rating': current_user.rating if hasattr(current_user, 'rating') else 0.0,
         'verified': current_user.verified if hasattr(current_user, 'verified') else False
     }
     
     return render_template('supplier/dashboard.html',
                          stats=stats,
-                         orders=orders[:5])  # Show only 5 recent orders
+                         orders=orders)  # Show only 5 recent orders
 
 @supplier_bp.route('/inventory')
 @login_required
 def inventory():
     """View and manage inventory"""
-    materials_ref = db.collection('materials').where('supplier_id', '==', current_user.id).stream()
+    page = paginate(db.collection('materials').where('supplier_id', '==', current_user.id),
+                    scope='supplier.inventory', token=request.args.get('page'))
     materials = []
-    for doc in materials_ref:
+    for doc in page.items:
         material_data = doc.to_dict()
         material_data['id'] = doc.id
         materials.append(material_data)
+    stock.with_available_stock(db, materials)
     
-    return render_template('supplier/inventory.html', materials=materials)
+    return render_template('supplier/inventory.html', materials=materials, page=page)
 
 @supplier_bp.route('/orders')
 @login_required
 def orders():
     """View all orders"""
-    orders_ref = db.collection('orders').where('supplier_id', '==', current_user.id).stream()
+    orders_query = db.collection('orders').where('supplier_id', '==', current_user.id)
+    page = paginate(orders_query, scope='supplier.orders', token=request.args.get('page'))
     orders_list = []
-    for doc in orders_ref:
+    for doc in page.items:
         order_data = doc.to_dict()
         order_data['id'] = doc.id
         
@@ -81,7 +77,15 @@ def orders():
         
         orders_list.append(order_data)
     
-    return render_template('supplier/orders.html', orders=orders_list)
+    # Header counts cover every order, not just this page
+    stats = {
+        'total': page.total,
+        'pending': count_of(orders_query.where('status', '==', 'pending')),
+        'processing': count_of(orders_query.where('status', '==', 'processing')),
+        'completed': count_of(orders_query.where('status', '==', 'completed'))
+    }
+    
+    return render_template('supplier/orders.html', orders=orders_list, stats=stats, page=page)
 
 @supplier_bp.route('/add-material', methods=['GET', 'POST'])
 @login_required
@@ -96,6 +100,7 @@ def add_material():
             'price': float(request.form.get('price')),
             'unit': request.form.get('unit'),
             'quantity': int(request.form.get('quantity')),
+            'reserved': 0,
             'description': request.form.get('description'),
             'created_at': datetime.now()
         }
@@ -200,8 +205,8 @@ def update_business_info():
         name = request.form.get('name')
         email = request.form.get('email')
         
-        supplier_ref = db.collection('suppliers').document(current_user.id)
-        supplier_ref.update({
+        # Moves the email_index entry along with the email
+        update_account_email(db, 'suppliers', current_user.id, current_user.email, {
             # Business Info
             'company_name': company_name,
             'business_type': business_type,
@@ -216,9 +221,12 @@ def update_business_info():
             'email': email,
             'updated_at': datetime.now()
         })
+        invalidate(current_user.id)
         
         return jsonify({'success': True, 'message': 'Profile updated successfully'})
     
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
         print(f"Error updating profile: {str(e)}")
         import traceback
@@ -233,15 +241,18 @@ def update_personal_info():
         name = request.form.get('name')
         email = request.form.get('email')
         
-        supplier_ref = db.collection('suppliers').document(current_user.id)
-        supplier_ref.update({
+        # Moves the email_index entry along with the email
+        update_account_email(db, 'suppliers', current_user.id, current_user.email, {
             'name': name,
             'email': email,
             'updated_at': datetime.now()
         })
+        invalidate(current_user.id)
         
         return jsonify({'success': True, 'message': 'Personal information updated successfully'})
     
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
         print(f"Error updating personal info: {str(e)}")
         return jsonify({'success': False, 'message': str(e)}), 500
@@ -399,6 +410,9 @@ def accept_order(order_id):
         if order_data.get('supplier_id') != current_user.id:
             return jsonify({'success': False, 'message': 'Access denied'}), 403
         
+        if order_data.get('status') in stock.FINAL_STATUSES:
+            return jsonify({'success': False, 'message': f"Order is already {order_data['status']}"}), 409
+        
         # Update order status
         order_ref.update({
             'status': 'processing',
@@ -432,8 +446,8 @@ def reject_order(order_id):
         if order_data.get('supplier_id') != current_user.id:
             return jsonify({'success': False, 'message': 'Access denied'}), 403
         
-        # Update order status
-        order_ref.update({
+        # Update order status and return its reserved stock
+        stock.close_order(db, order_ref, 'released', {
             'status': 'cancelled',
             'rejected_at': datetime.now(),
             'updated_at': datetime.now()
@@ -441,6 +455,10 @@ def reject_order(order_id):
         
         return jsonify({'success': True, 'message': 'Order rejected'})
         
+    except LookupError as e:
+        return jsonify({'success': False, 'message': str(e)}), 404
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 409
     except Exception as e:
         print(f"Error rejecting order: {str(e)}")
         import traceback
@@ -465,8 +483,9 @@ def complete_order(order_id):
         if order_data.get('supplier_id') != current_user.id:
             return jsonify({'success': False, 'message': 'Access denied'}), 403
         
-        # Update order status
-        order_ref.update({
+        # Update order status and settle its reserved stock; also adds the
+        # order to the revenue rollup (a completed order can't change again)
+        stock.close_order(db, order_ref, 'settled', {
             'status': 'completed',
             'completed_at': datetime.now(),
             'updated_at': datetime.now()
@@ -474,6 +493,10 @@ def complete_order(order_id):
         
         return jsonify({'success': True, 'message': 'Order marked as completed!'})
         
+    except LookupError as e:
+        return jsonify({'success': False, 'message': str(e)}), 404
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 409
     except Exception as e:
         print(f"Error completing order: {str(e)}")
         import traceback
@@ -494,45 +517,8 @@ def messages():
 def api_conversations():
     """API endpoint to get all conversations as JSON"""
     try:
-        # Get all unique conversations
-        messages_ref = db.collection('messages').where('supplier_id', '==', current_user.id).stream()
-        
-        conversations = {}
-        for doc in messages_ref:
-            message_data = doc.to_dict()
-            
-            # Skip outgoing messages from this supplier
-            if message_data.get('sender_id') == current_user.id and message_data.get('sender_type') == 'supplier':
-                continue
-            
-            user_id = message_data.get('user_id')
-            if not user_id:
-                continue
-                
-            conv_key = f"user_{user_id}"
-            
-            if conv_key not in conversations:
-                conversations[conv_key] = {
-                    'user_id': user_id,
-                    'sender_name': message_data.get('sender_name', 'Customer'),
-                    'sender_email': message_data.get('sender_email', ''),
-                    'sender_phone': message_data.get('sender_phone', ''),
-                    'last_message': message_data.get('message', ''),
-                    'last_message_time': message_data.get('created_at'),
-                    'unread_count': 0
-                }
-            
-            # Update last message if newer
-            if message_data.get('created_at') > conversations[conv_key]['last_message_time']:
-                conversations[conv_key]['last_message'] = message_data.get('message', '')
-                conversations[conv_key]['last_message_time'] = message_data.get('created_at')
-            
-            # Count unread incoming messages only
-            if not message_data.get('read', False) and message_data.get('sender_type') != 'supplier':
-                conversations[conv_key]['unread_count'] += 1
-        
-        conversations_list = list(conversations.values())
-        conversations_list.sort(key=lambda x: x.get('last_message_time', datetime.min), reverse=True)
+        # One query over the conversation summaries, newest first
+        conversations_list = list_for_partner(db, current_user.id)
         
         return jsonify({'conversations': conversations_list})
         
@@ -584,13 +570,9 @@ def api_messages(user_id):
         else:
             user_info = {'name': 'Customer', 'email': '', 'phone': ''}
         
-        # Mark incoming messages as read
-        for msg in all_messages:
-            if msg['direction'] == 'incoming' and not msg.get('read', False):
-                db.collection('messages').document(msg['id']).update({
-                    'read': True,
-                    'read_at': datetime.now()
-                })
+        # Mark incoming messages as read (and off the unread counters)
+        incoming = [msg for msg in all_messages if msg['direction'] == 'incoming']
+        mark_read(db, incoming, user_id, 'supplier', current_user.id)
         
         return jsonify({
             'messages': all_messages,
@@ -629,8 +611,7 @@ def send_chat_message(user_id):
             'created_at': datetime.now()
         }
         
-        doc_ref = db.collection('messages').add(message_data)
-        message_id = doc_ref[1].id
+        message_id = send_message(db, message_data)
         
         return jsonify({
             'success': True,
@@ -650,22 +631,8 @@ def send_chat_message(user_id):
 def messages_unread_count():
     """Get count of unread messages for badge"""
     try:
-        # Get all messages for this supplier
-        messages_ref = db.collection('messages').where('supplier_id', '==', current_user.id).stream()
-        
-        unread_count = 0
-        for doc in messages_ref:
-            message_data = doc.to_dict()
-            
-            # Skip outgoing messages (where this supplier is the sender)
-            if message_data.get('sender_id') == current_user.id and message_data.get('sender_type') == 'supplier':
-                continue
-            
-            # Count unread incoming messages
-            if not message_data.get('read', False):
-                unread_count += 1
-        
-        return jsonify({'count': unread_count})
+        # Maintained counter - one document read per poll
+        return jsonify({'count': unread_counters.unread_count(db, current_user.id, 'messages')})
         
     except Exception as e:
         print(f"Error getting unread count: {str(e)}")
@@ -6,6 +6,16 @@ from werkzeug.utils import secure_filename
 from datetime import datetime
 import os
 
+from services.doc_loader import load_doc, load_docs
+from services.email_index import update_account_email
+from services.user_cache import invalidate
+from services.conversation_service import list_for_user, mark_read, send_message
+from services import bid_service, cascade_delete, stats_rollup, unread_counters
+from services import inventory as stock
+from services.aggregation import count_of, sum_of
+from services.pagination import paginate
+from services.projections import USER_DASHBOARD_PROJECTS, USER_PROJECT_LIST, select_fields
+
 def debug_user_info(action=""):
     """Debug helper to print current user information"""
     print("=" * 80)
@@ -39,7 +49,8 @@ def dashboard():
         return redirect(url_for('index'))
     
     # Get user's projects
-    projects_ref = db.collection('projects').where('user_id', '==', current_user.id).stream()
+    projects_ref = select_fields(db.collection('projects').where('user_id', '==', current_user.id),
+                                 USER_DASHBOARD_PROJECTS).stream()
     projects = []
     for doc in projects_ref:
         project_data = doc.to_dict()
@@ -84,16 +95,13 @@ def profile():
         flash('Database connection error', 'error')
         return redirect(url_for('user.dashboard'))
     
-    # Get user data from Firebase
-    user_ref = db.collection('users').document(current_user.id)
-    user_doc = user_ref.get()
+    # Get user data from Firebase (already read for this request by load_user)
+    user_data = load_doc(db, 'users', current_user.id)
     
-    if not user_doc.exists:
+    if user_data is None:
         flash('User not found', 'error')
         return redirect(url_for('user.dashboard'))
     
-    user_data = user_doc.to_dict()
-    
     # Count user's projects
     projects_ref = db.collection('projects').where('user_id', '==', current_user.id).stream()
     project_count = len(list(projects_ref))
@@ -116,17 +124,20 @@ def update_profile():
         phone = request.form.get('phone', '')
         location = request.form.get('location', '')
         
-        user_ref = db.collection('users').document(current_user.id)
-        user_ref.update({
+        # Moves the email_index entry along with the email
+        update_account_email(db, 'users', current_user.id, current_user.email, {
             'name': name,
             'email': email,
             'phone': phone,
             'location': location,
             'updated_at': datetime.now().isoformat()
         })
+        invalidate(current_user.id)
         
         return jsonify({'success': True, 'message': 'Profile updated successfully'})
     
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
         print(f"Error updating profile: {str(e)}")
         return jsonify({'success': False, 'message': str(e)}), 500
@@ -220,18 +231,20 @@ def projects():
     
     debug_user_info("LIST PROJECTS")
     
-    projects_ref = db.collection('projects').where('user_id', '==', current_user.id).stream()
+    page = paginate(db.collection('projects').where('user_id', '==', current_user.id),
+                    scope='user.projects', token=request.args.get('page'),
+                    fields=USER_PROJECT_LIST)
     projects = []
-    for doc in projects_ref:
+    for doc in page.items:
         project_data = doc.to_dict()
         project_data['id'] = doc.id
         print(f"📋 Found project: {project_data.get('title')} (ID: {doc.id})")
         projects.append(project_data)
     
-    print(f"✅ Total projects found: {len(projects)}")
+    print(f"✅ Page {page.number}: {len(projects)} of {page.total} projects")
     print("=" * 80)
     
-    return render_template('user/my_projects.html', projects=projects)
+    return render_template('user/my_projects.html', projects=projects, page=page)
 
 # ─────────────────────────────────────────────────────────────────────────────
 #  REPLACE the create_project route in routes/user_routes.py with this block.
@@ -251,14 +264,15 @@ def create_project():
     # Pass user profile picture to template (used by navbar)
     user_profile_picture = None
     try:
-        user_doc = db.collection('users').document(current_user.id).get()
-        if user_doc.exists:
-            user_profile_picture = user_doc.to_dict().get('profile_picture')
+        user_data = load_doc(db, 'users', current_user.id)
+        if user_data is not None:
+            user_profile_picture = user_data.get('profile_picture')
     except Exception:
         pass
 
     if request.method == 'POST':
-        from services.calculation_service import calculate_materials_and_cost
+        from services.ai_refine_service import build_estimate, queue_refinement
+        from services.form_schema import form_snapshot
 
         # ── Core scalar fields (still kept for backwards-compat + DB storage) ──
         square_feet  = float(request.form.get('square_feet', 0) or 0)
@@ -279,8 +293,9 @@ def create_project():
             floors    = int(request.form.get('floors') or 1)
             bathrooms = int(request.form.get('bathrooms') or 2)
 
-        # ── Full estimation with all form fields ──
-        estimation = calculate_materials_and_cost(
+        # ── Full estimation with all form fields (memoized on the inputs it reads;
+        #    AI refinement runs in the background and is patched in later) ──
+        estimation = build_estimate(
             square_feet  = square_feet,
             rooms        = rooms,
             floors       = floors,
@@ -305,12 +320,20 @@ def create_project():
             'status':        'planning',
             'created_at':    datetime.now(),
             'estimation':    estimation,
+            'inputs':        form_snapshot(request.form),   # re-pricing (what-if) base
         }
 
-        doc_ref    = db.collection('projects').add(project_data)
-        project_id = doc_ref[1].id
+        doc_ref    = db.collection('projects').document()
+        batch      = db.batch()
+        batch.set(doc_ref, project_data)
+        stats_rollup.bump(db, batch, **stats_rollup.project_status_deltas(None, 'planning'))
+        batch.commit()
+        project_id = doc_ref.id
         project_data['id'] = project_id
 
+        queue_refinement(project_id, estimation, square_feet, rooms, floors,
+                         bathrooms, budget_range, form=request.form)
+
         return render_template(
             'user/project_created.html',
             project    = project_data,
@@ -376,6 +399,73 @@ def view_project(project_id):
         flash(f'Error loading project: {str(e)}', 'error')
         return redirect(url_for('user.projects'))
     
+@user_bp.route('/project/<project_id>/estimation-status')
+@login_required
+def estimation_status(project_id):
+    """Poll target for background AI refinement of a project estimate"""
+    db = get_db()
+    if not db:
+        return jsonify({'success': False, 'message': 'Database connection error'}), 500
+
+    try:
+        project_doc = db.collection('projects').document(project_id).get()
+        if not project_doc.exists:
+            return jsonify({'success': False, 'message': 'Project not found'}), 404
+
+        project_data = project_doc.to_dict()
+        if project_data.get('user_id') != current_user.id:
+            return jsonify({'success': False, 'message': 'Access denied'}), 403
+
+        estimation = project_data.get('estimation', {})
+        return jsonify({
+            'success':       True,
+            'ai_status':     estimation.get('ai_status', 'done'),
+            'ai_rationale':  estimation.get('ai_rationale', ''),
+            'ai_confidence': estimation.get('ai_confidence', ''),
+            'total_cost':    {tier: data.get('total_cost')
+                              for tier, data in estimation.get('costs', {}).items()},
+        })
+
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@user_bp.route('/project/<project_id>/what-if', methods=['POST'])
+@login_required
+def what_if_sweep(project_id):
+    """Price a grid of input variations against a project - read only, nothing is saved"""
+    db = get_db()
+    if not db:
+        return jsonify({'success': False, 'message': 'Database connection error'}), 500
+
+    try:
+        from services.whatif_service import project_base, what_if
+
+        project_doc = db.collection('projects').document(project_id).get()
+        if not project_doc.exists:
+            return jsonify({'success': False, 'message': 'Project not found'}), 404
+
+        project_data = project_doc.to_dict()
+        if project_data.get('user_id') != current_user.id:
+            return jsonify({'success': False, 'message': 'Access denied'}), 403
+
+        payload = request.get_json(silent=True) or {}
+        variations = payload.get('variations')
+        if not isinstance(variations, dict) or not variations:
+            return jsonify({'success': False,
+                            'message': 'variations must be an object of field -> values'}), 400
+
+        try:
+            sweep = what_if(project_base(project_data), variations,
+                            mode=payload.get('mode', 'grid'))
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+
+        return jsonify({'success': True, 'project_id': project_id, **sweep})
+
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
 @user_bp.route('/project/<project_id>/download-pdf')
 @login_required
 def download_pdf(project_id):
@@ -537,54 +627,21 @@ def accept_bid(bid_id):
         return redirect(url_for('user.projects'))
     
     try:
-        bid_doc = db.collection('bids').document(bid_id).get()
-        
-        if not bid_doc.exists:
-            flash('Bid not found', 'error')
-            return redirect(url_for('user.projects'))
-        
-        bid_data = bid_doc.to_dict()
-        
-        # Get project to verify ownership
-        project_doc = db.collection('projects').document(bid_data.get('project_id')).get()
-        project_data = project_doc.to_dict()
-        
-        if project_data.get('user_id') != current_user.id:
-            flash('Access denied', 'error')
-            return redirect(url_for('user.projects'))
-        
-        # Update bid status to accepted
-        db.collection('bids').document(bid_id).update({
-            'status': 'accepted',
-            'accepted_at': datetime.now(),
-            'updated_at': datetime.now()
-        })
-        
-        # Reject all other bids for this project
-        other_bids = db.collection('bids').where('project_id', '==', bid_data.get('project_id')).stream()
-        for other_bid in other_bids:
-            if other_bid.id != bid_id and other_bid.to_dict().get('status') == 'pending':
-                db.collection('bids').document(other_bid.id).update({
-                    'status': 'rejected',
-                    'rejected_at': datetime.now(),
-                    'updated_at': datetime.now()
-                })
-        
-        # Update project with contractor info and change status to active
-        db.collection('projects').document(bid_data.get('project_id')).update({
-            'contractor_id': bid_data.get('contractor_id'),
-            'contractor_name': bid_data.get('contractor_name'),
-            'contractor_company': bid_data.get('contractor_company'),
-            'agreed_cost': bid_data.get('total_cost'),
-            'agreed_duration': bid_data.get('duration_days'),
-            'status': 'active',
-            'started_at': datetime.now(),
-            'updated_at': datetime.now()
-        })
+        # Bid, competing bids, project and stats change in one transaction
+        bid_data = bid_service.accept_bid(db, bid_id, current_user.id)
         
         flash('Bid accepted! Contractor has been assigned to your project.', 'success')
         return redirect(url_for('user.project_bids', project_id=bid_data.get('project_id')))
         
+    except LookupError as e:
+        flash(str(e), 'error')
+        return redirect(url_for('user.projects'))
+    except PermissionError:
+        flash('Access denied', 'error')
+        return redirect(url_for('user.projects'))
+    except ValueError as e:
+        flash(str(e), 'error')
+        return redirect(request.referrer or url_for('user.projects'))
     except Exception as e:
         flash(f'Error accepting bid: {str(e)}', 'error')
         return redirect(url_for('user.projects'))
@@ -728,7 +785,9 @@ def edit_project(project_id):
             return redirect(url_for('user.projects'))
         
         if request.method == 'POST':
-            from services.calculation_service import calculate_materials_and_cost
+            from services.ai_refine_service import build_estimate, queue_refinement
+            from services.form_schema import form_snapshot
+            from services.whatif_service import apply_overrides, project_base
             
             square_feet = float(request.form.get('square_feet'))
             rooms = int(request.form.get('rooms'))
@@ -736,9 +795,23 @@ def edit_project(project_id):
             bathrooms = int(request.form.get('bathrooms', 2))
             budget_range = request.form.get('budget_range')
             
-            # Recalculate estimation
-            estimation = calculate_materials_and_cost(
-                square_feet, rooms, floors, bathrooms, budget_range
+            # The edit form only has the sizing fields - keep the detailed inputs
+            # saved at creation and overlay what was edited. Projects from before
+            # inputs were saved can only be re-estimated on defaults; say so, and
+            # don't store those defaults as if the owner had chosen them
+            has_inputs = bool(project_data.get('inputs'))
+            base = project_base(project_data, allow_defaults=True)
+            base['form'].update(form_snapshot(request.form))
+            args = apply_overrides(base, {
+                'square_feet': square_feet, 'rooms': rooms, 'floors': floors,
+                'bathrooms': bathrooms, 'budget_range': budget_range,
+            })
+            
+            # Recalculate estimation - only the stages whose inputs changed, and
+            # the previous AI factors when the AI inputs are unchanged
+            estimation = build_estimate(
+                square_feet, rooms, floors, bathrooms, budget_range,
+                form=args['form'], previous=project_data.get('estimation'),
             )
             
             # Update project data
@@ -753,10 +826,20 @@ def edit_project(project_id):
                 'budget_range': budget_range,
                 'description': request.form.get('description'),
                 'estimation': estimation,
+                'inputs': args['form'],
                 'updated_at': datetime.now()
             }
             
+            if not has_inputs:
+                del updated_data['inputs']
+            
             db.collection('projects').document(project_id).update(updated_data)
+            queue_refinement(project_id, estimation, square_feet, rooms, floors,
+                             bathrooms, budget_range, form=args['form'])
+            if not has_inputs:
+                print(f"⚠️ Project {project_id} has no saved inputs, re-estimated on defaults")
+                flash('This project was created before detailed specifications were saved, '
+                      'so its estimate uses default specifications.', 'warning')
             flash('Project updated successfully!', 'success')
             return redirect(url_for('user.view_project', project_id=project_id))
         
@@ -786,17 +869,16 @@ def browse_materials():
         for doc in materials_ref:
             material_data = doc.to_dict()
             material_data['id'] = doc.id
-            
-            # Get supplier info
-            supplier_id = material_data.get('supplier_id')
-            if supplier_id:
-                supplier_doc = db.collection('suppliers').document(supplier_id).get()
-                if supplier_doc.exists:
-                    supplier_data = supplier_doc.to_dict()
-                    material_data['supplier_name'] = supplier_data.get('company_name') or supplier_data.get('name')
-                    material_data['supplier_rating'] = supplier_data.get('rating', 0.0)
-            
             materials.append(material_data)
+        stock.with_available_stock(db, materials)
+        
+        # Supplier info - one batched read for all distinct suppliers
+        suppliers = load_docs(db, 'suppliers', [m.get('supplier_id') for m in materials])
+        for material_data in materials:
+            supplier_data = suppliers.get(material_data.get('supplier_id'))
+            if supplier_data is not None:
+                material_data['supplier_name'] = supplier_data.get('company_name') or supplier_data.get('name')
+                material_data['supplier_rating'] = supplier_data.get('rating', 0.0)
         
         return render_template('user/browse_materials.html', materials=materials)
         
@@ -838,16 +920,15 @@ def order_materials(project_id):
         for doc in materials_ref:
             material_data = doc.to_dict()
             material_data['id'] = doc.id
-            
-            # Get supplier info
-            supplier_id = material_data.get('supplier_id')
-            if supplier_id:
-                supplier_doc = db.collection('suppliers').document(supplier_id).get()
-                if supplier_doc.exists:
-                    supplier_data = supplier_doc.to_dict()
-                    material_data['supplier_name'] = supplier_data.get('company_name') or supplier_data.get('name')
-            
             materials.append(material_data)
+        stock.with_available_stock(db, materials)
+        
+        # Supplier info - one batched read for all distinct suppliers
+        suppliers = load_docs(db, 'suppliers', [m.get('supplier_id') for m in materials])
+        for material_data in materials:
+            supplier_data = suppliers.get(material_data.get('supplier_id'))
+            if supplier_data is not None:
+                material_data['supplier_name'] = supplier_data.get('company_name') or supplier_data.get('name')
         
         # Get project's estimated materials
         estimation = project_data.get('estimation', {})
@@ -886,74 +967,86 @@ def create_order():
         if not material_ids or not quantities:
             return jsonify({'success': False, 'message': 'No materials selected'}), 400
         
-        # Calculate total
-        total_cost = 0
-        order_items = []
-        supplier_ids = set()
+        quantities = [int(quantity) for quantity in quantities]
+        project_ref = db.collection('projects').document(project_id) if project_id else None
         
-        for i, material_id in enumerate(material_ids):
-            material_doc = db.collection('materials').document(material_id).get()
-            if material_doc.exists:
-                material_data = material_doc.to_dict()
-                quantity = int(quantities[i])
+        def price_orders(materials, read):
+            """One priced order per supplier, from the material snapshots the reservation reads"""
+            project_data = read.get('project') or {}
+            
+            # Single pass: price each item and group it under its supplier
+            total_cost = 0
+            items_by_supplier = {}
+            
+            for material_id, quantity in zip(material_ids, quantities):
+                material_data = materials.get(material_id)
+                if material_data is None:
+                    continue
                 item_cost = material_data.get('price', 0) * quantity
+                supplier_id = material_data.get('supplier_id')
+                if not supplier_id:
+                    print(f"⚠️ Skipping material {material_id} without supplier_id")
+                    continue
                 
-                order_items.append({
+                items_by_supplier.setdefault(supplier_id, []).append({
                     'material_id': material_id,
                     'material_name': material_data.get('name'),
                     'quantity': quantity,
                     'unit': material_data.get('unit'),
                     'price_per_unit': material_data.get('price'),
                     'total': item_cost,
-                    'supplier_id': material_data.get('supplier_id')
+                    'supplier_id': supplier_id
                 })
-                
                 total_cost += item_cost
-                supplier_ids.add(material_data.get('supplier_id'))
-        
-        print(f"Total order items: {len(order_items)}")
-        print(f"Total cost: ₹{total_cost}")
-        print(f"Supplier IDs: {supplier_ids}")
-        
-        # Get project info
-        project_doc = db.collection('projects').document(project_id).get()
-        project_data = project_doc.to_dict() if project_doc.exists else {}
-        
-        # Create separate orders for each supplier
-        created_orders = []
-        for supplier_id in supplier_ids:
-            if not supplier_id:
-                print("⚠️ Skipping None supplier_id")
-                continue
-                
-            supplier_items = [item for item in order_items if item.get('supplier_id') == supplier_id]
-            supplier_total = sum(item.get('total', 0) for item in supplier_items)
             
-            # Get supplier info
-            supplier_doc = db.collection('suppliers').document(supplier_id).get()
-            supplier_data = supplier_doc.to_dict() if supplier_doc.exists else {}
+            print(f"Total order items: {sum(len(items) for items in items_by_supplier.values())}")
+            print(f"Total cost: ₹{total_cost}")
+            print(f"Supplier IDs: {set(items_by_supplier)}")
             
-            supplier_order = {
-                'user_id': current_user.id,
-                'user_name': current_user.name,
-                'user_email': current_user.email if hasattr(current_user, 'email') else '',
-                'project_id': project_id,
-                'project_title': project_data.get('title', 'Untitled Project'),
-                'supplier_id': supplier_id,
-                'supplier_name': supplier_data.get('company_name') or supplier_data.get('name', 'Supplier'),
-                'items': supplier_items,
-                'total': supplier_total,
-                'status': 'pending',
-                'created_at': datetime.now(),
-                'updated_at': datetime.now()
-            }
+            if not items_by_supplier:
+                return []
             
-            print(f"Creating order for supplier: {supplier_data.get('company_name', 'Unknown')}")
-            print(f"Items: {len(supplier_items)}, Total: ₹{supplier_total}")
+            # Every supplier in one get_all (cached for the request, so a retry doesn't re-read)
+            suppliers = load_docs(db, 'suppliers', list(items_by_supplier))
             
-            order_ref = db.collection('orders').add(supplier_order)
-            created_orders.append(order_ref[1].id)
-            print(f"✅ Order created with ID: {order_ref[1].id}")
+            new_orders = []
+            for supplier_id, supplier_items in items_by_supplier.items():
+                supplier_total = sum(item.get('total', 0) for item in supplier_items)
+                supplier_data = suppliers.get(supplier_id) or {}
+                
+                supplier_order = {
+                    'user_id': current_user.id,
+                    'user_name': current_user.name,
+                    'user_email': current_user.email if hasattr(current_user, 'email') else '',
+                    'project_id': project_id,
+                    'project_title': project_data.get('title', 'Untitled Project'),
+                    'supplier_id': supplier_id,
+                    'supplier_name': supplier_data.get('company_name') or supplier_data.get('name', 'Supplier'),
+                    'items': supplier_items,
+                    'total': supplier_total,
+                    'status': 'pending',
+                    'created_at': datetime.now(),
+                    'updated_at': datetime.now()
+                }
+                
+                print(f"Creating order for supplier: {supplier_data.get('company_name', 'Unknown')}")
+                print(f"Items: {len(supplier_items)}, Total: ₹{supplier_total}")
+                
+                new_orders.append((db.collection('orders').document(), supplier_order))
+            return new_orders
+        
+        # One transaction reads the materials and project, prices the orders from
+        # those snapshots, reserves their stock and writes one order per supplier
+        try:
+            placed = stock.place_orders(db, material_ids, price_orders,
+                                        also_read={'project': project_ref} if project_ref else None)
+        except stock.OutOfStock as e:
+            print(f"⚠️ Order refused: {e}")
+            return jsonify({'success': False, 'message': str(e)}), 409
+        
+        if not placed:
+            return jsonify({'success': False, 'message': 'None of the selected materials are available'}), 400
+        created_orders = [order_ref.id for order_ref, _ in placed]
         
         print(f"✅ Total {len(created_orders)} order(s) created successfully!")
         print("=" * 50)
@@ -979,11 +1072,12 @@ def my_orders():
         return redirect(url_for('user.dashboard'))
     
     try:
-        # Get all orders for this user
-        orders_ref = db.collection('orders').where('user_id', '==', current_user.id).stream()
+        # One page of this user's orders, newest first
+        orders_query = db.collection('orders').where('user_id', '==', current_user.id)
+        page = paginate(orders_query, scope='user.my_orders', token=request.args.get('page'))
         orders = []
         
-        for doc in orders_ref:
+        for doc in page.items:
             order_data = doc.to_dict()
             order_data['id'] = doc.id
             
@@ -993,20 +1087,18 @@ def my_orders():
             
             orders.append(order_data)
         
-        # Sort by created_at descending
-        orders.sort(key=lambda x: x.get('created_at', datetime.min), reverse=True)
-        
-        # Calculate statistics
+        # Statistics over all orders, counted server-side
+        completed = orders_query.where('status', '==', 'completed')
         stats = {
-            'total': len(orders),
-            'pending': len([o for o in orders if o.get('status') == 'pending']),
-            'processing': len([o for o in orders if o.get('status') == 'processing']),
-            'completed': len([o for o in orders if o.get('status') == 'completed']),
-            'cancelled': len([o for o in orders if o.get('status') == 'cancelled']),
-            'total_spent': sum(o.get('total', 0) for o in orders if o.get('status') == 'completed')
+            'total': page.total,
+            'pending': count_of(orders_query.where('status', '==', 'pending')),
+            'processing': count_of(orders_query.where('status', '==', 'processing')),
+            'completed': count_of(completed),
+            'cancelled': count_of(orders_query.where('status', '==', 'cancelled')),
+            'total_spent': sum_of(completed, 'total')
         }
         
-        return render_template('user/my_orders.html', orders=orders, stats=stats)
+        return render_template('user/my_orders.html', orders=orders, stats=stats, page=page)
         
     except Exception as e:
         flash(f'Error loading orders: {str(e)}', 'error')
@@ -1085,6 +1177,8 @@ def send_message_to_supplier(supplier_id):
         message_data = {
             'supplier_id': supplier_id,
             'supplier_name': supplier_name,
+            'supplier_email': supplier_data.get('email', ''),
+            'supplier_phone': supplier_data.get('phone', ''),
             'user_id': current_user.id,
             'sender_name': current_user.name,
             'sender_email': current_user.email if hasattr(current_user, 'email') else '',
@@ -1102,8 +1196,7 @@ def send_message_to_supplier(supplier_id):
                 print(f"  {key}: {repr(value)}")
         
         # Save to Firebase
-        doc_ref = db.collection('messages').add(message_data)
-        message_id = doc_ref[1].id
+        message_id = send_message(db, message_data)
         
         print(f"\n✅ Message saved successfully!")
         print(f"Message ID: {message_id}")
@@ -1176,6 +1269,8 @@ def request_quote_from_supplier(supplier_id):
         quote_data = {
             'supplier_id': supplier_id,
             'supplier_name': supplier_name,
+            'supplier_email': supplier_data.get('email', ''),
+            'supplier_phone': supplier_data.get('phone', ''),
             'user_id': current_user.id,
             'sender_name': current_user.name,
             'sender_email': current_user.email if hasattr(current_user, 'email') else '',
@@ -1198,8 +1293,7 @@ def request_quote_from_supplier(supplier_id):
                 print(f"  {key}: {repr(value)}")
         
         # Save to Firebase
-        doc_ref = db.collection('messages').add(quote_data)
-        quote_id = doc_ref[1].id
+        quote_id = send_message(db, quote_data)
         
         print(f"\n✅ Quote request saved successfully!")
         print(f"Message ID: {quote_id}")
@@ -1291,6 +1385,8 @@ def send_message_to_contractor(contractor_id):
         message_data = {
             'contractor_id': contractor_id,
             'contractor_name': contractor_name,
+            'contractor_email': contractor_data.get('email', ''),
+            'contractor_phone': contractor_data.get('phone', ''),
             'user_id': current_user.id,
             'sender_name': current_user.name,
             'sender_email': current_user.email if hasattr(current_user, 'email') else '',
@@ -1308,8 +1404,7 @@ def send_message_to_contractor(contractor_id):
                 print(f"  {key}: {repr(value)}")
         
         # Save to Firebase
-        doc_ref = db.collection('messages').add(message_data)
-        message_id = doc_ref[1].id
+        message_id = send_message(db, message_data)
         
         print(f"\n✅ Message saved successfully!")
         print(f"Message ID: {message_id}")
@@ -1384,6 +1479,8 @@ def request_quote_from_contractor(contractor_id):
         quote_data = {
             'contractor_id': contractor_id,
             'contractor_name': contractor_name,
+            'contractor_email': contractor_data.get('email', ''),
+            'contractor_phone': contractor_data.get('phone', ''),
             'user_id': current_user.id,
             'sender_name': name,
             'sender_email': email,
@@ -1406,8 +1503,7 @@ def request_quote_from_contractor(contractor_id):
                 print(f"  {key}: {repr(value)}")
         
         # Save to Firebase
-        doc_ref = db.collection('messages').add(quote_data)
-        quote_id = doc_ref[1].id
+        quote_id = send_message(db, quote_data)
         
         print(f"\n✅ Quote request saved successfully!")
         print(f"Message ID: {quote_id}")
@@ -1457,30 +1553,19 @@ def delete_project(project_id):
             print(f"   Got: {current_user.id}")
             return jsonify({'success': False, 'message': 'Access denied - You do not own this project'}), 403
         
-        # Delete related bids first (if any)
-        try:
-            bids_ref = db.collection('bids').where('project_id', '==', project_id).stream()
-            deleted_bids = 0
-            for bid in bids_ref:
-                db.collection('bids').document(bid.id).delete()
-                deleted_bids += 1
-            print(f"✅ Deleted {deleted_bids} related bids")
-        except Exception as e:
-            print(f"⚠️ Error deleting bids: {e}")
-        
-        # Delete related orders (if any)
-        try:
-            orders_ref = db.collection('orders').where('project_id', '==', project_id).stream()
-            deleted_orders = 0
-            for order in orders_ref:
-                db.collection('orders').document(order.id).delete()
-                deleted_orders += 1
-            print(f"✅ Deleted {deleted_orders} related orders")
-        except Exception as e:
-            print(f"⚠️ Error deleting orders: {e}")
-        
-        # Delete the project
-        db.collection('projects').document(project_id).delete()
+        # Project, bids, orders, documents, updates and uploaded files;
+        # large cascades finish in a background job
+        result = cascade_delete.delete_project(db, project_id, project_data)
+        
+        if result['status'] == 'running':
+            print(f"🗑️ Project '{project_data.get('title')}' deleted, {result['total']} related records cleaning up in background")
+            print("=" * 80)
+            return jsonify({
+                'success': True,
+                'message': 'Project deleted! Related records are being cleaned up.',
+                'background': True,
+                'status_url': url_for('user.delete_status', project_id=project_id)
+            }), 202
         
         print(f"✅ Project '{project_data.get('title')}' deleted successfully!")
         print("=" * 80)
@@ -1497,6 +1582,34 @@ def delete_project(project_id):
         print("=" * 80)
         return jsonify({'success': False, 'message': str(e)}), 500
 
+@user_bp.route('/project/<project_id>/delete-status')
+@login_required
+def delete_status(project_id):
+    """Poll target for a background project delete"""
+    db = get_db()
+    if not db:
+        return jsonify({'success': False, 'message': 'Database connection error'}), 500
+    
+    try:
+        job = cascade_delete.delete_status(db, project_id)
+        if job is None:
+            return jsonify({'success': False, 'message': 'No delete in progress for this project'}), 404
+        if job.get('user_id') != current_user.id:
+            return jsonify({'success': False, 'message': 'Access denied'}), 403
+        
+        deleted = sum((job.get('deleted') or {}).values())
+        return jsonify({
+            'success':  True,
+            'status':   job.get('status'),
+            'deleted':  deleted,
+            'total':    job.get('total', 0),
+            'progress': round(100 * deleted / job['total']) if job.get('total') else 100,
+            'files':    job.get('files', 0),
+        })
+        
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
 # ======================== MESSAGING ROUTES ========================
 # Add these routes to routes/user_routes.py
 
@@ -1521,84 +1634,8 @@ def messages_conversations():
         print(f"User ID: {current_user.id}")
         print("=" * 80)
         
-        conversations = {}
-        
-        # Get ALL messages involving this user
-        all_messages = db.collection('messages').stream()
-        
-        for doc in all_messages:
-            msg = doc.to_dict()
-            
-            # Check if this message involves the current user
-            contractor_id = msg.get('contractor_id')
-            supplier_id = msg.get('supplier_id')
-            msg_user_id = msg.get('user_id')
-            sender_id = msg.get('sender_id')
-            sender_type = msg.get('sender_type')
-            
-            # Skip messages that don't involve this user
-            if msg_user_id != current_user.id and sender_id != current_user.id:
-                continue
-            
-            # Process contractor conversations
-            if contractor_id:
-                conv_key = f"contractor_{contractor_id}"
-                
-                if conv_key not in conversations:
-                    conversations[conv_key] = {
-                        'id': contractor_id,
-                        'sender_id': contractor_id,
-                        'sender_type': 'contractor',
-                        'sender_name': msg.get('contractor_name', 'Contractor'),
-                        'sender_email': msg.get('contractor_email', ''),
-                        'sender_phone': msg.get('contractor_phone', ''),
-                        'last_message': msg.get('message', ''),
-                        'last_message_time': msg.get('created_at', datetime.min),
-                        'unread_count': 0
-                    }
-                
-                # Update if this message is newer
-                msg_time = msg.get('created_at', datetime.min)
-                if msg_time > conversations[conv_key]['last_message_time']:
-                    conversations[conv_key]['last_message'] = msg.get('message', '')
-                    conversations[conv_key]['last_message_time'] = msg_time
-                
-                # Count unread (messages FROM contractor TO user that are unread)
-                is_from_contractor = sender_type == 'contractor' and sender_id == contractor_id
-                if is_from_contractor and not msg.get('read', False):
-                    conversations[conv_key]['unread_count'] += 1
-            
-            # Process supplier conversations
-            if supplier_id:
-                conv_key = f"supplier_{supplier_id}"
-                
-                if conv_key not in conversations:
-                    conversations[conv_key] = {
-                        'id': supplier_id,
-                        'sender_id': supplier_id,
-                        'sender_type': 'supplier',
-                        'sender_name': msg.get('supplier_name', 'Supplier'),
-                        'sender_email': msg.get('supplier_email', ''),
-                        'sender_phone': msg.get('supplier_phone', ''),
-                        'last_message': msg.get('message', ''),
-                        'last_message_time': msg.get('created_at', datetime.min),
-                        'unread_count': 0
-                    }
-                
-                # Update if this message is newer
-                msg_time = msg.get('created_at', datetime.min)
-                if msg_time > conversations[conv_key]['last_message_time']:
-                    conversations[conv_key]['last_message'] = msg.get('message', '')
-                    conversations[conv_key]['last_message_time'] = msg_time
-                
-                # Count unread (messages FROM supplier TO user that are unread)
-                is_from_supplier = sender_type == 'supplier' and sender_id == supplier_id
-                if is_from_supplier and not msg.get('read', False):
-                    conversations[conv_key]['unread_count'] += 1
-        
-        # Convert to list and sort by most recent
-        conversations_list = list(conversations.values())
-        conversations_list.sort(key=lambda x: x.get('last_message_time', datetime.min), reverse=True)
+        # One query over the conversation summaries, newest first
+        conversations_list = list_for_user(db, current_user.id)
         
         print(f"✅ Found {len(conversations_list)} conversations")
         for conv in conversations_list[:5]:
@@ -1700,13 +1737,9 @@ def messages_conversation(recipient_id):
         # Sort by created_at (oldest first for chat display)
         all_messages.sort(key=lambda x: x.get('created_at', datetime.min))
         
-        # Mark incoming messages as read
-        for msg in all_messages:
-            if msg['direction'] == 'incoming' and not msg.get('read', False):
-                db.collection('messages').document(msg['id']).update({
-                    'read': True,
-                    'read_at': datetime.now()
-                })
+        # Mark incoming messages as read (and off the unread counters)
+        incoming = [msg for msg in all_messages if msg['direction'] == 'incoming']
+        mark_read(db, incoming, current_user.id, recipient_type, recipient_id)
         
         print(f"✅ Loaded {len(all_messages)} messages")
         print(f"   Incoming: {len([m for m in all_messages if m['direction'] == 'incoming'])}")
@@ -1767,6 +1800,8 @@ def send_message_to_recipient(recipient_id):
                 'sender_email': current_user.email if hasattr(current_user, 'email') else '',
                 'sender_phone': current_user.phone if hasattr(current_user, 'phone') else '',
                 'contractor_name': contractor_data.get('company_name') or contractor_data.get('name'),
+                'contractor_email': contractor_data.get('email', ''),
+                'contractor_phone': contractor_data.get('phone', ''),
                 'message': message_text,
                 'type': 'chat',
                 'read': False,
@@ -1790,14 +1825,15 @@ def send_message_to_recipient(recipient_id):
                 'sender_email': current_user.email if hasattr(current_user, 'email') else '',
                 'sender_phone': current_user.phone if hasattr(current_user, 'phone') else '',
                 'supplier_name': supplier_data.get('company_name') or supplier_data.get('name'),
+                'supplier_email': supplier_data.get('email', ''),
+                'supplier_phone': supplier_data.get('phone', ''),
                 'message': message_text,
                 'type': 'chat',
                 'read': False,
                 'created_at': datetime.now()
             }
         
-        doc_ref = db.collection('messages').add(message_data)
-        message_id = doc_ref[1].id
+        message_id = send_message(db, message_data)
         
         print(f"✅ Message sent successfully! ID: {message_id}")
         print("=" * 80)
@@ -1825,22 +1861,8 @@ def messages_unread_count():
         return jsonify({'count': 0})
     
     try:
-        # Get all messages for this user
-        messages_ref = db.collection('messages').where('user_id', '==', current_user.id).stream()
-        
-        unread_count = 0
-        for doc in messages_ref:
-            message_data = doc.to_dict()
-            
-            # Skip outgoing messages (where user is the sender)
-            if message_data.get('sender_id') == current_user.id and message_data.get('sender_type') == 'user':
-                continue
-            
-            # Count unread
-            if not message_data.get('read', False):
-                unread_count += 1
-        
-        return jsonify({'count': unread_count})
+        # Maintained counter - one document read per poll
+        return jsonify({'count': unread_counters.unread_count(db, current_user.id, 'messages')})
         
     except Exception as e:
         print(f"Error getting unread count: {e}")
@@ -1855,25 +1877,18 @@ def complete_project(project_id):
         return jsonify({'success': False, 'message': 'Database connection error'}), 500
     
     try:
-        project_ref = db.collection('projects').document(project_id)
-        project_doc = project_ref.get()
-        
-        if not project_doc.exists:
+        # Status check and rollup bump in one transaction, so a double-submitted
+        # complete only counts the project once
+        try:
+            stats_rollup.set_project_status(db, project_id, 'completed', {
+                'completed_at': datetime.now(),
+                'updated_at': datetime.now()
+            }, owner=('user_id', current_user.id))
+        except LookupError:
             return jsonify({'success': False, 'message': 'Project not found'}), 404
-        
-        project_data = project_doc.to_dict()
-        
-        # Verify ownership
-        if project_data.get('user_id') != current_user.id:
+        except PermissionError:
             return jsonify({'success': False, 'message': 'Access denied'}), 403
         
-        # Update project status
-        project_ref.update({
-            'status': 'completed',
-            'completed_at': datetime.now(),
-            'updated_at': datetime.now()
-        })
-        
         return jsonify({'success': True, 'message': 'Project marked as completed!'})
         
     except Exception as e:
@@ -2082,11 +2097,13 @@ def mark_notification_read(notification_id):
         return jsonify({'success': False, 'message': 'Database connection error'}), 500
     
     try:
-        db.collection('notifications').document(notification_id).update({
-            'read': True,
-            'read_at': datetime.now()
-        })
+        # Flag check and counter decrement in one transaction
+        unread_counters.mark_notification_read(db, notification_id, current_user.id)
         return jsonify({'success': True})
+    except LookupError as e:
+        return jsonify({'success': False, 'message': str(e)}), 404
+    except PermissionError as e:
+        return jsonify({'success': False, 'message': str(e)}), 403
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
@@ -2099,13 +2116,8 @@ def notifications_unread_count():
         return jsonify({'count': 0})
     
     try:
-        notifications_ref = db.collection('notifications')\
-            .where('user_id', '==', current_user.id)\
-            .where('read', '==', False)\
-            .stream()
-        
-        count = len(list(notifications_ref))
-        return jsonify({'count': count})
+        # Maintained counter - one document read per poll
+        return jsonify({'count': unread_counters.unread_count(db, current_user.id, 'notifications')})
     except Exception as e:
         print(f"Error getting unread count: {e}")
         return jsonify({'count': 0})
@@ -2126,4 +2138,8 @@ def create_notification(user_id, title, message, type, link=None):
         'created_at': datetime.now()
     }
     
-    db.collection('notifications').add(notification_data)
\ No newline at end of file
+    # Notification + unread counter in one batch
+    batch = db.batch()
+    batch.set(db.collection('notifications').document(), notification_data)
+    unread_counters.bump(db, batch, user_id, 'notifications')
+    batch.commit()
\ No newline at end of file
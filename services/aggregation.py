@@ -0,0 +1,78 @@
+"""
+House-Forge Aggregation Helpers
+===============================
+Server-side count() / sum() over a Firestore query, so pages that only need
+a number don't download the documents behind it.
+
+    count_of(db.collection('orders').where('status', '==', 'pending'))
+    sum_of(db.collection('orders').where('status', '==', 'completed'), 'total')
+
+Where aggregation queries aren't available (an older google-cloud-firestore
+without Query.count() / Query.sum(), or a backend / emulator that rejects
+them) both fall back to streaming a select() projection: document keys only
+for a count, the one summed field for a sum. After the first failure the
+fallback is used for the rest of the process.
+"""
+
+from google.api_core.exceptions import InvalidArgument, MethodNotImplemented
+
+# Errors meaning "this client / backend can't run the aggregation", not "the query is wrong"
+_UNSUPPORTED = (AttributeError, InvalidArgument, MethodNotImplemented)
+
+# aggregation -> still worth trying server-side
+_supported = {'count': True, 'sum': True}
+
+
+def _value(aggregation_query):
+    result = aggregation_query.get()
+    return result[0][0].value if result and result[0] else 0
+
+
+def _aggregate(kind, run, fallback):
+    if _supported[kind]:
+        try:
+            return run()
+        except _UNSUPPORTED as e:
+            print(f"⚠️ {kind}() aggregation unavailable ({e}), streaming a projection instead")
+            _supported[kind] = False
+    return fallback()
+
+
+# ─────────────────────────────────────────────────────────────────
+#  FALLBACKS
+# ─────────────────────────────────────────────────────────────────
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _stream_count(query):
+    # '__name__' projects the document key only - no field data comes back
+    return sum(1 for _ in query.select(['__name__']).stream())
+
+
+def _stream_sum(query, field):
+    total = 0
+    for doc in query.select([field]).stream():
+        value = (doc.to_dict() or {}).get(field)
+        if _is_number(value):
+            total += value
+    return total
+
+
+# ─────────────────────────────────────────────────────────────────
+#  PUBLIC
+# ─────────────────────────────────────────────────────────────────
+
+def count_of(query):
+    """Number of documents matching query."""
+    return int(_aggregate('count',
+                          lambda: _value(query.count()) or 0,
+                          lambda: _stream_count(query)))
+
+
+def sum_of(query, field):
+    """Sum of a numeric field over the documents matching query (missing / non-numeric skipped)."""
+    return _aggregate('sum',
+                      lambda: _value(query.sum(field)) or 0,
+                      lambda: _stream_sum(query, field)) or 0
@@ -0,0 +1,205 @@
+"""
+House-Forge AI Call Guard
+=========================
+Wraps the remote refine call made by _ai_refine_estimate with:
+
+  - a factor cache keyed on the summary payload (property type, sqft bucket,
+    location, grades, soil, foundation, flooring) - LRU bound + TTL
+  - request coalescing: identical in-flight calls share one upstream request
+  - a circuit breaker: after AI_BREAKER_THRESHOLD consecutive failures the
+    call is short-circuited for AI_BREAKER_COOLDOWN seconds, then a single
+    half-open trial decides whether to close it again
+
+metrics() reports how much upstream latency the cache and breaker saved,
+using the observed mean latency of successful / failed calls.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from config import Config
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling upstream while the breaker is open."""
+
+
+def summary_key(summary, sqft_bucket=None):
+    """Cache key for a refine summary; sqft is bucketed so near-identical homes share factors."""
+    bucket = sqft_bucket or Config.AI_SQFT_BUCKET
+    inputs = summary.get("key_inputs", {})
+    payload = {
+        "property_type": summary.get("property_type"),
+        "sqft_bucket":   int(float(summary.get("sqft") or 0) // bucket),
+        "location":      str(summary.get("location") or "").strip().lower(),
+        "inputs":        {k: inputs.get(k) for k in sorted(inputs)},
+    }
+    blob = json.dumps(payload, sort_keys=True, default=str)
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+class _InFlight:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event  = threading.Event()
+        self.result = None
+        self.error  = None
+
+
+class AIGuard:
+    """Circuit breaker + factor cache + request coalescing around one upstream call."""
+
+    def __init__(self, failure_threshold=3, cooldown_seconds=60,
+                 cache_size=1024, cache_ttl=86400, wait_timeout=30):
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.cooldown_seconds  = cooldown_seconds
+        self.cache_size        = max(1, int(cache_size))
+        self.cache_ttl         = cache_ttl
+        self.wait_timeout      = wait_timeout
+
+        self._lock      = threading.Lock()
+        self._cache     = OrderedDict()    # key -> (stored_at, factors)
+        self._inflight  = {}               # key -> _InFlight
+        self._state     = "closed"         # closed | open | half_open
+        self._opened_at = 0.0
+        self._trial     = False
+        self._consecutive_failures = 0
+        self.reset_metrics()
+
+    def reset_metrics(self):
+        self._m = {
+            "calls": 0, "successes": 0, "failures": 0,
+            "cache_hits": 0, "coalesced": 0, "short_circuits": 0, "breaker_opens": 0,
+            "success_seconds": 0.0, "failure_seconds": 0.0,
+        }
+
+    # ── public ──
+    def call(self, key, fn):
+        """Return fn()'s factor dict for key, via cache / in-flight twin / breaker."""
+        with self._lock:
+            hit = self._cache_get(key)
+            if hit is not None:
+                self._m["cache_hits"] += 1
+                return dict(hit)
+            waiter = self._inflight.get(key)
+            leader = waiter is None
+            if leader:
+                self._admit()
+                waiter = self._inflight[key] = _InFlight()
+            else:
+                self._m["coalesced"] += 1
+
+        if not leader:
+            if not waiter.event.wait(self.wait_timeout):
+                raise TimeoutError("coalesced refine call did not finish in time")
+            if waiter.error is not None:
+                raise waiter.error
+            return dict(waiter.result)
+
+        start = time.monotonic()
+        try:
+            result = fn()
+            if not isinstance(result, dict):
+                raise ValueError("refine response is not a JSON object")
+        except Exception as e:
+            with self._lock:
+                self._record_failure(time.monotonic() - start)
+                del self._inflight[key]
+            waiter.error = e
+            waiter.event.set()
+            raise
+
+        with self._lock:
+            self._record_success(time.monotonic() - start)
+            self._cache_put(key, result)
+            del self._inflight[key]
+        waiter.result = result
+        waiter.event.set()
+        return dict(result)
+
+    def metrics(self):
+        with self._lock:
+            m = dict(self._m)
+            state = self._state
+            cached = len(self._cache)
+        avg_ok   = m["success_seconds"] / m["successes"] if m["successes"] else 0.0
+        avg_fail = m["failure_seconds"] / m["failures"] if m["failures"] else 0.0
+        return {
+            "breaker_state":        state,
+            "calls":                m["calls"],
+            "successes":            m["successes"],
+            "failures":             m["failures"],
+            "cache_hits":           m["cache_hits"],
+            "cache_size":           cached,
+            "coalesced":            m["coalesced"],
+            "short_circuits":       m["short_circuits"],
+            "breaker_opens":        m["breaker_opens"],
+            "avg_call_seconds":     round(avg_ok, 3),
+            "avg_failure_seconds":  round(avg_fail, 3),
+            "cache_saved_seconds":  round(m["cache_hits"] * avg_ok, 1),
+            "breaker_saved_seconds": round(m["short_circuits"] * avg_fail, 1),
+            "upstream_calls_saved": m["cache_hits"] + m["coalesced"] + m["short_circuits"],
+        }
+
+    # ── breaker (call with lock held) ──
+    def _admit(self):
+        if self._state == "open":
+            if time.monotonic() - self._opened_at < self.cooldown_seconds:
+                self._m["short_circuits"] += 1
+                raise CircuitOpenError("AI refine circuit open")
+            self._state = "half_open"
+            self._trial = False
+        if self._state == "half_open":
+            if self._trial:
+                self._m["short_circuits"] += 1
+                raise CircuitOpenError("AI refine circuit half-open, trial in progress")
+            self._trial = True
+        self._m["calls"] += 1
+
+    def _record_success(self, elapsed):
+        self._m["successes"] += 1
+        self._m["success_seconds"] += elapsed
+        self._consecutive_failures = 0
+        self._state = "closed"
+        self._trial = False
+
+    def _record_failure(self, elapsed):
+        self._m["failures"] += 1
+        self._m["failure_seconds"] += elapsed
+        self._consecutive_failures += 1
+        if self._state == "half_open" or self._consecutive_failures >= self.failure_threshold:
+            if self._state != "open":
+                self._m["breaker_opens"] += 1
+            self._state = "open"
+            self._opened_at = time.monotonic()
+        self._trial = False
+
+    # ── factor cache (call with lock held) ──
+    def _cache_get(self, key):
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        if time.time() - entry[0] > self.cache_ttl:
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return entry[1]
+
+    def _cache_put(self, key, factors):
+        self._cache[key] = (time.time(), dict(factors))
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+
+ai_guard = AIGuard(
+    failure_threshold = Config.AI_BREAKER_THRESHOLD,
+    cooldown_seconds  = Config.AI_BREAKER_COOLDOWN,
+    cache_size        = Config.AI_FACTOR_CACHE_SIZE,
+    cache_ttl         = Config.AI_FACTOR_CACHE_TTL,
+    wait_timeout      = Config.AI_REFINE_TIMEOUT + 5,
+)
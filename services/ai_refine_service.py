@@ -0,0 +1,172 @@
+"""
+House-Forge Background AI Refinement
+====================================
+Keeps the AI adjustment call off the request path.
+
+With Config.AI_REFINE_ASYNC on, routes save the deterministic estimate with
+estimation.ai_status = "pending" and return immediately. A small thread pool
+then calls _ai_refine_estimate, applies the factors and patches the project's
+`estimation` map in place, flipping ai_status to "done" (or "failed"). The
+project page polls /user/project/<id>/estimation-status until it settles.
+On edit, the stored ai_factors are re-applied instead of queueing a new job
+when the edit leaves ai_key (the AI call's cache key) unchanged.
+
+Each submission gets an ai_job token; a worker only patches the document if
+the token still matches, so a slow job can never overwrite the estimate from
+a newer edit.
+
+Point Config.AI_REFINE_URL at a local stub endpoint to exercise the whole
+flow in tests without the real API.
+"""
+
+import copy
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from firebase_admin import firestore
+
+from config import Config
+from services import rate_tables
+from services.calculation_service import (
+    STAGE_KEYS, _ai_refine_estimate, ai_inputs_key, apply_ai_refinement,
+)
+from services.estimate_cache import cached_estimate, cached_factors, remember_factors
+from services.form_schema import resolve_inputs
+from services.stage_tracker import tracked_estimate
+from services.uncertainty_service import cost_bands
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=Config.AI_REFINE_WORKERS,
+                                           thread_name_prefix="ai-refine")
+        return _executor
+
+
+def _is_refined(estimation):
+    return bool(estimation.get("ai_rationale") or estimation.get("ai_confidence"))
+
+
+def build_estimate(square_feet, rooms, floors, bathrooms, budget_range, form=None,
+                   previous=None):
+    """
+    Estimate for a create/edit request: the deterministic estimate (cached)
+    with AI factors applied when there are some - re-used from previous,
+    cached for the same AI inputs, or (sync mode only) from a blocking call.
+    Async mode without factors returns the deterministic estimate marked
+    pending.
+    previous is the project's current estimation (edit_project): only stages
+    whose inputs changed are recomputed (stage_tracker), and its AI factors
+    are re-applied when nothing the AI call is keyed on has changed.
+    Adds Monte Carlo P10/P50/P90 bands when Config.MONTE_CARLO_DRAWS is set.
+    """
+    refine_now = not Config.AI_REFINE_ASYNC
+    previous   = previous or {}
+    rate_tables.maybe_reload()
+    inp = resolve_inputs(square_feet, rooms, floors, bathrooms, budget_range, form)
+
+    def _tracked(inp):
+        estimation, recomputed = tracked_estimate(inp, previous)
+        if previous.get("stage_inputs"):
+            print(f"♻️ Re-estimated {len(recomputed)}/{len(STAGE_KEYS)} stages: "
+                  f"{', '.join(recomputed) or 'none'}")
+        return estimation
+
+    estimation = cached_estimate(inp, compute=_tracked)
+    factors = _reusable_factors(previous, inp) or cached_factors(inp)
+    if not factors and refine_now:
+        factors = _ai_refine_estimate(copy.deepcopy(estimation["costs"]), inp)
+        remember_factors(inp, factors)
+    if factors:
+        estimation = apply_ai_refinement(estimation, factors)
+    estimation["ai_key"] = ai_inputs_key(inp)
+    if Config.MONTE_CARLO_DRAWS:
+        try:
+            estimation["uncertainty"] = cost_bands(inp, draws=Config.MONTE_CARLO_DRAWS)
+        except Exception as e:
+            print(f"⚠️ Uncertainty bands skipped: {e}")
+    if _is_refined(estimation):
+        estimation["ai_status"] = "done"
+    elif refine_now:
+        estimation["ai_status"] = "failed"
+    else:
+        estimation["ai_status"] = "pending"
+        estimation["ai_job"]    = uuid.uuid4().hex
+    return estimation
+
+
+def _reusable_factors(previous, inp):
+    """The previous estimate's AI factors, if the AI inputs are unchanged."""
+    if not previous.get("ai_factors") or previous.get("ai_key") != ai_inputs_key(inp):
+        return {}
+    return dict(previous["ai_factors"],
+                rationale=previous.get("ai_rationale", ""),
+                confidence=previous.get("ai_confidence", ""))
+
+
+def queue_refinement(project_id, estimation, square_feet, rooms, floors,
+                     bathrooms, budget_range, form=None):
+    """Schedule the AI pass for a saved pending estimate. Returns the Future (or None)."""
+    if estimation.get("ai_status") != "pending":
+        return None
+    # Parsed here, on the request thread - request.form dies with the request
+    inp = resolve_inputs(square_feet, rooms, floors, bathrooms, budget_range, form)
+    return _get_executor().submit(_refine_job, project_id, copy.deepcopy(estimation), inp)
+
+
+def _refine_job(project_id, estimation, inp):
+    job_id = estimation.get("ai_job")
+    try:
+        factors = _ai_refine_estimate(copy.deepcopy(estimation["costs"]), inp)
+        if factors:
+            refined = apply_ai_refinement(estimation, factors)
+            refined["ai_status"] = "done"
+            refined.pop("ai_job", None)
+            remember_factors(inp, factors)
+            updates = {
+                "estimation.costs":         refined["costs"],
+                "estimation.ai_rationale":  refined["ai_rationale"],
+                "estimation.ai_confidence": refined["ai_confidence"],
+                "estimation.ai_factors":    refined["ai_factors"],
+                "estimation.ai_status":     "done",
+            }
+        else:
+            updates = {"estimation.ai_status": "failed"}
+        updates["estimation.ai_refined_at"] = datetime.now()
+
+        patched = _patch_if_current(project_id, job_id, updates)
+        print(f"🤖 AI refine {project_id}: {updates['estimation.ai_status']}"
+              f"{'' if patched else ' (superseded, not saved)'}")
+        return patched
+    except Exception as e:
+        print(f"❌ AI refine job failed for {project_id}: {e}")
+        try:
+            _patch_if_current(project_id, job_id, {"estimation.ai_status": "failed"})
+        except Exception:
+            pass
+        return False
+
+
+def _patch_if_current(project_id, job_id, updates):
+    db = firestore.client()
+    ref = db.collection('projects').document(project_id)
+
+    @firestore.transactional
+    def _patch(transaction):
+        snap = ref.get(transaction=transaction)
+        if not snap.exists:
+            return False
+        current = (snap.to_dict() or {}).get('estimation') or {}
+        if current.get('ai_job') != job_id:
+            return False
+        transaction.update(ref, updates)
+        return True
+
+    return _patch(db.transaction())
@@ -0,0 +1,748 @@
+"""
+House-Forge Batch Estimation Service
+====================================
+Columnar re-pricing of many projects in one pass.
+
+calculate_materials_and_cost_batch() takes the same arguments as
+calculate_materials_and_cost() for N projects and reads the forms column by
+column (form_schema.resolve_columns - no per-project record). Rates are
+looked up a column at a time (dict gets through map(), NumPy masks for every
+condition and fallback), then the residential, villa and apartment formulas,
+the cost tiers, the timeline and the BOQ quantities run as NumPy array
+expressions. A project whose inputs don't parse is reported back with its
+error instead of failing the batch.
+
+Reading each form field and building each result dict stay per project -
+they are the dict-in / dict-out interface itself, and most of a batch's time
+- so a batch is about 2-3x faster than pricing the projects one by one, not
+orders of magnitude. Callers that price many variants (what-if sweeps,
+uncertainty draws) gain the most.
+
+Results are identical to calculate_materials_and_cost(..., refine=False),
+values and types: every array expression keeps the scalar evaluation order,
+and 1-decimal quantities are rounded with Python's round() when rows are
+materialised. benchmark_estimation.py fails if the two paths ever disagree.
+"""
+
+from itertools import repeat
+from operator import eq, is_, itemgetter, truth
+
+import numpy as np
+
+from services import rate_tables
+from services.calculation_service import TIER_FACTOR, STAGE_KEYS, rate_table_version
+from services.form_schema import resolve_columns
+
+# Rate tables as RATES.CONCRETE_GRADE_FACTOR, RATES.DOOR_RATE, ..., rebound on reload
+rate_tables.bind(globals())
+
+# ─────────────────────────────────────────────────────────────────
+#  OUTPUT LAYOUT
+# ─────────────────────────────────────────────────────────────────
+
+# (section, key, kind) in the exact order _build_quantities emits them.
+#   "r1"  -> round(v, 1)   "int" -> integer count   "f" -> plain float
+#   "r1+" -> round(max(0, v), 1): a clamped value is the int 0, as in the scalar path
+QUANTITY_LAYOUT = [
+    ("foundation", "cement_bags", "r1"), ("foundation", "sand_cuft", "r1"),
+    ("foundation", "aggregate_cuft", "r1"), ("foundation", "steel_kg", "r1"),
+    ("foundation", "concrete_blocks", "int"), ("foundation", "water_liters", "r1"),
+    ("foundation", "waterproofing_kg", "r1"),
+    ("walls", "bricks_or_blocks", "int"), ("walls", "cement_bags", "r1"),
+    ("walls", "sand_cuft", "r1"), ("walls", "doors", "int"), ("walls", "windows", "int"),
+    ("walls", "internal_plaster_sqft", "r1+"), ("walls", "external_plaster_sqft", "r1+"),
+    ("flooring", "cement_bags", "r1"), ("flooring", "sand_cuft", "r1"),
+    ("flooring", "steel_kg", "r1"), ("flooring", "aggregate_cuft", "r1"),
+    ("flooring", "floor_tiles_sqft", "r1"), ("flooring", "bathroom_wall_tiles_sqft", "r1"),
+    ("flooring", "shuttering_sqft", "r1"),
+    ("roofing", "steel_kg", "r1"), ("roofing", "cement_bags", "r1"),
+    ("roofing", "sand_cuft", "r1"), ("roofing", "aggregate_cuft", "r1"),
+    ("roofing", "waterproofing_sqft", "r1"),
+    ("plumbing", "pvc_pipes_meters", "r1"), ("plumbing", "cpvc_pipes_meters", "r1"),
+    ("plumbing", "gi_pipes_meters", "r1"), ("plumbing", "water_tank_liters", "int"),
+    ("plumbing", "taps", "int"), ("plumbing", "washbasins", "int"),
+    ("plumbing", "toilets", "int"), ("plumbing", "kitchen_sink", "int"),
+    ("plumbing", "valves", "int"), ("plumbing", "showers", "int"),
+    ("electrical", "wiring_meters", "r1"), ("electrical", "switches", "int"),
+    ("electrical", "sockets", "int"), ("electrical", "fans", "int"),
+    ("electrical", "lights", "int"), ("electrical", "mcb_breakers", "int"),
+    ("electrical", "distribution_box", "int"), ("electrical", "conduits_meters", "r1"),
+    ("electrical", "ac_points", "int"),
+    ("finishing", "putty_kg", "r1"), ("finishing", "primer_liters", "r1"),
+    ("finishing", "interior_paint_liters", "r1"), ("finishing", "exterior_paint_liters", "r1"),
+    ("finishing", "false_ceiling_sqft", "r1"), ("finishing", "kitchen_platform_sqft", "r1"),
+    ("carpentry", "plywood_sheets", "r1"), ("carpentry", "laminate_sqft", "int"),
+    ("carpentry", "mdf_sheets", "r1"), ("carpentry", "wardrobes", "int"),
+    ("carpentry", "hinges", "int"), ("carpentry", "handles", "int"),
+    ("exterior", "car_porch_sqft", "f"), ("exterior", "boundary_wall_rft", "f"),
+    ("exterior", "garden_sqft", "f"), ("exterior", "sump_capacity_liters", "int"),
+    ("miscellaneous", "waterproofing_chem_kg", "r1"),
+    ("miscellaneous", "binding_wire_kg", "r1"),
+    ("miscellaneous", "safety_equipment_sets", "int"), ("miscellaneous", "nails_kg", "r1"),
+]
+
+TIMELINE_KEYS = ["foundation", "walls", "flooring", "roofing", "plumbing",
+                 "electrical", "finishing", "carpentry", "exterior"]
+
+
+# ─────────────────────────────────────────────────────────────────
+#  NORMALISATION  (resolved form columns -> numeric columns)
+# ─────────────────────────────────────────────────────────────────
+# Form values are Python strings / None, so a lookup is a dict get per row:
+# the helpers run it through map() (no Python frame per row) and every
+# condition / fallback is a NumPy mask, np.where() or np.select().
+
+def _fc_fraction(coverage):
+    """Share of sqft under false ceiling — mirrors _false_ceiling_area()."""
+    c = str(coverage or "").lower()
+    if c == "partial":
+        return 0.35
+    if c == "full":
+        return 1.0
+    return 0.0
+
+
+def _rates(table, col, default, field=None):
+    """table.get(value, default) (or its [field]) for every value in a column."""
+    rates = map(table.get, col, repeat(default))
+    if field is not None:
+        rates = map(itemgetter(field), rates)
+    return np.array(list(rates))
+
+
+def _per_value(fn, col):
+    """fn(value) for every value in a column, calling fn once per distinct value."""
+    return _rates({v: fn(v) for v in set(col)}, col, None)
+
+
+def _is(col, value):
+    """Boolean mask: column value == value."""
+    return np.fromiter(map(eq, col, repeat(value)), dtype=bool, count=len(col))
+
+
+def _given(col):
+    """Boolean mask: the form value is truthy (field filled in)."""
+    return np.fromiter(map(truth, col), dtype=bool, count=len(col))
+
+
+def _either(col, fallback):
+    """`value or fallback` per row, as an object column."""
+    return np.where(_given(col), np.array(col, dtype=object), np.array(fallback, dtype=object))
+
+
+def _or_default(col, fallback):
+    """Column value, or the fallback array where the form left it empty (None)."""
+    missing = np.fromiter(map(is_, col, repeat(None)), dtype=bool, count=len(col))
+    values = np.array(col, dtype=object)
+    values[missing] = fallback[missing]
+    return np.array(values.tolist())
+
+
+def _residential_columns(c, villa):
+    """Rate-resolved columns for _calc_residential_v() (residential and villa)."""
+    n = len(c["sqft"])
+    floors, bathrooms, rooms = np.array(c["floors"]), np.array(c["bathrooms"]), np.array(c["rooms"])
+
+    porch_on = _given(c["porch_size"])
+    size_sqft = _rates(RATES.PORCH_SIZE_SQFT, c["porch_size"], 200).astype(float)
+    porch_rate = _rates(RATES.PORCH_STYLE_RATE, c["porch_style"], 850)
+    if villa:
+        porch_rate = porch_rate + _rates(RATES.PORCH_FLOOR_RATE, c["porch_flooring"], 200)
+
+    if villa:
+        pl, pw, pd = (np.array(c[k]) for k in ("pool_length", "pool_width", "pool_depth"))
+        outdoor = {
+            "ls_rate":   _rates(RATES.LANDSCAPING_RATE, c["landscaping_grade"], 115),
+            "bw_height": np.array(c["boundary_height"]),
+            "gate_cost": np.where(_given(c["boundary_rft"]), _rates(RATES.GATE_RATE, c["gate_type"], 45000), 0),
+            "cladding":  _rates(RATES.CLADDING_RATE, c["cladding"], 0),
+            "pool_on":   _given(c["pool_length"]) & _given(c["pool_width"]),
+            "pl": pl, "pw": pw, "pd": pd,
+            "pool_fin":  _rates(RATES.POOL_FINISH_RATE, c["pool_finish"], 200),
+            "pool_deck": _rates(RATES.POOL_DECK_RATE, c["pool_deck"], 180),
+            "vd_sqft":   np.array(c["driveway_sqft"]),
+            "vd_rate":   _rates(RATES.DRIVEWAY_RATE, c["driveway_finish"], 180),
+        }
+    else:
+        zero = np.zeros(n, dtype=int)
+        outdoor = {"ls_rate": np.full(n, 60), "bw_height": np.full(n, 6.0), "gate_cost": zero,
+                   "cladding": zero, "pool_on": np.zeros(n, dtype=bool),
+                   "pl": zero, "pw": zero, "pd": zero, "pool_fin": zero, "pool_deck": zero,
+                   "vd_sqft": zero, "vd_rate": zero}
+
+    return {
+        "conc_fac":    _rates(RATES.CONCRETE_GRADE_FACTOR, c["concrete_grade"], 1.0),
+        "steel_fac":   _rates(RATES.STEEL_GRADE_FACTOR, c["steel_grade"], 1.0),
+        "slab_fac":    _rates(RATES.SLAB_THICKNESS_FACTOR, c["slab_thickness"], 1.0),
+        "struct_prem": np.where(_is(c["structure_type"], "rcc"), 1.05, 1.0),
+        "fd_rate":     _rates(RATES.FOUNDATION_RATE, c["foundation_type"], RATES.FOUNDATION_RATE["isolated"],
+                              "rate_per_sqft_bua"),
+        "fd_depth":    np.array(c["foundation_depth"]),
+        "soil_extra":  _rates(RATES.SOIL_EXTRA_RATE, c["soil_condition"], 0),
+        "anti_t":      _rates(RATES.ANTI_TERMITE_RATE, c["anti_termite"], 11.5),
+        "wproof":      _rates(RATES.WATERPROOFING_RATE, c["roof_waterproofing"], 42),
+        "num_doors":   np.array(c["num_doors"]),
+        "num_windows": np.array(c["num_windows"]),
+        "mat_rate":    _rates(RATES.WALL_MATERIAL_RATE, c["wall_material"], RATES.WALL_MATERIAL_RATE["red_clay"],
+                              "mat_rate"),
+        "outer_t":     np.array(c["wall_thickness"]) / 9,
+        "inner_t":     np.array(c["inner_wall_thickness"]) / 9,
+        "int_plas":    _rates(RATES.PLASTER_RATE, c["plaster_type"], 18),
+        "ext_plas":    _rates(RATES.PLASTER_RATE, c["external_plaster_type"], 20),
+        "door_rate":   _rates(RATES.DOOR_RATE, c["door_material"], 9000),
+        "win_rate":    _rates(RATES.WINDOW_RATE, c["window_material"], 13000),
+        "floor_rate":  _rates(RATES.FLOORING_RATE, c["floor_type"], 90),
+        "bath_tile":   _rates(RATES.BATH_TILE_RATE, c["bathroom_wall_tile"], 80),
+        "cov_fac":     np.where(_is(c["flooring_coverage"], "ground_only"), 1.0 / np.maximum(floors, 1),
+                                _rates(RATES.FLOORING_COVERAGE, c["flooring_coverage"], 1.0)),
+        "roof_mult":   np.where(_is(c["roof_type"], "sloped_tiled"), 1.15, 1.0),
+        "stair_rate":  _rates(RATES.STAIRCASE_RATE, c["staircase"], 60000),
+        "pipe_rate":   _rates(RATES.PIPE_RATE, c["pipe_material"], 150),
+        "num_taps":    _or_default(c["num_taps"], bathrooms * 4 + 4),
+        "num_showers": _or_default(c["num_showers"], bathrooms),
+        "num_geysers": _or_default(c["num_geysers"], bathrooms),
+        "san_rate":    _rates(RATES.SANITARY_RATE, c["sanitary_grade"], 11500),
+        "num_sw":      _or_default(c["num_switchboards"], rooms * 2 + bathrooms + 3),
+        "num_ac":      np.array(c["num_ac_points"]),
+        "wiring_rate": _rates(RATES.WIRING_RATE, c["wiring_type"], 30),
+        "earth_rate":  _rates(RATES.EARTHING_RATE, c["earthing_system"], 6000),
+        "inv_rate":    _rates(RATES.INVERTER_RATE, c["inverter_wiring"], 0),
+        "int_p_rate":  _rates(RATES.INTERNAL_PAINT_RATE,
+                              _either(c["internal_paint_quality"], c["internal_paint"]), 23),
+        "ext_p_rate":  _rates(RATES.EXTERNAL_PAINT_RATE,
+                              _either(c["external_paint_quality"], c["external_paint"]), 28),
+        "fc_frac":     _per_value(_fc_fraction, c["false_ceiling"]),
+        "kt_rate":     _rates(RATES.KITCHEN_PLATFORM_RATE, c["kitchen_type"], 0),
+        "kp_length":   np.array(c["kitchen_platform_length"]),
+        "kp_stone":    _rates(RATES.KITCHEN_STONE_RATE, c["kitchen_platform_stone"], 220),
+        "porch_on":    porch_on,
+        "porch_sqft":  np.where(porch_on, _or_default(c["porch_sqft"], size_sqft), 0.0),
+        "porch_rate":  np.where(porch_on, porch_rate, 0.0),
+        "garden_sqft": np.array(c["garden_sqft"]),
+        "bw_rft":      np.array(c["boundary_rft"]),
+        "bw_rate":     _rates(RATES.BOUNDARY_FINISH_RATE, c["boundary_finish"], 180),
+        **outdoor,
+    }
+
+
+def _apartment_columns(c):
+    """Rate-resolved columns for _calc_apartment_v()."""
+    b1, b2, b3 = (np.array(c[f"apt_{n}bhk_count"]) for n in (1, 2, 3))
+    units = _or_default(c["apt_total_units"], np.maximum(b1 + b2 + b3, 1))
+    baths, doors, windows = b1*1 + b2*2 + b3*3, b1*3 + b2*5 + b3*7, b1*4 + b2*6 + b3*8
+
+    parking = c["apt_parking_type"]
+    basement = _per_value(lambda p: p.startswith("basement"), parking).astype(bool)
+    depths = np.where(basement, np.array(c["apt_basement_depth"], dtype=object), None)
+
+    pool = c["apt_pool"]
+    pool_add = np.where(_is(pool, "none"), 0,
+                        _rates(RATES.APT_POOL_AREA, pool, 600)
+                        * (_rates(RATES.POOL_FINISH_RATE, c["apt_pool_finish"], 200) + 1200))
+    security = c["apt_security_level"]
+    sec_add = np.select([_is(security, "basic"), _is(security, "standard"), _is(security, "smart")],
+                        [120000, units*8000, units*18000], 0)
+    backup = c["apt_dg_backup"]
+    dg_cost = np.select([_is(backup, "none"), _is(backup, "common_only"),
+                         _is(backup, "partial"), _is(backup, "full")],
+                        [0, 350000, units*18000, units*40000], 350000)
+
+    return {
+        "total_units": units,
+        "total_baths": np.where(baths != 0, baths, units * 2),
+        "ca_pct":      np.array(c["apt_common_area_pct"]) / 100,
+        "conc_fac":    _rates(RATES.CONCRETE_GRADE_FACTOR, c["apt_concrete_grade"], 1.16),
+        "steel_fac":   _rates(RATES.STEEL_GRADE_FACTOR, c["apt_steel_grade"], 1.04),
+        "slab_fac":    _rates(RATES.SLAB_THICKNESS_FACTOR, c["apt_slab_thickness"], 1.0),
+        "fd_rate":     _rates(RATES.FOUNDATION_RATE, c["apt_foundation_type"], RATES.FOUNDATION_RATE["raft"],
+                              "rate_per_sqft_bua"),
+        "fd_depth":    np.array(c["apt_foundation_depth"]),
+        "soil_extra":  _rates(RATES.SOIL_EXTRA_RATE, c["apt_soil_condition"], 0),
+        "anti_t":      _rates(RATES.ANTI_TERMITE_RATE, c["apt_anti_termite"], 11.5),
+        "wproof":      _rates(RATES.WATERPROOFING_RATE, c["apt_roof_waterproofing"], 65),
+        "basement_on": basement,
+        "b_depth":     np.where(basement, _per_value(lambda d: float(d or 14), depths), 0.0),
+        "b_levels":    np.where(_is(parking, "basement_2"), 2, 1),
+        "bw_rate":     np.where(basement, _rates(RATES.WATERPROOFING_RATE, c["apt_basement_waterproofing"], 65), 0),
+        "mat_rate":    _rates(RATES.WALL_MATERIAL_RATE, c["apt_wall_material"], RATES.WALL_MATERIAL_RATE["aac_blocks"],
+                              "mat_rate"),
+        "num_doors":   np.where(doors != 0, doors, units * 4),
+        "num_windows": np.where(windows != 0, windows, units * 6),
+        "outer_t":     np.array(c["apt_wall_thickness"]) / 9,
+        "part_rate":   _rates(RATES.APT_PARTITION_FACTOR, c["apt_partition_material"], 1.0),
+        "int_plas":    _rates(RATES.PLASTER_RATE, c["apt_internal_plaster"], 28),
+        "ext_plas":    _rates(RATES.PLASTER_RATE, c["apt_external_plaster"], 20),
+        "door_rate":   _rates(RATES.DOOR_RATE, c["apt_door_material"], 22000),
+        "win_rate":    _rates(RATES.WINDOW_RATE, c["apt_window_material"], 13000),
+        "facade_rate": _rates(RATES.FACADE_RATE, c["apt_facade_type"], 100),
+        "ext_p_rate":  _rates(RATES.EXTERNAL_PAINT_RATE, c["apt_external_paint"], 28),
+        "num_stairs":  np.array(c["apt_staircases"]),
+        "stair_rate":  _rates(RATES.APT_STAIRCASE_RATE, c["apt_staircase_type"], 80000),
+        "floor_rate":  _rates(RATES.FLOORING_RATE, c["apt_flooring_type"], 90),
+        "bath_tile":   _rates(RATES.BATH_TILE_RATE, c["apt_bathroom_tile"], 80),
+        "san_rate":    _rates(RATES.SANITARY_RATE, c["apt_sanitary_grade"], 11500),
+        "num_lifts":   np.array(c["apt_lifts"]),
+        "lift_rate":   _per_value(lambda v: RATES.LIFT_RATE.get(str(v), 1800000), c["apt_lift_capacity"]),
+        "dg_cost":     dg_cost,
+        "int_p_rate":  _rates(RATES.INTERNAL_PAINT_RATE, c["apt_internal_paint"], 23),
+        "fc_frac":     _per_value(_fc_fraction, c["apt_false_ceiling"]),
+        "kt_rate":     _rates(RATES.KITCHEN_PLATFORM_RATE, c["apt_kitchen_type"], 0),
+        "park_slots":  np.array(c["apt_parking_slots"]),
+        "slot_len":    np.array(c["apt_slot_length"]),
+        "slot_wid":    np.array(c["apt_slot_width"]),
+        "park_rate":   _rates(RATES.PARKING_FLOOR_RATE, c["apt_parking_floor"], 180),
+        "pool_add":    pool_add,
+        "club_add":    _rates(RATES.CLUBHOUSE_RATE, c["apt_clubhouse"], 0),
+        "play_add":    _rates(RATES.PLAY_AREA_RATE, c["apt_play_area"], 0),
+        "fire_rate":   _rates(RATES.FIRE_SPEC_RATE, c["apt_fire_spec"], 800),
+        "stp_add":     np.where(_given(c["apt_stp_type"]), _rates(RATES.STP_RATE, c["apt_stp_type"], 800000), 0),
+        "sec_add":     sec_add,
+        "solar_kw":    np.array(c["apt_solar_kw"]),
+        "ls_rate":     _rates(RATES.APT_LANDSCAPE_RATE, c["apt_landscape"], 0),
+    }
+
+
+def _quantity_columns(c):
+    """Rate-resolved columns for _build_quantities_v()."""
+    bathrooms = np.array(c["q_baths"])
+    return {
+        "slab_fac":    _rates(RATES.SLAB_THICKNESS_FACTOR, c["slab_thickness"], 1.0),
+        "conc_fac":    _rates(RATES.CONCRETE_GRADE_FACTOR, c["concrete_grade"], 1.0),
+        "steel_fac":   _rates(RATES.STEEL_GRADE_FACTOR, c["steel_grade"], 1.0),
+        "num_doors":   np.array(c["num_doors"]),
+        "num_windows": np.array(c["num_windows"]),
+        "bags":        _rates(RATES.WALL_MATERIAL_RATE, c["wall_material"], RATES.WALL_MATERIAL_RATE["red_clay"],
+                              "bags_per_sqft"),
+        "tank":        np.array(c["overhead_tank_capacity"]),
+        "taps":        _or_default(c["num_taps"], bathrooms * 4 + 4),
+        "showers":     _or_default(c["num_showers"], bathrooms),
+        "ac_points":   np.array(c["num_ac_points"]),
+        "kp_len":      np.array(c["kitchen_platform_length"]),
+        "fc_frac":     _per_value(_fc_fraction, c["false_ceiling"]),
+        "porch_sqft":  np.array(c["boq_porch_sqft"]),
+        "bw_rft":      np.array(c["boq_boundary_rft"]),
+        "garden_sqft": np.array(c["boq_garden_sqft"]),
+        "sump":        np.array(c["sump_capacity"]),
+    }
+
+
+def _record_row(columns, inp):
+    """A *_columns() builder applied to one EstimateInputs record, as plain values."""
+    c = columns({slot: [getattr(inp, slot)] for slot in inp.__slots_all__})
+    return {k: v.tolist()[0] for k, v in c.items()}
+
+
+def _residential_inputs(inp):
+    """Rate-resolved row for one residential / villa record (uncertainty draws)."""
+    return _record_row(lambda c: _residential_columns(c, inp.kind == "villa"), inp)
+
+
+def _apartment_inputs(inp):
+    """Rate-resolved row for one apartment record (uncertainty draws)."""
+    return _record_row(_apartment_columns, inp)
+
+
+# ─────────────────────────────────────────────────────────────────
+#  VECTORISED CALCULATORS
+# ─────────────────────────────────────────────────────────────────
+
+def _wall_areas_v(sqft, floors, ceiling_ht, num_doors, num_windows, outer_wall_ratio=0.45):
+    side = np.sqrt(sqft / np.maximum(floors, 1))
+    perimeter = 4 * side
+    ext_gross = perimeter * ceiling_ht * floors
+    int_gross = ext_gross * (1 - outer_wall_ratio) / outer_wall_ratio
+    void_total = num_doors * 21 + num_windows * 16
+    ext_net = np.maximum(0, ext_gross - void_total * outer_wall_ratio)
+    int_net = np.maximum(0, int_gross - void_total * (1 - outer_wall_ratio))
+    return {
+        "ext_gross": ext_gross, "int_gross": int_gross,
+        "ext_net": ext_net,     "int_net": int_net,
+        "total_gross": ext_gross + int_gross,
+    }
+
+
+def _calc_residential_v(c, g, villa):
+    sqft, plot_area, floors = g["sqft"], g["plot_area"], g["floors"]
+    bathrooms, ceiling_ht = g["bathrooms"], g["ceiling_ht"]
+    conc_fac, steel_fac, slab_fac = c["conc_fac"], c["steel_fac"], c["slab_fac"]
+
+    fd_rate = c["fd_rate"] * (c["fd_depth"] / 6) * conc_fac * slab_fac * c["struct_prem"]
+    foundation = (fd_rate * sqft
+                  + c["soil_extra"] * sqft
+                  + c["anti_t"] * plot_area
+                  + c["wproof"] * (sqft / np.maximum(floors, 1)))
+
+    wall = _wall_areas_v(sqft, floors, ceiling_ht, c["num_doors"], c["num_windows"])
+    masonry  = (wall["ext_net"] * c["mat_rate"] * c["outer_t"]
+                + wall["int_net"] * c["mat_rate"] * c["inner_t"])
+    plaster  = wall["int_net"] * c["int_plas"] + wall["ext_net"] * c["ext_plas"]
+    openings = c["door_rate"] * c["num_doors"] + c["win_rate"] * c["num_windows"]
+    walls = masonry + plaster + openings
+
+    slab_concrete = sqft * floors * 180 * conc_fac * slab_fac
+    steel_cost    = sqft * floors * 3.5 * 65 * steel_fac
+    bath_tile     = bathrooms * 7 * (ceiling_ht * 0.65) * c["bath_tile"]
+    luxury_area   = sqft * floors * c["cov_fac"]
+    standard_area = sqft * floors * (1.0 - c["cov_fac"])
+    flooring = (luxury_area * c["floor_rate"]
+                + standard_area * RATES.FLOORING_RATE["vitrified"]
+                + slab_concrete + steel_cost + bath_tile)
+
+    roofing = sqft * 190 * conc_fac * slab_fac * c["roof_mult"]
+    roofing = roofing + c["stair_rate"] * np.maximum(1, floors - 1)
+
+    total_pipe = (bathrooms * 22) + (floors * 50) + 30
+    plumbing = (total_pipe * c["pipe_rate"]
+                + c["san_rate"] * bathrooms
+                + c["num_showers"] * 5500
+                + c["num_geysers"] * 2200
+                + c["num_taps"] * 850
+                + 35000 + 4500)
+
+    electrical = (sqft * floors * 2.5 * c["wiring_rate"]
+                  + c["num_sw"] * 1800
+                  + c["num_ac"] * 4500
+                  + c["earth_rate"]
+                  + c["inv_rate"])
+
+    finishing = (wall["int_net"] * (18 + c["int_p_rate"])
+                 + wall["ext_net"] * c["ext_p_rate"]
+                 + (sqft * c["fc_frac"]) * RATES.FALSE_CEILING_RATE)
+
+    kp_cost = (c["kp_length"] * 2.5 * c["kp_stone"] + c["kt_rate"] * c["kp_length"])
+    carpentry = sqft * 55 * (1.5 if villa else 1.0) + kp_cost
+
+    exterior = np.zeros(len(sqft))
+    exterior = np.where(c["porch_on"], exterior + c["porch_sqft"] * c["porch_rate"], exterior)
+    exterior = exterior + c["garden_sqft"] * c["ls_rate"]
+    exterior = exterior + (c["bw_rft"] * c["bw_height"] * c["bw_rate"] + c["gate_cost"])
+    if villa:
+        exterior = exterior + wall["ext_net"] * c["cladding"]
+        pl, pw, pd = c["pl"], c["pw"], c["pd"]
+        pool_surface = 2*(pl*pd + pw*pd) + pl*pw
+        pool_cost = (pool_surface * c["pool_fin"] + pl * pw * pd * 0.4 * 8000
+                     + (pool_surface * 1.5) * c["pool_deck"])
+        exterior = np.where(c["pool_on"], exterior + pool_cost, exterior)
+        exterior = exterior + c["vd_sqft"] * c["vd_rate"]
+
+    misc = sqft * floors * 35
+
+    return dict(zip(STAGE_KEYS, (foundation, walls, flooring, roofing, plumbing,
+                                 electrical, finishing, carpentry, exterior, misc)))
+
+
+def _calc_apartment_v(c, g):
+    sqft, plot_area, floors, ceiling_ht = g["sqft"], g["plot_area"], g["floors"], g["ceiling_ht"]
+    conc_fac, steel_fac, slab_fac = c["conc_fac"], c["steel_fac"], c["slab_fac"]
+    total_units, total_baths = c["total_units"], c["total_baths"]
+
+    fd_cost = c["fd_rate"] * (c["fd_depth"]/8) * conc_fac * slab_fac * sqft
+    anti_t  = c["anti_t"] * plot_area
+    wproof  = c["wproof"] * (sqft/np.maximum(floors, 1))
+    foundation = fd_cost + c["soil_extra"]*sqft + anti_t + wproof
+    basement = (sqft * c["b_depth"] * 0.15 * conc_fac * c["b_levels"]
+                + sqft * c["bw_rate"] * 0.4 * c["b_levels"])
+    foundation = np.where(c["basement_on"], foundation + basement, foundation)
+
+    wall = _wall_areas_v(sqft, floors, ceiling_ht, c["num_doors"], c["num_windows"])
+    masonry  = (wall["ext_net"] * c["mat_rate"] * c["outer_t"]
+                + wall["int_net"] * c["mat_rate"] * 0.5 * c["part_rate"])
+    plaster  = wall["int_net"] * c["int_plas"] + wall["ext_net"] * c["ext_plas"]
+    openings = (c["door_rate"]*c["num_doors"] + c["win_rate"]*c["num_windows"])
+    facade   = wall["ext_net"] * (c["facade_rate"] + c["ext_p_rate"])
+    walls = masonry + plaster + openings + facade + c["num_stairs"] * c["stair_rate"] * floors
+
+    slab_concrete = sqft * floors * 200 * conc_fac * slab_fac
+    steel_cost    = sqft * floors * 4.0 * 65 * steel_fac
+    flooring_mat  = sqft * (1 - c["ca_pct"]) * c["floor_rate"]
+    bath_tile     = total_baths * 7 * (ceiling_ht * 0.65) * c["bath_tile"]
+    flooring = slab_concrete + steel_cost + flooring_mat + bath_tile
+
+    roofing = (sqft / np.maximum(floors, 1)) * 190 * conc_fac * slab_fac
+
+    pipe_cost = ((total_baths*22 + floors*50 + total_units*15) * RATES.PIPE_RATE["cpvc"])
+    plumbing  = pipe_cost + c["san_rate"] * total_baths + (80000 + total_units * 1500)
+
+    num_sw = total_units * 8 + floors * 2
+    electrical = (sqft * 2.5 * RATES.WIRING_RATE["fr_pvc"]
+                  + num_sw * 1800
+                  + RATES.EARTHING_RATE["plate"] * floors
+                  + total_units * 8000
+                  + c["lift_rate"] * c["num_lifts"]
+                  + c["dg_cost"])
+
+    units1  = np.maximum(total_units, 1)
+    fc_area = ((sqft / units1) * c["fc_frac"]) * total_units
+    finishing = wall["int_net"] * (18 + c["int_p_rate"]) + fc_area * RATES.FALSE_CEILING_RATE
+
+    carpentry = sqft * 40 + c["kt_rate"] * 8 * total_units
+
+    exterior = np.zeros(len(sqft))
+    slot_area = c["park_slots"] * c["slot_len"] * c["slot_wid"]
+    exterior = exterior + slot_area * c["park_rate"]
+    exterior = exterior + c["pool_add"]
+    exterior = exterior + c["club_add"]
+    exterior = exterior + c["play_add"]
+    exterior = exterior + c["fire_rate"] * sqft / np.maximum(floors, 1)
+    exterior = exterior + c["stp_add"]
+    exterior = exterior + c["sec_add"]
+    exterior = exterior + c["solar_kw"] * 55000
+    ls_sqft  = np.maximum(0, plot_area - sqft / np.maximum(floors, 1))
+    exterior = exterior + ls_sqft * c["ls_rate"]
+
+    misc = sqft * floors * 40
+
+    return dict(zip(STAGE_KEYS, (foundation, walls, flooring, roofing, plumbing,
+                                 electrical, finishing, carpentry, exterior, misc)))
+
+
+def _build_quantities_v(c, g):
+    sqft, floors, ceiling_ht = g["sqft"], g["floors"], g["ceiling_ht"]
+    rooms, bathrooms = g["q_rooms"], g["q_baths"]
+    slab_fac, conc_fac, steel_fac = c["slab_fac"], c["conc_fac"], c["steel_fac"]
+    wall = _wall_areas_v(sqft, floors, ceiling_ht, c["num_doors"], c["num_windows"])
+    gross_bags = wall["total_gross"] * c["bags"]
+    total_pipe = (bathrooms * 22) + (floors * 50) + 30
+    n = len(sqft)
+
+    return [
+        sqft * 0.175 * floors * conc_fac * slab_fac,
+        sqft * 0.525 * floors * slab_fac,
+        sqft * 0.70  * floors * slab_fac,
+        sqft * 3.5   * floors * steel_fac,
+        np.trunc(sqft * 2.8 * slab_fac),
+        sqft * 18 * floors,
+        sqft * 0.18,
+
+        np.trunc(gross_bags * 4.5),
+        gross_bags,
+        gross_bags * 2.5,
+        c["num_doors"],
+        c["num_windows"],
+        wall["int_net"],
+        wall["ext_net"],
+
+        sqft * 0.15 * floors * conc_fac * slab_fac,
+        sqft * 0.38 * floors * slab_fac,
+        sqft * 3.04 * floors * steel_fac,
+        sqft * 0.57 * floors * slab_fac,
+        sqft * floors * 0.70,
+        bathrooms * 7 * ceiling_ht * 0.65,
+        sqft * floors * 0.48,
+
+        sqft * 4.4  * steel_fac,
+        sqft * 0.22 * conc_fac * slab_fac,
+        sqft * 0.44 * slab_fac,
+        sqft * 0.66 * slab_fac,
+        sqft / np.maximum(floors, 1),
+
+        total_pipe * 0.40,
+        total_pipe * 0.35,
+        total_pipe * 0.15,
+        c["tank"],
+        c["taps"],
+        bathrooms,
+        bathrooms,
+        np.ones(n, dtype=int),
+        bathrooms * 3 + 3,
+        c["showers"],
+
+        sqft * floors * 2.5,
+        rooms * 3 + bathrooms * 2,
+        rooms * 4 + bathrooms * 2,
+        rooms + 1,
+        rooms * 2 + bathrooms + 3,
+        6 + (floors * 2),
+        floors,
+        sqft * 1.5,
+        c["ac_points"],
+
+        wall["int_net"] * 0.8,
+        wall["int_net"] * 0.06,
+        wall["int_net"] * 0.08,
+        wall["ext_net"] * 0.07,
+        sqft * c["fc_frac"],
+        c["kp_len"] * 2.5,
+
+        rooms * 3.2,
+        rooms * 20,
+        rooms * 1.6,
+        np.maximum(1, rooms - 1),
+        (rooms * 6) + (bathrooms * 3),
+        (rooms * 4) + (bathrooms * 2),
+
+        c["porch_sqft"],
+        c["bw_rft"],
+        c["garden_sqft"],
+        c["sump"],
+
+        sqft * 0.12,
+        sqft * 0.04,
+        np.maximum(1, floors),
+        sqft * 0.02,
+    ]
+
+
+def _build_cost_tiers_v(base, labour_pct):
+    tiers = {}
+    for tier, fac in TIER_FACTOR.items():
+        stage_costs = {k: np.round(v * fac, 0) for k, v in base.items()}
+        mat = 0
+        for k in STAGE_KEYS:
+            mat = mat + stage_costs[k]
+        lab = np.round(mat * labour_pct, 0)
+        oth = np.round(mat * 0.025, 0)
+        tiers[tier] = {
+            "material_cost":   np.round(mat, 0),
+            "labor_cost":      lab,
+            "other_costs":     oth,
+            "total_cost":      np.round(mat + lab + oth, 0),
+            "stage_breakdown": stage_costs,
+        }
+    return tiers
+
+
+def _build_timeline_v(sqft, rooms):
+    tl = [
+        np.round(sqft / 44,  0),
+        np.round(sqft / 36,  0),
+        np.round(sqft / 57,  0),
+        np.round(sqft / 67,  0),
+        np.round(sqft / 100, 0),
+        np.round(sqft / 100, 0),
+        np.round(sqft / 44,  0),
+        rooms * 7,
+        np.round(sqft / 167, 0),
+    ]
+    total = 0
+    for col in tl:
+        total = total + col
+    return tl, np.trunc(total)
+
+
+# ─────────────────────────────────────────────────────────────────
+#  PUBLIC ENTRY POINT
+# ─────────────────────────────────────────────────────────────────
+
+def calculate_materials_and_cost_batch(projects):
+    """
+    Price many projects at once.
+    projects: iterable of dicts with the calculate_materials_and_cost()
+    keyword arguments (square_feet, rooms, floors, bathrooms, budget_range, form).
+    Returns (results, errors): results in input order, each equal to
+    calculate_materials_and_cost(**project, refine=False), or None for a
+    project whose inputs don't parse; errors maps those indices to the reason.
+    """
+    rate_tables.maybe_reload()
+    version = rate_table_version()
+    projects = list(projects)
+    groups, errors = resolve_columns(projects)
+    results = [None] * len(projects)
+    if not groups:
+        return results, errors
+
+    # Groups are priced back to back, so each one is a slice of the full columns
+    order = [kind for kind in ("villa", "apartment", "residential") if kind in groups]
+    meta = {k: [v for kind in order for v in groups[kind][1][k]]
+            for k in ("budget_range", "scope", "prop_type")}
+    g = {k: np.array([v for kind in order for v in groups[kind][1][k]])
+         for k in ("sqft", "plot_area", "floors", "rooms", "bathrooms",
+                   "ceiling_ht", "q_rooms", "q_baths")}
+    labour_pct = np.array([0.22 if s == "material_and_labour" else 0.0 for s in meta["scope"]])
+    n = len(labour_pct)
+
+    base = {k: np.empty(n) for k in STAGE_KEYS}
+    qty  = [None] * len(QUANTITY_LAYOUT)
+
+    start = 0
+    for kind in order:
+        cols = groups[kind][1]
+        idx = slice(start, start + len(groups[kind][0]))
+        start = idx.stop
+        gg = {k: v[idx] for k, v in g.items()}
+
+        if kind == "apartment":
+            bd = _calc_apartment_v(_apartment_columns(cols), gg)
+        else:
+            bd = _calc_residential_v(_residential_columns(cols, villa=kind == "villa"),
+                                     gg, villa=kind == "villa")
+        for k in STAGE_KEYS:
+            base[k][idx] = bd[k]
+
+        q_cols = _build_quantities_v(_quantity_columns(cols), gg)
+        for i, col in enumerate(q_cols):
+            if qty[i] is None:
+                qty[i] = np.empty(n, dtype=np.asarray(col).dtype)
+            qty[i][idx] = col
+
+    for k in STAGE_KEYS:
+        base[k] = np.round(base[k], 0)
+    tiers = _build_cost_tiers_v(base, labour_pct)
+    timeline, total_days = _build_timeline_v(g["sqft"], g["rooms"])
+
+    priced = _materialise(meta, tiers, qty, timeline, total_days, version)
+    for row, estimation in zip((row for kind in order for row in groups[kind][0]), priced):
+        results[row] = estimation
+    return results, errors
+
+
+def _round1(col):
+    """round(v, 1) for a float column, exact to Python's round().
+    rint(v*10)/10 only disagrees with round() when v*10 sits on a .5 tie,
+    so those few values are re-rounded in Python."""
+    scaled = col * 10
+    out = np.rint(scaled) / 10
+    near_tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    for i in np.nonzero(near_tie)[0]:
+        out[i] = round(float(col[i]), 1)
+    return out
+
+
+def _materialise(meta, tiers, qty, timeline, total_days, version):
+    """Turn the result columns back into one estimation dict per project."""
+    sections = {}
+    for (section, key, kind), col in zip(QUANTITY_LAYOUT, qty):
+        if kind == "int":
+            values = col.astype(np.int64).tolist()
+        elif kind == "r1":
+            values = _round1(col.astype(float)).tolist()
+        elif kind == "r1+":
+            values = [v if positive else 0 for v, positive in
+                      zip(_round1(col.astype(float)).tolist(), (col > 0).tolist())]
+        else:
+            values = col.astype(float).tolist()
+        sections.setdefault(section, ([], []))
+        sections[section][0].append(key)
+        sections[section][1].append(values)
+    section_rows = {s: [dict(zip(keys, t)) for t in zip(*cols)]
+                    for s, (keys, cols) in sections.items()}
+    materials = [dict(zip(section_rows, t)) for t in zip(*section_rows.values())]
+
+    total_keys = ("material_cost", "labor_cost", "other_costs", "total_cost")
+    tier_rows = {}
+    for tier, t in tiers.items():
+        stages = [dict(zip(STAGE_KEYS, v))
+                  for v in zip(*(t["stage_breakdown"][k].tolist() for k in STAGE_KEYS))]
+        totals = zip(*(t[k].tolist() for k in total_keys))
+        tier_rows[tier] = [dict(zip(total_keys, tot), stage_breakdown=sb)
+                           for tot, sb in zip(totals, stages)]
+    costs = [dict(zip(tier_rows, t)) for t in zip(*tier_rows.values())]
+
+    timelines = [dict(zip(TIMELINE_KEYS, t), total_days=td)
+                 for t, td in zip(zip(*(col.tolist() for col in timeline)),
+                                  total_days.astype(np.int64).tolist())]
+    materials_count = len(QUANTITY_LAYOUT)
+
+    return [{
+        "materials":             m,
+        "costs":                 c,
+        "timeline":              tl,
+        "selected_budget":       budget,
+        "total_materials_count": materials_count,
+        "ai_rationale":          "",
+        "ai_confidence":         "",
+        "estimate_scope":        scope,
+        "property_type":         prop_type,
+        "rate_table_version":    version,
+    } for budget, scope, prop_type, m, c, tl in zip(meta["budget_range"], meta["scope"],
+                                                    meta["prop_type"], materials, costs, timelines)]
@@ -0,0 +1,101 @@
+"""
+House-Forge Bid Acceptance
+==========================
+accept_bid() assigns a contractor in one Firestore transaction:
+
+    read   bid, project, the project's pending bids
+    check  caller owns the project, bid still pending, no contractor yet
+    write  bid -> accepted, other pending bids -> rejected,
+           project -> active with the contractor's terms, stats rollup
+
+Two owners / tabs accepting at once conflict on the project document; the
+loser's transaction is retried, sees the project already assigned and
+fails with a ValueError instead of double-assigning.
+
+A transaction commits at most WRITE_LIMIT writes. If a project has more
+pending bids than fit alongside the acceptance, the rest are rejected right
+after the commit in write batches of the same size (rejecting a pending bid
+of an assigned project is idempotent, so a crash there only leaves bids
+pending on an already-active project).
+"""
+
+from datetime import datetime
+
+from firebase_admin import firestore
+
+from services import stats_rollup
+
+# Firestore's per-commit write limit (transactions and batches alike)
+WRITE_LIMIT = 500
+
+# bid, project, stats rollup
+_ACCEPT_WRITES = 3
+
+
+def _rejection(now):
+    return {'status': 'rejected', 'rejected_at': now, 'updated_at': now}
+
+
+@firestore.transactional
+def _accept(transaction, db, bid_ref, user_id):
+    bid_doc = next(iter(transaction.get(bid_ref)), None)
+    if bid_doc is None or not bid_doc.exists:
+        raise LookupError('Bid not found')
+    bid_data = bid_doc.to_dict()
+
+    project_ref = db.collection('projects').document(bid_data.get('project_id'))
+    project_doc = next(iter(transaction.get(project_ref)), None)
+    if project_doc is None or not project_doc.exists:
+        raise LookupError('Project not found')
+    project_data = project_doc.to_dict()
+
+    if project_data.get('user_id') != user_id:
+        raise PermissionError('Access denied')
+    if project_data.get('contractor_id') or bid_data.get('status') != 'pending':
+        raise ValueError('A bid has already been accepted for this project')
+
+    others = [doc.reference for doc in transaction.get(
+                  db.collection('bids').where('project_id', '==', bid_data.get('project_id'))
+                                       .where('status', '==', 'pending'))
+              if doc.id != bid_ref.id]
+    inline, overflow = others[:WRITE_LIMIT - _ACCEPT_WRITES], others[WRITE_LIMIT - _ACCEPT_WRITES:]
+
+    now = datetime.now()
+    transaction.update(bid_ref, {
+        'status': 'accepted',
+        'accepted_at': now,
+        'updated_at': now
+    })
+    for ref in inline:
+        transaction.update(ref, _rejection(now))
+    transaction.update(project_ref, {
+        'contractor_id': bid_data.get('contractor_id'),
+        'contractor_name': bid_data.get('contractor_name'),
+        'contractor_company': bid_data.get('contractor_company'),
+        'agreed_cost': bid_data.get('total_cost'),
+        'agreed_duration': bid_data.get('duration_days'),
+        'status': 'active',
+        'started_at': now,
+        'updated_at': now
+    })
+    stats_rollup.bump(db, transaction, **stats_rollup.project_status_deltas(project_data.get('status'), 'active'))
+    return bid_data, overflow
+
+
+def accept_bid(db, bid_id, user_id):
+    """
+    Accept bid_id on behalf of user_id, rejecting the project's other pending
+    bids. Returns the accepted bid's data. Raises LookupError (bid / project
+    missing), PermissionError (not the owner) or ValueError (already assigned).
+    """
+    bid_data, overflow = _accept(db.transaction(), db, db.collection('bids').document(bid_id), user_id)
+
+    now = datetime.now()
+    for start in range(0, len(overflow), WRITE_LIMIT):
+        batch = db.batch()
+        for ref in overflow[start:start + WRITE_LIMIT]:
+            batch.update(ref, _rejection(now))
+        batch.commit()
+    if overflow:
+        print(f"⚠️ Rejected {len(overflow)} more bids outside the accept transaction")
+    return bid_data
@@ -22,104 +22,20 @@ Key fixes vs previous version:
 """
 
 import math
+from types import MappingProxyType
 from typing import Optional
 
+from config import Config
+from services import rate_tables
+from services.form_schema import PROPERTY_TYPES, form_keys, resolve_inputs
+
 # ─────────────────────────────────────────────────────────────────
 #  RATE TABLES
 # ─────────────────────────────────────────────────────────────────
 
-CONCRETE_GRADE_FACTOR = {"M20": 1.00, "M25": 1.08, "M30": 1.16, "M35": 1.25, "M40": 1.35}
-STEEL_GRADE_FACTOR    = {"Fe500": 1.00, "Fe550": 1.06, "Fe500D": 1.04}
-SLAB_THICKNESS_FACTOR = {4.5: 0.90, 5: 1.00, 5.5: 1.10, 6: 1.20}
-
-FOUNDATION_RATE = {
-    "isolated": {"rate_per_sqft_bua": 220},
-    "strip":    {"rate_per_sqft_bua": 260},
-    "raft":     {"rate_per_sqft_bua": 340},
-    "pile":     {"rate_per_sqft_bua": 520},
-    "combined": {"rate_per_sqft_bua": 300},
-}
-
-SOIL_EXTRA_RATE = {
-    "hard_rock": 0, "firm_soil": 0, "soft_soil": 40, "marshy": 120, "filled": 80,
-}
-
-WALL_MATERIAL_RATE = {
-    "red_clay":        {"mat_rate": 6.5,  "bags_per_sqft": 0.30},
-    "aac_blocks":      {"mat_rate": 9.0,  "bags_per_sqft": 0.22},
-    "fly_ash":         {"mat_rate": 7.5,  "bags_per_sqft": 0.26},
-    "hollow_concrete": {"mat_rate": 7.0,  "bags_per_sqft": 0.24},
-}
-
-PLASTER_RATE = {
-    "12mm_cm": 18, "20mm_cm": 22, "gypsum": 28, "skim_coat": 14,
-    "12mm_cm_15": 20, "20mm_cm_14": 24, "textured_coat": 35, "none": 0, "drywall": 45,
-}
-
-DOOR_RATE = {
-    "flush_hollow": 9000, "flush_solid": 22000, "panel_teak": 45000,
-    "upvc_door": 25000, "aluminium_door": 30000, "designer_wood": 90000,
-}
-
-WINDOW_RATE = {
-    "ms_grill": 5500, "aluminium_sliding": 13000, "upvc_casement": 22000,
-    "upvc_sliding": 17000, "wooden_frame": 30000,
-}
-
-FLOORING_RATE = {
-    "vitrified": 90, "marble": 250, "granite": 200, "hardwood": 350,
-    "ceramic": 60, "italian_marble": 580, "premium_granite": 300, "natural_stone": 380,
-}
-
-BATH_TILE_RATE = {
-    "ceramic_economy": 45, "ceramic_standard": 80, "vitrified_wall": 115,
-    "designer_tiles": 250, "natural_stone_bath": 375,
-}
-
-INTERNAL_PAINT_RATE = {"emulsion": 23, "luxury": 37, "texture": 70}
-EXTERNAL_PAINT_RATE = {"weathershield": 28, "elastomeric": 46, "texture_ext": 78}
-
-FALSE_CEILING_RATE = 85
-
-KITCHEN_PLATFORM_RATE = {"semi_modular": 0, "modular": 3500}
-KITCHEN_STONE_RATE = {
-    "granite_standard": 220, "granite_premium": 450, "quartz": 650,
-    "marble_kitchen": 375, "ceramic_tiles": 90,
-}
-
-PIPE_RATE    = {"cpvc": 150, "upvc": 80, "ppr": 140, "gi": 180}
-SANITARY_RATE= {"standard": 11500, "mid": 26500, "premium": 60000, "luxury": 100000}
-WIRING_RATE  = {"fr_pvc": 30, "lszh": 48, "armoured": 65}
-EARTHING_RATE= {"plate": 6000, "pipe": 4500, "chemical": 12000}
-
-WATERPROOFING_RATE = {
-    "brick_bat_coba": 42, "chemical_coat": 28, "membrane": 65, "crystalline": 100, "none": 0,
-}
-
-ANTI_TERMITE_RATE = {"pre_construction": 11.5, "post_construction": 8.0, "none": 0}
-
-POOL_FINISH_RATE = {
-    "ceramic_tile": 115, "vitrified_tile": 200, "glass_mosaic": 475,
-    "fibreglass": 550, "exposed_aggregate": 275,
-}
-
-POOL_DECK_RATE = {
-    "anti_skid_granite": 180, "natural_stone": 380,
-    "composite_deck": 250, "ceramic_anti_skid": 120,
-}
-
-LANDSCAPING_RATE = {"basic": 60, "standard": 115, "premium": 225, "luxury": 450}
-
-CLADDING_RATE = {"plaster": 0, "stone": 425, "glass_facade": 1650, "composite": 325}
-
-FACADE_RATE = {
-    "plaster_paint": 100, "texture_paint": 150, "acp_cladding": 325,
-    "stone_cladding": 425, "glass_curtain": 1200,
-}
-
-PORCH_FLOOR_RATE = {
-    "granite": 200, "cobblestone": 160, "stamped_concrete": 180, "natural_stone": 380,
-}
+# RATES.CONCRETE_GRADE_FACTOR, RATES.FOUNDATION_RATE, ... RATES.APT_LANDSCAPE_RATE
+# are read from data/rate_tables.json; RATES is rebound whenever that file changes.
+rate_tables.bind(globals())
 
 
 # ─────────────────────────────────────────────────────────────────
@@ -152,425 +68,382 @@ def _false_ceiling_area(sqft, coverage):
     return 0.0
 
 
+# Stage order of every breakdown; calculators also take a subset of it
+STAGE_KEYS = ["foundation", "walls", "flooring", "roofing", "plumbing",
+              "electrical", "finishing", "carpentry", "exterior", "miscellaneous"]
+_ALL_STAGES = frozenset(STAGE_KEYS)
+
+
 # ─────────────────────────────────────────────────────────────────
 #  RESIDENTIAL / VILLA CORE CALCULATOR
 # ─────────────────────────────────────────────────────────────────
 
-def _calc_residential(form, sqft, plot_area, floors, bathrooms, rooms, ceiling_ht, prefix=""):
-    """prefix="" residential | "villa_" villa. f() tries {prefix}{key} then bare {key}."""
-    p = prefix
+def _calc_residential(inp, stages=_ALL_STAGES):
+    """
+    Residential / villa stage costs. Villa-only extras keyed on inp.kind.
+    Only the requested stages are computed, and each stage reads only the
+    inputs it depends on (see stage_tracker).
+    """
+    villa = inp.kind == "villa"
+    out   = {}
 
-    def f(key, default=None):
-        return form.get(f"{p}{key}", form.get(key, default))
+    # ── Grade factors (structural stages) ──
+    if "foundation" in stages or "flooring" in stages or "roofing" in stages:
+        conc_fac  = RATES.CONCRETE_GRADE_FACTOR.get(inp.concrete_grade, 1.0)
+        slab_fac  = RATES.SLAB_THICKNESS_FACTOR.get(inp.slab_thickness, 1.0)
 
-    # ── Grade factors ──
-    conc_fac  = CONCRETE_GRADE_FACTOR.get(f("concrete_grade", "M20"), 1.0)
-    steel_fac = STEEL_GRADE_FACTOR.get(f("steel_grade", "Fe500"), 1.0)
-    slab_fac  = SLAB_THICKNESS_FACTOR.get(float(f("slab_thickness", 5) or 5), 1.0)
-    # structure_type: RCC uses ~5% more structural material
-    struct_prem = 1.05 if form.get("structure_type", "rcc") == "rcc" else 1.0
+    # ── Wall areas (walls, finishing, villa cladding) ──
+    if "walls" in stages or "finishing" in stages or (villa and "exterior" in stages):
+        wall_info = _wall_areas(inp.sqft, inp.floors, inp.ceiling_ht,
+                                inp.num_doors, inp.num_windows)
 
     # ── 1. FOUNDATION ──
-    fd_type  = f("foundation_type", "isolated")
-    fd_depth = float(f("foundation_depth", 6) or 6)
-    soil_t   = f("soil_condition", "firm_soil")
-    fd_rate  = (FOUNDATION_RATE.get(fd_type, FOUNDATION_RATE["isolated"])["rate_per_sqft_bua"]
-                * (fd_depth / 6) * conc_fac * slab_fac * struct_prem)
-    anti_t   = ANTI_TERMITE_RATE.get(f("anti_termite", "pre_construction"), 11.5)
-    wproof   = WATERPROOFING_RATE.get(f("roof_waterproofing", "brick_bat_coba"), 42)
-    foundation_cost = (fd_rate * sqft
-                       + SOIL_EXTRA_RATE.get(soil_t, 0) * sqft
-                       + anti_t * plot_area
-                       + wproof * (sqft / max(floors, 1)))
+    if "foundation" in stages:
+        sqft, floors = inp.sqft, inp.floors
+        # structure_type: RCC uses ~5% more structural material
+        struct_prem = 1.05 if inp.structure_type == "rcc" else 1.0
+        fd_rate  = (RATES.FOUNDATION_RATE.get(inp.foundation_type, RATES.FOUNDATION_RATE["isolated"])["rate_per_sqft_bua"]
+                    * (inp.foundation_depth / 6) * conc_fac * slab_fac * struct_prem)
+        anti_t   = RATES.ANTI_TERMITE_RATE.get(inp.anti_termite, 11.5)
+        wproof   = RATES.WATERPROOFING_RATE.get(inp.roof_waterproofing, 42)
+        foundation_cost = (fd_rate * sqft
+                           + RATES.SOIL_EXTRA_RATE.get(inp.soil_condition, 0) * sqft
+                           + anti_t * inp.plot_area
+                           + wproof * (sqft / max(floors, 1)))
+        out["foundation"] = round(foundation_cost, 0)
 
     # ── 2. WALLS ──
-    num_doors   = int(f("num_doors",   6) or 6)
-    num_windows = int(f("num_windows", 8) or 8)
-    wall_mat    = f("wall_material", "red_clay")
-    wm          = WALL_MATERIAL_RATE.get(wall_mat, WALL_MATERIAL_RATE["red_clay"])
-    wall_info   = _wall_areas(sqft, floors, ceiling_ht, num_doors, num_windows)
-    outer_t     = float(f("wall_thickness", 9) or 9) / 9
-    inner_t     = float(f("inner_wall_thickness", 4.5) or 4.5) / 9
-    masonry     = (wall_info["ext_net"] * wm["mat_rate"] * outer_t
-                   + wall_info["int_net"] * wm["mat_rate"] * inner_t)
-    int_plas    = PLASTER_RATE.get(f("plaster_type", "12mm_cm"), 18)
-    ext_plas    = PLASTER_RATE.get(f("external_plaster_type", "12mm_cm_15"), 20)
-    plaster     = wall_info["int_net"] * int_plas + wall_info["ext_net"] * ext_plas
-    door_mat    = f("door_material",   "flush_hollow")
-    win_mat     = f("window_material", "aluminium_sliding")
-    openings    = (DOOR_RATE.get(door_mat, 9000) * num_doors
-                   + WINDOW_RATE.get(win_mat, 13000) * num_windows)
-    walls_cost  = masonry + plaster + openings
+    if "walls" in stages:
+        num_doors   = inp.num_doors
+        num_windows = inp.num_windows
+        wm          = RATES.WALL_MATERIAL_RATE.get(inp.wall_material, RATES.WALL_MATERIAL_RATE["red_clay"])
+        outer_t     = inp.wall_thickness / 9
+        inner_t     = inp.inner_wall_thickness / 9
+        masonry     = (wall_info["ext_net"] * wm["mat_rate"] * outer_t
+                       + wall_info["int_net"] * wm["mat_rate"] * inner_t)
+        int_plas    = RATES.PLASTER_RATE.get(inp.plaster_type, 18)
+        ext_plas    = RATES.PLASTER_RATE.get(inp.external_plaster_type, 20)
+        plaster     = wall_info["int_net"] * int_plas + wall_info["ext_net"] * ext_plas
+        openings    = (RATES.DOOR_RATE.get(inp.door_material, 9000) * num_doors
+                       + RATES.WINDOW_RATE.get(inp.window_material, 13000) * num_windows)
+        walls_cost  = masonry + plaster + openings
+        out["walls"] = round(walls_cost, 0)
 
     # ── 3. FLOORING & SLAB ──
-    # villa uses villa_flooring_grade; residential uses flooring_type
-    if prefix == "villa_":
-        floor_type = f("flooring_grade", "italian_marble")
-    else:
-        floor_type = f("flooring_type", "vitrified")
-    floor_rate = FLOORING_RATE.get(floor_type, 90)
-
-    slab_concrete = sqft * floors * 180 * conc_fac * slab_fac
-    steel_cost    = sqft * floors * 3.5 * 65 * steel_fac
-
-    bath_tile      = f("bathroom_wall_tile", "ceramic_standard")
-    bath_tile_rate = BATH_TILE_RATE.get(bath_tile, 80)
-    bath_tile_cost = bathrooms * 7 * (ceiling_ht * 0.65) * bath_tile_rate
-
-    # Flooring coverage (villa_flooring_coverage via f() helper)
-    cov_map = {"full": 1.0, "ground_only": 1.0 / max(floors, 1), "partial_50": 0.5}
-    cov_fac = cov_map.get(f("flooring_coverage", "full"), 1.0)
-    luxury_area   = sqft * floors * cov_fac
-    standard_area = sqft * floors * (1.0 - cov_fac)
-    flooring_cost = (luxury_area * floor_rate
-                     + standard_area * FLOORING_RATE["vitrified"]
-                     + slab_concrete + steel_cost + bath_tile_cost)
+    if "flooring" in stages:
+        sqft, floors = inp.sqft, inp.floors
+        steel_fac = RATES.STEEL_GRADE_FACTOR.get(inp.steel_grade, 1.0)
+        # villa uses villa_flooring_grade; residential uses flooring_type
+        floor_rate = RATES.FLOORING_RATE.get(inp.floor_type, 90)
+
+        slab_concrete = sqft * floors * 180 * conc_fac * slab_fac
+        steel_cost    = sqft * floors * 3.5 * 65 * steel_fac
+
+        bath_tile_rate = RATES.BATH_TILE_RATE.get(inp.bathroom_wall_tile, 80)
+        bath_tile_cost = inp.bathrooms * 7 * (inp.ceiling_ht * 0.65) * bath_tile_rate
+
+        # Flooring coverage (villa_flooring_coverage via prefix alias)
+        cov_key = inp.flooring_coverage
+        cov_fac = (1.0 / max(floors, 1) if cov_key == "ground_only"
+                   else RATES.FLOORING_COVERAGE.get(cov_key, 1.0))
+        luxury_area   = sqft * floors * cov_fac
+        standard_area = sqft * floors * (1.0 - cov_fac)
+        flooring_cost = (luxury_area * floor_rate
+                         + standard_area * RATES.FLOORING_RATE["vitrified"]
+                         + slab_concrete + steel_cost + bath_tile_cost)
+        out["flooring"] = round(flooring_cost, 0)
 
     # ── 4. ROOFING + STAIRCASE ──
-    roof_type = f("roof_type", "flat_rcc")
-    roof_mult = 1.15 if roof_type == "sloped_tiled" else 1.0
-    roofing_cost = sqft * 190 * conc_fac * slab_fac * roof_mult
+    if "roofing" in stages:
+        roof_mult = 1.15 if inp.roof_type == "sloped_tiled" else 1.0
+        roofing_cost = inp.sqft * 190 * conc_fac * slab_fac * roof_mult
 
-    # Staircase — HTML: residential="staircase_type", villa="villa_staircase"
-    if prefix == "villa_":
-        stair_val = form.get("villa_staircase", "standard")
-    else:
-        stair_val = form.get("staircase_type", "rcc")
-    stair_map = {
-        "rcc": 60000, "standard": 60000, "spiral": 180000,
-        "grand_marble": 450000, "steel_glass": 250000, "wooden": 200000, "none": 0,
-    }
-    roofing_cost += stair_map.get(stair_val, 60000) * max(1, floors - 1)
+        # Staircase — HTML: residential="staircase_type", villa="villa_staircase"
+        roofing_cost += RATES.STAIRCASE_RATE.get(inp.staircase, 60000) * max(1, inp.floors - 1)
+        out["roofing"] = round(roofing_cost, 0)
 
     # ── 5. PLUMBING ──
-    pipe_rate     = PIPE_RATE.get(f("pipe_material", "cpvc"), 150)
-    total_pipe    = (bathrooms * 22) + (floors * 50) + 30
-    num_taps      = int(f("num_taps",    bathrooms * 4 + 4) or (bathrooms * 4 + 4))
-    num_showers   = int(f("num_showers", bathrooms) or bathrooms)
-    num_geysers   = int(f("num_geysers", bathrooms) or bathrooms)
-    san_rate      = SANITARY_RATE.get(f("sanitary_grade", "standard"), 11500)
-    plumbing_cost = (total_pipe * pipe_rate
-                     + san_rate * bathrooms
-                     + num_showers * 5500
-                     + num_geysers * 2200
-                     + num_taps * 850
-                     + 35000 + 4500)   # sump + tank
+    if "plumbing" in stages:
+        bathrooms     = inp.bathrooms
+        pipe_rate     = RATES.PIPE_RATE.get(inp.pipe_material, 150)
+        total_pipe    = (bathrooms * 22) + (inp.floors * 50) + 30
+        num_taps      = inp.num_taps    if inp.num_taps    is not None else bathrooms * 4 + 4
+        num_showers   = inp.num_showers if inp.num_showers is not None else bathrooms
+        num_geysers   = inp.num_geysers if inp.num_geysers is not None else bathrooms
+        san_rate      = RATES.SANITARY_RATE.get(inp.sanitary_grade, 11500)
+        plumbing_cost = (total_pipe * pipe_rate
+                         + san_rate * bathrooms
+                         + num_showers * 5500
+                         + num_geysers * 2200
+                         + num_taps * 850
+                         + 35000 + 4500)   # sump + tank
+        out["plumbing"] = round(plumbing_cost, 0)
 
     # ── 6. ELECTRICAL ──
-    num_sw   = int(f("num_switchboards", rooms * 2 + bathrooms + 3) or (rooms * 2 + bathrooms + 3))
-    num_ac   = int(f("num_ac_points",  0) or 0)
-    wiring   = f("wiring_type",    "fr_pvc")
-    inv      = f("inverter_wiring","none")
-    earth    = f("earthing_system","plate")
-    electrical_cost = (sqft * floors * 2.5 * WIRING_RATE.get(wiring, 30)
-                       + num_sw * 1800
-                       + num_ac * 4500
-                       + EARTHING_RATE.get(earth, 6000)
-                       + {"none": 0, "partial": 15000, "full": 45000}.get(inv, 0))
+    if "electrical" in stages:
+        num_sw   = (inp.num_switchboards if inp.num_switchboards is not None
+                    else inp.rooms * 2 + inp.bathrooms + 3)
+        electrical_cost = (inp.sqft * inp.floors * 2.5 * RATES.WIRING_RATE.get(inp.wiring_type, 30)
+                           + num_sw * 1800
+                           + inp.num_ac_points * 4500
+                           + RATES.EARTHING_RATE.get(inp.earthing_system, 6000)
+                           + RATES.INVERTER_RATE.get(inp.inverter_wiring, 0))
+        out["electrical"] = round(electrical_cost, 0)
 
     # ── 7. FINISHING ──
-    # villa HTML: villa_internal_paint / villa_external_paint
-    # residential HTML: internal_paint_quality / external_paint_quality
-    # f() with prefix resolves correctly for both
-    int_paint  = f("internal_paint_quality", None) or f("internal_paint", "emulsion")
-    ext_paint  = f("external_paint_quality", None) or f("external_paint", "weathershield")
-    int_p_rate = INTERNAL_PAINT_RATE.get(int_paint, 23)
-    ext_p_rate = EXTERNAL_PAINT_RATE.get(ext_paint, 28)
-    int_paint_cost = wall_info["int_net"] * (18 + int_p_rate)
-    ext_paint_cost = wall_info["ext_net"] * ext_p_rate
-
-    # False ceiling key
-    if prefix == "villa_":
-        fc_key = form.get("villa_false_ceiling", "no")
-    else:
-        fc_key = form.get("false_ceiling_yn", "no")
-    fc_cost = _false_ceiling_area(sqft, fc_key) * FALSE_CEILING_RATE
-    finishing_cost = int_paint_cost + ext_paint_cost + fc_cost
+    if "finishing" in stages:
+        # villa HTML: villa_internal_paint / villa_external_paint
+        # residential HTML: internal_paint_quality / external_paint_quality
+        int_paint  = inp.internal_paint_quality or inp.internal_paint
+        ext_paint  = inp.external_paint_quality or inp.external_paint
+        int_p_rate = RATES.INTERNAL_PAINT_RATE.get(int_paint, 23)
+        ext_p_rate = RATES.EXTERNAL_PAINT_RATE.get(ext_paint, 28)
+        int_paint_cost = wall_info["int_net"] * (18 + int_p_rate)
+        ext_paint_cost = wall_info["ext_net"] * ext_p_rate
+
+        # False ceiling key: villa_false_ceiling / false_ceiling_yn
+        fc_cost = _false_ceiling_area(inp.sqft, inp.false_ceiling) * RATES.FALSE_CEILING_RATE
+        finishing_cost = int_paint_cost + ext_paint_cost + fc_cost
+        out["finishing"] = round(finishing_cost, 0)
 
     # ── 8. CARPENTRY & KITCHEN ──
-    kt_type   = f("kitchen_type", "semi_modular")
-    kp_length = float(f("kitchen_platform_length", 10) or 10)
-    kp_stone  = f("kitchen_platform_stone", "granite_standard")
-    kp_cost   = (kp_length * 2.5 * KITCHEN_STONE_RATE.get(kp_stone, 220)
-                 + KITCHEN_PLATFORM_RATE.get(kt_type, 0) * kp_length)
-    base_carp = sqft * 55 * (1.5 if prefix == "villa_" else 1.0)
-    carpentry_cost = base_carp + kp_cost
+    if "carpentry" in stages:
+        kp_length = inp.kitchen_platform_length
+        kp_cost   = (kp_length * 2.5 * RATES.KITCHEN_STONE_RATE.get(inp.kitchen_platform_stone, 220)
+                     + RATES.KITCHEN_PLATFORM_RATE.get(inp.kitchen_type, 0) * kp_length)
+        base_carp = inp.sqft * 55 * (1.5 if villa else 1.0)
+        carpentry_cost = base_carp + kp_cost
+        out["carpentry"] = round(carpentry_cost, 0)
 
     # ── 9. EXTERIOR ──
-    exterior_cost = 0.0
-
-    # Car porch
-    if prefix == "villa_":
-        porch_sz = form.get("villa_car_porch_size")
-    else:
-        porch_sz = form.get("car_porch_size", "single")   # residential default-on
-
-    if porch_sz:
-        porch_map = {"single": 200, "double": 400, "triple": 600}
-        if prefix == "villa_":
-            porch_sqft = float(form.get("villa_car_porch_sqft") or porch_map.get(porch_sz, 200))
-            porch_style= form.get("villa_car_porch_style", "rcc_slab")
-            porch_floor= form.get("villa_porch_flooring", "granite")
-            porch_floor_rate = PORCH_FLOOR_RATE.get(porch_floor, 200)
+    if "exterior" in stages:
+        exterior_cost = 0.0
+
+        # Car porch (residential default-on, villa opt-in)
+        porch_sz = inp.porch_size
+        if porch_sz:
+            porch_sqft = (inp.porch_sqft if inp.porch_sqft is not None
+                          else float(RATES.PORCH_SIZE_SQFT.get(porch_sz, 200)))
+            # residential: plain concrete, no separate floor rate in HTML
+            porch_floor_rate = RATES.PORCH_FLOOR_RATE.get(inp.porch_flooring, 200) if villa else 0
+            porch_style_rate = RATES.PORCH_STYLE_RATE.get(inp.porch_style, 850)
+            exterior_cost += porch_sqft * (porch_style_rate + porch_floor_rate)
+
+        # Garden / landscaping
+        ls_rate = RATES.LANDSCAPING_RATE.get(inp.landscaping_grade, 115) if villa else 60
+        exterior_cost += inp.garden_sqft * ls_rate
+
+        # Boundary wall
+        bw_rft = inp.boundary_rft
+        if villa:
+            bw_height = inp.boundary_height
+            gate_cost = RATES.GATE_RATE.get(inp.gate_type, 45000) if bw_rft else 0
         else:
-            porch_sqft = float(form.get("car_porch_sqft") or porch_map.get(porch_sz, 200))
-            porch_style= form.get("car_porch_style", "rcc_slab")
-            porch_floor_rate = 0   # residential: plain concrete, no separate rate in HTML
-        porch_style_rate = {
-            "rcc_slab": 850, "designer_canopy": 1400,
-            "pergola_style": 1100, "arched": 1200,
-        }.get(porch_style, 850)
-        exterior_cost += porch_sqft * (porch_style_rate + porch_floor_rate)
-
-    # Garden / landscaping
-    if prefix == "villa_":
-        garden_sqft = float(form.get("villa_garden_sqft") or 0)
-        ls_grade    = form.get("villa_landscaping_grade", "standard")
-        ls_rate     = LANDSCAPING_RATE.get(ls_grade, 115)
-    else:
-        garden_sqft = float(form.get("garden_sqft") or 0)
-        ls_rate     = 60
-    exterior_cost += garden_sqft * ls_rate
-
-    # Boundary wall
-    if prefix == "villa_":
-        bw_rft    = float(form.get("villa_boundary_rft")    or 0)
-        bw_height = float(form.get("villa_boundary_height", 8) or 8)
-        bw_finish = form.get("villa_boundary_finish", "stone_cladding")
-        gate_cost = {
-            "ms_fabricated": 45000, "sliding_auto": 115000,
-            "swing_ornamental": 90000, "ss_glass": 185000,
-        }.get(form.get("villa_gate_type", "ms_fabricated"), 45000) if bw_rft else 0
-    else:
-        bw_rft    = float(form.get("boundary_rft") or 0)
-        bw_height = 6.0   # HTML has no boundary_height for residential — default 6 ft
-        bw_finish = form.get("boundary_finish", "plaster")
-        gate_cost = 0     # residential boundary section has no gate field in HTML
-    bw_finish_rate = {
-        "plaster": 180, "exposed": 120, "cladding": 320,
-        "stone_cladding": 380, "composite_cladding": 290,
-    }.get(bw_finish, 180)
-    exterior_cost += bw_rft * bw_height * bw_finish_rate + gate_cost
-
-    # Villa-specific extras
-    if prefix == "villa_":
-        # External cladding
-        cladding  = form.get("villa_cladding", "plaster")
-        exterior_cost += wall_info["ext_net"] * CLADDING_RATE.get(cladding, 0)
-
-        # Swimming pool
-        pl = float(form.get("pool_length") or 0)
-        pw = float(form.get("pool_width")  or 0)
-        pd = float(form.get("pool_depth", 5) or 5)
-        if pl and pw:
-            pool_surface = 2*(pl*pd + pw*pd) + pl*pw
-            pool_fin     = POOL_FINISH_RATE.get(form.get("pool_finish", "vitrified_tile"), 200)
-            pool_deck_fin= POOL_DECK_RATE.get(form.get("pool_deck", "anti_skid_granite"), 180)
-            deck_area    = pool_surface * 1.5
-            pool_shell   = pl * pw * pd * 0.4 * 8000
-            exterior_cost += pool_surface * pool_fin + pool_shell + deck_area * pool_deck_fin
-
-        # Driveway
-        vd_sqft  = float(form.get("villa_driveway_sqft") or 0)
-        vd_rate  = {
-            "interlocking_pavers": 180, "natural_stone_path": 380,
-            "stamped_concrete": 220,    "granite_cobble": 420,
-        }.get(form.get("villa_driveway_finish", "interlocking_pavers"), 180)
-        exterior_cost += vd_sqft * vd_rate
+            bw_height = 6.0   # HTML has no boundary_height for residential — default 6 ft
+            gate_cost = 0     # residential boundary section has no gate field in HTML
+        bw_finish_rate = RATES.BOUNDARY_FINISH_RATE.get(inp.boundary_finish, 180)
+        exterior_cost += bw_rft * bw_height * bw_finish_rate + gate_cost
+
+        # Villa-specific extras
+        if villa:
+            # External cladding
+            exterior_cost += wall_info["ext_net"] * RATES.CLADDING_RATE.get(inp.cladding, 0)
+
+            # Swimming pool
+            pl, pw, pd = inp.pool_length, inp.pool_width, inp.pool_depth
+            if pl and pw:
+                pool_surface = 2*(pl*pd + pw*pd) + pl*pw
+                pool_fin     = RATES.POOL_FINISH_RATE.get(inp.pool_finish, 200)
+                pool_deck_fin= RATES.POOL_DECK_RATE.get(inp.pool_deck, 180)
+                deck_area    = pool_surface * 1.5
+                pool_shell   = pl * pw * pd * 0.4 * 8000
+                exterior_cost += pool_surface * pool_fin + pool_shell + deck_area * pool_deck_fin
+
+            # Driveway
+            vd_rate  = RATES.DRIVEWAY_RATE.get(inp.driveway_finish, 180)
+            exterior_cost += inp.driveway_sqft * vd_rate
+        out["exterior"] = round(exterior_cost, 0)
 
     # ── 10. MISCELLANEOUS ──
-    misc_cost = sqft * floors * 35
+    if "miscellaneous" in stages:
+        misc_cost = inp.sqft * inp.floors * 35
+        out["miscellaneous"] = round(misc_cost, 0)
 
-    return {
-        "foundation":    round(foundation_cost, 0),
-        "walls":         round(walls_cost, 0),
-        "flooring":      round(flooring_cost, 0),
-        "roofing":       round(roofing_cost, 0),
-        "plumbing":      round(plumbing_cost, 0),
-        "electrical":    round(electrical_cost, 0),
-        "finishing":     round(finishing_cost, 0),
-        "carpentry":     round(carpentry_cost, 0),
-        "exterior":      round(exterior_cost, 0),
-        "miscellaneous": round(misc_cost, 0),
-    }
+    return out
 
 
 # ─────────────────────────────────────────────────────────────────
 #  APARTMENT CALCULATOR
 # ─────────────────────────────────────────────────────────────────
 
-def _calc_apartment(form, sqft, plot_area, floors):
-    bhk1 = int(form.get("apt_1bhk_count") or 0)
-    bhk2 = int(form.get("apt_2bhk_count") or 0)
-    bhk3 = int(form.get("apt_3bhk_count") or 0)
-    total_units = int(form.get("apt_total_units") or max(bhk1+bhk2+bhk3, 1))
-    total_baths = bhk1*1 + bhk2*2 + bhk3*3 or total_units * 2
-    ceiling_ht  = float(form.get("apt_ceiling_height") or 10)
-    ca_pct      = float(form.get("apt_common_area_pct") or 20) / 100
+_APT_UNIT_STAGES = frozenset(["walls", "flooring", "plumbing", "electrical",
+                              "finishing", "carpentry", "exterior"])
+
 
-    conc_fac = CONCRETE_GRADE_FACTOR.get(form.get("apt_concrete_grade", "M30"), 1.16)
-    steel_fac= STEEL_GRADE_FACTOR.get(form.get("apt_steel_grade", "Fe500D"), 1.04)
-    slab_fac = SLAB_THICKNESS_FACTOR.get(float(form.get("apt_slab_thickness") or 5), 1.0)
+def _calc_apartment(inp, stages=_ALL_STAGES):
+    """Apartment stage costs; like _calc_residential, only the requested stages."""
+    out = {}
+
+    # ── Unit mix (every per-unit stage) ──
+    if not _APT_UNIT_STAGES.isdisjoint(stages):
+        bhk1, bhk2, bhk3 = inp.apt_1bhk_count, inp.apt_2bhk_count, inp.apt_3bhk_count
+        total_units = (inp.apt_total_units if inp.apt_total_units is not None
+                       else max(bhk1+bhk2+bhk3, 1))
+        total_baths = bhk1*1 + bhk2*2 + bhk3*3 or total_units * 2
+
+    if "foundation" in stages or "flooring" in stages or "roofing" in stages:
+        conc_fac = RATES.CONCRETE_GRADE_FACTOR.get(inp.apt_concrete_grade, 1.16)
+        slab_fac = RATES.SLAB_THICKNESS_FACTOR.get(inp.apt_slab_thickness, 1.0)
+
+    if "walls" in stages or "finishing" in stages:
+        num_doors  = (bhk1*3 + bhk2*5 + bhk3*7) or total_units*4
+        num_windows= (bhk1*4 + bhk2*6 + bhk3*8) or total_units*6
+        wall_info  = _wall_areas(inp.sqft, inp.floors, inp.ceiling_ht, num_doors, num_windows)
 
     # ── Foundation ──
-    fd_type  = form.get("apt_foundation_type", "raft")
-    fd_depth = float(form.get("apt_foundation_depth") or 8)
-    soil     = form.get("apt_soil_condition", "firm_soil")
-    fd_cost  = (FOUNDATION_RATE.get(fd_type, FOUNDATION_RATE["raft"])["rate_per_sqft_bua"]
-                * (fd_depth/8) * conc_fac * slab_fac * sqft)
-    anti_t   = ANTI_TERMITE_RATE.get(form.get("apt_anti_termite", "pre_construction"), 11.5) * plot_area
-    wproof   = WATERPROOFING_RATE.get(form.get("apt_roof_waterproofing", "membrane"), 65) * (sqft/max(floors,1))
-    foundation_cost = fd_cost + SOIL_EXTRA_RATE.get(soil, 0)*sqft + anti_t + wproof
-
-    # Basement
-    park_type = form.get("apt_parking_type", "open")
-    if park_type.startswith("basement"):
-        b_depth  = float(form.get("apt_basement_depth") or 14)
-        b_levels = 2 if park_type == "basement_2" else 1
-        bw_rate  = WATERPROOFING_RATE.get(form.get("apt_basement_waterproofing", "membrane"), 65)
-        foundation_cost += (sqft * b_depth * 0.15 * conc_fac * b_levels
-                            + sqft * bw_rate * 0.4 * b_levels)
+    if "foundation" in stages:
+        sqft, floors = inp.sqft, inp.floors
+        fd_cost  = (RATES.FOUNDATION_RATE.get(inp.apt_foundation_type, RATES.FOUNDATION_RATE["raft"])["rate_per_sqft_bua"]
+                    * (inp.apt_foundation_depth/8) * conc_fac * slab_fac * sqft)
+        anti_t   = RATES.ANTI_TERMITE_RATE.get(inp.apt_anti_termite, 11.5) * inp.plot_area
+        wproof   = RATES.WATERPROOFING_RATE.get(inp.apt_roof_waterproofing, 65) * (sqft/max(floors,1))
+        foundation_cost = fd_cost + RATES.SOIL_EXTRA_RATE.get(inp.apt_soil_condition, 0)*sqft + anti_t + wproof
+
+        # Basement
+        park_type = inp.apt_parking_type
+        if park_type.startswith("basement"):
+            b_depth  = float(inp.apt_basement_depth or 14)
+            b_levels = 2 if park_type == "basement_2" else 1
+            bw_rate  = RATES.WATERPROOFING_RATE.get(inp.apt_basement_waterproofing, 65)
+            foundation_cost += (sqft * b_depth * 0.15 * conc_fac * b_levels
+                                + sqft * bw_rate * 0.4 * b_levels)
+        out["foundation"] = round(foundation_cost, 0)
 
     # ── Walls ──
-    wall_mat   = form.get("apt_wall_material", "aac_blocks")
-    wm         = WALL_MATERIAL_RATE.get(wall_mat, WALL_MATERIAL_RATE["aac_blocks"])
-    num_doors  = (bhk1*3 + bhk2*5 + bhk3*7) or total_units*4
-    num_windows= (bhk1*4 + bhk2*6 + bhk3*8) or total_units*6
-    wall_info  = _wall_areas(sqft, floors, ceiling_ht, num_doors, num_windows)
-    outer_t    = float(form.get("apt_wall_thickness", 9) or 9) / 9
-    part_rate  = {"aac_blocks": 1.0, "fly_ash_partition": 0.9, "drywall": 1.3}.get(
-                  form.get("apt_partition_material", "aac_blocks"), 1.0)
-    masonry    = (wall_info["ext_net"] * wm["mat_rate"] * outer_t
-                  + wall_info["int_net"] * wm["mat_rate"] * 0.5 * part_rate)
-    int_plas   = PLASTER_RATE.get(form.get("apt_internal_plaster", "gypsum"), 28)
-    ext_plas   = PLASTER_RATE.get(form.get("apt_external_plaster", "12mm_cm_15"), 20)
-    plaster    = wall_info["int_net"] * int_plas + wall_info["ext_net"] * ext_plas
-    door_mat   = form.get("apt_door_material",   "flush_solid")
-    win_mat    = form.get("apt_window_material",  "aluminium_sliding")
-    openings   = (DOOR_RATE.get(door_mat, 22000)*num_doors
-                  + WINDOW_RATE.get(win_mat, 13000)*num_windows)
-    facade_t   = form.get("apt_facade_type", "plaster_paint")
-    ext_paint  = EXTERNAL_PAINT_RATE.get(form.get("apt_external_paint", "weathershield"), 28)
-    facade_cost= wall_info["ext_net"] * (FACADE_RATE.get(facade_t, 100) + ext_paint)
-    num_stairs = int(form.get("apt_staircases") or 2)
-    stair_t    = form.get("apt_staircase_type", "rcc_enclosed")
-    stair_rate = {"rcc_open": 55000, "rcc_enclosed": 80000,
-                  "fire_rated": 130000, "smoke_lobby": 200000}.get(stair_t, 80000)
-    walls_cost = masonry + plaster + openings + facade_cost + num_stairs * stair_rate * floors
+    if "walls" in stages:
+        wm         = RATES.WALL_MATERIAL_RATE.get(inp.apt_wall_material, RATES.WALL_MATERIAL_RATE["aac_blocks"])
+        outer_t    = inp.apt_wall_thickness / 9
+        part_rate  = RATES.APT_PARTITION_FACTOR.get(inp.apt_partition_material, 1.0)
+        masonry    = (wall_info["ext_net"] * wm["mat_rate"] * outer_t
+                      + wall_info["int_net"] * wm["mat_rate"] * 0.5 * part_rate)
+        int_plas   = RATES.PLASTER_RATE.get(inp.apt_internal_plaster, 28)
+        ext_plas   = RATES.PLASTER_RATE.get(inp.apt_external_plaster, 20)
+        plaster    = wall_info["int_net"] * int_plas + wall_info["ext_net"] * ext_plas
+        openings   = (RATES.DOOR_RATE.get(inp.apt_door_material, 22000)*num_doors
+                      + RATES.WINDOW_RATE.get(inp.apt_window_material, 13000)*num_windows)
+        ext_paint  = RATES.EXTERNAL_PAINT_RATE.get(inp.apt_external_paint, 28)
+        facade_cost= wall_info["ext_net"] * (RATES.FACADE_RATE.get(inp.apt_facade_type, 100) + ext_paint)
+        num_stairs = inp.apt_staircases
+        stair_rate = RATES.APT_STAIRCASE_RATE.get(inp.apt_staircase_type, 80000)
+        walls_cost = masonry + plaster + openings + facade_cost + num_stairs * stair_rate * inp.floors
+        out["walls"] = round(walls_cost, 0)
 
     # ── Flooring & Slab ──
-    slab_concrete= sqft * floors * 200 * conc_fac * slab_fac
-    steel_cost   = sqft * floors * 4.0 * 65 * steel_fac
-    floor_type   = form.get("apt_flooring_type", "vitrified")
-    flooring_mat = sqft * (1 - ca_pct) * FLOORING_RATE.get(floor_type, 90)
-    bath_tile    = form.get("apt_bathroom_tile", "ceramic_standard")
-    bath_tile_cost = total_baths * 7 * (ceiling_ht * 0.65) * BATH_TILE_RATE.get(bath_tile, 80)
-    flooring_cost  = slab_concrete + steel_cost + flooring_mat + bath_tile_cost
+    if "flooring" in stages:
+        sqft, floors = inp.sqft, inp.floors
+        steel_fac    = RATES.STEEL_GRADE_FACTOR.get(inp.apt_steel_grade, 1.04)
+        ca_pct       = inp.apt_common_area_pct / 100
+        slab_concrete= sqft * floors * 200 * conc_fac * slab_fac
+        steel_cost   = sqft * floors * 4.0 * 65 * steel_fac
+        flooring_mat = sqft * (1 - ca_pct) * RATES.FLOORING_RATE.get(inp.apt_flooring_type, 90)
+        bath_tile_cost = (total_baths * 7 * (inp.ceiling_ht * 0.65)
+                          * RATES.BATH_TILE_RATE.get(inp.apt_bathroom_tile, 80))
+        flooring_cost  = slab_concrete + steel_cost + flooring_mat + bath_tile_cost
+        out["flooring"] = round(flooring_cost, 0)
 
     # ── Roofing ──
-    roofing_cost = (sqft / max(floors,1)) * 190 * conc_fac * slab_fac
+    if "roofing" in stages:
+        roofing_cost = (inp.sqft / max(inp.floors,1)) * 190 * conc_fac * slab_fac
+        out["roofing"] = round(roofing_cost, 0)
 
     # ── Plumbing ──
-    pipe_cost   = ((total_baths*22 + floors*50 + total_units*15) * PIPE_RATE["cpvc"])
-    san_cost    = SANITARY_RATE.get(form.get("apt_sanitary_grade", "standard"), 11500) * total_baths
-    sump_cost   = 80000 + total_units * 1500
-    plumbing_cost = pipe_cost + san_cost + sump_cost
+    if "plumbing" in stages:
+        pipe_cost   = ((total_baths*22 + inp.floors*50 + total_units*15) * RATES.PIPE_RATE["cpvc"])
+        san_cost    = RATES.SANITARY_RATE.get(inp.apt_sanitary_grade, 11500) * total_baths
+        sump_cost   = 80000 + total_units * 1500
+        plumbing_cost = pipe_cost + san_cost + sump_cost
+        out["plumbing"] = round(plumbing_cost, 0)
 
     # ── Electrical ──
-    # No apt wiring/switchboard fields in HTML — derive from units/floors
-    num_sw   = total_units * 8 + floors * 2
-    wire_cost= sqft * 2.5 * WIRING_RATE["fr_pvc"]
-    sw_cost  = num_sw * 1800
-    earth_cost = EARTHING_RATE["plate"] * floors
-    inv_cost   = total_units * 8000
-    num_lifts  = int(form.get("apt_lifts") or 0)
-    lift_cap   = form.get("apt_lift_capacity", "8")
-    lift_cost  = {"6": 1200000, "8": 1800000, "13": 2800000,
-                  "service": 2200000}.get(str(lift_cap), 1800000) * num_lifts
-    dg = form.get("apt_dg_backup", "common_only")
-    dg_cost = {"none": 0, "common_only": 350000,
-               "partial": total_units*18000, "full": total_units*40000}.get(dg, 350000)
-    electrical_cost = wire_cost + sw_cost + earth_cost + inv_cost + lift_cost + dg_cost
+    if "electrical" in stages:
+        floors   = inp.floors
+        # No apt wiring/switchboard fields in HTML — derive from units/floors
+        num_sw   = total_units * 8 + floors * 2
+        wire_cost= inp.sqft * 2.5 * RATES.WIRING_RATE["fr_pvc"]
+        sw_cost  = num_sw * 1800
+        earth_cost = RATES.EARTHING_RATE["plate"] * floors
+        inv_cost   = total_units * 8000
+        lift_cost  = RATES.LIFT_RATE.get(str(inp.apt_lift_capacity), 1800000) * inp.apt_lifts
+        dg_cost = {"none": 0, "common_only": 350000,
+                   "partial": total_units*18000, "full": total_units*40000}.get(inp.apt_dg_backup, 350000)
+        electrical_cost = wire_cost + sw_cost + earth_cost + inv_cost + lift_cost + dg_cost
+        out["electrical"] = round(electrical_cost, 0)
 
     # ── Finishing ──
-    int_paint  = form.get("apt_internal_paint", "emulsion")
-    int_p_cost = wall_info["int_net"] * (18 + INTERNAL_PAINT_RATE.get(int_paint, 23))
-    # apt_false_ceiling: HTML values "none"/"partial"/"full"
-    fc_per = form.get("apt_false_ceiling", "none")
-    fc_area= _false_ceiling_area(sqft / max(total_units,1), fc_per) * total_units
-    finishing_cost = int_p_cost + fc_area * FALSE_CEILING_RATE
+    if "finishing" in stages:
+        int_p_cost = wall_info["int_net"] * (18 + RATES.INTERNAL_PAINT_RATE.get(inp.apt_internal_paint, 23))
+        # apt_false_ceiling: HTML values "none"/"partial"/"full"
+        fc_area= _false_ceiling_area(inp.sqft / max(total_units,1), inp.apt_false_ceiling) * total_units
+        finishing_cost = int_p_cost + fc_area * RATES.FALSE_CEILING_RATE
+        out["finishing"] = round(finishing_cost, 0)
 
     # ── Carpentry ──
-    kt_type  = form.get("apt_kitchen_type", "semi_modular")
-    mod_extra= KITCHEN_PLATFORM_RATE.get(kt_type, 0) * 8 * total_units
-    carpentry_cost = sqft * 40 + mod_extra
+    if "carpentry" in stages:
+        mod_extra= RATES.KITCHEN_PLATFORM_RATE.get(inp.apt_kitchen_type, 0) * 8 * total_units
+        carpentry_cost = inp.sqft * 40 + mod_extra
+        out["carpentry"] = round(carpentry_cost, 0)
 
     # ── Exterior / Amenities ──
-    exterior_cost = 0.0
-
-    # Parking floor finish
-    park_slots = int(form.get("apt_parking_slots") or 0)
-    park_rate  = {"pcc": 90, "epoxy": 180, "interlocking": 160,
-                  "polished_concrete": 220, "anti_skid_ramp": 140}.get(
-                   form.get("apt_parking_floor", "epoxy"), 180)
-    slot_area  = park_slots * float(form.get("apt_slot_length") or 18) * float(form.get("apt_slot_width") or 8.5)
-    exterior_cost += slot_area * park_rate
-
-    # Pool
-    apt_pool = form.get("apt_pool", "none")
-    if apt_pool != "none":
-        pa = {"small": 600, "standard": 1200, "lap_pool": 1600}.get(apt_pool, 600)
-        pool_fin = POOL_FINISH_RATE.get(form.get("apt_pool_finish", "vitrified_tile"), 200)
-        exterior_cost += pa * (pool_fin + 1200)
-
-    # Clubhouse
-    exterior_cost += {"none": 0, "basic": 1500000, "standard": 4000000,
-                       "full": 10000000}.get(form.get("apt_clubhouse", "none"), 0)
-
-    # Play area
-    exterior_cost += {"none": 0, "basic": 150000, "standard": 350000}.get(
-                      form.get("apt_play_area", "none"), 0)
-
-    # Fire suppression
-    fire_spec = form.get("apt_fire_spec", "wet_riser")
-    exterior_cost += {"wet_riser": 800, "sprinkler_full": 1400, "both": 2000}.get(
-                      fire_spec, 800) * sqft / max(floors, 1)
-
-    # STP
-    if form.get("apt_stp_type"):
-        exterior_cost += {"stp_only": 800000, "stp_rwh": 1200000,
-                          "stp_wtp_rwh": 2000000}.get(form.get("apt_stp_type"), 800000)
-
-    # CCTV / Security
-    sec = form.get("apt_security_level", "")
-    if sec:
-        exterior_cost += {"basic": 120000, "standard": total_units*8000,
-                          "smart": total_units*18000}.get(sec, 0)
-
-    # Solar
-    exterior_cost += float(form.get("apt_solar_kw") or 0) * 55000
-
-    # Landscape
-    ls_sqft = max(0, plot_area - sqft / max(floors, 1))
-    ls_rate = {"none": 0, "basic": 60, "designed": 180, "terrace": 250}.get(
-               form.get("apt_landscape", "none"), 0)
-    exterior_cost += ls_sqft * ls_rate
+    if "exterior" in stages:
+        sqft, floors = inp.sqft, inp.floors
+        exterior_cost = 0.0
+
+        # Parking floor finish
+        park_rate  = RATES.PARKING_FLOOR_RATE.get(inp.apt_parking_floor, 180)
+        slot_area  = inp.apt_parking_slots * inp.apt_slot_length * inp.apt_slot_width
+        exterior_cost += slot_area * park_rate
+
+        # Pool
+        apt_pool = inp.apt_pool
+        if apt_pool != "none":
+            pa = RATES.APT_POOL_AREA.get(apt_pool, 600)
+            pool_fin = RATES.POOL_FINISH_RATE.get(inp.apt_pool_finish, 200)
+            exterior_cost += pa * (pool_fin + 1200)
+
+        # Clubhouse
+        exterior_cost += RATES.CLUBHOUSE_RATE.get(inp.apt_clubhouse, 0)
+
+        # Play area
+        exterior_cost += RATES.PLAY_AREA_RATE.get(inp.apt_play_area, 0)
+
+        # Fire suppression
+        exterior_cost += RATES.FIRE_SPEC_RATE.get(inp.apt_fire_spec, 800) * sqft / max(floors, 1)
+
+        # STP
+        if inp.apt_stp_type:
+            exterior_cost += RATES.STP_RATE.get(inp.apt_stp_type, 800000)
+
+        # CCTV / Security
+        sec = inp.apt_security_level
+        if sec:
+            exterior_cost += {"basic": 120000, "standard": total_units*8000,
+                              "smart": total_units*18000}.get(sec, 0)
+
+        # Solar
+        exterior_cost += inp.apt_solar_kw * 55000
+
+        # Landscape
+        ls_sqft = max(0, inp.plot_area - sqft / max(floors, 1))
+        ls_rate = RATES.APT_LANDSCAPE_RATE.get(inp.apt_landscape, 0)
+        exterior_cost += ls_sqft * ls_rate
+        out["exterior"] = round(exterior_cost, 0)
 
     # Misc
-    misc_cost = sqft * floors * 40
+    if "miscellaneous" in stages:
+        misc_cost = inp.sqft * inp.floors * 40
+        out["miscellaneous"] = round(misc_cost, 0)
 
-    return {
-        "foundation":    round(foundation_cost, 0),
-        "walls":         round(walls_cost, 0),
-        "flooring":      round(flooring_cost, 0),
-        "roofing":       round(roofing_cost, 0),
-        "plumbing":      round(plumbing_cost, 0),
-        "electrical":    round(electrical_cost, 0),
-        "finishing":     round(finishing_cost, 0),
-        "carpentry":     round(carpentry_cost, 0),
-        "exterior":      round(exterior_cost, 0),
-        "miscellaneous": round(misc_cost, 0),
-    }
+    return out
 
 
 # ─────────────────────────────────────────────────────────────────
@@ -579,7 +452,6 @@ def _calc_apartment(form, sqft, plot_area, floors):
 
 TIER_FACTOR = {"low": 0.75, "medium": 1.00, "high": 1.40}
 
-
 def _build_cost_tiers(base_breakdown, scope):
     labour_pct = 0.22 if scope == "material_and_labour" else 0.0
     all_costs  = {}
@@ -602,20 +474,17 @@ def _build_cost_tiers(base_breakdown, scope):
 #  MATERIAL QUANTITIES (BOQ)
 # ─────────────────────────────────────────────────────────────────
 
-def _build_quantities(sqft, floors, rooms, bathrooms, ceiling_ht, form, prefix=""):
-    p = prefix
-
-    def f(key, default=None):
-        return form.get(f"{p}{key}", form.get(key, default))
+def _build_quantities(inp):
+    sqft, floors, ceiling_ht = inp.sqft, inp.floors, inp.ceiling_ht
+    rooms, bathrooms = inp.q_rooms, inp.q_baths
 
-    slab_fac  = SLAB_THICKNESS_FACTOR.get(float(f("slab_thickness", 5) or 5), 1.0)
-    conc_fac  = CONCRETE_GRADE_FACTOR.get(f("concrete_grade", "M20"), 1.0)
-    steel_fac = STEEL_GRADE_FACTOR.get(f("steel_grade", "Fe500"), 1.0)
-    num_doors   = int(f("num_doors",   6) or 6)
-    num_windows = int(f("num_windows", 8) or 8)
+    slab_fac  = RATES.SLAB_THICKNESS_FACTOR.get(inp.slab_thickness, 1.0)
+    conc_fac  = RATES.CONCRETE_GRADE_FACTOR.get(inp.concrete_grade, 1.0)
+    steel_fac = RATES.STEEL_GRADE_FACTOR.get(inp.steel_grade, 1.0)
+    num_doors   = inp.num_doors
+    num_windows = inp.num_windows
     wall_info   = _wall_areas(sqft, floors, ceiling_ht, num_doors, num_windows)
-    wm          = WALL_MATERIAL_RATE.get(f("wall_material", "red_clay"),
-                                         WALL_MATERIAL_RATE["red_clay"])
+    wm          = RATES.WALL_MATERIAL_RATE.get(inp.wall_material, RATES.WALL_MATERIAL_RATE["red_clay"])
 
     foundation = {
         "cement_bags":      round(sqft * 0.175 * floors * conc_fac * slab_fac, 1),
@@ -637,12 +506,6 @@ def _build_quantities(sqft, floors, rooms, bathrooms, ceiling_ht, form, prefix="
         "external_plaster_sqft": round(wall_info["ext_net"], 1),
     }
 
-    # Flooring quantity key: villa=flooring_grade, residential/apt=flooring_type
-    if prefix == "villa_":
-        _floor_type = f("flooring_grade", "italian_marble")
-    else:
-        _floor_type = f("flooring_type", "vitrified")
-
     flooring = {
         "cement_bags":               round(sqft * 0.15 * floors * conc_fac * slab_fac, 1),
         "sand_cuft":                 round(sqft * 0.38 * floors * slab_fac, 1),
@@ -666,13 +529,13 @@ def _build_quantities(sqft, floors, rooms, bathrooms, ceiling_ht, form, prefix="
         "pvc_pipes_meters":  round(total_pipe * 0.40, 1),
         "cpvc_pipes_meters": round(total_pipe * 0.35, 1),
         "gi_pipes_meters":   round(total_pipe * 0.15, 1),
-        "water_tank_liters": int(f("overhead_tank_capacity", 1000) or 1000),
-        "taps":              int(f("num_taps",    bathrooms*4+4) or (bathrooms*4+4)),
+        "water_tank_liters": inp.overhead_tank_capacity,
+        "taps":              inp.num_taps if inp.num_taps is not None else bathrooms*4+4,
         "washbasins":        bathrooms,
         "toilets":           bathrooms,
         "kitchen_sink":      1,
         "valves":            bathrooms * 3 + 3,
-        "showers":           int(f("num_showers", bathrooms) or bathrooms),
+        "showers":           inp.num_showers if inp.num_showers is not None else bathrooms,
     }
 
     electrical = {
@@ -684,18 +547,12 @@ def _build_quantities(sqft, floors, rooms, bathrooms, ceiling_ht, form, prefix="
         "mcb_breakers":     6 + (floors * 2),
         "distribution_box": floors,
         "conduits_meters":  round(sqft * 1.5, 1),
-        "ac_points":        int(f("num_ac_points", 0) or 0),
+        "ac_points":        inp.num_ac_points,
     }
 
-    kp_len = float(f("kitchen_platform_length", 10) or 10)
-    # false ceiling key per type
-    if prefix == "villa_":
-        fc_key = form.get("villa_false_ceiling", "no")
-    elif prefix == "":
-        fc_key = form.get("false_ceiling_yn", "no") or "no"
-    else:
-        fc_key = form.get("apt_false_ceiling", "none")
-    fc_area = _false_ceiling_area(sqft, fc_key)
+    kp_len = inp.kitchen_platform_length
+    # false ceiling key: villa_false_ceiling, else false_ceiling_yn (apartments too)
+    fc_area = _false_ceiling_area(sqft, inp.false_ceiling)
 
     finishing = {
         "putty_kg":              round(wall_info["int_net"] * 0.8, 1),
@@ -716,10 +573,10 @@ def _build_quantities(sqft, floors, rooms, bathrooms, ceiling_ht, form, prefix="
     }
 
     exterior = {
-        "car_porch_sqft":       float(f("car_porch_sqft") or 200),
-        "boundary_wall_rft":    float(f("boundary_rft") or 0),
-        "garden_sqft":          float(f("garden_sqft") or 0),
-        "sump_capacity_liters": int(f("sump_capacity", 5000) or 5000),
+        "car_porch_sqft":       inp.boq_porch_sqft,
+        "boundary_wall_rft":    inp.boq_boundary_rft,
+        "garden_sqft":          inp.boq_garden_sqft,
+        "sump_capacity_liters": inp.sump_capacity,
     }
 
     miscellaneous = {
@@ -761,26 +618,31 @@ def _build_timeline(sqft, floors, rooms):
 #  AI REFINEMENT
 # ─────────────────────────────────────────────────────────────────
 
-def _ai_refine_estimate(base_costs, form, sqft, property_type):
+def ai_inputs_key(inp):
+    """
+    Factor-cache key of everything the AI refine call is keyed on (property
+    type, sqft bucket, location, key inputs). Stage costs are not part of it,
+    so an edit that leaves this key alone can reuse the stored factors.
+    """
+    from services.ai_guard import summary_key
+    return summary_key({
+        "sqft": inp.sqft,
+        "property_type": inp.prop_type,
+        "location": inp.location,
+        "key_inputs": dict(inp.ai_inputs),
+    })
+
+
+def _ai_refine_estimate(base_costs, inp):
     import json, requests
+    sqft, property_type = inp.sqft, inp.prop_type
     summary = {
         "sqft": sqft,
         "property_type": property_type,
-        "location": form.get("location", "India"),
+        "location": inp.location,
         "base_total_medium": base_costs.get("medium", {}).get("total_cost", 0),
         "stages": dict(base_costs.get("medium", {}).get("stage_breakdown", {})),
-        "key_inputs": {
-            "concrete_grade": (form.get("concrete_grade") or form.get("villa_concrete_grade")
-                               or form.get("apt_concrete_grade")),
-            "steel_grade":    (form.get("steel_grade") or form.get("villa_steel_grade")
-                               or form.get("apt_steel_grade")),
-            "soil_condition": (form.get("soil_condition") or form.get("villa_soil_condition")
-                               or form.get("apt_soil_condition")),
-            "foundation_type":(form.get("foundation_type") or form.get("villa_foundation_type")
-                               or form.get("apt_foundation_type")),
-            "flooring":       (form.get("flooring_type") or form.get("villa_flooring_grade")
-                               or form.get("apt_flooring_type")),
-        },
+        "key_inputs": dict(inp.ai_inputs),
     }
     prompt = (
         f"You are a senior construction cost estimator in India.\n"
@@ -792,20 +654,31 @@ def _ai_refine_estimate(base_costs, form, sqft, property_type):
         f'"electrical":1.0,"finishing":1.0,"carpentry":1.0,"exterior":1.0,'
         f'"miscellaneous":1.0,"rationale":"...","confidence":8}}'
     )
-    try:
+    headers = {"Content-Type": "application/json"}
+    if Config.AI_REFINE_API_KEY:
+        headers.update({"x-api-key": Config.AI_REFINE_API_KEY,
+                        "anthropic-version": "2023-06-01"})
+
+    def _call():
         resp = requests.post(
-            "https://api.anthropic.com/v1/messages",
-            headers={"Content-Type": "application/json"},
+            Config.AI_REFINE_URL,
+            headers=headers,
             json={"model": "claude-sonnet-4-6", "max_tokens": 512,
                   "messages": [{"role": "user", "content": prompt}]},
-            timeout=12,
+            timeout=Config.AI_REFINE_TIMEOUT,
         )
-        if resp.status_code == 200:
-            data = resp.json()
-            text = "".join(b.get("text","") for b in data.get("content",[])
-                           if b.get("type") == "text")
-            text = text.strip().lstrip("```json").lstrip("```").rstrip("```").strip()
-            return json.loads(text)
+        if resp.status_code != 200:
+            raise RuntimeError(f"HTTP {resp.status_code}")
+        data = resp.json()
+        text = "".join(b.get("text","") for b in data.get("content",[])
+                       if b.get("type") == "text")
+        text = text.strip().lstrip("```json").lstrip("```").rstrip("```").strip()
+        return json.loads(text)
+
+    # Breaker + factor cache + coalescing of identical in-flight summaries
+    from services.ai_guard import ai_guard
+    try:
+        return ai_guard.call(ai_inputs_key(inp), _call)
     except Exception as e:
         print(f"[AI refine] skipped: {e}")
     return {}
@@ -814,10 +687,8 @@ def _ai_refine_estimate(base_costs, form, sqft, property_type):
 def _apply_ai_factors(costs, factors):
     if not factors:
         return costs
-    stage_keys = ["foundation","walls","flooring","roofing","plumbing",
-                  "electrical","finishing","carpentry","exterior","miscellaneous"]
     for tier in costs:
-        for stage in stage_keys:
+        for stage in STAGE_KEYS:
             fac = max(0.75, min(1.35, float(factors.get(stage, 1.0))))
             costs[tier]["stage_breakdown"][stage] = round(
                 costs[tier]["stage_breakdown"][stage] * fac, 0)
@@ -833,89 +704,101 @@ def _apply_ai_factors(costs, factors):
     return costs
 
 
+def apply_ai_refinement(estimation, factors):
+    """Copy of a deterministic (refine=False) estimation with AI factors applied."""
+    import copy
+    refined = copy.deepcopy(estimation)
+    refined["costs"]         = _apply_ai_factors(refined["costs"], factors)
+    refined["ai_rationale"]  = factors.get("rationale", "")
+    refined["ai_confidence"] = factors.get("confidence", "")
+    # Kept so an edit with the same ai_key can re-apply them without a call
+    refined["ai_factors"]    = {k: factors[k] for k in STAGE_KEYS if k in factors}
+    return refined
+
+
+# ─────────────────────────────────────────────────────────────────
+#  ESTIMATOR INPUTS
+# ─────────────────────────────────────────────────────────────────
+
+# Every form key the estimator (incl. the AI summary) can read, per property
+# type, derived from the form schema. Unknown property types are estimated as
+# residential. Anything not listed here cannot change the result.
+ESTIMATOR_FIELDS = {kind: form_keys(kind) for kind in PROPERTY_TYPES}
+
+
+def _rate_table_version():
+    """Short content hash of every rate table and module-level constant."""
+    import hashlib, json
+    tables = {k: v for k, v in sorted(globals().items())
+              if k.isupper() and isinstance(v, (dict, list, int, float))}
+    tables.update(RATES._asdict())
+    blob = json.dumps(tables, sort_keys=True,
+                      default=lambda v: dict(v) if isinstance(v, MappingProxyType) else str(v))
+    return hashlib.sha1(blob.encode()).hexdigest()[:12]
+
+
+RATE_TABLE_VERSION = _rate_table_version()
+
+
+def rate_table_version():
+    """RATE_TABLE_VERSION as of now - it changes when the rate file is reloaded."""
+    return RATE_TABLE_VERSION
+
+
+def _on_rates_reloaded(snapshot):
+    global RATE_TABLE_VERSION
+    RATE_TABLE_VERSION = _rate_table_version()
+
+
+rate_tables.on_reload(_on_rates_reloaded)
+
+
 # ─────────────────────────────────────────────────────────────────
 #  PUBLIC ENTRY POINT
 # ─────────────────────────────────────────────────────────────────
 
 def calculate_materials_and_cost(square_feet, rooms, floors, bathrooms,
-                                 budget_range, form: Optional[dict] = None):
+                                 budget_range, form: Optional[dict] = None,
+                                 refine: bool = True):
     """
     Main function called from user_routes.py.
     Pass form=request.form for full detail calculation.
     All 169 HTML fields from create_project.html are now properly consumed.
+    refine=False skips the AI adjustment call (deterministic estimate only).
     """
-    if form is None:
-        form = {}
-
-    sqft      = float(square_feet)
-    rooms     = max(1, int(rooms))
-    bathrooms = max(1, int(bathrooms))
-    plot_area = float(form.get("plot_area") or sqft * 1.3)
-    prop_type = form.get("property_type", "residential")
-    scope     = form.get("estimate_scope", "material_only")
-
-    # Floors — for apartment, authoritative source is apt_total_floors form field
-    if prop_type == "apartment":
-        try:
-            floors = max(1, int(form.get("apt_total_floors", floors) or floors))
-            if floors == 99:
-                floors = 30   # sentinel for "30+" option
-        except (ValueError, TypeError):
-            floors = max(1, int(floors))
-    else:
-        floors = max(1, int(floors))
+    rate_tables.maybe_reload()
+    inp = resolve_inputs(square_feet, rooms, floors, bathrooms, budget_range, form)
+    return estimate_from_inputs(inp, refine=refine)
 
-    # Ceiling height
-    if prop_type == "villa":
-        ceiling_ht = float(form.get("villa_ceiling_height") or form.get("ceiling_height") or 12)
-    elif prop_type == "apartment":
-        ceiling_ht = float(form.get("apt_ceiling_height") or 10)
-    else:
-        ceiling_ht = float(form.get("ceiling_height") or 10)
 
+def estimate_from_inputs(inp, refine: bool = True):
+    """Estimate from an already-resolved EstimateInputs record (see form_schema)."""
+    version = RATE_TABLE_VERSION
     # ── Sub-calculator ──
-    if prop_type == "villa":
-        base_bd = _calc_residential(form, sqft, plot_area, floors,
-                                    bathrooms, rooms, ceiling_ht, prefix="villa_")
-    elif prop_type == "apartment":
-        base_bd = _calc_apartment(form, sqft, plot_area, floors)
+    if inp.kind == "apartment":
+        base_bd = _calc_apartment(inp)
     else:
-        base_bd = _calc_residential(form, sqft, plot_area, floors,
-                                    bathrooms, rooms, ceiling_ht, prefix="")
+        base_bd = _calc_residential(inp)
 
-    costs = _build_cost_tiers(base_bd, scope)
+    costs = _build_cost_tiers(base_bd, inp.scope)
 
-    # AI refinement (non-blocking)
-    ai_factors = _ai_refine_estimate(costs, form, sqft, prop_type)
+    # AI refinement (skipped when refine=False; see ai_refine_service for async)
+    ai_factors = _ai_refine_estimate(costs, inp) if refine else {}
     costs      = _apply_ai_factors(costs, ai_factors)
 
     # Material quantities
-    if prop_type == "villa":
-        materials = _build_quantities(sqft, floors, rooms, bathrooms,
-                                      ceiling_ht, form, prefix="villa_")
-    elif prop_type == "apartment":
-        total_units = int(form.get("apt_total_units") or 1)
-        bhk1 = int(form.get("apt_1bhk_count") or 0)
-        bhk2 = int(form.get("apt_2bhk_count") or 0)
-        bhk3 = int(form.get("apt_3bhk_count") or 0)
-        total_baths = bhk1 + bhk2*2 + bhk3*3 or total_units * 2
-        avg_baths   = max(1, total_baths // max(total_units, 1))
-        materials = _build_quantities(sqft, floors, rooms or total_units*2,
-                                      avg_baths or bathrooms, ceiling_ht, form, prefix="")
-    else:
-        materials = _build_quantities(sqft, floors, rooms, bathrooms,
-                                      ceiling_ht, form, prefix="")
-
-    timeline = _build_timeline(sqft, floors, rooms)
+    materials = _build_quantities(inp)
+    timeline  = _build_timeline(inp.sqft, inp.floors, inp.rooms)
 
     return {
         "materials":             materials,
         "costs":                 costs,
         "timeline":              timeline,
-        "selected_budget":       budget_range,
+        "selected_budget":       inp.budget_range,
         "total_materials_count": sum(len(s) for s in materials.values()),
         "ai_rationale":          ai_factors.get("rationale", ""),
         "ai_confidence":         ai_factors.get("confidence", ""),
-        "estimate_scope":        scope,
-        "property_type":         prop_type,
-    }
\ No newline at end of file
+        "estimate_scope":        inp.scope,
+        "property_type":         inp.prop_type,
+        "rate_table_version":    version,
+    }
@@ -0,0 +1,242 @@
+"""
+House-Forge Project Cascade Delete
+==================================
+Deletes a project together with everything hanging off it:
+
+    bids, orders, project_documents, project_updates   (where project_id == id)
+    static/uploads/documents/<project_id>_*            (uploaded files)
+
+Orders still holding stock (services/inventory.py) release it in the batch
+that deletes them.
+
+delete_project() counts the dependents with aggregation queries first.
+Up to Config.CASCADE_INLINE_LIMIT of them go in the same write batch as the
+project itself - one commit, inside the request - as long as that commit,
+stock releases included, stays under Firestore's MAX_WRITES. Anything
+larger is a job:
+the request deletes the project document (so it leaves every listing at
+once), writes delete_jobs/<project_id> and returns; a worker thread then
+removes the dependents in chunks of at most BATCH_SIZE, each chunk
+committing its deletes, its stock releases, its stats rollup deltas and its
+progress on the job document together. The owner can poll /user/project/<id>/delete-status.
+
+A job interrupted by a restart is still marked "running";
+`flask resume-project-deletes` finishes it (every chunk re-queries what is
+left, so re-running is safe).
+"""
+
+import glob
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from firebase_admin import firestore
+
+from config import Config
+from services import inventory as stock
+from services import stats_rollup
+from services.aggregation import count_of
+from services.projections import select_fields
+
+JOBS_COLLECTION = 'delete_jobs'
+DOCUMENTS_FOLDER = os.path.join(Config.UPLOAD_FOLDER, 'documents')
+
+# dependent collection -> fields the cascade needs from each document
+DEPENDENTS = {
+    'bids':              ('__name__',),
+    'orders':            ('status', 'total', 'reservation'),
+    'project_documents': ('filename',),
+    'project_updates':   ('__name__',),
+}
+
+# Firestore's cap on writes per commit
+MAX_WRITES = 500
+# dependents read per chunk; chunks are split further so their writes fit in MAX_WRITES
+BATCH_SIZE = 400
+# writes every commit carries besides the dependents: the stats rollup, and
+# the project delete (inline) or the job progress update (background)
+FIXED_WRITES = 2
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=Config.CASCADE_DELETE_WORKERS,
+                                           thread_name_prefix="cascade-delete")
+        return _executor
+
+
+def _job_ref(db, project_id):
+    return db.collection(JOBS_COLLECTION).document(project_id)
+
+
+def _dependents(db, collection, project_id, limit=None):
+    query = select_fields(db.collection(collection).where('project_id', '==', project_id),
+                          DEPENDENTS[collection])
+    return list((query.limit(limit) if limit else query).stream())
+
+
+def _writes(collection, docs):
+    """Writes deleting docs takes: one each, plus one per material held stock returns to."""
+    if collection != 'orders':
+        return len(docs)
+    return len(docs) + len(stock.held_lines([doc.to_dict() or {} for doc in docs]))
+
+
+def _fit(collection, docs):
+    """Split docs into runs whose writes (plus FIXED_WRITES) fit in one commit."""
+    chunk = []
+    for doc in docs:
+        if chunk and FIXED_WRITES + _writes(collection, chunk + [doc]) > MAX_WRITES:
+            yield chunk
+            chunk = []
+        chunk.append(doc)
+    if chunk:
+        yield chunk
+
+
+def _delete_docs(db, batch, collection, docs, deltas):
+    """
+    Queue deletes for docs, adding their rollup deltas to deltas; orders still
+    holding stock release it in the same batch. Returns the files to remove after commit.
+    """
+    files = []
+    if collection == 'orders':
+        stock.release_held(db, batch, [doc.to_dict() or {} for doc in docs])
+    for doc in docs:
+        batch.delete(doc.reference)
+        data = doc.to_dict() or {}
+        if collection == 'orders' and data.get('status') == 'completed':
+            deltas['orders_completed'] = deltas.get('orders_completed', 0) - 1
+            deltas['revenue'] = deltas.get('revenue', 0) - (data.get('total') or 0)
+        if collection == 'project_documents' and data.get('filename'):
+            files.append(data['filename'])
+    return files
+
+
+def _remove_files(project_id, filenames=()):
+    """Delete the given uploads plus any other <project_id>_* file. Returns how many went."""
+    paths = {os.path.join(DOCUMENTS_FOLDER, os.path.basename(name)) for name in filenames}
+    paths.update(glob.glob(os.path.join(DOCUMENTS_FOLDER, glob.escape(project_id) + '_*')))
+    removed = 0
+    for path in paths:
+        try:
+            os.remove(path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"⚠️ Could not remove {path}: {e}")
+    return removed
+
+
+# ─────────────────────────────────────────────────────────────────
+#  DELETE
+# ─────────────────────────────────────────────────────────────────
+
+def delete_project(db, project_id, project_data):
+    """
+    Delete a project the caller has already authorised. Returns
+    {'status': 'done' | 'running', 'counts': {collection: n}, ...}.
+    """
+    counts = {c: count_of(db.collection(c).where('project_id', '==', project_id)) for c in DEPENDENTS}
+    project_ref = db.collection('projects').document(project_id)
+
+    batch = db.batch()
+    batch.delete(project_ref)
+    deltas = stats_rollup.project_status_deltas(project_data.get('status'), None)
+
+    inline = sum(counts.values()) <= Config.CASCADE_INLINE_LIMIT
+    if inline:
+        dependents = {c: _dependents(db, c, project_id) for c in DEPENDENTS if counts[c]}
+        inline = FIXED_WRITES + sum(_writes(c, docs) for c, docs in dependents.items()) <= MAX_WRITES
+
+    if inline:
+        files = []
+        for collection, docs in dependents.items():
+            files += _delete_docs(db, batch, collection, docs, deltas)
+        stats_rollup.bump(db, batch, **deltas)
+        batch.commit()
+        removed = _remove_files(project_id, files)
+        print(f"✅ Project {project_id} deleted with {counts} and {removed} files")
+        return {'status': 'done', 'counts': counts, 'files': removed}
+
+    job = {
+        'project_id': project_id,
+        'user_id':    project_data.get('user_id'),
+        'title':      project_data.get('title'),
+        'status':     'running',
+        'counts':     counts,
+        'total':      sum(counts.values()),
+        'deleted':    {c: 0 for c in DEPENDENTS},
+        'files':      0,
+        'started_at': datetime.now(),
+    }
+    batch.set(_job_ref(db, project_id), job)
+    stats_rollup.bump(db, batch, **deltas)
+    batch.commit()
+    _get_executor().submit(_run_job, project_id)
+    print(f"🗑️ Project {project_id} deleted, {job['total']} dependents queued for background cleanup")
+    return job
+
+
+def _cascade(db, project_id):
+    """Delete every dependent in chunks that fit one commit, reporting progress on the job doc."""
+    job_ref, removed = _job_ref(db, project_id), 0
+    for collection in DEPENDENTS:
+        while True:
+            docs = _dependents(db, collection, project_id, limit=BATCH_SIZE)
+            if not docs:
+                break
+            for chunk in _fit(collection, docs):
+                batch, deltas = db.batch(), {}
+                files = _delete_docs(db, batch, collection, chunk, deltas)
+                stats_rollup.bump(db, batch, **deltas)
+                batch.update(job_ref, {f'deleted.{collection}': firestore.Increment(len(chunk)),
+                                       'updated_at': datetime.now()})
+                batch.commit()
+                if files:
+                    removed += _remove_files(project_id, files)
+    removed += _remove_files(project_id)
+    job_ref.update({'status': 'done', 'files': firestore.Increment(removed),
+                    'finished_at': datetime.now()})
+
+
+def _run_job(project_id):
+    db = firestore.client()
+    try:
+        _cascade(db, project_id)
+        print(f"✅ Cascade delete finished for project {project_id}")
+        return True
+    except Exception as e:
+        print(f"❌ Cascade delete failed for project {project_id}: {e}")
+        try:
+            _job_ref(db, project_id).update({'status': 'failed', 'error': str(e)})
+        except Exception:
+            pass
+        return False
+
+
+# ─────────────────────────────────────────────────────────────────
+#  STATUS / RECOVERY
+# ─────────────────────────────────────────────────────────────────
+
+def delete_status(db, project_id):
+    """The job document for a background delete, or None."""
+    doc = _job_ref(db, project_id).get()
+    return doc.to_dict() if doc.exists else None
+
+
+def resume_pending(db):
+    """Finish every job left running or failed (e.g. by a restart). Returns how many ran."""
+    resumed = 0
+    for doc in db.collection(JOBS_COLLECTION).where('status', 'in', ['running', 'failed']).stream():
+        doc.reference.update({'status': 'running', 'error': firestore.DELETE_FIELD})
+        _cascade(db, doc.id)
+        resumed += 1
+    return resumed
@@ -0,0 +1,246 @@
+"""
+House-Forge Conversation Summaries
+==================================
+One summary document per (user, contractor|supplier) pair, kept next to the
+messages so the inbox lists never have to read the messages collection:
+
+    conversations/<user_id>_<partner_type>_<partner_id> = {
+        user_id, partner_id, partner_type,
+        user_name, user_email, user_phone,
+        partner_name, partner_email, partner_phone,
+        last_message, last_message_time, last_sender_type,
+        user_unread, partner_unread,
+    }
+
+send_message() writes the message and updates its summary in one batch;
+mark_read() re-reads the messages in a transaction, marks the ones still
+unread read and takes only those off the summary's counters. Both also keep
+unread_counts (services/unread_counters.py). The inbox is then one query
+per account:
+
+    conversations where user_id == X    order by last_message_time desc
+    conversations where partner_id == X order by last_message_time desc
+
+(each needs a composite index on <field> + last_message_time desc).
+backfill() builds the summaries from existing messages, taking partner
+contact details missing from them from the contractor / supplier documents
+(`flask backfill-conversations`).
+"""
+
+from datetime import datetime
+
+from firebase_admin import firestore
+
+from services.doc_loader import load_many
+from services.unread_counters import bump
+
+PARTNER_TYPES = ('contractor', 'supplier')
+
+
+def partner_of(message):
+    """(partner_type, partner_id) a message belongs to, or (None, None)."""
+    for partner_type in PARTNER_TYPES:
+        if message.get(f'{partner_type}_id'):
+            return partner_type, message[f'{partner_type}_id']
+    return None, None
+
+
+def conversation_id(user_id, partner_type, partner_id):
+    return f"{user_id}_{partner_type}_{partner_id}"
+
+
+def _from_partner(message, partner_type):
+    # Messages without a sender_type are user inquiries / quote requests
+    return message.get('sender_type') == partner_type
+
+
+def unread_recipient(message):
+    """Account id whose unread count an unread message adds to, or None."""
+    partner_type, partner_id = partner_of(message)
+    if not partner_type:
+        return None
+    return message.get('user_id') if _from_partner(message, partner_type) else partner_id
+
+
+def _summary_fields(message, partner_type):
+    """Summary fields a single message sets (everything but the counters)."""
+    fields = {
+        'user_id':           message['user_id'],
+        'partner_id':        message[f'{partner_type}_id'],
+        'partner_type':      partner_type,
+        'last_message':      message.get('message', ''),
+        'last_message_time': message.get('created_at') or datetime.now(),
+        'last_sender_type':  message.get('sender_type') or 'user',
+    }
+    for key in ('name', 'email', 'phone'):
+        if _from_partner(message, partner_type):
+            if message.get(f'sender_{key}'):
+                fields[f'partner_{key}'] = message[f'sender_{key}']
+        else:
+            if message.get(f'sender_{key}'):
+                fields[f'user_{key}'] = message[f'sender_{key}']
+            if message.get(f'{partner_type}_{key}'):
+                fields[f'partner_{key}'] = message[f'{partner_type}_{key}']
+    return fields
+
+
+# ─────────────────────────────────────────────────────────────────
+#  WRITES
+# ─────────────────────────────────────────────────────────────────
+
+def send_message(db, message_data):
+    """Store a message and bump its conversation summary atomically. Returns the message id."""
+    msg_ref = db.collection('messages').document()
+    batch = db.batch()
+    batch.set(msg_ref, message_data)
+
+    partner_type, partner_id = partner_of(message_data)
+    if partner_type and message_data.get('user_id'):
+        fields = _summary_fields(message_data, partner_type)
+        unread_side = 'user_unread' if _from_partner(message_data, partner_type) else 'partner_unread'
+        fields[unread_side] = firestore.Increment(1)
+        conv_ref = db.collection('conversations').document(
+            conversation_id(message_data['user_id'], partner_type, partner_id))
+        batch.set(conv_ref, fields, merge=True)
+        bump(db, batch, unread_recipient(message_data), 'messages')
+
+    batch.commit()
+    return msg_ref.id
+
+
+def _mark_read_chunk(db, refs, user_id, partner_type, partner_id):
+    @firestore.transactional
+    def _mark(transaction):
+        # Only messages still unread inside the transaction count, so a
+        # concurrent mark_read of the same conversation can't decrement twice
+        unread = [snap for snap in db.get_all(refs, transaction=transaction)
+                  if snap.exists and not (snap.to_dict() or {}).get('read', False)]
+        if not unread:
+            return
+        now = datetime.now()
+        for snap in unread:
+            transaction.update(snap.reference, {'read': True, 'read_at': now})
+        to_user = sum(1 for snap in unread if _from_partner(snap.to_dict(), partner_type))
+        to_partner = len(unread) - to_user
+        conv_ref = db.collection('conversations').document(
+            conversation_id(user_id, partner_type, partner_id))
+        transaction.set(conv_ref, {'user_unread': firestore.Increment(-to_user),
+                                   'partner_unread': firestore.Increment(-to_partner)}, merge=True)
+        bump(db, transaction, user_id, 'messages', -to_user)
+        bump(db, transaction, partner_id, 'messages', -to_partner)
+
+    _mark(db.transaction())
+
+
+def mark_read(db, messages, user_id, partner_type, partner_id, chunk_size=400):
+    """
+    Mark unread messages (dicts carrying their 'id') of one conversation read,
+    taking them off the conversation's and the recipients' unread counts in
+    the same transaction (one per chunk_size messages).
+    """
+    refs = [db.collection('messages').document(msg['id'])
+            for msg in messages if not msg.get('read', False)]
+    for start in range(0, len(refs), chunk_size):
+        _mark_read_chunk(db, refs[start:start + chunk_size], user_id, partner_type, partner_id)
+
+
+# ─────────────────────────────────────────────────────────────────
+#  INBOX LISTS
+# ─────────────────────────────────────────────────────────────────
+
+def _by_activity(db, field, value):
+    return db.collection('conversations')\
+        .where(field, '==', value)\
+        .order_by('last_message_time', direction=firestore.Query.DESCENDING)\
+        .stream()
+
+
+def list_for_user(db, user_id):
+    """The user inbox: one entry per contractor / supplier, newest first."""
+    conversations = []
+    for doc in _by_activity(db, 'user_id', user_id):
+        conv = doc.to_dict()
+        partner_type = conv.get('partner_type', 'contractor')
+        conversations.append({
+            'id':                conv.get('partner_id'),
+            'sender_id':         conv.get('partner_id'),
+            'sender_type':       partner_type,
+            'sender_name':       conv.get('partner_name') or partner_type.capitalize(),
+            'sender_email':      conv.get('partner_email', ''),
+            'sender_phone':      conv.get('partner_phone', ''),
+            'last_message':      conv.get('last_message', ''),
+            'last_message_time': conv.get('last_message_time'),
+            'unread_count':      max(0, conv.get('user_unread', 0)),
+        })
+    return conversations
+
+
+def list_for_partner(db, partner_id):
+    """A contractor / supplier inbox: one entry per customer, newest first."""
+    conversations = []
+    for doc in _by_activity(db, 'partner_id', partner_id):
+        conv = doc.to_dict()
+        conversations.append({
+            'user_id':           conv.get('user_id'),
+            'sender_name':       conv.get('user_name', 'Customer'),
+            'sender_email':      conv.get('user_email', ''),
+            'sender_phone':      conv.get('user_phone', ''),
+            'last_message':      conv.get('last_message', ''),
+            'last_message_time': conv.get('last_message_time'),
+            'unread_count':      max(0, conv.get('partner_unread', 0)),
+        })
+    return conversations
+
+
+# ─────────────────────────────────────────────────────────────────
+#  BACKFILL
+# ─────────────────────────────────────────────────────────────────
+
+def summarize(messages):
+    """{conversation id: summary dict} rebuilt from an iterable of message dicts."""
+    summaries = {}
+    # Firestore hands back tz-aware datetimes, so order by timestamp, not by datetime.min
+    for msg in sorted(messages, key=lambda m: m['created_at'].timestamp() if m.get('created_at') else 0):
+        partner_type, partner_id = partner_of(msg)
+        if not partner_type or not msg.get('user_id'):
+            continue
+        conv = summaries.setdefault(conversation_id(msg['user_id'], partner_type, partner_id),
+                                    {'user_unread': 0, 'partner_unread': 0})
+        conv.update(_summary_fields(msg, partner_type))
+        if not msg.get('read', False):
+            conv['user_unread' if _from_partner(msg, partner_type) else 'partner_unread'] += 1
+    return summaries
+
+
+def _fill_partner_contacts(db, summaries):
+    """Partner name / email / phone from the contractor / supplier documents, where the messages lacked them."""
+    missing = [conv for conv in summaries.values()
+               if not all(conv.get(f'partner_{key}') for key in ('name', 'email', 'phone'))]
+    wanted = {}
+    for conv in missing:
+        wanted.setdefault(f"{conv['partner_type']}s", []).append(conv['partner_id'])
+    partners = load_many(db, wanted) if wanted else {}
+    for conv in missing:
+        partner = partners[f"{conv['partner_type']}s"].get(conv['partner_id']) or {}
+        contacts = {'name':  partner.get('company_name') or partner.get('name'),
+                    'email': partner.get('email'),
+                    'phone': partner.get('phone')}
+        for key, value in contacts.items():
+            if value and not conv.get(f'partner_{key}'):
+                conv[f'partner_{key}'] = value
+
+
+def backfill(db, batch_size=400):
+    """Rebuild every conversation summary from the messages collection. Returns the count."""
+    summaries = summarize(doc.to_dict() for doc in db.collection('messages').stream())
+    _fill_partner_contacts(db, summaries)
+    batch, pending = db.batch(), 0
+    for conv_id, summary in summaries.items():
+        batch.set(db.collection('conversations').document(conv_id), summary)
+        pending += 1
+        if pending >= batch_size:
+            batch.commit()
+            batch, pending = db.batch(), 0
+    if pending:
+        batch.commit()
+    return len(summaries)
@@ -0,0 +1,177 @@
+"""
+House-Forge Firestore Document Loader
+=====================================
+Request-scoped document cache + read/write accounting.
+
+load_docs(db, 'suppliers', ids) / load_doc(db, 'users', uid) serve documents
+from an identity map on flask.g keyed by document path ("users/<uid>").
+Whatever is not in the map yet is fetched with a single db.get_all() round
+trip, misses included, so a document is read at most once per request no
+matter how many routes, context processors or the user loader ask for it.
+Writes made during the request evict the path they touch, so a read after a
+write sees the new data. Outside a request context nothing is remembered.
+The dicts handed back are the shared cached copies; treat them as read-only.
+
+init_app(app) also counts every Firestore read and write the request makes
+(through these helpers or not) and returns them as response headers:
+
+    X-Firestore-Reads / X-Firestore-Writes / X-Firestore-Cache-Hits
+
+Pages over Config.FIRESTORE_READ_WARN reads are logged.
+"""
+
+import functools
+
+from flask import g, has_request_context, request
+
+from config import Config
+
+
+def _identity_map():
+    if not has_request_context():
+        return {}
+    docs = g.get('_doc_identity_map')
+    if docs is None:
+        docs = g._doc_identity_map = {}
+    return docs
+
+
+def load_many(db, wanted):
+    """
+    load_docs over several collections in one get_all round trip:
+    {'materials': ids, 'projects': [pid]} -> {'materials': {id: dict|None}, 'projects': {...}}.
+    """
+    docs   = _identity_map()
+    wanted = {c: list(dict.fromkeys(i for i in ids if i)) for c, ids in wanted.items()}
+    paths  = [f"{c}/{i}" for c, ids in wanted.items() for i in ids]
+    missing = [p for p in dict.fromkeys(paths) if p not in docs]
+    if len(missing) < len(paths):
+        _count('hits', len(paths) - len(missing))
+    if missing:
+        for snap in db.get_all([db.document(p) for p in missing]):
+            docs[snap.reference.path] = snap.to_dict() if snap.exists else None
+    return {c: {i: docs.get(f"{c}/{i}") for i in ids} for c, ids in wanted.items()}
+
+
+def load_docs(db, collection, ids):
+    """{id: document dict, or None if it does not exist} for every non-empty id."""
+    return load_many(db, {collection: ids})[collection]
+
+
+def load_doc(db, collection, doc_id):
+    """Single-document load_docs; None if missing."""
+    return load_docs(db, collection, [doc_id]).get(doc_id)
+
+
+def forget(path):
+    """Drop one document path from this request's identity map."""
+    if has_request_context():
+        (g.get('_doc_identity_map') or {}).pop(path, None)
+
+
+# ─────────────────────────────────────────────────────────────────
+#  READ / WRITE ACCOUNTING
+# ─────────────────────────────────────────────────────────────────
+
+def _count(kind, n=1):
+    if not has_request_context():
+        return
+    stats = g.get('_doc_stats')
+    if stats is None:
+        stats = g._doc_stats = {'reads': 0, 'writes': 0, 'hits': 0}
+    stats[kind] += n
+
+
+def request_stats():
+    """{'reads', 'writes', 'hits'} so far in this request."""
+    if not has_request_context():
+        return {'reads': 0, 'writes': 0, 'hits': 0}
+    return dict(g.get('_doc_stats') or {'reads': 0, 'writes': 0, 'hits': 0})
+
+
+class _CountingStream:
+    """Iterator that counts the snapshots it yields; everything else is delegated."""
+
+    def __init__(self, inner, min_reads=0):
+        self._inner = inner
+        self._seen  = 0
+        self._min   = min_reads
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            snap = next(self._inner)
+        except StopIteration:
+            if self._seen < self._min:          # an empty query still bills one read
+                _count('reads', self._min - self._seen)
+                self._seen = self._min
+            raise
+        self._seen += 1
+        _count('reads')
+        return snap
+
+    def __getattr__(self, name):
+        return getattr(self._inner, name)
+
+
+def _instrument():
+    from google.cloud.firestore_v1 import aggregation, base_batch, client, document, query
+
+    def reads_one(fn):
+        @functools.wraps(fn)
+        def wrapper(self, *args, **kwargs):
+            _count('reads')
+            return fn(self, *args, **kwargs)
+        return wrapper
+
+    def reads_stream(min_reads):
+        def wrap(fn):
+            @functools.wraps(fn)
+            def wrapper(self, *args, **kwargs):
+                return _CountingStream(iter(fn(self, *args, **kwargs)), min_reads)
+            return wrapper
+        return wrap
+
+    def writes_one(fn):
+        # batch.set/create/update/delete(reference, ...) and DocumentReference.delete()
+        @functools.wraps(fn)
+        def wrapper(self, *args, **kwargs):
+            ref = args[0] if args and hasattr(args[0], 'path') else self
+            _count('writes')
+            forget(ref.path)
+            return fn(self, *args, **kwargs)
+        return wrapper
+
+    document.DocumentReference.get = reads_one(document.DocumentReference.get)
+    client.Client.get_all  = reads_stream(0)(client.Client.get_all)
+    query.Query.stream     = reads_stream(1)(query.Query.stream)
+    # count()/sum() bill one read per 1000 index entries; counted as one
+    aggregation.AggregationQuery.get = reads_one(aggregation.AggregationQuery.get)
+    for name in ('set', 'create', 'update', 'delete'):
+        setattr(base_batch.BaseBatch, name, writes_one(getattr(base_batch.BaseBatch, name)))
+    document.DocumentReference.delete = writes_one(document.DocumentReference.delete)
+
+
+def _add_headers(response):
+    stats = request_stats()
+    response.headers['X-Firestore-Reads']      = str(stats['reads'])
+    response.headers['X-Firestore-Writes']     = str(stats['writes'])
+    response.headers['X-Firestore-Cache-Hits'] = str(stats['hits'])
+    if stats['reads'] > Config.FIRESTORE_READ_WARN:
+        print(f"⚠️ Heavy page {request.method} {request.path}: "
+              f"{stats['reads']} reads, {stats['writes']} writes, {stats['hits']} cache hits")
+    return response
+
+
+_installed = False
+
+
+def init_app(app):
+    """Install the read/write counters (once per process) and the response headers."""
+    global _installed
+    if not _installed:
+        _instrument()
+        _installed = True
+    app.after_request(_add_headers)
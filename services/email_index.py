@@ -0,0 +1,192 @@
+"""
+House-Forge Email Index
+=======================
+One document per account email, so login and register don't have to query
+users, admins, contractors and suppliers one after another:
+
+    email_index/<normalized email> = {collection: 'contractors', doc_id: '<id>'}
+
+register() creates the entry in the same batch as the account (create() fails
+if the email is already indexed, so two sign-ups can't claim one address) and
+the profile routes move it when the email changes. Login is one index get
+plus one account get.
+
+Accounts that predate the index are picked up by backfill()
+(`flask backfill-email-index`). Until a backfill has completed, an index miss
+falls back to the old per-collection scan; afterwards a miss is final. A
+"not backfilled yet" answer is remembered for Config.EMAIL_INDEX_CHECK_SECONDS
+(and logged once) rather than re-read on every login.
+
+Document ids can't contain '/', so emails with one are never indexed: new
+accounts and email changes reject them, and legacy accounts are found by scan.
+"""
+
+import time
+from datetime import datetime
+
+from config import Config
+from services.doc_loader import load_doc
+
+INDEX_COLLECTION = 'email_index'
+ACCOUNT_COLLECTIONS = ['users', 'admins', 'contractors', 'suppliers']
+
+# meta/email_index.complete is set once a backfill has indexed every account
+_META = ('meta', 'email_index')
+_backfilled = False
+_checked_at = None      # monotonic time of the last meta read that found no backfill
+
+
+def normalize_email(email):
+    return (email or '').strip().lower()
+
+
+def _indexable(email):
+    return bool(email) and '/' not in email
+
+
+def _index_ref(db, email):
+    return db.collection(INDEX_COLLECTION).document(normalize_email(email))
+
+
+def _is_backfilled(db):
+    global _backfilled, _checked_at
+    if _backfilled:
+        return True
+    now = time.monotonic()
+    if _checked_at is not None and now - _checked_at < Config.EMAIL_INDEX_CHECK_SECONDS:
+        return False
+    meta = load_doc(db, *_META)
+    _backfilled = bool(meta and meta.get('complete'))
+    if not _backfilled:
+        if _checked_at is None:
+            print("⚠️ email_index not backfilled yet: unindexed emails scan every account "
+                  "collection until `flask backfill-email-index` runs")
+        _checked_at = now
+    return _backfilled
+
+
+def _scan(db, email):
+    """Pre-index lookup: first account in any collection with this email."""
+    for collection in ACCOUNT_COLLECTIONS:
+        for doc in db.collection(collection).where('email', '==', email).limit(1).stream():
+            return collection, doc.id, doc.to_dict()
+    return None
+
+
+# ─────────────────────────────────────────────────────────────────
+#  LOOKUP
+# ─────────────────────────────────────────────────────────────────
+
+def find_account(db, email):
+    """(collection, doc_id, account dict) for an email, or None."""
+    email = normalize_email(email)
+    if not email:
+        return None
+    if not _indexable(email):
+        return _scan(db, email)
+    entry = load_doc(db, INDEX_COLLECTION, email)
+    if entry:
+        data = load_doc(db, entry['collection'], entry['doc_id'])
+        if data is not None and normalize_email(data.get('email')) == email:
+            return entry['collection'], entry['doc_id'], data
+        print(f"⚠️ Stale email_index entry for {email}")
+    if _is_backfilled(db):
+        return None
+    return _scan(db, email)
+
+
+def email_taken(db, email, exclude_id=None):
+    """True if another account (not exclude_id) already uses this email."""
+    found = find_account(db, email)
+    return found is not None and found[1] != exclude_id
+
+
+# ─────────────────────────────────────────────────────────────────
+#  MAINTENANCE
+# ─────────────────────────────────────────────────────────────────
+
+def _entry(collection, doc_id):
+    return {'collection': collection, 'doc_id': doc_id, 'updated_at': datetime.now()}
+
+
+def create_account(db, collection, account, batch=None):
+    """
+    Write a new account and its index entry in one batch. Raises
+    ValueError if the email can't be an index key and
+    google.api_core.exceptions.AlreadyExists if it is already indexed.
+    Pass a batch to add more writes to it; the caller then commits.
+    Returns the new document id.
+    """
+    if not _indexable(normalize_email(account.get('email'))):
+        raise ValueError('Invalid email address')
+    doc_ref = db.collection(collection).document()
+    own_batch = batch is None
+    batch = db.batch() if own_batch else batch
+    batch.create(_index_ref(db, account['email']), _entry(collection, doc_ref.id))
+    batch.set(doc_ref, account)
+    if own_batch:
+        batch.commit()
+    return doc_ref.id
+
+
+def update_account_email(db, collection, doc_id, old_email, fields):
+    """
+    Apply a profile update that may change 'email', moving the index entry
+    with it in the same batch. Raises ValueError if the new email belongs to
+    another account or can't be an index key.
+    """
+    new_email = normalize_email(fields.get('email'))
+    old_email = normalize_email(old_email)
+    batch = db.batch()
+    if new_email and new_email != old_email:
+        if not _indexable(new_email):
+            raise ValueError('Invalid email address')
+        if email_taken(db, new_email, exclude_id=doc_id):
+            raise ValueError('Email already registered')
+        fields = dict(fields, email=new_email)
+        batch.set(_index_ref(db, new_email), _entry(collection, doc_id))
+        if _indexable(old_email):
+            old_entry = load_doc(db, INDEX_COLLECTION, old_email)
+            if old_entry and old_entry.get('doc_id') == doc_id:
+                batch.delete(_index_ref(db, old_email))
+    batch.update(db.collection(collection).document(doc_id), fields)
+    batch.commit()
+
+
+# ─────────────────────────────────────────────────────────────────
+#  BACKFILL
+# ─────────────────────────────────────────────────────────────────
+
+def backfill(db, batch_size=400):
+    """
+    Index every existing account. Existing entries are overwritten; when two
+    accounts share an email the first collection in ACCOUNT_COLLECTIONS wins,
+    same as the old login scan. Returns {'indexed', 'duplicates', 'skipped'}.
+    """
+    global _backfilled
+    seen, stats = set(), {'indexed': 0, 'duplicates': 0, 'skipped': 0}
+    batch, pending = db.batch(), 0
+
+    for collection in ACCOUNT_COLLECTIONS:
+        for doc in db.collection(collection).stream():
+            email = normalize_email(doc.to_dict().get('email'))
+            if not _indexable(email):
+                stats['skipped'] += 1
+                continue
+            if email in seen:
+                print(f"⚠️ {email} used by more than one account, keeping the first ({collection}/{doc.id} skipped)")
+                stats['duplicates'] += 1
+                continue
+            seen.add(email)
+            batch.set(_index_ref(db, email), _entry(collection, doc.id))
+            stats['indexed'] += 1
+            pending += 1
+            if pending >= batch_size:
+                batch.commit()
+                batch, pending = db.batch(), 0
+
+    batch.set(db.collection(_META[0]).document(_META[1]),
+              {'complete': True, 'indexed': stats['indexed'], 'completed_at': datetime.now()})
+    batch.commit()
+    _backfilled = True
+    return stats
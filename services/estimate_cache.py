@@ -0,0 +1,198 @@
+"""
+House-Forge Estimate Cache
+==========================
+Content-addressed memoization for calculate_materials_and_cost.
+
+The key is a SHA-256 over the parsed EstimateInputs record (form_schema) -
+exactly the values the estimator reads - and RATE_TABLE_VERSION, so identical
+submissions - re-posted forms, duplicated projects, edits that change only
+the title or description - skip the calculator. The form is parsed once and
+the record reused on a miss.
+
+Two kinds of entry:
+  - the deterministic estimate (refine=False), under estimate_key(inp) -
+    always stored, so a missing API key or an AI outage doesn't turn every
+    request into a miss
+  - the AI factors, under factors_key(inp) (the AI call's own key,
+    ai_inputs_key) - stored only when a call succeeded, and applied on read
+    by the callers that want a refined estimate
+
+Two tiers:
+  - in-process LRU (size bound + TTL), always on
+  - optional SQLite file (Config.ESTIMATE_CACHE_PATH) shared by all workers
+    on the host and surviving restarts
+
+Values are stored as JSON text, so every hit hands back a fresh dict the
+caller is free to mutate.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from config import Config
+from services.calculation_service import ai_inputs_key, estimate_from_inputs, rate_table_version
+
+
+def estimate_key(inp):
+    """Canonical hash of an EstimateInputs record - everything the estimator depends on."""
+    payload = [rate_table_version(), type(inp).__name__, inp.values()]
+    blob = json.dumps(payload, separators=(",", ":"), default=str)
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+def factors_key(inp):
+    """Cache key of the AI factors for inp - shared by every estimate with the same ai_inputs_key."""
+    return "ai:" + ai_inputs_key(inp)
+
+
+class EstimateCache:
+    """Thread-safe LRU + TTL cache of estimation dicts with an optional disk tier."""
+
+    def __init__(self, max_entries=512, ttl_seconds=3600, disk_path=None):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_seconds = ttl_seconds
+        self.disk_path   = disk_path or None
+        self._entries    = OrderedDict()      # key -> (stored_at, json text)
+        self._lock       = threading.Lock()
+        self.hits = self.misses = self.disk_hits = self.evictions = 0
+        if self.disk_path:
+            self._init_disk()
+
+    # ── memory tier ──
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and now - entry[0] <= self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return json.loads(entry[1])
+            if entry:
+                del self._entries[key]
+
+        entry = self._disk_get(key, now)
+        with self._lock:
+            if entry:
+                self.disk_hits += 1
+                self._remember(key, entry)
+                return json.loads(entry[1])
+            self.misses += 1
+        return None
+
+    def put(self, key, value):
+        entry = (time.time(), json.dumps(value, default=str))
+        with self._lock:
+            self._remember(key, entry)
+        self._disk_put(key, entry)
+
+    def _remember(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.disk_path:
+            try:
+                with self._connect() as conn:
+                    conn.execute("DELETE FROM estimates")
+            except sqlite3.Error as e:
+                print(f"⚠️ Estimate cache clear failed: {e}")
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "size":       len(self._entries),
+                "hits":       self.hits,
+                "disk_hits":  self.disk_hits,
+                "misses":     self.misses,
+                "evictions":  self.evictions,
+                "hit_rate":   round((self.hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+                "rate_table_version": rate_table_version(),
+            }
+
+    # ── disk tier ──
+    def _connect(self):
+        return sqlite3.connect(self.disk_path, timeout=5)
+
+    def _init_disk(self):
+        try:
+            folder = os.path.dirname(self.disk_path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            with self._connect() as conn:
+                conn.execute("CREATE TABLE IF NOT EXISTS estimates ("
+                             "key TEXT PRIMARY KEY, stored_at REAL, value TEXT)")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_estimates_stored_at "
+                             "ON estimates (stored_at)")
+        except (sqlite3.Error, OSError) as e:
+            print(f"⚠️ Estimate cache disk tier disabled: {e}")
+            self.disk_path = None
+
+    def _disk_get(self, key, now):
+        if not self.disk_path:
+            return None
+        try:
+            with self._connect() as conn:
+                row = conn.execute("SELECT stored_at, value FROM estimates WHERE key = ?",
+                                   (key,)).fetchone()
+        except sqlite3.Error as e:
+            print(f"⚠️ Estimate cache read failed: {e}")
+            return None
+        if row and now - row[0] <= self.ttl_seconds:
+            return row
+        return None
+
+    def _disk_put(self, key, entry):
+        if not self.disk_path:
+            return
+        try:
+            with self._connect() as conn:
+                conn.execute("INSERT OR REPLACE INTO estimates (key, stored_at, value) "
+                             "VALUES (?, ?, ?)", (key, entry[0], entry[1]))
+                conn.execute("DELETE FROM estimates WHERE stored_at < ?",
+                             (entry[0] - self.ttl_seconds,))
+        except sqlite3.Error as e:
+            print(f"⚠️ Estimate cache write failed: {e}")
+
+
+estimate_cache = EstimateCache(
+    max_entries = Config.ESTIMATE_CACHE_SIZE,
+    ttl_seconds = Config.ESTIMATE_CACHE_TTL,
+    disk_path   = Config.ESTIMATE_CACHE_PATH,
+)
+
+
+def cached_estimate(inp, cache=None, compute=None):
+    """
+    Deterministic estimate for an EstimateInputs record: a cache hit, or
+    compute(inp) (default estimate_from_inputs(inp, refine=False)) stored
+    on a miss. Never AI-refined - see cached_factors().
+    """
+    cache = cache or estimate_cache
+    key = estimate_key(inp)
+    estimation = cache.get(key)
+    if estimation is None:
+        estimation = compute(inp) if compute else estimate_from_inputs(inp, refine=False)
+        cache.put(key, estimation)
+    return estimation
+
+
+def cached_factors(inp, cache=None):
+    """AI factors stored for inp's ai_inputs_key, or {}."""
+    return (cache or estimate_cache).get(factors_key(inp)) or {}
+
+
+def remember_factors(inp, factors, cache=None):
+    """Store a successful AI call's factors; empty results (failures) are not pinned."""
+    if factors:
+        (cache or estimate_cache).put(factors_key(inp), factors)
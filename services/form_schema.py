@@ -0,0 +1,505 @@
+"""
+House-Forge Estimator Form Schema
+=================================
+Declarative list of every create_project.html field the estimator consumes,
+compiled once per property type into a resolver that parses a request.form
+(or any dict) into a typed, slotted input record.
+
+The calculators, the batch engine and the estimate cache all read the same
+record, so each field is looked up and parsed exactly once per estimate.
+resolve_columns() is the batch engine's columnar variant: one list per
+field across many forms instead of one record per form.
+
+Field kinds (raw = form value, d = default):
+  "str"     raw, unparsed (rate-table lookup keys)
+  "int"     int(raw or d)
+  "float"   float(raw or d)
+  "int?"    int(raw) if raw else None     - caller applies a computed default
+  "float?"  float(raw) if raw else None
+  "raw"     raw, parsed by the calculator only when the value is needed
+
+Lookup semantics match the old f() helper: for aliased fields the prefixed
+key wins whenever it is present (even if empty), otherwise the bare key.
+"""
+
+PROPERTY_TYPES = ("residential", "villa", "apartment")
+
+# ─────────────────────────────────────────────────────────────────
+#  SCHEMA
+# ─────────────────────────────────────────────────────────────────
+
+# Residential + villa calculator fields, read as {prefix}{key} -> {key}
+# (prefix "villa_" for villas, none for residential).
+CALC_FIELDS = (
+    # name                      kind     default
+    ("concrete_grade",          "str",   "M20"),
+    ("steel_grade",             "str",   "Fe500"),
+    ("slab_thickness",          "float", 5),
+    ("foundation_type",         "str",   "isolated"),
+    ("foundation_depth",        "float", 6),
+    ("soil_condition",          "str",   "firm_soil"),
+    ("anti_termite",            "str",   "pre_construction"),
+    ("roof_waterproofing",      "str",   "brick_bat_coba"),
+    ("num_doors",               "int",   6),
+    ("num_windows",             "int",   8),
+    ("wall_material",           "str",   "red_clay"),
+    ("wall_thickness",          "float", 9),
+    ("inner_wall_thickness",    "float", 4.5),
+    ("plaster_type",            "str",   "12mm_cm"),
+    ("external_plaster_type",   "str",   "12mm_cm_15"),
+    ("door_material",           "str",   "flush_hollow"),
+    ("window_material",         "str",   "aluminium_sliding"),
+    ("bathroom_wall_tile",      "str",   "ceramic_standard"),
+    ("flooring_coverage",       "str",   "full"),
+    ("roof_type",               "str",   "flat_rcc"),
+    ("pipe_material",           "str",   "cpvc"),
+    ("num_taps",                "int?",  None),     # default bathrooms*4 + 4
+    ("num_showers",             "int?",  None),     # default bathrooms
+    ("num_geysers",             "int?",  None),     # default bathrooms
+    ("sanitary_grade",          "str",   "standard"),
+    ("num_switchboards",        "int?",  None),     # default rooms*2 + bathrooms + 3
+    ("num_ac_points",           "int",   0),
+    ("wiring_type",             "str",   "fr_pvc"),
+    ("inverter_wiring",         "str",   "none"),
+    ("earthing_system",         "str",   "plate"),
+    ("internal_paint_quality",  "str",   None),     # falls back to internal_paint
+    ("internal_paint",          "str",   "emulsion"),
+    ("external_paint_quality",  "str",   None),     # falls back to external_paint
+    ("external_paint",          "str",   "weathershield"),
+    ("kitchen_type",            "str",   "semi_modular"),
+    ("kitchen_platform_length", "float", 10),
+    ("kitchen_platform_stone",  "str",   "granite_standard"),
+)
+
+# BOQ (material quantity) fields, read as {prefix}{key} -> {key} for every
+# property type (prefix "villa_" for villas, none otherwise).
+# (name, kind, default, form key) - name differs from key where the
+# calculator reads the same key without the alias fallback.
+BOQ_FIELDS = (
+    ("concrete_grade",          "str",   "M20",  "concrete_grade"),
+    ("steel_grade",             "str",   "Fe500", "steel_grade"),
+    ("slab_thickness",          "float", 5,      "slab_thickness"),
+    ("num_doors",               "int",   6,      "num_doors"),
+    ("num_windows",             "int",   8,      "num_windows"),
+    ("wall_material",           "str",   "red_clay", "wall_material"),
+    ("overhead_tank_capacity",  "int",   1000,   "overhead_tank_capacity"),
+    ("num_taps",                "int?",  None,   "num_taps"),
+    ("num_showers",             "int?",  None,   "num_showers"),
+    ("num_ac_points",           "int",   0,      "num_ac_points"),
+    ("kitchen_platform_length", "float", 10,     "kitchen_platform_length"),
+    ("boq_porch_sqft",          "float", 200,    "car_porch_sqft"),
+    ("boq_boundary_rft",        "float", 0,      "boundary_rft"),
+    ("boq_garden_sqft",         "float", 0,      "garden_sqft"),
+    ("sump_capacity",           "int",   5000,   "sump_capacity"),
+)
+
+# Fields read from one fixed key per property type: (name, kind, default, key).
+TYPE_FIELDS = {
+    "residential": (
+        ("floor_type",          "str",    "vitrified",          "flooring_type"),
+        ("structure_type",      "str",    "rcc",                "structure_type"),
+        ("staircase",           "str",    "rcc",                "staircase_type"),
+        ("false_ceiling",       "str",    "no",                 "false_ceiling_yn"),
+        ("porch_size",          "str",    "single",             "car_porch_size"),
+        ("porch_sqft",          "float?", None,                 "car_porch_sqft"),
+        ("porch_style",         "str",    "rcc_slab",           "car_porch_style"),
+        ("garden_sqft",         "float",  0,                    "garden_sqft"),
+        ("boundary_rft",        "float",  0,                    "boundary_rft"),
+        ("boundary_finish",     "str",    "plaster",            "boundary_finish"),
+    ),
+    "villa": (
+        ("floor_type",          "str",    "italian_marble",     ("villa_flooring_grade", "flooring_grade")),
+        ("structure_type",      "str",    "rcc",                "structure_type"),
+        ("staircase",           "str",    "standard",           "villa_staircase"),
+        ("false_ceiling",       "str",    "no",                 "villa_false_ceiling"),
+        ("porch_size",          "str",    None,                 "villa_car_porch_size"),
+        ("porch_sqft",          "float?", None,                 "villa_car_porch_sqft"),
+        ("porch_style",         "str",    "rcc_slab",           "villa_car_porch_style"),
+        ("porch_flooring",      "str",    "granite",            "villa_porch_flooring"),
+        ("garden_sqft",         "float",  0,                    "villa_garden_sqft"),
+        ("landscaping_grade",   "str",    "standard",           "villa_landscaping_grade"),
+        ("boundary_rft",        "float",  0,                    "villa_boundary_rft"),
+        ("boundary_height",     "float",  8,                    "villa_boundary_height"),
+        ("boundary_finish",     "str",    "stone_cladding",     "villa_boundary_finish"),
+        ("gate_type",           "str",    "ms_fabricated",      "villa_gate_type"),
+        ("cladding",            "str",    "plaster",            "villa_cladding"),
+        ("pool_length",         "float",  0,                    "pool_length"),
+        ("pool_width",          "float",  0,                    "pool_width"),
+        ("pool_depth",          "float",  5,                    "pool_depth"),
+        ("pool_finish",         "str",    "vitrified_tile",     "pool_finish"),
+        ("pool_deck",           "str",    "anti_skid_granite",  "pool_deck"),
+        ("driveway_sqft",       "float",  0,                    "villa_driveway_sqft"),
+        ("driveway_finish",     "str",    "interlocking_pavers", "villa_driveway_finish"),
+    ),
+    "apartment": (
+        ("apt_1bhk_count",             "int",   0,                   "apt_1bhk_count"),
+        ("apt_2bhk_count",             "int",   0,                   "apt_2bhk_count"),
+        ("apt_3bhk_count",             "int",   0,                   "apt_3bhk_count"),
+        ("apt_total_units",            "int?",  None,                "apt_total_units"),
+        ("apt_common_area_pct",        "float", 20,                  "apt_common_area_pct"),
+        ("apt_concrete_grade",         "str",   "M30",               "apt_concrete_grade"),
+        ("apt_steel_grade",            "str",   "Fe500D",            "apt_steel_grade"),
+        ("apt_slab_thickness",         "float", 5,                   "apt_slab_thickness"),
+        ("apt_foundation_type",        "str",   "raft",              "apt_foundation_type"),
+        ("apt_foundation_depth",       "float", 8,                   "apt_foundation_depth"),
+        ("apt_soil_condition",         "str",   "firm_soil",         "apt_soil_condition"),
+        ("apt_anti_termite",           "str",   "pre_construction",  "apt_anti_termite"),
+        ("apt_roof_waterproofing",     "str",   "membrane",          "apt_roof_waterproofing"),
+        ("apt_parking_type",           "str",   "open",              "apt_parking_type"),
+        ("apt_basement_depth",         "raw",   None,                "apt_basement_depth"),
+        ("apt_basement_waterproofing", "str",   "membrane",          "apt_basement_waterproofing"),
+        ("apt_wall_material",          "str",   "aac_blocks",        "apt_wall_material"),
+        ("apt_wall_thickness",         "float", 9,                   "apt_wall_thickness"),
+        ("apt_partition_material",     "str",   "aac_blocks",        "apt_partition_material"),
+        ("apt_internal_plaster",       "str",   "gypsum",            "apt_internal_plaster"),
+        ("apt_external_plaster",       "str",   "12mm_cm_15",        "apt_external_plaster"),
+        ("apt_door_material",          "str",   "flush_solid",       "apt_door_material"),
+        ("apt_window_material",        "str",   "aluminium_sliding", "apt_window_material"),
+        ("apt_facade_type",            "str",   "plaster_paint",     "apt_facade_type"),
+        ("apt_external_paint",         "str",   "weathershield",     "apt_external_paint"),
+        ("apt_staircases",             "int",   2,                   "apt_staircases"),
+        ("apt_staircase_type",         "str",   "rcc_enclosed",      "apt_staircase_type"),
+        ("apt_flooring_type",          "str",   "vitrified",         "apt_flooring_type"),
+        ("apt_bathroom_tile",          "str",   "ceramic_standard",  "apt_bathroom_tile"),
+        ("apt_sanitary_grade",         "str",   "standard",          "apt_sanitary_grade"),
+        ("apt_lifts",                  "int",   0,                   "apt_lifts"),
+        ("apt_lift_capacity",          "str",   "8",                 "apt_lift_capacity"),
+        ("apt_dg_backup",              "str",   "common_only",       "apt_dg_backup"),
+        ("apt_internal_paint",         "str",   "emulsion",          "apt_internal_paint"),
+        ("apt_false_ceiling",          "str",   "none",              "apt_false_ceiling"),
+        ("apt_kitchen_type",           "str",   "semi_modular",      "apt_kitchen_type"),
+        ("apt_parking_slots",          "int",   0,                   "apt_parking_slots"),
+        ("apt_parking_floor",          "str",   "epoxy",             "apt_parking_floor"),
+        ("apt_slot_length",            "float", 18,                  "apt_slot_length"),
+        ("apt_slot_width",             "float", 8.5,                 "apt_slot_width"),
+        ("apt_pool",                   "str",   "none",              "apt_pool"),
+        ("apt_pool_finish",            "str",   "vitrified_tile",    "apt_pool_finish"),
+        ("apt_clubhouse",              "str",   "none",              "apt_clubhouse"),
+        ("apt_play_area",              "str",   "none",              "apt_play_area"),
+        ("apt_fire_spec",              "str",   "wet_riser",         "apt_fire_spec"),
+        ("apt_stp_type",               "str",   None,                "apt_stp_type"),
+        ("apt_security_level",         "str",   "",                  "apt_security_level"),
+        ("apt_solar_kw",               "float", 0,                   "apt_solar_kw"),
+        ("apt_landscape",              "str",   "none",              "apt_landscape"),
+        # BOQ false-ceiling key for apartments is the residential one
+        ("false_ceiling",              "str",   "no",                "false_ceiling_yn"),
+    ),
+}
+
+# Keys read by the resolver prelude itself (sizing, scope, floors, ceiling).
+PRELUDE_KEYS = {
+    "residential": ("plot_area", "property_type", "estimate_scope", "ceiling_height"),
+    "villa":       ("plot_area", "property_type", "estimate_scope",
+                    "villa_ceiling_height", "ceiling_height"),
+    "apartment":   ("plot_area", "property_type", "estimate_scope", "apt_total_floors",
+                    "apt_ceiling_height"),
+}
+
+# AI summary inputs: first truthy value across the three section variants.
+AI_SUMMARY_FIELDS = {
+    "concrete_grade":  ("concrete_grade", "villa_concrete_grade", "apt_concrete_grade"),
+    "steel_grade":     ("steel_grade", "villa_steel_grade", "apt_steel_grade"),
+    "soil_condition":  ("soil_condition", "villa_soil_condition", "apt_soil_condition"),
+    "foundation_type": ("foundation_type", "villa_foundation_type", "apt_foundation_type"),
+    "flooring":        ("flooring_type", "villa_flooring_grade", "apt_flooring_type"),
+}
+
+_BASE_SLOTS = ("kind", "prop_type", "scope", "budget_range", "sqft", "plot_area",
+               "floors", "rooms", "bathrooms", "ceiling_ht", "q_rooms", "q_baths",
+               "location", "ai_inputs")
+
+
+# ─────────────────────────────────────────────────────────────────
+#  COMPILER
+# ─────────────────────────────────────────────────────────────────
+
+class EstimateInputs:
+    """Parsed estimator inputs. Concrete per-type subclasses add one slot per field."""
+    __slots__ = _BASE_SLOTS
+
+    def values(self):
+        """(slot, value) pairs in a stable order - used for cache keys."""
+        return [(s, getattr(self, s)) for s in self.__slots_all__]
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.prop_type} {self.sqft} sqft>"
+
+
+_MISSING = object()
+
+_CONVERTERS = {
+    "str":    lambda raw, d: raw,
+    "raw":    lambda raw, d: raw,
+    "int":    lambda raw, d: int(raw or d),
+    "float":  lambda raw, d: float(raw or d),
+    "int?":   lambda raw, d: int(raw) if raw else None,
+    "float?": lambda raw, d: float(raw) if raw else None,
+}
+
+
+# Whole-column versions of _CONVERTERS (one comprehension per field)
+_COLUMN_CONVERTERS = {
+    "str":    lambda col, d: col,
+    "raw":    lambda col, d: col,
+    "int":    lambda col, d: [int(raw or d) for raw in col],
+    "float":  lambda col, d: [float(raw or d) for raw in col],
+    "int?":   lambda col, d: [int(raw) if raw else None for raw in col],
+    "float?": lambda col, d: [float(raw) if raw else None for raw in col],
+}
+
+
+def _aliased(prefix, key):
+    return (prefix + key, key) if prefix else (key,)
+
+
+def schema_for(kind):
+    """[(name, kind, default, keys)] for a property type, first declaration wins."""
+    prefix = "villa_" if kind == "villa" else ""
+    fields, seen = [], set()
+
+    def add(name, ftype, default, keys):
+        if name not in seen:
+            seen.add(name)
+            fields.append((name, ftype, default, keys if isinstance(keys, tuple) else (keys,)))
+
+    if kind != "apartment":
+        for name, ftype, default in CALC_FIELDS:
+            add(name, ftype, default, _aliased(prefix, name))
+    for name, ftype, default, key in BOQ_FIELDS:
+        add(name, ftype, default, _aliased(prefix, key))
+    for name, ftype, default, key in TYPE_FIELDS[kind]:
+        add(name, ftype, default, key)
+    return fields
+
+
+def form_keys(kind):
+    """Every form key an estimate of this property type can read, sorted."""
+    keys = set(PRELUDE_KEYS[kind]) | {"location"}
+    for _, _, _, chain in schema_for(kind):
+        keys.update(chain)
+    for chain in AI_SUMMARY_FIELDS.values():
+        keys.update(chain)
+    return tuple(sorted(keys))
+
+
+def kind_of(prop_type):
+    """Calculator family for a property_type value."""
+    return prop_type if prop_type in ("villa", "apartment") else "residential"
+
+
+def form_snapshot(form):
+    """
+    Plain dict of just the estimator fields present in a request form, for
+    storing on the project (project.inputs) so it can be re-priced later.
+    """
+    form = form or {}
+    kind = kind_of(form.get("property_type", "residential"))
+    return {k: form.get(k) for k in form_keys(kind) if k in form}
+
+
+def _compile(kind):
+    fields = schema_for(kind)
+    names  = tuple(f[0] for f in fields)
+    record = type(f"{kind.title()}Inputs", (EstimateInputs,), {
+        "__slots__":     names,
+        "__slots_all__": _BASE_SLOTS + names,
+    })
+    plan = tuple((name, keys, _CONVERTERS[ftype], default)
+                 for name, ftype, default, keys in fields)
+    return record, plan
+
+
+_COMPILED = {kind: _compile(kind) for kind in PROPERTY_TYPES}
+
+_COLUMN_PLANS = {kind: tuple((name, keys, _COLUMN_CONVERTERS[ftype], _CONVERTERS[ftype], default)
+                             for name, ftype, default, keys in schema_for(kind))
+                 for kind in PROPERTY_TYPES}
+
+
+# ─────────────────────────────────────────────────────────────────
+#  RESOLVER
+# ─────────────────────────────────────────────────────────────────
+
+def resolve_inputs(square_feet, rooms, floors, bathrooms, budget_range=None, form=None):
+    """Parse the scalar arguments + form once into an EstimateInputs record."""
+    if form is None:
+        form = {}
+    get = form.get
+
+    sqft      = float(square_feet)
+    rooms     = max(1, int(rooms))
+    bathrooms = max(1, int(bathrooms))
+    plot_area = float(get("plot_area") or sqft * 1.3)
+    prop_type = get("property_type", "residential")
+    scope     = get("estimate_scope", "material_only")
+    kind      = kind_of(prop_type)
+
+    # Floors — for apartment, authoritative source is apt_total_floors form field
+    if kind == "apartment":
+        try:
+            floors = max(1, int(get("apt_total_floors", floors) or floors))
+            if floors == 99:
+                floors = 30   # sentinel for "30+" option
+        except (ValueError, TypeError):
+            floors = max(1, int(floors))
+    else:
+        floors = max(1, int(floors))
+
+    # Ceiling height
+    if kind == "villa":
+        ceiling_ht = float(get("villa_ceiling_height") or get("ceiling_height") or 12)
+    elif kind == "apartment":
+        ceiling_ht = float(get("apt_ceiling_height") or 10)
+    else:
+        ceiling_ht = float(get("ceiling_height") or 10)
+
+    record, plan = _COMPILED[kind]
+    inp = record()
+    for name, keys, conv, default in plan:
+        if len(keys) == 2:
+            raw = get(keys[0], _MISSING)
+            if raw is _MISSING:
+                raw = get(keys[1], default)
+        else:
+            raw = get(keys[0], default)
+        setattr(inp, name, conv(raw, default))
+
+    inp.kind, inp.prop_type, inp.scope = kind, prop_type, scope
+    inp.budget_range = budget_range
+    inp.sqft, inp.plot_area, inp.floors = sqft, plot_area, floors
+    inp.rooms, inp.bathrooms, inp.ceiling_ht = rooms, bathrooms, ceiling_ht
+
+    # BOQ room / bathroom counts — apartments derive them from the unit mix
+    inp.q_rooms, inp.q_baths = rooms, bathrooms
+    if kind == "apartment":
+        total_units = inp.apt_total_units if inp.apt_total_units is not None else 1
+        total_baths = (inp.apt_1bhk_count + inp.apt_2bhk_count*2 + inp.apt_3bhk_count*3
+                       or total_units * 2)
+        avg_baths   = max(1, total_baths // max(total_units, 1))
+        inp.q_rooms, inp.q_baths = rooms or total_units*2, avg_baths or bathrooms
+
+    inp.location  = get("location", "India")
+    inp.ai_inputs = {name: (get(chain[0]) or get(chain[1]) or get(chain[2]))
+                     for name, chain in AI_SUMMARY_FIELDS.items()}
+    return inp
+
+
+# ─────────────────────────────────────────────────────────────────
+#  COLUMNAR RESOLVER  (batch engine)
+# ─────────────────────────────────────────────────────────────────
+
+def _parse_column(values, parse, rows, errors, name):
+    """[parse(v) for v in values]; a value that fails records its row in errors (and parses to None)."""
+    try:
+        return [parse(v) for v in values]
+    except (TypeError, ValueError):
+        out = []
+        for value, row in zip(values, rows):
+            try:
+                out.append(parse(value))
+            except (TypeError, ValueError) as e:
+                errors.setdefault(row, f"{name}: {e}")
+                out.append(None)
+        return out
+
+
+def _apartment_floors(pair):
+    raw, floors = pair
+    try:
+        floors = max(1, int(raw or floors))
+        return 30 if floors == 99 else floors     # sentinel for "30+" option
+    except (ValueError, TypeError):
+        return max(1, int(floors))
+
+
+def _drop_failed(rows, forms, projects, cols, errors):
+    keep = [j for j, row in enumerate(rows) if row not in errors]
+    if len(keep) == len(rows):
+        return rows, forms, projects, cols
+    pick = lambda col: [col[j] for j in keep]
+    return pick(rows), pick(forms), pick(projects), {k: pick(v) for k, v in cols.items()}
+
+
+def _resolve_group(kind, rows, projects, forms, errors):
+    """resolve_columns() for the projects of one property type."""
+    cols = {
+        "sqft":      _parse_column([p.get("square_feet") for p in projects], float,
+                                   rows, errors, "square_feet"),
+        "rooms":     _parse_column([p.get("rooms") for p in projects], lambda v: max(1, int(v)),
+                                   rows, errors, "rooms"),
+        "bathrooms": _parse_column([p.get("bathrooms") for p in projects], lambda v: max(1, int(v)),
+                                   rows, errors, "bathrooms"),
+    }
+    if kind == "apartment":
+        cols["floors"] = _parse_column([(f.get("apt_total_floors", p.get("floors")), p.get("floors"))
+                                        for f, p in zip(forms, projects)],
+                                       _apartment_floors, rows, errors, "floors")
+        ceiling = [f.get("apt_ceiling_height") or 10 for f in forms]
+    else:
+        cols["floors"] = _parse_column([p.get("floors") for p in projects], lambda v: max(1, int(v)),
+                                       rows, errors, "floors")
+        ceiling = ([f.get("villa_ceiling_height") or f.get("ceiling_height") or 12 for f in forms]
+                   if kind == "villa" else [f.get("ceiling_height") or 10 for f in forms])
+    cols["ceiling_ht"] = _parse_column(ceiling, float, rows, errors, "ceiling_height")
+    for row, sqft in zip(rows, cols["sqft"]):
+        if sqft is not None and sqft < 0:
+            errors.setdefault(row, "square_feet must not be negative")
+    rows, forms, projects, cols = _drop_failed(rows, forms, projects, cols, errors)
+    cols["plot_area"] = _parse_column([(f.get("plot_area"), sqft) for f, sqft in zip(forms, cols["sqft"])],
+                                      lambda v: float(v[0] or v[1] * 1.3), rows, errors, "plot_area")
+
+    for name, keys, convert_all, convert, default in _COLUMN_PLANS[kind]:
+        if len(keys) == 2:
+            first, second = keys
+            raw = [f[first] if first in f else f.get(second, default) for f in forms]
+        else:
+            raw = [f.get(keys[0], default) for f in forms]
+        try:
+            cols[name] = convert_all(raw, default)
+        except (TypeError, ValueError):
+            cols[name] = _parse_column(raw, lambda v: convert(v, default), rows, errors, keys[0])
+    if kind == "apartment":
+        # "raw" field: parsed by the calculator, but only for basement parking
+        _parse_column([depth if park.startswith("basement") else None
+                       for depth, park in zip(cols["apt_basement_depth"], cols["apt_parking_type"])],
+                      lambda v: float(v or 14), rows, errors, "apt_basement_depth")
+    rows, forms, projects, cols = _drop_failed(rows, forms, projects, cols, errors)
+
+    cols["prop_type"]    = [f.get("property_type", "residential") for f in forms]
+    cols["scope"]        = [f.get("estimate_scope", "material_only") for f in forms]
+    cols["budget_range"] = [p.get("budget_range") for p in projects]
+
+    # BOQ room / bathroom counts — apartments derive them from the unit mix
+    cols["q_rooms"], cols["q_baths"] = cols["rooms"], cols["bathrooms"]
+    if kind == "apartment":
+        units = [u if u is not None else 1 for u in cols["apt_total_units"]]
+        baths = [b1 + b2*2 + b3*3 or u*2 for b1, b2, b3, u in
+                 zip(cols["apt_1bhk_count"], cols["apt_2bhk_count"], cols["apt_3bhk_count"], units)]
+        avg   = [max(1, b // max(u, 1)) for b, u in zip(baths, units)]
+        cols["q_rooms"] = [r or u*2 for r, u in zip(cols["rooms"], units)]
+        cols["q_baths"] = [a or b for a, b in zip(avg, cols["bathrooms"])]
+    return rows, cols
+
+
+def resolve_columns(projects):
+    """
+    resolve_inputs() for many projects (dicts of its arguments) at once, one
+    field at a time across every form. Returns
+    ({kind: (row indices, {slot: [values]})}, {row index: error message});
+    a project whose arguments or form values don't parse is reported in the
+    errors and left out of the columns. Column values equal the record slots
+    resolve_inputs() would produce (location / ai_inputs are not built).
+    """
+    projects = list(projects)
+    forms = [p.get("form") or {} for p in projects]
+    by_kind = {}
+    for row, form in enumerate(forms):
+        by_kind.setdefault(kind_of(form.get("property_type", "residential")), []).append(row)
+
+    groups, errors = {}, {}
+    for kind, rows in by_kind.items():
+        rows, cols = _resolve_group(kind, rows, [projects[i] for i in rows],
+                                    [forms[i] for i in rows], errors)
+        if rows:
+            groups[kind] = (rows, cols)
+    return groups, errors
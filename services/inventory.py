@@ -0,0 +1,277 @@
+"""
+House-Forge Inventory Reservations
+==================================
+Orders hold stock from the moment they are placed:
+
+    place_orders()   one transaction: read materials, price, decrement stock,
+                     write the orders
+    close_order()    reject -> stock released, complete -> reservation settled
+                     (completed / cancelled orders are final)
+
+A material's available stock is its `quantity` plus, for hot SKUs, the
+`available` of its shards:
+
+    materials/<id>                        {quantity, reserved, stock_shards: N}
+    materials/<id>/stock_shards/<0..N-1>  {available, reserved}
+
+Ordinary materials are decremented on the material document. A material
+split with `flask shard-stock <id>` spreads its stock over N shard documents;
+a reservation starts at a random shard and reads on only until the quantity
+is covered, so concurrent orders for the same SKU usually lock different
+documents instead of all retrying on one. Releases and settlements are
+plain increments on a random shard (or the material), so totals stay right
+wherever they land.
+
+Each order records what it holds (reservation.lines, reservation.status
+held / released / settled); close_order() re-reads it inside its
+transaction, so a double-clicked reject can't return the stock twice.
+"""
+
+import random
+from collections import Counter
+from datetime import datetime
+
+from firebase_admin import firestore
+
+from services import stats_rollup
+from services.aggregation import sum_of
+
+SHARDS = 'stock_shards'     # shard subcollection, and the material field holding N
+
+
+class OutOfStock(ValueError):
+    """An order line needs more than the material has available."""
+
+
+def _material_ref(db, material_id):
+    return db.collection('materials').document(material_id)
+
+
+def _shard_ref(db, material_id, index):
+    return _material_ref(db, material_id).collection(SHARDS).document(str(index))
+
+
+# ─────────────────────────────────────────────────────────────────
+#  RESERVE
+# ─────────────────────────────────────────────────────────────────
+
+def _hold(transaction, db, material_id, material, wanted):
+    """Reads for one line; returns the (ref, fields) writes that take `wanted` units."""
+    writes, remaining = [], wanted
+    shards = int(material.get(SHARDS) or 0)
+    start = random.randrange(shards) if shards else 0
+    for k in range(shards):
+        ref = _shard_ref(db, material_id, (start + k) % shards)
+        available = int((ref.get(transaction=transaction).to_dict() or {}).get('available') or 0)
+        take = min(available, remaining)
+        if take > 0:
+            writes.append((ref, {'available': available - take,
+                                 'reserved': firestore.Increment(take)}))
+            remaining -= take
+        if not remaining:
+            return writes
+
+    # Ordinary material, or shards exhausted: the rest comes off the material itself
+    available = int(material.get('quantity') or 0)
+    if available < remaining:
+        have = wanted - remaining + max(available, 0)
+        raise OutOfStock(f"Only {have} {material.get('unit') or 'units'} of "
+                         f"{material.get('name') or material_id} available")
+    writes.append((_material_ref(db, material_id), {'quantity': available - remaining,
+                                                    'reserved': firestore.Increment(remaining)}))
+    return writes
+
+
+def _reserve(transaction, db, materials, lines):
+    """
+    Hold {material_id: quantity} against the material snapshots already read
+    in transaction; the shard reads come before any write is queued.
+    """
+    writes = []
+    for material_id, wanted in lines.items():
+        if material_id not in materials:
+            raise OutOfStock(f'Material {material_id} is no longer available')
+        writes += _hold(transaction, db, material_id, materials[material_id], wanted)
+    for ref, fields in writes:
+        transaction.update(ref, fields)
+    return {material_id: {'quantity': wanted, 'shards': int(materials[material_id].get(SHARDS) or 0)}
+            for material_id, wanted in lines.items()}
+
+
+def _quantities(order):
+    lines = Counter()
+    for item in order.get('items', []):
+        lines[item['material_id']] += int(item.get('quantity') or 0)
+    return lines
+
+
+def place_orders(db, material_ids, build, also_read=None):
+    """
+    Price, write and hold stock for orders in one transaction. The materials
+    (plus the {name: ref} documents in also_read) are read with one get_all
+    inside it, then build(materials, read) turns those snapshots into the
+    orders: materials is {id: dict} of the ones that exist, read is
+    {name: dict or None}, and it returns [(order_ref, order dict)]. build runs
+    again if the transaction retries, so prices always match the stock held.
+    Raises OutOfStock (nothing written) if any line can't be covered.
+    Returns the orders written.
+    """
+    also_read = also_read or {}
+
+    @firestore.transactional
+    def _place(transaction):
+        refs = [_material_ref(db, m) for m in dict.fromkeys(material_ids) if m]
+        snaps = {snap.reference.path: snap for snap in
+                 db.get_all(refs + list(also_read.values()), transaction=transaction)}
+        materials = {ref.id: snaps[ref.path].to_dict() for ref in refs if snaps[ref.path].exists}
+        read = {name: snaps[ref.path].to_dict() if snaps[ref.path].exists else None
+                for name, ref in also_read.items()}
+
+        orders = build(materials, read)
+        lines = sum((_quantities(order) for _, order in orders), Counter())
+        held = _reserve(transaction, db, materials, {m: q for m, q in lines.items() if q > 0})
+        for ref, order in orders:
+            # each order records only its own quantities, so closing it returns just those
+            order_lines = {material_id: {'quantity': quantity, 'shards': held[material_id]['shards']}
+                           for material_id, quantity in _quantities(order).items()
+                           if material_id in held and quantity > 0}
+            transaction.set(ref, dict(order, reservation={'status': 'held', 'lines': order_lines,
+                                                          'held_at': datetime.now()}))
+        return orders
+
+    return _place(db.transaction())
+
+
+# ─────────────────────────────────────────────────────────────────
+#  RELEASE / SETTLE
+# ─────────────────────────────────────────────────────────────────
+
+# order status -> no further transitions allowed
+FINAL_STATUSES = ('completed', 'cancelled', 'rejected')
+
+
+def _return_lines(db, writer, lines, outcome, transaction=None):
+    """
+    Queue the stock writes that release / settle lines on writer (a batch or
+    transaction). Targets are read first (inside transaction, if given) and
+    only existing documents are updated, so a material deleted since the
+    order was placed isn't recreated as an empty ghost.
+    """
+    targets = []
+    for material_id, line in lines.items():
+        qty = int(line.get('quantity') or 0)
+        if not qty:
+            continue
+        shard = (_shard_ref(db, material_id, random.randrange(line['shards']))
+                 if line.get('shards') else None)
+        targets.append((material_id, qty, shard))
+
+    refs = [_material_ref(db, m) for m, _, _ in targets] + [s for _, _, s in targets if s]
+    existing = {snap.reference.path for snap in db.get_all(refs, transaction=transaction)
+                if snap.exists}
+
+    for material_id, qty, shard in targets:
+        material_ref = _material_ref(db, material_id)
+        if material_ref.path not in existing:
+            print(f"⚠️ Material {material_id} no longer exists, {qty} reserved units dropped")
+            continue
+        if shard is not None and shard.path in existing:
+            ref, stock_field = shard, 'available'
+        else:
+            ref, stock_field = material_ref, 'quantity'
+        fields = {'reserved': firestore.Increment(-qty)}
+        if outcome == 'released':
+            fields[stock_field] = firestore.Increment(qty)
+        writer.update(ref, fields)
+
+
+def held_lines(orders):
+    """{material_id: {'quantity', 'shards'}} still held by orders (dicts), merged per material."""
+    lines = {}
+    for order in orders:
+        hold = order.get('reservation') or {}
+        if hold.get('status') != 'held':
+            continue
+        for material_id, line in (hold.get('lines') or {}).items():
+            merged = lines.setdefault(material_id, {'quantity': 0, 'shards': line.get('shards') or 0})
+            merged['quantity'] += int(line.get('quantity') or 0)
+    return lines
+
+
+def release_held(db, writer, orders):
+    """
+    Release the stock still held by orders (dicts) on writer, e.g. in the
+    batch that deletes them: one read for all of them and at most one write
+    per material in held_lines(). Returns how many orders held any.
+    """
+    held = sum(1 for order in orders if (order.get('reservation') or {}).get('status') == 'held')
+    lines = held_lines(orders)
+    if lines:
+        _return_lines(db, writer, lines, 'released')
+    return held
+
+
+def close_order(db, order_ref, outcome, fields):
+    """
+    Update an order with fields and release ('released') or settle ('settled')
+    the stock it holds, in one transaction. Settling also adds the order to
+    the revenue rollup. Raises LookupError if the order is gone and ValueError
+    if it is already completed or cancelled. Returns the order as it was before.
+    """
+    @firestore.transactional
+    def _close(transaction):
+        snap = order_ref.get(transaction=transaction)
+        if not snap.exists:
+            raise LookupError('Order not found')
+        before = snap.to_dict() or {}
+        if before.get('status') in FINAL_STATUSES:
+            raise ValueError(f"Order is already {before['status']}")
+        updates = dict(fields)
+        hold = before.get('reservation') or {}
+        if hold.get('status') == 'held':
+            _return_lines(db, transaction, hold.get('lines') or {}, outcome, transaction=transaction)
+            updates['reservation.status'] = outcome
+            updates['reservation.closed_at'] = datetime.now()
+        if outcome == 'settled':
+            stats_rollup.bump(db, transaction, orders_completed=1, revenue=before.get('total') or 0)
+        transaction.update(order_ref, updates)
+        return before
+
+    return _close(db.transaction())
+
+
+# ─────────────────────────────────────────────────────────────────
+#  STOCK LEVELS / SHARDING
+# ─────────────────────────────────────────────────────────────────
+
+def with_available_stock(db, materials):
+    """Set quantity on sharded material dicts (with 'id') to their total available stock."""
+    for material in materials:
+        if material.get(SHARDS):
+            shards = _material_ref(db, material['id']).collection(SHARDS)
+            material['quantity'] = int(material.get('quantity') or 0) + int(sum_of(shards, 'available'))
+    return materials
+
+
+def shard_stock(db, material_id, shards):
+    """
+    Spread a material's available quantity over `shards` shard documents
+    (never fewer than it already has). Returns the new shard count.
+    """
+    @firestore.transactional
+    def _split(transaction):
+        snap = _material_ref(db, material_id).get(transaction=transaction)
+        if not snap.exists:
+            raise LookupError(f'Material {material_id} not found')
+        material = snap.to_dict()
+        count = max(int(shards), int(material.get(SHARDS) or 0))
+        quantity = max(int(material.get('quantity') or 0), 0)
+        for index in range(count):
+            part = quantity // count + (1 if index < quantity % count else 0)
+            transaction.set(_shard_ref(db, material_id, index),
+                            {'available': firestore.Increment(part), 'reserved': firestore.Increment(0)},
+                            merge=True)
+        transaction.update(snap.reference, {'quantity': 0, SHARDS: count})
+        return count
+
+    return _split(db.transaction())
@@ -0,0 +1,149 @@
+"""
+House-Forge Cursor Pagination
+=============================
+Shared paging for the listing pages (Config.ITEMS_PER_PAGE rows a page).
+
+    page = paginate(db.collection('orders').where('user_id', '==', uid),
+                    scope='user.orders', token=request.args.get('page'))
+    page.items         # DocumentSnapshots for this page
+    page.total         # count() aggregation over the whole query
+    page.next_token    # None on the last page
+    page.prev_token    # None on the first page
+
+Pass fields=(...) (see services.projections) to select() only what the
+list shows; the sort fields are added to the projection automatically.
+
+Pages are read with start_after() cursors over a stable order - the sort
+field plus the document id as tie-breaker - so a page costs per_page + 1
+reads however deep it is, instead of streaming the collection. Each listing
+needs a composite index on its filter fields + sort field.
+
+Page tokens are signed (SECRET_KEY) and bound to their scope: a client can
+pass them back but not forge or reuse them on another listing. A bad token
+just restarts at page 1.
+"""
+
+from datetime import datetime
+
+from flask import current_app
+from google.api_core.datetime_helpers import DatetimeWithNanoseconds
+from google.cloud.firestore_v1.field_path import FieldPath
+from google.cloud.firestore_v1.query import Query
+from itsdangerous import BadData, URLSafeSerializer
+
+from config import Config
+from services.aggregation import count_of
+from services.projections import select_fields
+
+_DOC_ID = FieldPath.document_id()
+_FLIP = {Query.DESCENDING: Query.ASCENDING, Query.ASCENDING: Query.DESCENDING}
+
+
+class Page:
+    """One page of a listing."""
+    __slots__ = ("items", "total", "per_page", "number", "next_token", "prev_token")
+
+    def __init__(self, items, total, per_page, number, next_token, prev_token):
+        self.items      = items
+        self.total      = total
+        self.per_page   = per_page
+        self.number     = number
+        self.next_token = next_token
+        self.prev_token = prev_token
+
+    @property
+    def pages(self):
+        if self.total is None:
+            return None
+        return max(1, -(-self.total // self.per_page))
+
+
+# ─────────────────────────────────────────────────────────────────
+#  TOKENS
+# ─────────────────────────────────────────────────────────────────
+
+def _serializer():
+    return URLSafeSerializer(current_app.secret_key, salt='page-token')
+
+
+def _encode_value(value):
+    if isinstance(value, DatetimeWithNanoseconds):
+        return {'ts': value.rfc3339()}
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict) and 'ts' in value:
+        return DatetimeWithNanoseconds.from_rfc3339(value['ts'])
+    if isinstance(value, dict) and 'dt' in value:
+        return datetime.fromisoformat(value['dt'])
+    return value
+
+
+def _make_token(scope, snapshot, fields, direction, number):
+    values = [_encode_value(snapshot.get(f)) for f in fields]
+    return _serializer().dumps({'s': scope, 'c': values, 'id': snapshot.id,
+                                'd': direction, 'n': number})
+
+
+def _read_token(token, scope):
+    if not token:
+        return None
+    try:
+        data = _serializer().loads(token)
+    except BadData:
+        return None
+    if not isinstance(data, dict) or data.get('s') != scope:
+        return None
+    return data
+
+
+# ─────────────────────────────────────────────────────────────────
+#  PAGINATE
+# ─────────────────────────────────────────────────────────────────
+
+def paginate(query, scope, token=None, order=(('created_at', Query.DESCENDING),),
+             per_page=None, total=True, fields=None):
+    """
+    One page of query, ordered by order (+ document id). scope names the
+    listing ('admin.users', 'supplier.orders:<id>', ...) its tokens belong to.
+    fields, if given, projects the page onto those fields.
+    """
+    per_page = per_page or Config.ITEMS_PER_PAGE
+    sort_by  = [field for field, _ in order]
+    cursor   = _read_token(token, scope)
+    backward = bool(cursor) and cursor['d'] == 'prev'
+
+    # The cursor values for the next / prev token are read off the page's snapshots
+    ordered = select_fields(query, list(dict.fromkeys([*fields, *sort_by])) if fields else None)
+    for field, direction in order:
+        ordered = ordered.order_by(field, direction=_FLIP[direction] if backward else direction)
+    last_direction = order[-1][1]
+    ordered = ordered.order_by(_DOC_ID, direction=_FLIP[last_direction] if backward else last_direction)
+
+    if cursor:
+        ordered = ordered.start_after([_decode_value(v) for v in cursor['c']] + [cursor['id']])
+    docs = list(ordered.limit(per_page + 1).stream())
+    more = len(docs) > per_page
+    docs = docs[:per_page]
+    if backward:
+        docs.reverse()
+
+    number = cursor['n'] if cursor else 1
+    if backward:
+        has_next, has_prev = True, more and number > 1
+    else:
+        has_next, has_prev = more, number > 1
+    if not docs:
+        has_next = has_prev = False
+
+    return Page(
+        items      = docs,
+        total      = count_of(query) if total else None,
+        per_page   = per_page,
+        number     = number,
+        next_token = _make_token(scope, docs[-1], sort_by, 'next', number + 1) if has_next else None,
+        prev_token = _make_token(scope, docs[0], sort_by, 'prev', number - 1) if has_prev else None,
+    )
@@ -0,0 +1,43 @@
+"""
+House-Forge List Projections
+============================
+Field sets for listing pages, applied with Query.select() so a list view
+downloads only what its template shows:
+
+    paginate(query, scope='admin.projects', token=..., fields=ADMIN_PROJECT_LIST)
+    select_fields(query, CONTRACTOR_ACTIVE_PROJECTS).stream()
+
+A project document carries the full `estimation` map (quantities, tiers,
+stage breakdown) and the raw form `inputs`; neither is in any list set, so
+they are only read by the detail pages that fetch the whole document.
+Snapshots from a projected query hold just these fields - add a field here
+when a list template starts using it.
+"""
+
+# ─────────────────────────────────────────────────────────────────
+#  PROJECTS
+# ─────────────────────────────────────────────────────────────────
+
+# user/my_projects.html
+USER_PROJECT_LIST = ('title', 'status', 'created_at', 'location', 'square_feet',
+                     'rooms', 'floors', 'budget_range')
+
+# user/dashboard.html (also counted for the stat tiles)
+USER_DASHBOARD_PROJECTS = ('title', 'status', 'square_feet', 'rooms', 'floors')
+
+# contractor/browse_projects.html (user_id resolves the owner's name)
+BROWSE_PROJECTS = ('title', 'description', 'user_id', 'location', 'square_feet',
+                   'rooms', 'floors', 'bathrooms', 'budget_range')
+
+# contractor/active_projects.html
+CONTRACTOR_ACTIVE_PROJECTS = ('title', 'status', 'user_id', 'location', 'square_feet',
+                              'rooms', 'floors', 'bathrooms', 'agreed_cost',
+                              'agreed_duration', 'started_at')
+
+# admin/all_projects.html
+ADMIN_PROJECT_LIST = ('title', 'status', 'created_at', 'location', 'square_feet')
+
+
+def select_fields(query, fields):
+    """query projected onto fields (None = whole documents)."""
+    return query.select(list(fields)) if fields else query
@@ -0,0 +1,150 @@
+"""
+House-Forge Rate Tables
+=======================
+Every estimator rate table (CONCRETE_GRADE_FACTOR, DOOR_RATE, SANITARY_RATE,
+...) and Config.MATERIAL_PRICES, loaded from a versioned data file
+(Config.RATE_TABLES_PATH, default data/rate_tables.json) instead of code.
+
+The file is compiled once per version into a RateTables snapshot: every
+level read-only (mappings behind MappingProxyType, lists as tuples) with
+interned keys, shared by every module that binds it. bind(globals()) puts
+the snapshot's `rates` namedtuple into a module's namespace as RATES, so
+the calculators read RATES.DOOR_RATE, RATES.SANITARY_RATE, ...
+
+maybe_reload() runs at the start of each estimate. It stats the file at most
+every Config.RATE_TABLE_CHECK_SECONDS; when the mtime changed it compiles the
+new file and rebinds RATES in every bound module - one assignment per
+module, never table by table - with no restart or redeploy. A file that
+fails to parse, or drops a table, is reported and the current snapshot kept.
+Callbacks from on_reload() (RATE_TABLE_VERSION) run after each swap.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from collections import namedtuple
+from types import MappingProxyType
+
+from config import Config
+
+
+class RateTables:
+    """One compiled, immutable version of the rate file."""
+    __slots__ = ("label", "tables", "rates", "material_prices", "path", "mtime")
+
+    def __init__(self, label, tables, material_prices, path, mtime):
+        self.label           = label
+        self.tables          = tables
+        self.rates           = namedtuple("Rates", tables)(**tables)
+        self.material_prices = material_prices
+        self.path            = path
+        self.mtime           = mtime
+
+
+def _freeze(value, numeric_keys=False):
+    # A proxy .get() costs ~25% more than a dict's; at the few dozen lookups an
+    # estimate makes that is ~1us, a fair price for tables nothing can edit.
+    if isinstance(value, dict):
+        return MappingProxyType({_key(k, numeric_keys): _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _key(key, numeric):
+    # JSON keys are strings; numeric tables (slab thickness) are looked up by number
+    if numeric:
+        return int(key) if key.isdigit() else float(key)
+    return sys.intern(key)
+
+
+def compile_file(path, previous=None):
+    """Parse and freeze a rate file. Raises ValueError if it drops a table previous had."""
+    mtime = os.stat(path).st_mtime_ns
+    with open(path, encoding="utf-8") as fh:
+        raw = json.load(fh)
+    numeric = set(raw.get("numeric_keys") or [])
+    tables  = {sys.intern(name): _freeze(table, name in numeric)
+               for name, table in raw["tables"].items()}
+    if previous is not None:
+        missing = sorted(set(previous.tables) - set(tables))
+        if missing:
+            raise ValueError(f"missing tables: {', '.join(missing)}")
+    return RateTables(
+        label           = str(raw.get("version") or "unversioned"),
+        tables          = MappingProxyType(tables),
+        material_prices = _freeze(raw.get("material_prices") or {}),
+        path            = path,
+        mtime           = mtime,
+    )
+
+
+# ─────────────────────────────────────────────────────────────────
+#  CURRENT SNAPSHOT + HOT RELOAD
+# ─────────────────────────────────────────────────────────────────
+
+_lock       = threading.Lock()
+_namespaces = []
+_listeners  = []
+_current    = None
+_seen_mtime = None
+_checked_at = 0.0
+
+
+def current():
+    """The RateTables snapshot estimates are priced with right now."""
+    return _current
+
+
+def bind(namespace):
+    """Set RATES in a module namespace (globals()) and keep it current on reload."""
+    namespace["RATES"] = _current.rates
+    _namespaces.append(namespace)
+
+
+def on_reload(callback):
+    """Call callback(snapshot) after every successful reload."""
+    _listeners.append(callback)
+
+
+def _swap(snapshot):
+    global _current, _seen_mtime
+    _current    = snapshot
+    _seen_mtime = snapshot.mtime
+    Config.MATERIAL_PRICES = snapshot.material_prices
+    for namespace in _namespaces:
+        namespace["RATES"] = snapshot.rates
+    for callback in _listeners:
+        callback(snapshot)
+
+
+def maybe_reload(force=False):
+    """Reload the rate file if it changed since the last check. Returns True on a swap."""
+    global _seen_mtime, _checked_at
+    now = time.monotonic()
+    if not force and now - _checked_at < Config.RATE_TABLE_CHECK_SECONDS:
+        return False
+    with _lock:
+        _checked_at = now
+        path = _current.path
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError as e:
+            print(f"⚠️ Rate table file unavailable, keeping {_current.label}: {e}")
+            return False
+        if mtime == _seen_mtime and not force:
+            return False
+        try:
+            snapshot = compile_file(path, previous=_current)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            _seen_mtime = mtime        # don't retry the same broken file every check
+            print(f"⚠️ Rate tables not reloaded, keeping {_current.label}: {e}")
+            return False
+        _swap(snapshot)
+    print(f"🔄 Rate tables reloaded: {snapshot.label}")
+    return True
+
+
+_swap(compile_file(Config.RATE_TABLES_PATH))
@@ -0,0 +1,130 @@
+"""
+House-Forge Incremental Re-estimation
+=====================================
+Lets edit_project re-price only the stages an edit actually touches.
+
+Every stage of _calc_residential / _calc_apartment (and the material
+quantities) is run against a tracing proxy of the EstimateInputs record that
+records which fields it read. The estimate then stores, per stage, that
+dependency list, a fingerprint of the values it saw and the resulting base
+cost:
+
+    estimation.stage_inputs = {
+        "v": RATE_TABLE_VERSION, "kind": "residential",
+        "stages": {"finishing": {"deps": [...], "fp": "...", "cost": 412345.0}, ...},
+        "boq":    {"deps": [...], "fp": "..."},
+    }
+
+On the next edit a stage whose fingerprint over its stored deps is unchanged
+keeps its cost; the rest are recomputed (and re-traced, since a changed value
+can change which fields a stage reads). The tier roll-up and the timeline are
+always rebuilt. Fingerprints include RATE_TABLE_VERSION, so a rate change
+recomputes everything.
+"""
+
+import hashlib
+import json
+
+from services.calculation_service import (
+    STAGE_KEYS, rate_table_version,
+    _build_cost_tiers, _build_quantities, _build_timeline,
+    _calc_apartment, _calc_residential,
+)
+
+
+class _Tracer:
+    """Read-only stand-in for an EstimateInputs record that logs attribute reads."""
+    __slots__ = ("_inp", "reads")
+
+    def __init__(self, inp):
+        self._inp  = inp
+        self.reads = set()
+
+    def __getattr__(self, name):
+        self.reads.add(name)
+        return getattr(self._inp, name)
+
+
+def _fingerprint(inp, deps):
+    values = [[name, getattr(inp, name, None)] for name in deps]
+    blob = json.dumps([rate_table_version(), values], separators=(",", ":"), default=str)
+    return hashlib.sha1(blob.encode()).hexdigest()[:16]
+
+
+def _traced(fn, inp, *args):
+    """fn(inp, *args) plus a tracked unit {deps, fp} for what it read."""
+    tracer = _Tracer(inp)
+    result = fn(tracer, *args)
+    deps   = sorted(tracer.reads)
+    return result, {"deps": deps, "fp": _fingerprint(inp, deps)}
+
+
+def _is_fresh(unit, inp):
+    return bool(unit) and _fingerprint(inp, unit.get("deps", [])) == unit.get("fp")
+
+
+# ─────────────────────────────────────────────────────────────────
+#  STAGES
+# ─────────────────────────────────────────────────────────────────
+
+def trace_stages(inp, previous=None):
+    """
+    Base (unscaled) stage costs for inp, reusing every stage of a previous
+    stage_inputs map whose inputs are unchanged.
+    Returns (base_breakdown, stage_inputs, recomputed stage names).
+    """
+    calc = _calc_apartment if inp.kind == "apartment" else _calc_residential
+    prev = previous or {}
+    if prev.get("v") != rate_table_version() or prev.get("kind") != inp.kind:
+        prev = {}
+    prev_stages = prev.get("stages") or {}
+
+    base, stages, recomputed = {}, {}, []
+    for stage in STAGE_KEYS:
+        unit = prev_stages.get(stage)
+        if _is_fresh(unit, inp):
+            base[stage]   = unit["cost"]
+            stages[stage] = unit
+            continue
+        costs, unit = _traced(calc, inp, (stage,))
+        unit["cost"]  = costs[stage]
+        base[stage]   = costs[stage]
+        stages[stage] = unit
+        recomputed.append(stage)
+
+    stage_inputs = {"v": rate_table_version(), "kind": inp.kind, "stages": stages}
+    if prev.get("boq"):
+        stage_inputs["boq"] = prev["boq"]
+    return base, stage_inputs, recomputed
+
+
+def tracked_estimate(inp, previous=None):
+    """
+    Deterministic estimate (same as estimate_from_inputs(inp, refine=False))
+    that carries stage_inputs, recomputing only what changed since the
+    previous estimation dict. Returns (estimation, recomputed stage names).
+    """
+    previous = previous or {}
+    base_bd, stage_inputs, recomputed = trace_stages(inp, previous.get("stage_inputs"))
+    costs = _build_cost_tiers(base_bd, inp.scope)
+
+    # "boq" only survives trace_stages when the version and kind still match
+    if previous.get("materials") and _is_fresh(stage_inputs.get("boq"), inp):
+        materials = previous["materials"]
+    else:
+        materials, stage_inputs["boq"] = _traced(_build_quantities, inp)
+    timeline = _build_timeline(inp.sqft, inp.floors, inp.rooms)
+
+    return {
+        "materials":             materials,
+        "costs":                 costs,
+        "timeline":              timeline,
+        "selected_budget":       inp.budget_range,
+        "total_materials_count": sum(len(s) for s in materials.values()),
+        "ai_rationale":          "",
+        "ai_confidence":         "",
+        "estimate_scope":        inp.scope,
+        "property_type":         inp.prop_type,
+        "rate_table_version":    stage_inputs["v"],
+        "stage_inputs":          stage_inputs,
+    }, recomputed
@@ -0,0 +1,135 @@
+"""
+House-Forge Platform Stats Rollup
+=================================
+The admin dashboard and analytics read one document instead of streaming
+users, contractors, suppliers, projects and orders:
+
+    stats/platform = {
+        users, contractors, suppliers, users_active,
+        pending_users, pending_contractors, pending_suppliers,
+        projects, projects_active, projects_completed,
+        orders_completed, revenue, recomputed_at,
+    }
+
+Write paths add their deltas with bump() in the same batch or transaction
+as the change itself: register, verify, activate / deactivate, project
+create / accept / complete / delete, order complete. recompute() (`flask recompute-stats`,
+and automatically when the document is missing) rebuilds every field from
+count() / sum() aggregations to correct any drift.
+"""
+
+from datetime import datetime
+
+from firebase_admin import firestore
+
+from services.aggregation import count_of, sum_of
+from services.doc_loader import load_doc
+
+STATS_DOC = ('stats', 'platform')
+
+FIELDS = ('users', 'contractors', 'suppliers', 'users_active',
+          'pending_users', 'pending_contractors', 'pending_suppliers',
+          'projects', 'projects_active', 'projects_completed',
+          'orders_completed', 'revenue')
+
+# account collection -> (total field, pending-verification field)
+ACCOUNT_FIELDS = {
+    'users':       ('users', 'pending_users'),
+    'contractors': ('contractors', 'pending_contractors'),
+    'suppliers':   ('suppliers', 'pending_suppliers'),
+}
+
+# project status -> field counting projects in that status
+PROJECT_STATUS_FIELDS = {'active': 'projects_active', 'completed': 'projects_completed'}
+
+
+def _ref(db):
+    return db.collection(STATS_DOC[0]).document(STATS_DOC[1])
+
+
+def bump(db, batch, **deltas):
+    """Add deltas (field=n) to the rollup as part of batch."""
+    deltas = {f: firestore.Increment(n) for f, n in deltas.items() if n}
+    if deltas:
+        batch.set(_ref(db), deltas, merge=True)
+
+
+def bump_now(db, **deltas):
+    """bump() in a batch of its own."""
+    batch = db.batch()
+    bump(db, batch, **deltas)
+    batch.commit()
+
+
+def project_status_deltas(old_status, new_status):
+    """Rollup deltas for a project moving from old_status to new_status (None = created / deleted)."""
+    deltas = {}
+    if old_status is None:
+        deltas['projects'] = 1
+    if new_status is None:
+        deltas['projects'] = -1
+    if old_status in PROJECT_STATUS_FIELDS and old_status != new_status:
+        deltas[PROJECT_STATUS_FIELDS[old_status]] = -1
+    if new_status in PROJECT_STATUS_FIELDS and old_status != new_status:
+        deltas[PROJECT_STATUS_FIELDS[new_status]] = 1
+    return deltas
+
+
+def set_project_status(db, project_id, status, fields=None, owner=None):
+    """
+    Move a project to status (plus fields) and bump its rollup deltas in one
+    transaction, so a repeated or concurrent request counts the move once.
+    owner=(field, id) must match the stored project. Raises LookupError if
+    the project is gone and PermissionError if owner doesn't match. Returns
+    the project as it was before.
+    """
+    project_ref = db.collection('projects').document(project_id)
+
+    @firestore.transactional
+    def _move(transaction):
+        snap = project_ref.get(transaction=transaction)
+        if not snap.exists:
+            raise LookupError('Project not found')
+        before = snap.to_dict() or {}
+        if owner and before.get(owner[0]) != owner[1]:
+            raise PermissionError('Access denied')
+        transaction.update(project_ref, dict(fields or {}, status=status))
+        bump(db, transaction, **project_status_deltas(before.get('status'), status))
+        return before
+
+    return _move(db.transaction())
+
+
+# ─────────────────────────────────────────────────────────────────
+#  READ / RECOMPUTE
+# ─────────────────────────────────────────────────────────────────
+
+def load(db):
+    """The rollup as a dict (every field present, never negative). Recomputes if missing."""
+    stats = load_doc(db, *STATS_DOC)
+    if stats is None:
+        stats = recompute(db)
+    return {f: max(0, stats.get(f) or 0) for f in FIELDS}
+
+
+def recompute(db):
+    """Rebuild every field from aggregation queries and overwrite the rollup."""
+    stats = {}
+    for collection, (total_field, pending_field) in ACCOUNT_FIELDS.items():
+        accounts = db.collection(collection)
+        stats[total_field] = count_of(accounts)
+        # register always writes verified; older accounts without it count as pending
+        stats[pending_field] = stats[total_field] - count_of(accounts.where('verified', '==', True))
+    stats['users_active'] = stats['users'] - count_of(db.collection('users').where('active', '==', False))
+
+    projects = db.collection('projects')
+    stats['projects'] = count_of(projects)
+    for status, field in PROJECT_STATUS_FIELDS.items():
+        stats[field] = count_of(projects.where('status', '==', status))
+
+    completed = db.collection('orders').where('status', '==', 'completed')
+    stats['orders_completed'] = count_of(completed)
+    stats['revenue'] = sum_of(completed, 'total')
+
+    _ref(db).set(dict(stats, recomputed_at=datetime.now()))
+    return stats
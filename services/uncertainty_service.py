@@ -0,0 +1,227 @@
+"""
+House-Forge Estimate Uncertainty
+================================
+Monte Carlo P10 / P50 / P90 cost bands per stage, shown next to the fixed
+TIER_FACTOR low / medium / high tiers.
+
+Each draw perturbs the rate-resolved row the batch engine builds for a
+project and re-prices it with the same vectorised calculators
+(services.batch_service), so thousands of draws are a few dozen NumPy array
+expressions rather than a Python loop:
+
+  - a market factor shared by every rate in the draw
+  - one multiplier per rate table (all columns read from that table move
+    together), triangular around the table rate
+  - soil: foundation depth over-run, soil surcharge spread and a chance the
+    site turns out one soil class worse than declared
+  - per-stage quantity variance (wastage / measurement over-run)
+
+Draws are seeded from the estimate cache key, so the same inputs always give
+the same bands. AI refinement factors are not applied to the bands.
+"""
+
+import numpy as np
+
+from services.batch_service import (
+    _apartment_inputs, _calc_apartment_v, _calc_residential_v, _residential_inputs,
+)
+from services import rate_tables
+from services.calculation_service import STAGE_KEYS, TIER_FACTOR
+from services.estimate_cache import estimate_key
+
+# RATES.SOIL_EXTRA_RATE (and the other rate tables), rebound on reload
+rate_tables.bind(globals())
+
+# ─────────────────────────────────────────────────────────────────
+#  DISTRIBUTIONS  (triangular: low, mode 1.0, high - as rate multipliers)
+# ─────────────────────────────────────────────────────────────────
+
+MARKET_SPREAD = (0.95, 1.12)
+
+RATE_SPREAD = {
+    "CONCRETE_GRADE_FACTOR": (0.94, 1.10),    # concrete price
+    "STEEL_GRADE_FACTOR":    (0.90, 1.18),    # steel price - the most volatile input
+    "FOUNDATION_RATE":       (0.90, 1.15),
+    "SOIL_EXTRA_RATE":       (0.70, 1.60),
+    "ANTI_TERMITE_RATE":     (0.90, 1.10),
+    "WATERPROOFING_RATE":    (0.90, 1.15),
+    "WALL_MATERIAL_RATE":    (0.92, 1.12),
+    "PLASTER_RATE":          (0.92, 1.10),
+    "DOOR_RATE":             (0.88, 1.18),
+    "WINDOW_RATE":           (0.88, 1.18),
+    "FLOORING_RATE":         (0.85, 1.20),
+    "BATH_TILE_RATE":        (0.88, 1.15),
+    "STAIRCASE_RATE":        (0.90, 1.15),
+    "APT_STAIRCASE_RATE":    (0.90, 1.15),
+    "PIPE_RATE":             (0.90, 1.12),
+    "SANITARY_RATE":         (0.85, 1.20),
+    "WIRING_RATE":           (0.90, 1.15),
+    "EARTHING_RATE":         (0.90, 1.10),
+    "INVERTER_RATE":         (0.90, 1.15),
+    "INTERNAL_PAINT_RATE":   (0.92, 1.10),
+    "EXTERNAL_PAINT_RATE":   (0.92, 1.10),
+    "KITCHEN_PLATFORM_RATE": (0.90, 1.15),
+    "KITCHEN_STONE_RATE":    (0.88, 1.15),
+    "PORCH_STYLE_RATE":      (0.90, 1.15),
+    "LANDSCAPING_RATE":      (0.80, 1.30),
+    "BOUNDARY_FINISH_RATE":  (0.90, 1.15),
+    "GATE_RATE":             (0.85, 1.20),
+    "CLADDING_RATE":         (0.85, 1.20),
+    "POOL_FINISH_RATE":      (0.85, 1.25),
+    "POOL_DECK_RATE":        (0.88, 1.18),
+    "DRIVEWAY_RATE":         (0.90, 1.15),
+    "FACADE_RATE":           (0.88, 1.18),
+    "LIFT_RATE":             (0.92, 1.12),
+    "DG_BACKUP":             (0.90, 1.15),
+    "PARKING_FLOOR_RATE":    (0.90, 1.15),
+    "CLUBHOUSE_RATE":        (0.85, 1.25),
+    "PLAY_AREA_RATE":        (0.85, 1.20),
+    "FIRE_SPEC_RATE":        (0.90, 1.15),
+    "STP_RATE":              (0.90, 1.15),
+    "APT_LANDSCAPE_RATE":    (0.80, 1.30),
+}
+
+# Batch-engine row column -> the rate table it was looked up from
+RESIDENTIAL_COLUMNS = {
+    "conc_fac": "CONCRETE_GRADE_FACTOR", "steel_fac": "STEEL_GRADE_FACTOR",
+    "fd_rate": "FOUNDATION_RATE",        "soil_extra": "SOIL_EXTRA_RATE",
+    "anti_t": "ANTI_TERMITE_RATE",       "wproof": "WATERPROOFING_RATE",
+    "mat_rate": "WALL_MATERIAL_RATE",
+    "int_plas": "PLASTER_RATE",          "ext_plas": "PLASTER_RATE",
+    "door_rate": "DOOR_RATE",            "win_rate": "WINDOW_RATE",
+    "floor_rate": "FLOORING_RATE",       "bath_tile": "BATH_TILE_RATE",
+    "stair_rate": "STAIRCASE_RATE",      "pipe_rate": "PIPE_RATE",
+    "san_rate": "SANITARY_RATE",         "wiring_rate": "WIRING_RATE",
+    "earth_rate": "EARTHING_RATE",       "inv_rate": "INVERTER_RATE",
+    "int_p_rate": "INTERNAL_PAINT_RATE", "ext_p_rate": "EXTERNAL_PAINT_RATE",
+    "kt_rate": "KITCHEN_PLATFORM_RATE",  "kp_stone": "KITCHEN_STONE_RATE",
+    "porch_rate": "PORCH_STYLE_RATE",    "ls_rate": "LANDSCAPING_RATE",
+    "bw_rate": "BOUNDARY_FINISH_RATE",   "gate_cost": "GATE_RATE",
+    "cladding": "CLADDING_RATE",         "pool_fin": "POOL_FINISH_RATE",
+    "pool_deck": "POOL_DECK_RATE",       "vd_rate": "DRIVEWAY_RATE",
+}
+
+APARTMENT_COLUMNS = {
+    "conc_fac": "CONCRETE_GRADE_FACTOR", "steel_fac": "STEEL_GRADE_FACTOR",
+    "fd_rate": "FOUNDATION_RATE",        "soil_extra": "SOIL_EXTRA_RATE",
+    "anti_t": "ANTI_TERMITE_RATE",       "wproof": "WATERPROOFING_RATE",
+    "bw_rate": "WATERPROOFING_RATE",     "mat_rate": "WALL_MATERIAL_RATE",
+    "int_plas": "PLASTER_RATE",          "ext_plas": "PLASTER_RATE",
+    "door_rate": "DOOR_RATE",            "win_rate": "WINDOW_RATE",
+    "facade_rate": "FACADE_RATE",        "ext_p_rate": "EXTERNAL_PAINT_RATE",
+    "stair_rate": "APT_STAIRCASE_RATE",  "floor_rate": "FLOORING_RATE",
+    "bath_tile": "BATH_TILE_RATE",       "san_rate": "SANITARY_RATE",
+    "lift_rate": "LIFT_RATE",            "dg_cost": "DG_BACKUP",
+    "int_p_rate": "INTERNAL_PAINT_RATE", "kt_rate": "KITCHEN_PLATFORM_RATE",
+    "park_rate": "PARKING_FLOOR_RATE",   "pool_add": "POOL_FINISH_RATE",
+    "club_add": "CLUBHOUSE_RATE",        "play_add": "PLAY_AREA_RATE",
+    "fire_rate": "FIRE_SPEC_RATE",       "stp_add": "STP_RATE",
+    "ls_rate": "APT_LANDSCAPE_RATE",
+}
+
+# Soil: excavation usually goes deeper than drawn, rarely shallower
+FOUNDATION_DEPTH_SPREAD = (0.95, 1.30)
+SOIL_SURPRISE_CHANCE    = 0.15
+
+# Quantity variance per stage (wastage, measurement over-run)
+STAGE_QUANTITY_SPREAD = {
+    "foundation":    (0.95, 1.15),
+    "walls":         (0.96, 1.08),
+    "flooring":      (0.97, 1.08),
+    "roofing":       (0.97, 1.08),
+    "plumbing":      (0.95, 1.12),
+    "electrical":    (0.95, 1.12),
+    "finishing":     (0.95, 1.10),
+    "carpentry":     (0.95, 1.15),
+    "exterior":      (0.90, 1.20),
+    "miscellaneous": (0.90, 1.20),
+}
+
+PERCENTILES = (10, 50, 90)
+
+
+# ─────────────────────────────────────────────────────────────────
+#  SAMPLING
+# ─────────────────────────────────────────────────────────────────
+
+def _triangular(rng, spreads, draws):
+    """
+    (len(spreads), draws) multipliers, one triangular(low, 1.0, high) row per
+    spread. Inverse-CDF on a single uniform block - Generator.triangular is
+    several times slower when the bounds are arrays.
+    """
+    lo = np.array([s[0] for s in spreads])[:, None]
+    hi = np.array([s[1] for s in spreads])[:, None]
+    u  = rng.random((len(spreads), draws))
+    width = hi - lo
+    left  = u < (1.0 - lo) / width
+    dist  = np.sqrt(np.where(left, u * width * (1.0 - lo), (1.0 - u) * width * (hi - 1.0)))
+    return np.where(left, lo + dist, hi - dist)
+
+
+def _worse_soil(soil_extra):
+    """Surcharge of the next soil class up from the declared one."""
+    for step in sorted(set(RATES.SOIL_EXTRA_RATE.values())):
+        if step > soil_extra:
+            return step
+    return soil_extra
+
+
+def _sample_columns(row, columns, rng, draws):
+    """Rate-resolved row -> dict of draw columns with every rate perturbed."""
+    c = dict(row)
+    tables = sorted(set(columns.values()))
+    table_mult = dict(zip(tables, _triangular(rng, [RATE_SPREAD[t] for t in tables], draws)))
+    market = _triangular(rng, [MARKET_SPREAD], draws)[0]
+    for col, table in columns.items():
+        c[col] = row[col] * table_mult[table] * market
+
+    surprise = rng.random(draws) < SOIL_SURPRISE_CHANCE
+    c["soil_extra"] = np.where(surprise, _worse_soil(row["soil_extra"]) * table_mult["SOIL_EXTRA_RATE"],
+                               c["soil_extra"])
+    c["fd_depth"] = row["fd_depth"] * _triangular(rng, [FOUNDATION_DEPTH_SPREAD], draws)[0]
+    return c
+
+
+# ─────────────────────────────────────────────────────────────────
+#  PUBLIC ENTRY POINT
+# ─────────────────────────────────────────────────────────────────
+
+def cost_bands(inp, draws=4000, seed=None):
+    """
+    P10/P50/P90 per stage plus material and total cost for one resolved
+    EstimateInputs record, at the project's selected budget tier.
+    """
+    draws = max(100, int(draws))
+    rng = np.random.default_rng(int(estimate_key(inp)[:16], 16) if seed is None else seed)
+
+    g = {k: np.full(draws, getattr(inp, k))
+         for k in ("sqft", "plot_area", "floors", "rooms", "bathrooms", "ceiling_ht")}
+    if inp.kind == "apartment":
+        c  = _sample_columns(_apartment_inputs(inp), APARTMENT_COLUMNS, rng, draws)
+        bd = _calc_apartment_v(c, g)
+    else:
+        c  = _sample_columns(_residential_inputs(inp), RESIDENTIAL_COLUMNS, rng, draws)
+        bd = _calc_residential_v(c, g, villa=inp.kind == "villa")
+
+    tier_fac = TIER_FACTOR.get(inp.budget_range, 1.0)
+    qty = _triangular(rng, [STAGE_QUANTITY_SPREAD[k] for k in STAGE_KEYS], draws)
+    stages = np.vstack([bd[k] for k in STAGE_KEYS]) * qty * tier_fac     # (stages, draws)
+
+    labour_pct = 0.22 if inp.scope == "material_and_labour" else 0.0
+    material = stages.sum(axis=0)
+    total    = material + material * labour_pct + material * 0.025
+
+    bands = np.round(np.percentile(np.vstack([stages, material, total]), PERCENTILES, axis=1), 0)
+    p10, p50, p90 = bands.tolist()
+    keys = STAGE_KEYS + ["material_cost", "total_cost"]
+    out = {k: {"p10": lo, "p50": mid, "p90": hi}
+           for k, lo, mid, hi in zip(keys, p10, p50, p90)}
+
+    return {
+        "draws":         draws,
+        "budget":        inp.budget_range if inp.budget_range in TIER_FACTOR else "medium",
+        "stages":        {k: out[k] for k in STAGE_KEYS},
+        "material_cost": out["material_cost"],
+        "total_cost":    out["total_cost"],
+    }
@@ -0,0 +1,131 @@
+"""
+House-Forge Unread Counters
+===========================
+The navbar polls the unread badges on every page, so each account keeps its
+unread totals in one document instead of counting messages / notifications:
+
+    unread_counts/<account_id> = {messages: n, notifications: n}
+
+Writers bump the counter in the same batch as the document they create
+(conversation_service.send_message, create_notification), so a poll is one
+point read. Mark-reads (conversation_service.mark_read, mark_notification_read
+here) re-read the read flags inside a transaction and decrement only for
+documents that were still unread, so concurrent clicks on the same message or
+notification take it off the count once.
+
+reconcile() (`flask reconcile-unread-counts`) recounts from the source
+collections and repairs every counter that drifted anyway (e.g. documents
+deleted while unread), including the per-conversation user_unread /
+partner_unread. Like the mark-reads, it treats a document without a `read`
+field as unread, so it streams every message and notification (projected to
+the fields it needs) rather than querying read == False.
+"""
+
+from collections import Counter
+from datetime import datetime
+
+from firebase_admin import firestore
+
+from services.doc_loader import load_doc
+from services.projections import select_fields
+
+COLLECTION = 'unread_counts'
+FIELDS = ('messages', 'notifications')
+
+
+def bump(db, batch, account_id, field, n=1):
+    """Add n (may be negative) to an account's counter as part of batch (or transaction)."""
+    if account_id and n:
+        batch.set(db.collection(COLLECTION).document(account_id),
+                  {field: firestore.Increment(n)}, merge=True)
+
+
+def mark_notification_read(db, notification_id, user_id):
+    """
+    Mark one of user_id's notifications read and take it off the counter, in
+    one transaction. Raises LookupError (missing) or PermissionError (not theirs).
+    """
+    notif_ref = db.collection('notifications').document(notification_id)
+
+    @firestore.transactional
+    def _mark(transaction):
+        snap = notif_ref.get(transaction=transaction)
+        if not snap.exists:
+            raise LookupError('Notification not found')
+        notif = snap.to_dict() or {}
+        if notif.get('user_id') != user_id:
+            raise PermissionError('Access denied')
+        if notif.get('read', False):
+            return
+        transaction.update(notif_ref, {'read': True, 'read_at': datetime.now()})
+        bump(db, transaction, user_id, 'notifications', -1)
+
+    _mark(db.transaction())
+
+
+def unread_count(db, account_id, field):
+    """Current unread total - one document read, shared with the rest of the request."""
+    counts = load_doc(db, COLLECTION, account_id) or {}
+    return max(0, int(counts.get(field) or 0))
+
+
+# ─────────────────────────────────────────────────────────────────
+#  RECONCILIATION
+# ─────────────────────────────────────────────────────────────────
+
+def _commit_all(db, writes, batch_size=400):
+    for start in range(0, len(writes), batch_size):
+        batch = db.batch()
+        for ref, data in writes[start:start + batch_size]:
+            batch.set(ref, data, merge=True)
+        batch.commit()
+
+
+def _unread(db, collection, fields):
+    """Documents of collection not marked read (a missing 'read' counts as unread), as dicts."""
+    docs = select_fields(db.collection(collection), fields + ('read',)).stream()
+    return [data for data in (doc.to_dict() or {} for doc in docs) if not data.get('read', False)]
+
+
+def reconcile(db):
+    """
+    Recount unread messages and notifications per account and rewrite every
+    counter that disagrees. Returns {'counters': n fixed, 'conversations': n fixed}.
+    """
+    from services.conversation_service import PARTNER_TYPES, summarize, unread_recipient
+
+    messages = _unread(db, 'messages', ('user_id', 'sender_type', 'created_at')
+                       + tuple(f'{partner_type}_id' for partner_type in PARTNER_TYPES))
+    actual = {'messages': Counter(), 'notifications': Counter()}
+    for msg in messages:
+        recipient = unread_recipient(msg)
+        if recipient:
+            actual['messages'][recipient] += 1
+    for notif in _unread(db, 'notifications', ('user_id',)):
+        if notif.get('user_id'):
+            actual['notifications'][notif['user_id']] += 1
+
+    writes, stored_ids = [], set()
+    for doc in db.collection(COLLECTION).stream():
+        stored_ids.add(doc.id)
+        stored = doc.to_dict()
+        fix = {f: actual[f][doc.id] for f in FIELDS if stored.get(f, 0) != actual[f][doc.id]}
+        if fix:
+            writes.append((doc.reference, fix))
+    for account_id in (set(actual['messages']) | set(actual['notifications'])) - stored_ids:
+        writes.append((db.collection(COLLECTION).document(account_id),
+                       {f: actual[f][account_id] for f in FIELDS}))
+    counters_fixed = len(writes)
+
+    # Per-conversation counters; only unread messages can contribute to them
+    unread = summarize(messages)
+    for doc in db.collection('conversations').stream():
+        stored = doc.to_dict()
+        want = unread.get(doc.id, {})
+        fix = {side: want.get(side, 0) for side in ('user_unread', 'partner_unread')
+               if stored.get(side, 0) != want.get(side, 0)}
+        if fix:
+            writes.append((doc.reference, fix))
+
+    _commit_all(db, writes)
+    return {'counters': counters_fixed, 'conversations': len(writes) - counters_fixed}
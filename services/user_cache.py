@@ -0,0 +1,104 @@
+"""
+House-Forge User Cache
+======================
+Keeps Flask-Login's load_user off Firestore for most requests.
+
+  - login stores the account's collection in the session
+    (session['account_collection']), so a cache miss reads one collection
+    instead of probing users, admins, contractors and suppliers in turn
+  - loaded User objects are kept in a small in-process LRU with a short TTL
+    (Config.USER_CACHE_SIZE / USER_CACHE_TTL)
+
+Routes that change what a User carries (profile edits, verify, activate /
+deactivate) call invalidate(user_id). Other workers catch up within the TTL.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from flask import has_request_context, session
+
+from config import Config
+from services.email_index import ACCOUNT_COLLECTIONS
+
+SESSION_KEY = 'account_collection'
+
+
+class UserCache:
+    """Thread-safe LRU + TTL map of user_id -> (collection, User)."""
+
+    def __init__(self, max_entries=1024, ttl_seconds=60):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_seconds = ttl_seconds
+        self._entries    = OrderedDict()      # user_id -> (stored_at, collection, user)
+        self._lock       = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry and now - entry[0] <= self.ttl_seconds:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[1], entry[2]
+            if entry:
+                del self._entries[user_id]
+            self.misses += 1
+        return None
+
+    def put(self, user_id, collection, user):
+        with self._lock:
+            self._entries[user_id] = (time.monotonic(), collection, user)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+user_cache = UserCache(Config.USER_CACHE_SIZE, Config.USER_CACHE_TTL)
+
+
+# ─────────────────────────────────────────────────────────────────
+#  SESSION HINT
+# ─────────────────────────────────────────────────────────────────
+
+def collection_hint():
+    """Collection the logged-in account lives in, if login recorded it."""
+    if not has_request_context():
+        return None
+    hint = session.get(SESSION_KEY)
+    return hint if hint in ACCOUNT_COLLECTIONS else None
+
+
+def remember(user_id, collection, user):
+    """Cache a freshly loaded User and record its collection in the session."""
+    user_cache.put(user_id, collection, user)
+    if has_request_context() and session.get(SESSION_KEY) != collection:
+        session[SESSION_KEY] = collection
+
+
+def forget_session():
+    if has_request_context():
+        session.pop(SESSION_KEY, None)
+
+
+def invalidate(user_id):
+    """Drop a cached User after its account document changed."""
+    user_cache.invalidate(user_id)
+
+
+def probe_order():
+    """Collections to try for a cache miss: the session hint first, then the rest."""
+    hint = collection_hint()
+    if not hint:
+        return list(ACCOUNT_COLLECTIONS)
+    return [hint] + [c for c in ACCOUNT_COLLECTIONS if c != hint]
@@ -0,0 +1,186 @@
+"""
+House-Forge What-If Sweep
+=========================
+"What if we use M25 instead of M20?" without an edit_project round trip.
+
+Takes a base project and a grid of input variations, prices every variant in
+one pass through the batch engine (calculate_materials_and_cost_batch) and
+returns a ranked delta table against the base. Nothing is written to
+Firestore.
+
+Variation keys may be
+  - sizing arguments:  square_feet, rooms, floors, bathrooms, budget_range
+  - schema field names from form_schema (concrete_grade, wall_material,
+    floor_type, ...) - generic names also reach the apt_* field for apartments
+  - raw create_project.html form keys (villa_wall_material, apt_lifts, ...)
+
+Projects created before their detailed inputs were stored can't be swept:
+every variant would silently be priced on schema defaults, so project_base()
+raises MissingInputs for them.
+"""
+
+import itertools
+import math
+
+from config import Config
+from services.batch_service import calculate_materials_and_cost_batch
+from services.calculation_service import STAGE_KEYS
+from services.form_schema import form_keys, kind_of, schema_for
+
+SIZING_FIELDS = ("square_feet", "rooms", "floors", "bathrooms", "budget_range")
+
+
+# ─────────────────────────────────────────────────────────────────
+#  BASE + VARIANTS
+# ─────────────────────────────────────────────────────────────────
+
+class MissingInputs(ValueError):
+    """The project has no stored estimator inputs (it predates them)."""
+
+
+def project_base(project, allow_defaults=False):
+    """
+    Estimator arguments for a stored project document. Raises MissingInputs
+    if it has no stored inputs, unless allow_defaults (schema defaults then
+    stand in for every detailed field).
+    """
+    if not project.get('inputs') and not allow_defaults:
+        raise MissingInputs('This project predates saved detailed inputs, so it can only be '
+                            're-priced on default specifications')
+    form = dict(project.get('inputs') or {})
+    for key in ('property_type', 'estimate_scope', 'location', 'plot_area'):
+        if project.get(key) and key not in form:
+            form[key] = project[key]
+    return {
+        'square_feet':  float(project.get('square_feet') or 0),
+        'rooms':        int(project.get('rooms') or 1),
+        'floors':       int(project.get('floors') or 1),
+        'bathrooms':    int(project.get('bathrooms') or 2),
+        'budget_range': project.get('budget_range') or 'medium',
+        'form':         form,
+    }
+
+
+def _form_key(kind, field):
+    """Form key a variation field writes to, or None if the estimator never reads it."""
+    names = {name: keys[0] for name, _, _, keys in schema_for(kind)}
+    if kind == "apartment" and f"apt_{field}" in names:
+        return names[f"apt_{field}"]        # the apartment form's own field
+    if field in names:
+        return names[field]
+    if field in form_keys(kind):
+        return field
+    return None
+
+
+def _axes(variations):
+    return [(field, values if isinstance(values, (list, tuple)) else [values])
+            for field, values in (variations or {}).items()]
+
+
+def count_variants(variations, mode="grid"):
+    """How many overrides expand_variations() would build, without building them."""
+    sizes = [len(values) for _, values in _axes(variations)]
+    if not sizes:
+        return 0
+    return sum(sizes) if mode == "each" else math.prod(sizes)
+
+
+def expand_variations(variations, mode="grid"):
+    """
+    {field: [values]} -> list of {field: value} overrides.
+    grid: every combination; each: one field changed at a time.
+    """
+    axes = _axes(variations)
+    if mode == "each":
+        return [{field: v} for field, values in axes for v in values]
+    fields = [field for field, _ in axes]
+    return [dict(zip(fields, combo)) for combo in itertools.product(*(v for _, v in axes))]
+
+
+def apply_overrides(base, overrides):
+    """New estimator arguments with the overrides applied to a base."""
+    variant = dict(base, form=dict(base.get('form') or {}))
+    form = variant['form']
+    kind = kind_of(form.get('property_type', 'residential'))
+    for field, value in overrides.items():
+        if field in SIZING_FIELDS:
+            variant[field] = value
+            if field == 'floors' and kind == 'apartment':
+                form['apt_total_floors'] = value
+            continue
+        key = _form_key(kind, field)
+        if key is None:
+            raise ValueError(f"Unknown estimator input '{field}' for {kind} projects")
+        form[key] = value
+    return variant
+
+
+# ─────────────────────────────────────────────────────────────────
+#  SWEEP
+# ─────────────────────────────────────────────────────────────────
+
+def _summary(estimation):
+    budget = estimation.get('selected_budget') or 'medium'
+    tier = estimation['costs'].get(budget, estimation['costs']['medium'])
+    return {
+        'budget':          budget,
+        'total_cost':      tier['total_cost'],
+        'stage_breakdown': tier['stage_breakdown'],
+        'total_days':      estimation['timeline']['total_days'],
+    }
+
+
+def what_if(base, variations, mode="grid", limit=None):
+    """
+    Price the base and every variant in one batched pass.
+    Returns {'base': summary, 'variants': [...], 'invalid': [...]} with variants
+    ranked by the size of their effect on total cost (largest first); variants
+    whose values the estimator can't parse are listed in invalid with the reason.
+    """
+    limit = limit or Config.WHATIF_MAX_VARIANTS
+    if mode not in ("grid", "each"):
+        raise ValueError("mode must be 'grid' or 'each'")
+    for field, values in _axes(variations):
+        if len(values) > Config.WHATIF_MAX_VALUES:
+            raise ValueError(f"{len(values)} values given for '{field}', "
+                             f"the limit is {Config.WHATIF_MAX_VALUES}")
+    # checked before expanding, so an oversized grid is never materialised
+    count = count_variants(variations, mode)
+    if not count:
+        raise ValueError("No variations given")
+    if count > limit:
+        raise ValueError(f"{count} variants requested, the limit is {limit}")
+    overrides = expand_variations(variations, mode)
+
+    projects = [apply_overrides(base, {})] + [apply_overrides(base, o) for o in overrides]
+    results, errors = calculate_materials_and_cost_batch(projects)
+    if 0 in errors:
+        raise ValueError(f"Project inputs are invalid: {errors[0]}")
+
+    base_sum = _summary(results[0])
+    base_total = base_sum['total_cost']
+    variants, invalid = [], []
+    for changes, estimation, row in zip(overrides, results[1:], range(1, len(results))):
+        if estimation is None:
+            invalid.append({'changes': changes, 'error': errors[row]})
+            continue
+        s = _summary(estimation)
+        delta = s['total_cost'] - base_total
+        variants.append({
+            'changes':      changes,
+            'budget':       s['budget'],
+            'total_cost':   s['total_cost'],
+            'delta':        delta,
+            'delta_pct':    round(delta / base_total * 100, 2) if base_total else 0.0,
+            'stage_deltas': {k: s['stage_breakdown'][k] - base_sum['stage_breakdown'][k]
+                             for k in STAGE_KEYS
+                             if s['stage_breakdown'][k] != base_sum['stage_breakdown'][k]},
+            'days_delta':   s['total_days'] - base_sum['total_days'],
+        })
+
+    variants.sort(key=lambda v: abs(v['delta']), reverse=True)
+    for rank, v in enumerate(variants, 1):
+        v['rank'] = rank
+
+    return {'base': base_sum, 'variants': variants, 'invalid': invalid}